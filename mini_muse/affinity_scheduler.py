@@ -0,0 +1,260 @@
+"""
+ワークフロー（モデルの組み合わせ）ごとにジョブをまとめて投入するスケジューラ
+
+このモジュールは、1台の ComfyUI サーバー（GPU）を画像生成（SD3.5 Large + RealESRGAN）と
+動画生成（WAN 2.2 14B ×2 + UMT5 + LoRA）で共有する場合に、ジョブを同じモデルの組み合わせ
+ごとにまとめて投入する AffinityScheduler を提供します。
+
+================================================================================
+使い方 - affinity_scheduler
+================================================================================
+
+## 概要
+
+ComfyUI はキューを投入順に実行するため、画像と動画のジョブを交互に投入すると、
+ジョブごとに数十GBの重みの追い出しと読み込みが発生します。
+AffinityScheduler は投入の直前でジョブを待たせ、同じグループ（モデルの組み合わせ）の
+ジョブを続けて投入します。
+
+- 実行中のグループに待機中・実行中のジョブがある間は、他のグループは待機します。
+  1件ずつ完了を待って次を投入する呼び出し側でもまとめられるよう、実行中のグループが
+  空いてから linger_s 秒は次のジョブを待ってから切り替えます。
+- 公平性の上限: 同じグループを max_batch 件続けて投入した場合、または他のグループの
+  先頭のジョブが max_wait_s 秒以上待っている場合は、最も長く待っているグループに切り替えます
+  （動画のジョブが画像のジョブに埋もれて待たされ続けることはありません）。
+- グループ内は投入を待ち始めた順です。
+- 順番を得たジョブは投入したら submitted() を呼びます。実行中のグループに投入前のジョブが
+  残っている間は切り替えないため、サーバーのキューでグループが入れ替わることはありません。
+- 切り替え直後のジョブの実行時間と、切り替えずに続けて実行したジョブの実行時間（中央値）の差を
+  モデルの読み込み時間として推定し、グループごとに集計します。
+
+## 基本的な使い方
+
+```python
+from mini_muse.affinity_scheduler import AffinityScheduler, workflow_models
+from mini_muse.comfy_video_generator import history_execution_seconds
+
+scheduler = AffinityScheduler(max_batch=8, max_wait_s=300)
+key = workflow_models(workflow)  # ワークフローが読み込むモデルファイルの組み合わせ
+
+ticket = scheduler.acquire(key, label="video")  # このグループの順番まで待機
+history = None
+try:
+    prompt_id = submit_workflow(workflow, host=host)
+    scheduler.submitted(ticket)  # 投入が終わるまで他のグループには切り替えない
+    history = wait_for_history(prompt_id, host=host)
+finally:
+    seconds = history_execution_seconds(history) if history else None
+    scheduler.release(ticket, seconds)  # 実行時間を記録
+
+for stats in scheduler.stats().values():
+    print(stats.label, stats.switches, stats.load_seconds)
+```
+
+================================================================================
+"""
+
+from __future__ import annotations
+
+import statistics
+import threading
+import time
+from collections import deque
+from collections.abc import Hashable
+from dataclasses import dataclass, field
+from typing import Any
+
+# モデルファイルを指定する入力名（CheckpointLoaderSimple / UNETLoader / CLIPLoader / VAELoader /
+# LoraLoader / UpscaleModelLoader など）
+MODEL_INPUTS = (
+    "ckpt_name",
+    "unet_name",
+    "clip_name",
+    "clip_name1",
+    "clip_name2",
+    "clip_name3",
+    "vae_name",
+    "lora_name",
+    "model_name",
+)
+
+
+def workflow_models(workflow: dict[str, Any]) -> tuple[str, ...]:
+    """
+    ワークフローが読み込むモデルファイルの組み合わせを返します。
+
+    同じ組み合わせのワークフローは、続けて実行するとモデルを読み込み直さずに済みます。
+
+    Args:
+        workflow: ワークフロー辞書（API形式）
+
+    Returns:
+        Tuple[str, ...]: モデルファイル名（重複なし、名前順）
+    """
+    models = set()
+    for node in workflow.values():
+        if not isinstance(node, dict):
+            continue
+        inputs = node.get("inputs") or {}
+        for name in MODEL_INPUTS:
+            value = inputs.get(name)
+            if isinstance(value, str) and value:
+                models.add(value)
+    return tuple(sorted(models))
+
+
+@dataclass
+class Ticket:
+    """acquire() で得た投入の順番（release() に渡す）"""
+
+    key: Hashable
+    waiting_since: float = field(default_factory=time.monotonic)
+    after_switch: bool = False  # グループを切り替えた直後のジョブ（モデルの読み込みを含む）
+    submitted: bool = False
+    released: bool = False
+
+
+@dataclass
+class GroupStats:
+    """グループごとの投入数とモデルの読み込み時間の統計"""
+
+    label: str
+    submitted: int = 0  # 投入したジョブ数
+    switches: int = 0  # このグループに切り替えた回数（最初の読み込みを含む）
+    wait_seconds: float = 0.0  # 投入の順番を待った時間の合計
+    first_seconds: list[float] = field(default_factory=list)  # 切り替え直後のジョブの実行時間
+    steady_seconds: list[float] = field(default_factory=list)  # 続けて実行したジョブの実行時間
+
+    @property
+    def load_seconds(self) -> float | None:
+        """切り替え1回あたりのモデルの読み込み時間の推定値（計測できない場合はNone）"""
+        if not self.first_seconds or not self.steady_seconds:
+            return None
+        load = statistics.mean(self.first_seconds) - statistics.median(self.steady_seconds)
+        return max(0.0, load)
+
+
+class AffinityScheduler:
+    """
+    同じグループ（モデルの組み合わせ）のジョブを続けて投入するスケジューラ
+    """
+
+    def __init__(self, *, max_batch: int = 8, max_wait_s: float = 300.0, linger_s: float = 1.0):
+        """
+        スケジューラを作成します。
+
+        Args:
+            max_batch: 他のグループが待っている場合に、同じグループを続けて投入する上限
+            max_wait_s: 他のグループの先頭のジョブがこの秒数以上待っている場合は切り替える
+            linger_s: 実行中のグループが空いてから、同じグループの次のジョブを待つ時間（秒）
+        """
+        self.max_batch = max(1, max_batch)
+        self.max_wait_s = max_wait_s
+        self.linger_s = linger_s
+        self._changed = threading.Condition()
+        self._waiting: dict[Hashable, deque[Ticket]] = {}
+        self._in_flight: dict[Hashable, int] = {}
+        self._unsubmitted = 0  # 順番を得て投入前のジョブ数（実行中のグループのみ）
+        self._stats: dict[Hashable, GroupStats] = {}
+        self._active: Hashable | None = None
+        self._run = 0  # 実行中のグループを続けて投入した件数
+        self._idle_since = 0.0  # 実行中のグループが空いた時刻（time.monotonic()）
+
+    def _oldest_other(self, key: Hashable) -> Ticket | None:
+        """key 以外のグループで最も長く待っている先頭のジョブを返します。"""
+        heads = [queue[0] for k, queue in self._waiting.items() if k != key and queue]
+        return min(heads, key=lambda t: t.waiting_since, default=None)
+
+    def _may_start(self, ticket: Ticket, now: float) -> bool:
+        queue = self._waiting[ticket.key]
+        if queue[0] is not ticket:  # グループ内は待ち始めた順
+            return False
+        if self._active is None:
+            return True
+        other = self._oldest_other(self._active)
+        if ticket.key == self._active:
+            if other is None:
+                return True
+            # 公平性の上限に達したら、待っている他のグループに譲る
+            return self._run < self.max_batch and now - other.waiting_since < self.max_wait_s
+        active_idle = (
+            not self._waiting.get(self._active)
+            and not self._in_flight.get(self._active)
+            and now - self._idle_since >= self.linger_s
+        )
+        bounded = self._run >= self.max_batch or (
+            other is not None and now - other.waiting_since >= self.max_wait_s
+        )
+        return (active_idle or bounded) and other is ticket and not self._unsubmitted
+
+    def acquire(self, key: Hashable, *, label: str | None = None) -> Ticket:
+        """
+        key のグループが投入できる順番になるまで待機します。
+
+        Args:
+            key: グループ（workflow_models() の結果など、ハッシュ可能な値）
+            label: 統計に表示する名前（Noneの場合は str(key)）
+
+        Returns:
+            Ticket: 投入の順番（完了または失敗したら release() に渡す）
+        """
+        ticket = Ticket(key)
+        with self._changed:
+            stats = self._stats.setdefault(key, GroupStats(label or str(key)))
+            self._waiting.setdefault(key, deque()).append(ticket)
+            while not self._may_start(ticket, time.monotonic()):
+                # 待ち時間による切り替えに気付けるよう、通知がなくても定期的に確認する
+                self._changed.wait(min(1.0, max(self.linger_s, 0.05)))
+            self._waiting[key].popleft()
+            if self._active != key:
+                self._active = key
+                self._run = 0
+                ticket.after_switch = True
+                stats.switches += 1
+            self._run += 1
+            self._in_flight[key] = self._in_flight.get(key, 0) + 1
+            self._unsubmitted += 1
+            stats.submitted += 1
+            stats.wait_seconds += time.monotonic() - ticket.waiting_since
+            self._changed.notify_all()
+        return ticket
+
+    def submitted(self, ticket: Ticket):
+        """ジョブをサーバーに投入したことを記録します（何度呼んでも安全）。"""
+        with self._changed:
+            self._submitted(ticket)
+
+    def _submitted(self, ticket: Ticket):
+        if not ticket.submitted:
+            ticket.submitted = True
+            self._unsubmitted -= 1
+            self._changed.notify_all()
+
+    def release(self, ticket: Ticket, seconds: float | None = None):
+        """
+        ジョブの完了（または失敗）を記録し、待っているジョブに順番を回します。
+
+        何度呼んでも安全です（2回目以降は何もしない）。
+
+        Args:
+            ticket: acquire() が返した値
+            seconds: サーバーでの実行時間（Noneの場合は読み込み時間の推定に使わない）
+        """
+        with self._changed:
+            if ticket.released:
+                return
+            ticket.released = True
+            self._submitted(ticket)
+            self._in_flight[ticket.key] -= 1
+            if ticket.key == self._active and not self._in_flight[ticket.key]:
+                self._idle_since = time.monotonic()
+            if seconds is not None:
+                stats = self._stats[ticket.key]
+                samples = stats.first_seconds if ticket.after_switch else stats.steady_seconds
+                samples.append(seconds)
+            self._changed.notify_all()
+
+    def stats(self) -> dict[Hashable, GroupStats]:
+        """グループごとの統計を返します。"""
+        with self._changed:
+            return dict(self._stats)
@@ -8,9 +8,16 @@
 1. video_input/ から画像を取得
 2. Ollamaで各画像から動画プロンプト生成
 3. ComfyUIで動画生成
-4. 生成された動画を video_output/ にコピー
+4. 生成された動画を video_output/ に届ける（DELIVERY: http / link / rename）
 5. 処理済み画像を video_processed/ に移動
 
+各工程はステージとして有界キューでつながれ、並行に実行されます
+（前処理 → プロンプト → アップロード → 投入 → 待機 → 回収）。
+ComfyUIが動画を生成している間に、Ollamaが次の画像のプロンプトを先行して生成し、
+次の画像のアップロードも済ませておきます。ComfyUIのキューにはサーバーごとに
+COMFY_QUEUE_DEPTH 件のジョブが積まれた状態を保つため、GPUは動画を続けて生成し、
+完了した動画から（投入順に関係なく）回収します。
+
 フォルダ構成:
     D:\\python\\stablediffusion\
     ├── video_input/          # 入力画像フォルダ
@@ -22,20 +29,110 @@
 
     または環境変数で設定変更:
     INPUT_DIR=/path/to/input OUTPUT_DIR=/path/to/output uv run python batch_video_generation.py
+
+    ComfyUIの出力ディレクトリ（output/ のマウント先）を変更する場合:
+    COMFY_OUTPUT_DIR=/mnt/d/ComfyUI/output uv run python batch_video_generation.py
+
+    動画の受け渡し方法（既定の auto はマウントがあればハードリンク、なければHTTP）:
+    DELIVERY=http uv run python batch_video_generation.py    # /view からストリーミング
+    DELIVERY=link uv run python batch_video_generation.py    # ハードリンク / reflink
+    DELIVERY=rename uv run python batch_video_generation.py  # マウントから移動
+
+    アップロード前にワークフローの解像度へ縮小する場合:
+    PRERESIZE=1 PREPROCESS_WORKERS=4 uv run python batch_video_generation.py
+
+    INPUT_DIR を監視し、追加された画像を処理し続ける場合（inotify、使えない環境ではポーリング）:
+    WATCH=1 uv run python batch_video_generation.py
+
+    途中で終了した場合は、同じコマンドで再実行すると続きから再開します
+    （ジョブジャーナル ~/.cache/mini_muse/video_jobs.jsonl に各ステージの結果を記録。
+    生成済みのプロンプトは再利用し、投入済みのジョブは ComfyUI の履歴・キューに再接続します）:
+    JOURNAL_PATH=/path/to/jobs.jsonl uv run python batch_video_generation.py
+    JOURNAL=0 uv run python batch_video_generation.py  # 記録・再開しない
+
+    Ollama分析結果のキャッシュを使わない場合:
+    OLLAMA_CACHE=0 uv run python batch_video_generation.py
+
+    Ollamaの同時リクエスト数（サーバー側の OLLAMA_NUM_PARALLEL に合わせる）と常駐時間:
+    OLLAMA_WORKERS=2 OLLAMA_KEEP_ALIVE=1h uv run python batch_video_generation.py
+
+    複数のComfyUIサーバー（GPU）に、キューが最も短いサーバーから順に振り分ける場合
+    （接続できないサーバーは COMFY_HOST_RETRY_S 秒のあいだ振り分け先から外す）:
+    COMFY_HOSTS=http://gpu1:8188,http://gpu2:8188 uv run python batch_video_generation.py
+
+    ノイズのシード（既定の random は毎回ランダム、fixed は SEED かワークフローの値、
+    increment は SEED から1ずつ増やす。使ったシードはジョブジャーナルと出力ファイル名に記録）:
+    SEED_MODE=fixed SEED=1234 uv run python batch_video_generation.py
+
+    1枚の画像からシードの違う動画を TAKES 本ずつ生成する場合（同じサーバーに続けて投入するため、
+    ComfyUIは画像・テキストのエンコード結果をキャッシュから再利用します）:
+    TAKES=3 uv run python batch_video_generation.py
+
+    下書きモード（解像度・フレーム数・ステップ数を縮めて候補を素早く生成し、
+    動画と同じ名前の .json に画像・プロンプト・シード・生成パラメータを記録）:
+    DRAFT=1 TAKES=4 uv run python batch_video_generation.py
+    DRAFT=1 DRAFT_SCALE=0.5 DRAFT_LENGTH=33 DRAFT_STEPS=2 uv run python batch_video_generation.py
+
+    選んだ下書きを、同じ画像・プロンプト・シードで本番の品質で生成し直す場合
+    （.json のパスをカンマ区切りで指定、フォルダの場合は中の .json すべて）:
+    RERENDER=/path/to/video_output/sample_..._draft.json uv run python batch_video_generation.py
+
+    ComfyUIのキューに先に積んでおくジョブ数（サーバーごと、既定: 2 = 生成中1件＋次の1件）:
+    COMFY_QUEUE_DEPTH=3 uv run python batch_video_generation.py
+
+    ステージごとのワーカー数とキューの上限:
+    OLLAMA_WORKERS=1 UPLOAD_WORKERS=2 AWAIT_WORKERS=1 STAGE_QUEUE_SIZE=2 \\
+        uv run python batch_video_generation.py
 """
 
+import json
 import os
 import shutil
 import sys
+import threading
 import time
+import uuid
+from collections.abc import Iterator
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field, replace
 from datetime import datetime
+from functools import partial
 from pathlib import Path
-from typing import Any
+from typing import Any, Optional
+
+import requests
 
 # モジュールインポート
 try:
-    from mini_muse.comfy_video_generator import run_comfy_pipeline
-    from mini_muse.ollama_video_prompt import analyze_image_with_ollama
+    from mini_muse.comfy_hosts import ComfyHostPool, is_host_failure
+    from mini_muse.comfy_video_generator import (
+        DELIVERY_STRATEGIES,
+        SEED_MODES,
+        VIDEO_SUFFIXES,
+        RenderParams,
+        SeedSequence,
+        WorkflowTemplate,
+        deliver_output,
+        draft_render_params,
+        fetch_history_entry,
+        fetch_queue,
+        history_output_files,
+        load_workflow_template,
+        replace_placeholders,
+        submit_workflow,
+        upload_image_to_comfyui,
+        wait_for_history,
+        with_filename_prefix,
+        with_noise_seed,
+        with_render_params,
+        workflow_noise_seed,
+        workflow_render_params,
+    )
+    from mini_muse.folder_watcher import FolderWatcher
+    from mini_muse.job_journal import JobJournal, image_key
+    from mini_muse.ollama_video_prompt import AnalysisCache, OllamaClient
+    from mini_muse.video_pipeline import PipelineJob, Stage, StagedPipeline
+    from mini_muse.video_preprocess import resize_for_video, workflow_target_size
 except ImportError as e:
     print(f"エラー: モジュールのインポートに失敗しました: {e}")
     print("\n実行方法:")
@@ -53,7 +150,73 @@ WORKFLOW_PATH = Path(os.environ.get("WORKFLOW_PATH", "workflows/wan22_i2v_workfl
 OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
 OLLAMA_MODEL = os.environ.get("OLLAMA_MODEL", "llava:7b")
 COMFY_HOST = os.environ.get("COMFY_HOST", "http://127.0.0.1:8000")
+# 複数のComfyUIサーバーに振り分ける場合はカンマ区切りで指定（先頭が COMFY_OUTPUT_DIR のサーバー）
+COMFY_HOSTS = [
+    h.strip().rstrip("/") for h in os.environ.get("COMFY_HOSTS", "").split(",") if h.strip()
+] or [COMFY_HOST.rstrip("/")]
+# 接続できないサーバーを振り分け先から外す時間（秒）
+COMFY_HOST_RETRY_S = float(os.environ.get("COMFY_HOST_RETRY_S", "60"))
 COMFY_TIMEOUT = int(os.environ.get("COMFY_TIMEOUT", "600"))
+# ComfyUIの出力ディレクトリ（COMFY_HOSTS の先頭のサーバーの output/ をマウントしたパス）
+COMFY_OUTPUT_DIR = Path(
+    os.environ.get("COMFY_OUTPUT_DIR", "/mnt/d/python/stablediffusion/output/comfy")
+)
+# 動画の受け渡し方法（auto / http / link / rename、deliver_output を参照）
+DELIVERY = os.environ.get("DELIVERY", "auto").lower()
+
+# ノイズのシード（SEED_MODE: random / fixed / increment、SEED: fixed / increment の基準値）
+SEED_MODE = os.environ.get("SEED_MODE", "random").lower()
+SEED = os.environ.get("SEED", "").strip()
+# 1枚の画像から生成する動画の本数（シードだけを変えて同じサーバーに続けて投入）
+TAKES = max(1, int(os.environ.get("TAKES", "1")))
+
+# 下書きモード（DRAFT=1 で解像度の倍率・フレーム数・ステップ数を縮めて生成）
+DRAFT = os.environ.get("DRAFT", "").lower() in ("1", "true", "yes")
+DRAFT_SCALE = float(os.environ.get("DRAFT_SCALE", "0.5"))
+DRAFT_LENGTH = int(os.environ.get("DRAFT_LENGTH", "33"))
+DRAFT_STEPS = int(os.environ.get("DRAFT_STEPS", "2"))
+# 本番の品質で生成し直す下書きの記録（カンマ区切り、フォルダの場合は中の *.json）
+RERENDER = [p.strip() for p in os.environ.get("RERENDER", "").split(",") if p.strip()]
+
+# Ollama分析結果のキャッシュ（OLLAMA_CACHE=0 で無効化）
+OLLAMA_CACHE = os.environ.get("OLLAMA_CACHE", "1").lower() not in ("0", "false", "no")
+OLLAMA_CACHE_MAX_ENTRIES = int(os.environ.get("OLLAMA_CACHE_MAX_ENTRIES", "5000"))
+ANALYSIS_CACHE = AnalysisCache(max_entries=OLLAMA_CACHE_MAX_ENTRIES) if OLLAMA_CACHE else None
+# バッチの間モデルをメモリに残す時間（Ollama の keep_alive）
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+# 1行プロンプトが完成した時点で生成を打ち切る（OLLAMA_STREAM=0 で無効化）
+OLLAMA_STREAM = os.environ.get("OLLAMA_STREAM", "1").lower() not in ("0", "false", "no")
+OLLAMA_NUM_PREDICT = int(os.environ.get("OLLAMA_NUM_PREDICT", "0")) or None
+
+# 前処理設定（ワークフローの解像度に縮小してからアップロード）
+# PREPROCESS_WORKERS はOllama送信用の画像エンコードにも使うプロセス数
+PRERESIZE = os.environ.get("PRERESIZE", "").lower() in ("1", "true", "yes")
+PREPROCESS_WORKERS = int(os.environ.get("PREPROCESS_WORKERS", "0")) or None
+
+# パイプライン設定（ステージごとのワーカー数とステージ間キューの上限）
+OLLAMA_WORKERS = int(os.environ.get("OLLAMA_WORKERS", "1"))
+UPLOAD_WORKERS = int(os.environ.get("UPLOAD_WORKERS", "2"))
+# ComfyUIのキューにサーバーごとに積んでおくジョブ数（投入済みで未完了のジョブの上限）
+COMFY_QUEUE_DEPTH = max(1, int(os.environ.get("COMFY_QUEUE_DEPTH", "2")))
+# 待機ワーカー数の既定値は積んでおくジョブの総数（完了したジョブから順に回収する）
+AWAIT_WORKERS = int(os.environ.get("AWAIT_WORKERS", "0")) or COMFY_QUEUE_DEPTH * len(COMFY_HOSTS)
+STAGE_QUEUE_SIZE = int(os.environ.get("STAGE_QUEUE_SIZE", "2"))
+
+# 監視モード（WATCH=1 で INPUT_DIR を監視し、追加された画像を処理し続ける）
+WATCH = os.environ.get("WATCH", "").lower() in ("1", "true", "yes")
+WATCH_SETTLE_S = float(os.environ.get("WATCH_SETTLE_S", "0.5"))
+WATCH_POLL_S = float(os.environ.get("WATCH_POLL_S", "0.5"))
+
+# ジョブジャーナル（JOURNAL=0 で無効化、JOURNAL_PATH が空の場合は ~/.cache/mini_muse/video_jobs.jsonl）
+JOURNAL = os.environ.get("JOURNAL", "1").lower() not in ("0", "false", "no")
+JOURNAL_PATH = os.environ.get("JOURNAL_PATH") or None
+
+# ComfyUIへの接続（アップロード・投入・履歴取得・ダウンロードで再利用）
+COMFY_SESSION = requests.Session()
+# ジョブごとにキューが最も短いサーバーを選ぶ
+HOST_POOL = ComfyHostPool(
+    COMFY_HOSTS, session=COMFY_SESSION, retry_s=COMFY_HOST_RETRY_S, depth=COMFY_QUEUE_DEPTH
+)
 
 # サポートする画像拡張子
 IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
@@ -90,52 +253,590 @@ def get_input_images() -> list[Path]:
     Returns:
         List[Path]: 画像ファイルパスのリスト
     """
-    images = []
-    for ext in IMAGE_EXTENSIONS:
-        images.extend(INPUT_DIR.glob(f"*{ext}"))
-        images.extend(INPUT_DIR.glob(f"*{ext.upper()}"))
+    # 1回の走査で拡張子を大文字小文字を区別せずに判定（ファイル名順）
+    watcher = FolderWatcher(INPUT_DIR, IMAGE_EXTENSIONS, use_inotify=False)
+    return [INPUT_DIR / name for name in watcher.scan()]
+
+
+@dataclass
+class VideoJob(PipelineJob):
+    """バッチ処理1件分の状態（パイプラインの各ステージで順に埋められます）"""
+
+    image_path: Optional[Path] = None  # 入力画像パス
+    index: int = 0  # 処理番号（1始まり）
+    total: int = 0  # 総処理数
+    upload_path: Optional[Path] = None  # 前処理済みの画像（Noneの場合は入力画像）
+    prompt: Optional[str] = None  # 生成されたプロンプト
+    image_ref: Optional[str] = None  # ComfyUI上の画像名（LoadImage に渡す値）
+    host: Optional[str] = None  # 割り当てたComfyUIサーバー
+    client_id: str = field(default_factory=lambda: uuid.uuid4().hex)  # 完了通知の受信用
+    output_tag: Optional[str] = None  # 保存ノードの filename_prefix に付けるジョブ固有のタグ
+    prompt_id: Optional[str] = None
+    history: Optional[dict[str, Any]] = None  # 完了した履歴エントリ
+    outputs: list[dict[str, str]] = field(default_factory=list)  # 履歴に記録された動画ファイル
+    video_path: Optional[Path] = None  # 出力動画パス
+    key: Optional[str] = None  # ジョブジャーナルのキー（記録しない場合はNone）
+    seed: Optional[int] = None  # ノイズのシード（Noneの場合はワークフローの値）
+    take: int = 0  # テイク番号（1始まり、TAKES=1 の場合は0）
+    group: Optional["TakeGroup"] = None  # 同じ画像のテイク（TAKES=1 の場合はNone）
+    params: Optional[RenderParams] = None  # 生成パラメータ（Noneの場合はワークフローの値）
+    spec_path: Optional[Path] = None  # 生成し直す下書きの記録（RERENDER の場合）
+
+    @property
+    def draft(self) -> bool:
+        """下書き（縮めた生成パラメータ）のジョブの場合True"""
+        return self.params is not None and self.spec_path is None
+
+    @property
+    def label(self) -> str:
+        take = f" #{self.take}" if self.take else ""
+        if not self.total:  # 監視モードでは総数が決まらない
+            return f"[{self.index}] {self.image_path.name}{take}"
+        return f"[{self.index}/{self.total}] {self.image_path.name}{take}"
+
+    def as_result(self) -> dict[str, Any]:
+        """process_single_image と同じ形式の処理結果を返します。"""
+        return {
+            "success": self.success,
+            "image_path": self.image_path,
+            "prompt": self.prompt,
+            "video_path": self.video_path,
+            "seed": self.seed,
+            "error": self.error,
+            "duration": self.duration,
+        }
+
+
+@dataclass
+class TakeGroup:
+    """同じ画像から生成するテイクの残り数（最後のテイクの回収後に画像を移動する）"""
+
+    key: Optional[str]  # 画像のジョブジャーナルのキー
+    remaining: int
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def done(self) -> bool:
+        """テイクを1本回収したことを記録し、最後のテイクの場合はTrueを返します。"""
+        with self._lock:
+            self.remaining -= 1
+            return self.remaining == 0
+
+
+def create_seed_sequence(template: WorkflowTemplate) -> Optional[SeedSequence]:
+    """
+    SEED_MODE / SEED からシードの決め方を作成します。
+
+    fixed で SEED を省略した場合は、ワークフローに書かれているシードを使います。
+
+    Returns:
+        Optional[SeedSequence]: シードの決め方（ワークフローにシードがない場合はNone）
+
+    Raises:
+        ValueError: SEED_MODE / SEED が不正な場合
+    """
+    base = int(SEED) if SEED else None
+    workflow_seed = workflow_noise_seed(template.workflow)
+    if workflow_seed is None and "SEED" not in template.placeholders:
+        return None
+    if SEED_MODE == "fixed" and base is None:
+        base = workflow_seed
+    return SeedSequence(SEED_MODE, base)
+
+
+def _journal(journal: Optional[JobJournal], job: VideoJob, stage: str, **data: Any):
+    """ジョブジャーナルにステージの結果を記録します（ジャーナルなしの場合は何もしない）。"""
+    if journal is not None and job.key is not None:
+        journal.record(job.key, stage, **data)
+
+
+def resume_job(job: VideoJob, journal: Optional[JobJournal]) -> VideoJob:
+    """
+    ジョブジャーナルの記録から、前回完了したステージの結果を復元します。
+
+    投入済みのジョブは ComfyUI に問い合わせ、完了していれば履歴から出力を取得し、
+    実行中・待機中であれば同じ prompt_id / client_id で再接続します。
+    サーバーに残っていない（再起動された）場合は、記録済みのプロンプトで投入し直します。
+
+    Args:
+        job: 作成したばかりのジョブ
+        journal: ジョブジャーナル（Noneの場合は何もしない）
+
+    Returns:
+        VideoJob: 復元したジョブ（同じオブジェクト）
+    """
+    if journal is None:
+        return job
+    try:
+        job.key = image_key(job.image_path)
+        if job.spec_path is not None:  # 同じ画像の下書きが複数ある（シードで区別）
+            job.key += f"@{job.seed}"
+    except OSError:
+        return job  # 画像が移動・削除された（以降のステージで失敗として報告）
+    state = journal.state(job.key)
+    if not state or state.get("stage") == "done":
+        return job
+
+    job.prompt = state.get("prompt")
+    if not _restore_submission(job, state) and job.prompt:
+        print(f"{job.label} ↻ 記録済みのプロンプトを再利用します")
+    return job
+
+
+def _split_takes(job: VideoJob, journal: Optional[JobJournal] = None) -> list[VideoJob]:
+    """
+    [テイク] アップロード済みのジョブを、シードの違う TAKES 本のジョブに分けます。
+
+    テイクはすべてアップロードしたサーバーに割り当て、続けて投入されるようにします
+    （ComfyUIは同じ画像・プロンプトのエンコード結果をキャッシュから再利用します）。
+    前回の実行で完了したテイクは飛ばし、投入済みのテイクは再接続します。
+
+    Returns:
+        List[VideoJob]: 生成するテイク（すべて完了済みの場合は空、画像は処理済みに移動）
+    """
+    if job.spec_path is not None:  # 下書きを生成し直す（記録したシードの1本だけ）
+        return [job]
+    HOST_POOL.release(job.client_id)
+    takes = []
+    for take in range(1, TAKES + 1):
+        key = f"{job.key}#{take}" if job.key is not None else None
+        state = journal.state(key) if journal is not None and key is not None else None
+        if state and state.get("stage") == "done":
+            continue
+        take_job = replace(
+            job,
+            take=take,
+            key=key,
+            client_id=uuid.uuid4().hex,
+            output_tag=None,
+            prompt_id=None,
+            history=None,
+            outputs=[],
+            seed=None,
+            stage_seconds=dict(job.stage_seconds),
+        )
+        if not (state and _restore_submission(take_job, state)):
+            HOST_POOL.attach(take_job.client_id, job.host, submitted=False)
+        takes.append(take_job)
+    if not takes:
+        _finish_image(job.image_path, job.key, journal)
+        return []
+    group = TakeGroup(job.key, len(takes))
+    for take_job in takes:
+        take_job.group = group
+    return takes
+
+
+def _restore_submission(job: VideoJob, state: dict[str, Any]) -> bool:
+    """
+    記録された投入・生成の結果をジョブに復元します。
+
+    Returns:
+        bool: 生成済み、または投入済みのジョブに再接続できた場合True
+    """
+    job.seed = state.get("seed", job.seed)
+    host = state.get("host", COMFY_HOSTS[0])
+    if state.get("outputs"):
+        job.prompt_id = state.get("prompt_id")
+        job.host = host
+        job.outputs = state["outputs"]
+        print(f"{job.label} ↻ 生成済みの動画を回収します (prompt_id: {job.prompt_id})")
+        return True
+    prompt_id = state.get("prompt_id")
+    if not prompt_id or host not in HOST_POOL.hosts:
+        return False
+    try:
+        entry = fetch_history_entry(prompt_id, host=host, session=COMFY_SESSION)
+        queued = False
+        if entry is None:
+            queue = fetch_queue(host=host, session=COMFY_SESSION)
+            queued = prompt_id in queue["running"] + queue["pending"]
+    except (requests.RequestException, RuntimeError) as e:
+        print(f"{job.label} ⚠️  投入済みのジョブを再利用できません（投入し直します）: {e}")
+        return False
+    if entry is None and not queued:
+        return False
+    job.prompt_id = prompt_id
+    job.client_id = state.get("client_id") or job.client_id
+    job.output_tag = state.get("output_tag")
+    job.history = entry
+    job.host = host
+    status = "完了済み" if entry is not None else "実行中・待機中"
+    print(f"{job.label} ↻ 投入済みのジョブに再接続します（{status}、{prompt_id}）")
+    return True
+
+
+def _preprocess(job: VideoJob, size: tuple[int, int], pool: ProcessPoolExecutor) -> VideoJob:
+    """[前処理] ワークフローの解像度に縮小します（失敗時は元画像を使用）。"""
+    if job.prompt_id:  # 投入済み（再開したジョブ）
+        return job
+    try:
+        job.upload_path = pool.submit(resize_for_video, job.image_path, size).result()
+    except Exception as e:
+        print(f"{job.label} ⚠️  縮小に失敗したため元画像を使用します: {e}")
+    return job
+
+
+def create_ollama_client(encoder: Optional[Executor] = None) -> OllamaClient:
+    """
+    バッチ設定（常駐時間・同時実行数・キャッシュ・ストリーミング）の OllamaClient を作成します。
+
+    Args:
+        encoder: 送信前の画像の縮小・エンコードを実行するプロセスプール（Noneの場合は同じスレッド）
+    """
+    return OllamaClient(
+        OLLAMA_HOST,
+        OLLAMA_MODEL,
+        keep_alive=OLLAMA_KEEP_ALIVE,
+        max_concurrency=OLLAMA_WORKERS,
+        timeout=60,
+        cache=ANALYSIS_CACHE,
+        use_cache=OLLAMA_CACHE,
+        stream=OLLAMA_STREAM,
+        num_predict=OLLAMA_NUM_PREDICT,
+        encoder=encoder,
+    )
+
+
+def _make_prompt(
+    job: VideoJob, client: OllamaClient, journal: Optional[JobJournal] = None
+) -> VideoJob:
+    """[プロンプト] Ollamaで画像から動画プロンプトを生成します。"""
+    if job.prompt:  # 前回の実行で生成済み
+        return job
+    job.prompt = client.analyze(job.image_path)
+    print(f"{job.label} ✓ プロンプト: {job.prompt}")
+    _journal(journal, job, "prompt", prompt=job.prompt)
+    return job
+
+
+def _host_failed(job: VideoJob, error: Exception):
+    """割り当てたサーバーの障害を記録し、割り当てを解除します（障害でなければ例外を再送出）。"""
+    if not is_host_failure(error):
+        raise error
+    HOST_POOL.mark_failed(job.host, error)
+    HOST_POOL.release(job.client_id)
+    print(f"{job.label} ⚠️  {job.host} を振り分け先から外します: {error}")
+
+
+def _upload(job: VideoJob) -> VideoJob:
+    """[アップロード] キューが最も短いサーバーを選び、画像をアップロードします。"""
+    if job.prompt_id:
+        return job
+    # 接続できないサーバーは外して、利用できるサーバーがなくなるまで選び直す
+    while True:
+        job.host = HOST_POOL.acquire(job.client_id)
+        try:
+            job.image_ref = upload_image_to_comfyui(
+                job.upload_path or job.image_path, host=job.host, session=COMFY_SESSION
+            )
+            return job
+        except requests.RequestException as e:
+            _host_failed(job, e)
+
+
+def _submit(
+    job: VideoJob,
+    template: WorkflowTemplate,
+    seeds: Optional[SeedSequence] = None,
+    journal: Optional[JobJournal] = None,
+) -> VideoJob:
+    """[投入] ワークフローを差し替えてComfyUIのキューに投入します。"""
+    if job.prompt_id:  # 再接続したジョブ
+        return job
+    # 出力ファイル名をジョブごとに一意にする（例: video/ComfyUI_sample_3fa2c9d1_00001_.mp4）
+    job.output_tag = f"{job.image_path.stem}_{job.client_id[:8]}"
+    # 前回の実行で記録したシードがあれば同じシードで投入し直す
+    if job.seed is None and seeds is not None:
+        job.seed = seeds.next()
+    while True:
+        # サーバーのキューに COMFY_QUEUE_DEPTH 件積まれている間は、どれかが完了するまで待つ
+        # （先に別のサーバーが空いた場合はそちらに投入する。テイクはアップロードしたサーバーで待つ）
+        host = HOST_POOL.wait_for_slot(job.client_id, move=job.group is None)
+        if host is None:  # 待機中に割り当てが解除された（サーバーを選び直してアップロードする）
+            _upload(job)
+            continue
+        try:
+            if host != job.host:
+                print(f"{job.label} → 先に空いた {host} に投入します")
+                job.host = host
+                job.image_ref = upload_image_to_comfyui(
+                    job.upload_path or job.image_path, host=job.host, session=COMFY_SESSION
+                )
+            values = {"SEED": job.seed} if job.seed is not None else None
+            workflow = replace_placeholders(
+                template, image_filename=job.image_ref, prompt_text=job.prompt, values=values
+            )
+            if job.seed is not None and workflow_noise_seed(workflow) is not None:
+                workflow = with_noise_seed(workflow, job.seed)
+            if job.params is not None:
+                workflow = with_render_params(workflow, job.params)
+            workflow = with_filename_prefix(workflow, job.output_tag)
+            job.prompt_id = submit_workflow(
+                workflow, host=job.host, client_id=job.client_id, session=COMFY_SESSION
+            )
+            break
+        except requests.RequestException as e:
+            _host_failed(job, e)
+            _upload(job)  # 別のサーバーにアップロードし直す
+    HOST_POOL.submitted(job.client_id)
+    where = f"{job.host}, " if len(HOST_POOL.hosts) > 1 else ""
+    seed = f", seed: {job.seed}" if job.seed is not None else ""
+    print(f"{job.label} ✓ ComfyUIに投入 ({where}prompt_id: {job.prompt_id}{seed})")
+    _journal(
+        journal,
+        job,
+        "submit",
+        prompt_id=job.prompt_id,
+        client_id=job.client_id,
+        output_tag=job.output_tag,
+        host=job.host,
+        seed=job.seed,
+    )
+    return job
+
+
+def _await(job: VideoJob, journal: Optional[JobJournal] = None) -> VideoJob:
+    """[待機] 動画生成の完了を待機し、履歴エントリから動画ファイルを特定します。"""
+    if job.outputs:  # 前回の実行で完了済み
+        return job
+    if job.history is None:
+        # 再接続したジョブは待機を始めるときにサーバーに割り当てる（フィーダーで割り当てると、
+        # 後ろに並んだ再接続のジョブが空きを埋め、先の新しいジョブが投入を待ち続けてしまう）
+        HOST_POOL.attach(job.client_id, job.host)
+        try:
+            job.history = wait_for_history(
+                job.prompt_id,
+                host=job.host,
+                timeout_s=COMFY_TIMEOUT,
+                client_id=job.client_id,
+                session=COMFY_SESSION,
+            )
+        finally:
+            HOST_POOL.release(job.client_id)
+    # このジョブの履歴エントリから動画ファイルを特定（出力ディレクトリは走査しない）
+    job.outputs = history_output_files(job.history, suffixes=VIDEO_SUFFIXES)
+    if not job.outputs:
+        raise FileNotFoundError(
+            f"履歴に動画ファイルが記録されていません (prompt_id: {job.prompt_id})"
+        )
+    _journal(journal, job, "render", outputs=job.outputs)
+    return job
 
-    # ソート（ファイル名順）
-    images = sorted(images)
-    return images
 
+def _collect(
+    job: VideoJob, journal: Optional[JobJournal] = None, full: Optional[RenderParams] = None
+) -> VideoJob:
+    """
+    [回収] 動画を出力フォルダに届け、画像を処理済みフォルダに移動します。
 
-def copy_video_from_comfy_to_output(video_filename: str, dest_dir: Path) -> Path:
+    下書きの場合は、本番の生成パラメータ full とあわせて再生成用の記録を書き込みます。
+    """
+    video = job.outputs[0]
+
+    # 出力ファイル名を生成（元の画像名ベース）
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    suffix = Path(video["filename"]).suffix or ".mp4"
+    name = f"{job.image_path.stem}_{timestamp}"
+    # 例: sample_20250101_120000_take2_seed1234_draft.mp4
+    if job.take:
+        name += f"_take{job.take}"
+    if (job.take or job.params is not None) and job.seed is not None:
+        name += f"_seed{job.seed}"
+    if job.draft:
+        name += "_draft"
+    # 最終的なファイル名へ直接届ける（一時フォルダを経由しない）
+    # 出力ディレクトリのマウントは先頭のサーバーのみ（他のサーバーからは /view で取得）
+    local = job.host == COMFY_HOSTS[0]
+    artifact = deliver_output(
+        video,
+        OUTPUT_DIR / f"{name}{suffix}",
+        strategy=DELIVERY if local else "http",
+        host=job.host,
+        comfy_output_dir=COMFY_OUTPUT_DIR if local else None,
+        session=COMFY_SESSION,
+    )
+    job.video_path = artifact.path
+    if job.draft:
+        write_render_spec(job, full or RenderParams())
+
+    # 画像を移動してから完了を記録する（先に記録すると、移動前に終了した場合に
+    # 次回の実行で完了済みの記録が整理され、入力フォルダに残った画像を生成し直してしまう）
+    # テイクの場合は最後のテイクを回収してから画像を移動する
+    if job.spec_path is not None:  # 生成し直した下書きの画像は処理済みフォルダにある
+        pass
+    elif job.group is None:
+        _finish_image(job.image_path)
+    elif job.group.done():
+        _finish_image(job.image_path, job.group.key, journal)
+    _journal(journal, job, "done", video=str(job.video_path), seed=job.seed)
+    return job
+
+
+def _finish_image(
+    image_path: Path, key: Optional[str] = None, journal: Optional[JobJournal] = None
+):
+    """画像を処理済みフォルダに移動し、key を指定した場合は画像のジョブを完了として記録します。"""
+    processed_path = PROCESSED_DIR / image_path.name
+    shutil.move(str(image_path), str(processed_path))
+    if journal is not None and key is not None:
+        journal.record(key, "done")
+
+
+def write_render_spec(job: VideoJob, full: RenderParams) -> Path:
     """
-    ComfyUIの出力ディレクトリから動画をコピーします。
+    下書きを本番の品質で生成し直すための記録を、動画と同じ名前の .json に書き込みます。
 
     Args:
-        video_filename: 動画ファイル名（例: "ComfyUI_00001_.mp4"）
-        dest_dir: コピー先ディレクトリ
+        job: 回収した下書きのジョブ
+        full: 本番の生成パラメータ
 
     Returns:
-        Path: コピー先のファイルパス
+        Path: 書き込んだ記録のパス
+    """
+    spec = {
+        "image": str(PROCESSED_DIR / job.image_path.name),
+        "prompt": job.prompt,
+        "seed": job.seed,
+        "workflow": str(WORKFLOW_PATH),
+        "draft": asdict(job.params),
+        "full": asdict(full),
+        "video": job.video_path.name,
+        "host": job.host,
+        "prompt_id": job.prompt_id,
+    }
+    path = job.video_path.with_suffix(".json")
+    path.write_text(json.dumps(spec, ensure_ascii=False, indent=2), encoding="utf-8")
+    return path
+
+
+def find_render_specs(paths: list[str]) -> list[Path]:
+    """RERENDER に指定された下書きの記録（フォルダの場合は中の *.json）をファイル名順に返します。"""
+    specs = []
+    for path in map(Path, paths):
+        specs += sorted(path.glob("*.json")) if path.is_dir() else [path]
+    return specs
 
-    Note:
-        ComfyUIの出力ディレクトリは D:\\python\\stablediffusion\\output\\comfy\video\\ です
+
+def rerender_job(spec_path: Path, index: int, total: int) -> VideoJob:
     """
-    # ComfyUIの出力ディレクトリ（Windowsパス）
-    comfy_output = Path("/mnt/d/python/stablediffusion/output/comfy/video")
-    source_file = comfy_output / video_filename
+    下書きの記録から、同じ画像・プロンプト・シードで本番の品質のジョブを作成します。
 
-    if not source_file.exists():
-        raise FileNotFoundError(f"ComfyUI出力ファイルが見つかりません: {source_file}")
+    Raises:
+        OSError, ValueError, KeyError, TypeError: 記録を読み込めない場合
+    """
+    spec = json.loads(spec_path.read_text(encoding="utf-8"))
+    return VideoJob(
+        image_path=Path(spec["image"]),
+        index=index,
+        total=total,
+        prompt=spec["prompt"],
+        seed=spec["seed"],
+        params=RenderParams(**spec["full"]),
+        spec_path=spec_path,
+    )
+
+
+def create_draft_params(template: WorkflowTemplate) -> tuple[RenderParams, RenderParams]:
+    """
+    DRAFT_SCALE / DRAFT_LENGTH / DRAFT_STEPS から下書きの生成パラメータを作成します。
 
-    # コピー先のファイルパス
-    dest_file = dest_dir / video_filename
-    shutil.copy2(source_file, dest_file)
+    Returns:
+        Tuple[RenderParams, RenderParams]: (下書き, 本番) の生成パラメータ
+
+    Raises:
+        ValueError: 指定が範囲外の場合
+    """
+    full = workflow_render_params(template.workflow)
+    draft = draft_render_params(full, scale=DRAFT_SCALE, length=DRAFT_LENGTH, steps=DRAFT_STEPS)
+    return draft, full
+
+
+def build_stages(
+    template: WorkflowTemplate,
+    client: OllamaClient,
+    size: Optional[tuple[int, int]] = None,
+    pool: Optional[ProcessPoolExecutor] = None,
+    journal: Optional[JobJournal] = None,
+    seeds: Optional[SeedSequence] = None,
+    full: Optional[RenderParams] = None,
+) -> list[Stage]:
+    """
+    バッチ処理のステージを構築します。
 
-    return dest_file
+    投入ステージはサーバーごとの投入済みで未完了のジョブが COMFY_QUEUE_DEPTH 件未満になるまで
+    ブロックするため、ComfyUIのキューには常に次のジョブが積まれた状態になり、
+    その間にOllamaが後続の画像のプロンプトを生成し、アップロードも先に済ませます。
+    待機ステージは投入済みのジョブごとにワーカーが完了を待つため、完了した順に回収されます。
 
+    Args:
+        template: ワークフローテンプレート
+        client: プロンプト生成に使う OllamaClient（同時実行数は OLLAMA_WORKERS）
+        size: 前処理の縮小解像度（Noneの場合は前処理ステージなし）
+        pool: 前処理に使うプロセスプール（size を指定する場合は必須）
+        journal: ステージの結果を記録するジョブジャーナル（Noneの場合は記録しない）
+        seeds: ジョブごとのシードの決め方（Noneの場合はワークフローのシード）
+        full: 本番の生成パラメータ（下書きの記録に書き込む）
 
-def process_single_image(image_path: Path, index: int, total: int) -> dict[str, Any]:
+    Returns:
+        List[Stage]: 前処理 → プロンプト → アップロード → （テイク →）投入 → 待機 → 回収
+    """
+    stages = []
+    if size is not None and pool is not None:
+        stages.append(
+            Stage(
+                "preprocess",
+                partial(_preprocess, size=size, pool=pool),
+                workers=PREPROCESS_WORKERS or os.cpu_count() or 1,
+                queue_size=STAGE_QUEUE_SIZE,
+            )
+        )
+    stages += [
+        Stage(
+            "prompt",
+            partial(_make_prompt, client=client, journal=journal),
+            workers=OLLAMA_WORKERS,
+            queue_size=STAGE_QUEUE_SIZE,
+        ),
+        Stage("upload", _upload, workers=UPLOAD_WORKERS, queue_size=STAGE_QUEUE_SIZE),
+    ]
+    if TAKES > 1:
+        stages.append(
+            Stage("takes", partial(_split_takes, journal=journal), queue_size=STAGE_QUEUE_SIZE)
+        )
+    stages += [
+        # サーバーごとに投入できるよう、投入ワーカーはサーバー数だけ用意する
+        Stage(
+            "submit",
+            partial(_submit, template=template, seeds=seeds, journal=journal),
+            workers=len(COMFY_HOSTS),
+            queue_size=STAGE_QUEUE_SIZE,
+        ),
+        Stage(
+            "await",
+            partial(_await, journal=journal),
+            workers=AWAIT_WORKERS,
+            queue_size=max(STAGE_QUEUE_SIZE, COMFY_QUEUE_DEPTH * len(COMFY_HOSTS)),
+        ),
+        Stage(
+            "collect",
+            partial(_collect, journal=journal, full=full),
+            queue_size=STAGE_QUEUE_SIZE,
+        ),
+    ]
+    return stages
+
+
+def process_single_image(
+    image_path: Path, index: int, total: int, upload_path: Optional[Path] = None
+) -> dict[str, Any]:
     """
-    単一画像を処理して動画を生成します。
+    単一画像を処理して動画を生成します（パイプラインと同じステージを順番に実行）。
 
     Args:
         image_path: 入力画像パス
         index: 現在の処理番号（1始まり）
         total: 総処理数
+        upload_path: ComfyUIにアップロードする画像（前処理済みの画像、Noneの場合は入力画像）
 
     Returns:
         Dict[str, Any]: 処理結果
@@ -143,93 +844,90 @@ def process_single_image(image_path: Path, index: int, total: int) -> dict[str,
             - image_path: Path - 入力画像パス
             - prompt: str - 生成されたプロンプト
             - video_path: Path - 出力動画パス（成功時）
+            - seed: int - ノイズのシード（ワークフローの値を使った場合はNone）
             - error: str - エラーメッセージ（失敗時）
             - duration: float - 処理時間（秒）
     """
-    result = {
-        "success": False,
-        "image_path": image_path,
-        "prompt": None,
-        "video_path": None,
-        "error": None,
-        "duration": 0.0,
-    }
-
-    start_time = time.time()
+    job = VideoJob(image_path=image_path, index=index, total=total, upload_path=upload_path)
+    template = load_workflow_template(WORKFLOW_PATH)
 
     print(f"\n{'='*70}")
     print(f"[{index}/{total}] 処理中: {image_path.name}")
     print(f"{'='*70}")
 
-    try:
-        # Step 1: プロンプト生成
-        print("\n[Step 1] Ollamaでプロンプト生成中...")
-        prompt = analyze_image_with_ollama(
-            image_path, model=OLLAMA_MODEL, host=OLLAMA_HOST, timeout=60
-        )
-        result["prompt"] = prompt
-        print("✓ プロンプト生成成功")
-        print(f"  プロンプト: {prompt}")
-
-        # Step 2: 動画生成
-        print("\n[Step 2] ComfyUIで動画生成中...")
-        print("  ⚠️  この処理には数分かかる場合があります...")
-
-        # 一時的な出力ディレクトリ
-        temp_output = Path("output/batch_temp")
-
-        run_comfy_pipeline(
-            image_path=image_path,
-            prompt_text=prompt,
-            workflow_path=WORKFLOW_PATH,
-            host=COMFY_HOST,
-            out_dir=temp_output,
-            timeout_s=COMFY_TIMEOUT,
-        )
-
-        # 動画ファイルをComfyUIの出力ディレクトリからコピー
-        # （run_comfy_pipelineは空のリストを返すことがあるため、履歴から取得）
-        print("\n[Step 3] 動画ファイルをコピー中...")
-
-        # 最新の動画ファイル名を取得（通常は ComfyUI_XXXXX_.mp4）
-        comfy_output = Path("/mnt/d/python/stablediffusion/output/comfy/video")
-        video_files = sorted(
-            comfy_output.glob("*.mp4"), key=lambda p: p.stat().st_mtime, reverse=True
-        )
-
-        if video_files:
-            latest_video = video_files[0]
-
-            # 出力ファイル名を生成（元の画像名ベース）
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_filename = f"{image_path.stem}_{timestamp}.mp4"
-            output_path = OUTPUT_DIR / output_filename
-
-            # コピー
-            shutil.copy2(latest_video, output_path)
-            result["video_path"] = output_path
-            print(f"✓ 動画保存成功: {output_path}")
-        else:
-            raise FileNotFoundError("ComfyUI出力ディレクトリに動画ファイルが見つかりません")
+    client = create_ollama_client()
+    seeds = create_seed_sequence(template)
+    steps = [
+        ("prompt", partial(_make_prompt, client=client)),
+        ("upload", _upload),
+        ("submit", partial(_submit, template=template, seeds=seeds)),
+        ("await", _await),
+        ("collect", _collect),
+    ]
+    for name, func in steps:
+        t0 = time.time()
+        try:
+            func(job)
+        except Exception as e:
+            job.error = str(e)
+            job.failed_stage = name
+            break
+        finally:
+            job.stage_seconds[name] = time.time() - t0
+    job.finished_at = time.time()
+    client.close()
+
+    if job.success:
+        print(f"\n✓ 処理完了（所要時間: {job.duration:.1f}秒、seed: {job.seed}）")
+    else:
+        print(f"\n✗ 処理エラー: {job.error}")
+        print(f"  所要時間: {job.duration:.1f}秒")
+    return job.as_result()
+
+
+def _report_job(job: VideoJob, journal: Optional[JobJournal] = None):
+    """ジョブの完了（または失敗）を表示し、失敗をジョブジャーナルに記録します。"""
+    HOST_POOL.release(job.client_id)
+    if not job.success:
+        _journal(journal, job, "failed", failed_stage=job.failed_stage, error=job.error)
+    if job.success:
+        print(f"{job.label} ✓ 完了 → {job.video_path.name}（{job.duration:.1f}秒）")
+    else:
+        print(f"{job.label} ✗ {job.failed_stage} で失敗: {job.error}")
 
-        # Step 3: 画像を処理済みフォルダに移動
-        print("\n[Step 4] 画像を処理済みフォルダに移動中...")
-        processed_path = PROCESSED_DIR / image_path.name
-        shutil.move(str(image_path), str(processed_path))
-        print(f"✓ 画像移動成功: {processed_path}")
 
-        result["success"] = True
-        result["duration"] = time.time() - start_time
+def watch_jobs(
+    stop: Optional[threading.Event] = None,
+    journal: Optional[JobJournal] = None,
+    params: Optional[RenderParams] = None,
+) -> Iterator[VideoJob]:
+    """
+    INPUT_DIR を監視し、書き込みが完了した画像からジョブを作成し続けます。
 
-        print(f"\n✓ 処理完了（所要時間: {result['duration']:.1f}秒）")
+    inotify が使えない場合（WSL の /mnt/d など）はポーリングで監視します。
+    Ctrl+C で監視を終了し、処理中のジョブの完了を待ちます。
 
-    except Exception as e:
-        result["error"] = str(e)
-        result["duration"] = time.time() - start_time
-        print(f"\n✗ 処理エラー: {e}")
-        print(f"  所要時間: {result['duration']:.1f}秒")
+    Args:
+        stop: セットされると監視を終了するイベント
+        journal: 前回の実行の結果を復元するジョブジャーナル
+        params: 生成パラメータ（下書きモードの場合）
 
-    return result
+    Yields:
+        VideoJob: 追加された画像のジョブ（total=0）
+    """
+    watcher = FolderWatcher(
+        INPUT_DIR, IMAGE_EXTENSIONS, settle_s=WATCH_SETTLE_S, poll_s=WATCH_POLL_S
+    )
+    print(f"\n[監視モード] {INPUT_DIR} を監視中（{watcher.mode}）... Ctrl+C で終了")
+    try:
+        for index, image_path in enumerate(watcher.watch(stop), 1):
+            print(f"[{index}] {image_path.name} を検出")
+            job = VideoJob(image_path=image_path, index=index, params=params)
+            yield resume_job(job, journal)
+    except KeyboardInterrupt:
+        print("\n監視を終了します。処理中のジョブの完了を待っています...")
+    finally:
+        watcher.close()
 
 
 def main():
@@ -248,47 +946,138 @@ def main():
         return 1
     print(f"✓ ワークフロー確認: {WORKFLOW_PATH}")
 
-    # 入力画像の取得
-    print("\n[入力画像の確認]")
-    images = get_input_images()
-
-    if not images:
-        print(f"✗ 入力画像が見つかりません: {INPUT_DIR}")
-        print(f"  対応形式: {', '.join(IMAGE_EXTENSIONS)}")
+    if DELIVERY not in DELIVERY_STRATEGIES:
+        print(f"\n✗ 不明な受け渡し方法です: DELIVERY={DELIVERY}")
+        print(f"  指定可能な値: {', '.join(DELIVERY_STRATEGIES)}")
         return 1
 
-    print(f"✓ {len(images)}枚の画像を検出")
-    for img in images:
-        print(f"  - {img.name}")
-
-    # 処理開始確認（環境変数で自動実行可能）
-    auto_run = os.environ.get("AUTO_RUN", "").lower() in ("1", "true", "yes")
-    if not auto_run:
-        print(f"\n{len(images)}枚の画像を処理します。よろしいですか？")
-        print("  続行するには Enter キーを押してください...")
-        print("  中止するには Ctrl+C を押してください...")
+    if RERENDER:
+        # 本番の品質で生成し直す下書きの記録
+        specs = find_render_specs(RERENDER)
+        if not specs:
+            print(f"\n✗ 下書きの記録が見つかりません: {', '.join(RERENDER)}")
+            return 1
         try:
-            input()
-        except (KeyboardInterrupt, EOFError):
-            print("\n\n処理を中止しました。")
-            return 0
+            rerender_jobs = [rerender_job(spec, i, len(specs)) for i, spec in enumerate(specs, 1)]
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"\n✗ 下書きの記録を読み込めません: {e}")
+            return 1
+        print(f"\n[再生成] {len(specs)}本の下書きを本番の品質で生成し直します")
+        for job in rerender_jobs:
+            print(f"  - {job.spec_path.name}（{job.image_path.name}、seed: {job.seed}）")
+    elif not WATCH:
+        # 入力画像の取得
+        print("\n[入力画像の確認]")
+        images = get_input_images()
+
+        if not images:
+            print(f"✗ 入力画像が見つかりません: {INPUT_DIR}")
+            print(f"  対応形式: {', '.join(IMAGE_EXTENSIONS)}")
+            return 1
+
+        print(f"✓ {len(images)}枚の画像を検出")
+        for img in images:
+            print(f"  - {img.name}")
+
+        # 処理開始確認（環境変数で自動実行可能）
+        auto_run = os.environ.get("AUTO_RUN", "").lower() in ("1", "true", "yes")
+        if not auto_run:
+            print(f"\n{len(images)}枚の画像を処理します。よろしいですか？")
+            print("  続行するには Enter キーを押してください...")
+            print("  中止するには Ctrl+C を押してください...")
+            try:
+                input()
+            except (KeyboardInterrupt, EOFError):
+                print("\n\n処理を中止しました。")
+                return 0
+        else:
+            print(f"\n{len(images)}枚の画像を自動処理します...")
+
+    template = load_workflow_template(WORKFLOW_PATH)
+
+    # ノイズのシード（ジョブごとに決めて、ジョブジャーナルと出力ファイル名に記録）
+    try:
+        seeds = create_seed_sequence(template)
+    except ValueError as e:
+        print(f"\n✗ シードの指定が不正です: {e}")
+        print(f"  SEED_MODE に指定可能な値: {', '.join(SEED_MODES)}、SEED は整数")
+        return 1
+    if seeds is None:
+        print("\n⚠️  ワークフローにシードを持つサンプラーがないため、シードは変更しません")
     else:
-        print(f"\n{len(images)}枚の画像を自動処理します...")
+        base = f"（基準値: {seeds.base}）" if seeds.mode != "random" else ""
+        print(f"\n[シード] {seeds.mode}{base}")
+    if TAKES > 1 and not RERENDER:
+        print(f"[テイク] 1枚の画像から {TAKES} 本ずつ生成します")
+
+    # 下書きモード（解像度・フレーム数・ステップ数を縮め、再生成用の記録を残す）
+    # DRAFT_* は下書きを生成する場合のみ検証する（不正な値で通常の実行を止めない）
+    draft = full = None
+    if DRAFT and not RERENDER:
+        try:
+            draft, full = create_draft_params(template)
+        except ValueError as e:
+            print(f"\n✗ 下書きの指定が不正です: {e}")
+            return 1
+        print(f"\n[下書き] {draft.describe()}（本番: {full.describe()}）")
+
+    # 前処理（ワークフローの解像度に縮小、プロセスプールで並列実行）
+    size = None
+    if PRERESIZE:
+        workflow = with_render_params(template.workflow, draft) if draft else template.workflow
+        size = workflow_target_size(workflow)
+        if size is None:
+            print("\n⚠️  ワークフローから出力解像度を取得できないため、前処理をスキップします")
+        else:
+            print(f"\n[前処理] {size[0]}x{size[1]} に縮小してからアップロードします")
+
+    # バッチ処理（ステージごとに並行実行）
+    # 画像のデコード（Ollama送信用のエンコードと前処理）はプロセスプールで並列に行う
+    # 監視モードではモデル・接続・解析済みワークフローを保ったまま、追加された画像を処理し続ける
+    # 前回の実行の記録があれば、完了済みのステージを飛ばして再開する
+    journal = None
+    if JOURNAL:
+        journal = JobJournal(JOURNAL_PATH)
+        removed = journal.compact()
+        pending = len(journal.pending())
+        print(f"\n[ジョブジャーナル] {journal.path}（未完了: {pending}件、整理: {removed}件）")
 
-    # バッチ処理
-    results = []
-    success_count = 0
-    failed_count = 0
     total_start_time = time.time()
+    if RERENDER:
+        jobs = (resume_job(job, journal) for job in rerender_jobs)
+    elif WATCH:
+        jobs = watch_jobs(journal=journal, params=draft)
+    else:
+        jobs = (
+            resume_job(
+                VideoJob(image_path=image_path, index=i, total=len(images), params=draft),
+                journal,
+            )
+            for i, image_path in enumerate(images, 1)
+        )
+    with ProcessPoolExecutor(max_workers=PREPROCESS_WORKERS) as pool:
+        # Ollamaのモデルを先に読み込む（バッチの間は keep_alive で常駐）
+        client = create_ollama_client(encoder=pool)
+        print(f"\n[Ollama] {OLLAMA_MODEL} を読み込み中（keep_alive: {OLLAMA_KEEP_ALIVE}）...")
+        try:
+            print(f"✓ モデル準備完了（{client.warm_up():.1f}秒）")
+        except Exception as e:
+            print(f"⚠️  モデルのウォームアップに失敗しました（最初の画像で読み込みます）: {e}")
 
-    for i, image_path in enumerate(images, 1):
-        result = process_single_image(image_path, i, len(images))
-        results.append(result)
+        if len(HOST_POOL.hosts) > 1:
+            print(f"\n[ComfyUIサーバー] {len(HOST_POOL.hosts)}台（キューが最も短いサーバーに投入）")
+            for host in HOST_POOL.hosts:
+                print(f"  - {host}")
 
-        if result["success"]:
-            success_count += 1
-        else:
-            failed_count += 1
+        stages = build_stages(template, client, size, pool, journal, seeds, full)
+        pipeline = StagedPipeline(stages, on_result=partial(_report_job, journal=journal))
+        print(f"\n[パイプライン] {' → '.join(stage.name for stage in pipeline.stages)}")
+        finished = pipeline.run(jobs)
+    client.close()
+
+    results = [job.as_result() for job in sorted(finished, key=lambda job: (job.index, job.take))]
+    success_count = sum(1 for r in results if r["success"])
+    failed_count = len(results) - success_count
 
     # 結果サマリー
     total_duration = time.time() - total_start_time
@@ -302,14 +1091,44 @@ def main():
 
     if success_count > 0:
         avg_time = sum(r["duration"] for r in results if r["success"]) / success_count
-        print(f"平均処理時間: {avg_time:.1f}秒/枚")
+        print(f"平均処理時間: {avg_time:.1f}秒/枚（開始から完了まで、待ち時間を含む）")
+
+    # ステージごとの稼働時間
+    print("\n[ステージ別の処理時間]")
+    for name, stats in pipeline.stats.items():
+        print(
+            f"  {name}: {stats.processed}件成功 / {stats.failed}件失敗 / "
+            f"稼働 {stats.busy_seconds:.1f}秒（総処理時間の {stats.busy_seconds / max(total_duration, 1e-9):.0%}）"
+        )
+
+    # サーバーごとの振り分け結果
+    if len(HOST_POOL.hosts) > 1:
+        print("\n[ComfyUIサーバー別の投入数]")
+        for host, host_stats in HOST_POOL.stats.items():
+            line = f"  {host}: {host_stats.submitted}件投入"
+            if host_stats.failures:
+                line += f" / 障害 {host_stats.failures}回（最後: {host_stats.last_error}）"
+            print(line)
+
+    # Ollama分析キャッシュの利用状況
+    if ANALYSIS_CACHE is not None:
+        cache_stats = ANALYSIS_CACHE.stats()
+        print("\n[Ollama分析キャッシュ]")
+        print(
+            f"  ヒット: {cache_stats['hits']}件 / ミス: {cache_stats['misses']}件 / "
+            f"削除: {cache_stats['evictions']}件 / 保存数: {cache_stats['entries']}件"
+        )
+        print(f"  キャッシュファイル: {ANALYSIS_CACHE.path}")
+    else:
+        print("\n[Ollama分析キャッシュ] 無効（OLLAMA_CACHE=0）")
 
     # 成功した処理の詳細
     if success_count > 0:
         print("\n[成功した処理]")
         for r in results:
             if r["success"]:
-                print(f"  ✓ {r['image_path'].name} → {r['video_path'].name}")
+                seed = f"（seed: {r['seed']}）" if r["seed"] is not None else ""
+                print(f"  ✓ {r['image_path'].name} → {r['video_path'].name}{seed}")
 
     # 失敗した処理の詳細
     if failed_count > 0:
@@ -318,6 +1137,10 @@ def main():
             if not r["success"]:
                 print(f"  ✗ {r['image_path'].name}: {r['error']}")
 
+    if draft is not None and success_count > 0:
+        print("\n気に入った下書きは、動画と同じ名前の .json を RERENDER に指定すると")
+        print("同じ画像・プロンプト・シードで本番の品質で生成し直せます。")
+
     print("\n出力ディレクトリ:")
     print(f"  動画: {OUTPUT_DIR}")
     print(f"  処理済み画像: {PROCESSED_DIR}")
@@ -0,0 +1,268 @@
+"""
+複数の ComfyUI サーバーへのジョブの振り分け
+
+このモジュールは、複数の ComfyUI サーバー（GPU）にジョブを振り分けるための
+ComfyHostPool を提供します。ジョブごとにキューが最も短いサーバーを選び、
+どのジョブがどのサーバーに割り当てられているかを記録します。
+
+================================================================================
+使い方 - comfy_hosts
+================================================================================
+
+## 概要
+
+- acquire() は各サーバーの /queue（実行中＋待機中）と、割り当て済みで未投入のジョブ数の
+  合計が最も小さいサーバーを選びます（同じ場合は割り当て中のジョブが少ない順、指定順）。
+- 接続できないサーバーは mark_failed() で retry_s 秒のあいだ選択対象から外します。
+  /queue を取得できなかったサーバーも自動的に外されます。
+- ジョブはトークン（client_id など）で管理し、release() は何度呼んでも安全です。
+- サーバーが1台の場合は /queue を問い合わせません。
+- depth を指定すると、wait_for_slot() はサーバーの投入済みで未完了のジョブが
+  depth 件未満になるまで待機します（GPU が次のジョブをすぐ始められる数だけ先に積む）。
+  先に別のサーバーが空いた場合は、ジョブをそのサーバーに割り当て直します。
+
+## 基本的な使い方
+
+```python
+from mini_muse.comfy_hosts import ComfyHostPool, is_host_failure
+
+hosts = ComfyHostPool(["http://gpu1:8188", "http://gpu2:8188"])
+host = hosts.acquire(client_id)  # キューが最も短いサーバー
+try:
+    image_ref = upload_image_to_comfyui(path, host=host)
+    host = hosts.wait_for_slot(client_id)  # depth を指定した場合のみ待機（空いたサーバー）
+    prompt_id = submit_workflow(workflow, host=host, client_id=client_id)
+    hosts.submitted(client_id)
+except requests.RequestException as e:
+    if is_host_failure(e):
+        hosts.mark_failed(host, e)  # 次の acquire() では別のサーバーを選ぶ
+    raise
+...
+hosts.release(client_id)  # 完了または失敗したら割り当てを解除
+```
+
+================================================================================
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+
+import requests
+
+from mini_muse.comfy_video_generator import fetch_queue
+
+
+def is_host_failure(error: BaseException) -> bool:
+    """
+    例外がサーバー側の障害（接続できない・タイムアウト・5xx）によるものか判定します。
+
+    ワークフローの誤りなどによる 4xx はサーバーの障害とみなしません。
+    """
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code >= 500
+    return False
+
+
+@dataclass
+class HostStats:
+    """サーバーごとの振り分け統計"""
+
+    assigned: int = 0  # 割り当てたジョブ数
+    submitted: int = 0  # 投入したジョブ数
+    failures: int = 0  # 障害として記録した回数
+    down_until: float = 0.0  # この時刻まで選択対象から外す（time.monotonic()）
+    last_error: str | None = None
+
+
+class ComfyHostPool:
+    """
+    キューが最も短い ComfyUI サーバーにジョブを割り当てるプール
+    """
+
+    def __init__(
+        self,
+        hosts: list[str],
+        *,
+        session: requests.Session | None = None,
+        retry_s: float = 60.0,
+        queue_timeout: float = 5.0,
+        depth: int | None = None,
+    ):
+        """
+        プールを作成します。
+
+        Args:
+            hosts: ComfyUIサーバーURLのリスト（先頭が優先）
+            session: /queue の取得で接続を再利用する requests.Session
+            retry_s: 障害が起きたサーバーを選択対象から外す時間（秒）
+            queue_timeout: /queue の取得のタイムアウト（秒）
+            depth: サーバーごとに投入しておくジョブ数の上限（Noneの場合は上限なし）
+        """
+        self.hosts = list(dict.fromkeys(h.rstrip("/") for h in hosts))
+        if not self.hosts:
+            raise ValueError("ComfyUIサーバーが指定されていません。")
+        self.session = session
+        self.retry_s = retry_s
+        self.queue_timeout = queue_timeout
+        self.depth = depth
+        self.stats: dict[str, HostStats] = {host: HostStats() for host in self.hosts}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        # {トークン: (サーバー, 投入済みか)}
+        self._jobs: dict[str, tuple[str, bool]] = {}
+
+    def available(self) -> list[str]:
+        """選択対象のサーバーを返します（障害で外しているサーバーを除く）。"""
+        now = time.monotonic()
+        with self._lock:
+            return [host for host in self.hosts if self.stats[host].down_until <= now]
+
+    def mark_failed(self, host: str, error: BaseException | str):
+        """サーバーを retry_s 秒のあいだ選択対象から外します。"""
+        with self._lock:
+            stats = self.stats.get(host)
+            if stats is None:
+                return
+            stats.failures += 1
+            stats.down_until = time.monotonic() + self.retry_s
+            stats.last_error = str(error)
+
+    def _local_load(self, host: str) -> tuple[int, int]:
+        """(割り当て済みで未投入のジョブ数, 割り当て中のジョブ数) を返します。"""
+        jobs = [submitted for h, submitted in self._jobs.values() if h == host]
+        return sum(1 for submitted in jobs if not submitted), len(jobs)
+
+    def in_flight(self, host: str) -> int:
+        """サーバーに投入済みで未完了（release() 前）のジョブ数を返します。"""
+        with self._lock:
+            return self._in_flight(host)
+
+    def _in_flight(self, host: str) -> int:
+        return sum(1 for h, submitted in self._jobs.values() if h == host and submitted)
+
+    def queue_length(self, host: str) -> int | None:
+        """
+        サーバーのキューの長さ（実行中＋待機中）を返します。
+
+        Returns:
+            Optional[int]: キューの長さ（取得できない場合はNone、サーバーは選択対象から外す）
+        """
+        try:
+            queue = fetch_queue(host=host, timeout=self.queue_timeout, session=self.session)
+        except (requests.RequestException, ValueError) as e:
+            self.mark_failed(host, e)
+            return None
+        return len(queue["running"]) + len(queue["pending"])
+
+    def acquire(self, token: str) -> str:
+        """
+        キューが最も短いサーバーをジョブに割り当てます。
+
+        Args:
+            token: ジョブを識別する値（client_id など）
+
+        Returns:
+            str: 割り当てたサーバーURL
+
+        Raises:
+            RuntimeError: 利用できるサーバーがない
+        """
+        self.release(token)
+        candidates = self.available()
+        if len(candidates) > 1:
+            lengths = {host: self.queue_length(host) for host in candidates}
+            candidates = [host for host in candidates if lengths[host] is not None]
+        else:
+            lengths = dict.fromkeys(candidates, 0)
+        if not candidates:
+            raise RuntimeError(f"利用できるComfyUIサーバーがありません: {', '.join(self.hosts)}")
+
+        with self._lock:
+
+            def score(host: str) -> tuple[int, int, int]:
+                pending, assigned = self._local_load(host)
+                return (lengths[host] + pending, assigned, self.hosts.index(host))
+
+            host = min(candidates, key=score)
+            self._jobs[token] = (host, False)
+            self.stats[host].assigned += 1
+        return host
+
+    def wait_for_slot(
+        self, token: str, timeout: float | None = None, *, move: bool = True
+    ) -> str | None:
+        """
+        いずれかのサーバーの投入済みで未完了のジョブが depth 件未満になるまで待機します。
+
+        割り当てたサーバーに空きがあればそのサーバーを、先に別のサーバーが空いた場合は
+        そのサーバーにジョブを割り当て直して返します（アップロードし直しが必要）。
+        速さの違うサーバーが混在していても、空いた GPU から順にジョブが投入されます。
+
+        Args:
+            token: acquire() に渡した値
+            timeout: 待機の上限（秒、Noneの場合は無期限）
+            move: False の場合は割り当てたサーバーが空くまで待つ（割り当て直さない）
+
+        Returns:
+            Optional[str]: 投入先のサーバーURL（タイムアウトした場合、割り当てが解除された場合はNone）
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._changed:
+            entry = self._jobs.get(token)
+            if entry is None or not self.depth:
+                return entry[0] if entry else None
+            while True:
+                now = time.monotonic()
+                entry = self._jobs.get(token)
+                if entry is None:  # 待機中に割り当てが解除された
+                    return None
+                current = entry[0]
+                free = [
+                    host
+                    for host in (self.hosts if move else [current])
+                    if self.stats[host].down_until <= now and self._in_flight(host) < self.depth
+                ]
+                if free:
+                    host = current if current in free else min(free, key=self._in_flight)
+                    if host != current:
+                        self._jobs[token] = (host, False)
+                        self.stats[host].assigned += 1
+                    return host
+                if deadline is not None and now >= deadline:
+                    return None
+                # 外したサーバーの復帰に気付けるよう、通知がなくても定期的に確認する
+                wait = 1.0 if deadline is None else min(1.0, deadline - now)
+                self._changed.wait(wait)
+
+    def submitted(self, token: str):
+        """割り当てたジョブをサーバーに投入したことを記録します。"""
+        with self._changed:
+            host, _ = self._jobs.get(token, (None, True))
+            if host is not None:
+                self._jobs[token] = (host, True)
+                self.stats[host].submitted += 1
+
+    def attach(self, token: str, host: str, *, submitted: bool = True):
+        """
+        ジョブを指定したサーバーに割り当てます（/queue は問い合わせない）。
+
+        Args:
+            token: ジョブを識別する値
+            host: サーバーURL
+            submitted: 投入済みのジョブ（再開したジョブなど）の場合True
+        """
+        with self._changed:
+            self._jobs[token] = (host, submitted)
+            if not submitted:
+                self.stats[host].assigned += 1
+
+    def release(self, token: str):
+        """ジョブの割り当てを解除します（割り当てがない場合は何もしない）。"""
+        with self._changed:
+            if self._jobs.pop(token, None) is not None:
+                self._changed.notify_all()
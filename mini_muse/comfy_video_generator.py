@@ -14,7 +14,7 @@ ComfyUI APIを使用して、以下の処理を自動化します：
 1. 画像のアップロード
 2. ワークフローJSONのプレースホルダ差し替え
 3. ワークフローの投入
-4. 完了待機（履歴ポーリング）
+4. 完了待機（websocket の完了イベント、使えない場合は履歴ポーリング）
 5. 出力ファイルのダウンロード
 
 ## 前提条件
@@ -131,27 +131,42 @@ workflow = replace_placeholders(
 prompt_id = submit_workflow(workflow)
 print(f"実行開始: {prompt_id}")
 
-# 4. 完了待機
-wait_for_history(prompt_id, timeout_s=600)
+# 4. 完了待機（履歴エントリが返る）
+history = wait_for_history(prompt_id, timeout_s=600)
 print("実行完了")
 
-# 5. 出力ダウンロード
-outputs = download_outputs(prompt_id, save_dir="output")
+# 5. 出力ダウンロード（履歴エントリを渡すと /history を再取得しない）
+outputs = download_outputs(prompt_id, save_dir="output", history=history)
 print(f"保存完了: {outputs}")
 ```
 
 ## 関数詳細
 
-### upload_image_to_comfyui(image_path, *, host) -> str
+### upload_image_to_comfyui(image_path, *, host, subfolder, manifest, content_addressed, session) -> str
 
 画像をComfyUIサーバーにアップロードします。
 
+画像は内容の SHA-256 をファイル名として `input/mini_muse/` に置かれるため、
+同じファイル名の別画像を同時に処理しても上書きされません。
+アップロード済みの画像は `~/.cache/mini_muse/comfy_uploads.json`（サーバーごと）に記録され、
+再実行時はアップロード自体を省略します。
+
 **引数:**
 - `image_path` (str | Path): 画像ファイルパス
 - `host` (str): ComfyUIサーバーURL（デフォルト: http://127.0.0.1:15434）
+- `subfolder` (str): アップロード先のサブフォルダ（デフォルト: mini_muse）
+- `manifest` (UploadManifest | str | Path): マニフェスト（デフォルト: 上記パス、パスごとにプロセス内で共有）
+- `content_addressed` (bool): False の場合は元のファイル名で上書きアップロード（従来動作）
 
 **戻り値:**
-- `str`: アップロードされたファイル名
+- `str`: LoadImage の `image` 入力に指定する名前（例: `mini_muse/3fa2...c9.png`）
+
+### output_image_ref(item) -> str / upload_image_bytes(data, suffix, *, host, subfolder, session) -> str
+
+同じサーバーで生成した画像は、`output_image_ref(item)` の名前（例: `sd35/ComfyUI_00001_.png [output]`）を
+LoadImage に指定すると、ダウンロード・アップロードせずに output/ から直接読み込めます。
+別のサーバーの場合は `fetch_output_bytes(item, host=...)` で読み込んだデータを
+`upload_image_bytes(data, ".png", host=...)` でアップロードします（ローカルには保存しません）。
 
 ### load_workflow(path) -> Dict[str, Any]
 
@@ -163,59 +178,160 @@ print(f"保存完了: {outputs}")
 **戻り値:**
 - `Dict[str, Any]`: ワークフロー辞書
 
-### replace_placeholders(workflow, image_filename, prompt_text) -> Dict[str, Any]
+### replace_placeholders(workflow, image_filename, prompt_text, *, values) -> Dict[str, Any]
 
 ワークフロー内のプレースホルダを実際の値に置換します。
 
 **プレースホルダ:**
 - `###IMAGE_FILENAME###`: 画像ファイル名
 - `###PROMPT###`: プロンプトテキスト
+- その他の `###NAME###`: `values` で指定（例: `{"SEED": 1234}`）
+
+プレースホルダの位置は同じワークフロー辞書に対して1回だけ索引化され（`WorkflowTemplate`）、
+以降のジョブでは該当箇所と経路上の dict だけをコピーして差し替えます。
+文字列全体がプレースホルダの場合は値の型（int など）をそのまま設定します。
 
 **引数:**
-- `workflow` (Dict[str, Any]): ワークフロー辞書
+- `workflow` (Dict[str, Any] | WorkflowTemplate): ワークフロー辞書
 - `image_filename` (str): 画像ファイル名
 - `prompt_text` (str): プロンプトテキスト
+- `values` (Dict[str, Any]): 追加のプレースホルダの値
 
 **戻り値:**
 - `Dict[str, Any]`: 置換後のワークフロー辞書
 
-### submit_workflow(workflow, *, host) -> str
+### with_filename_prefix(workflow, tag, *, class_types) -> Dict[str, Any]
+
+保存ノード（SaveVideo など）の `filename_prefix` にジョブ固有のタグを付けたワークフローを返します
+（例: `video/ComfyUI` → `video/ComfyUI_sample_3fa2c9d1`）。元の辞書は変更されません。
+出力ファイル名がジョブごとに一意になるため、同じサーバーを複数のジョブや
+他のユーザーと共有していても、出力は履歴エントリから確実に特定できます。
+
+**引数:**
+- `workflow` (Dict[str, Any]): ワークフロー辞書
+- `tag` (str): 付加するタグ（ファイル名に使えない文字は `_` に置換）
+- `class_types` (Tuple[str, ...]): 対象ノードの種類（デフォルト: `SAVE_NODE_TYPES`）
+
+**戻り値:**
+- `Dict[str, Any]`: 差し替え後のワークフロー辞書
+
+### with_noise_seed(workflow, seed, *, class_types) -> Dict[str, Any]
+
+ノイズを加えるサンプラー（KSamplerAdvanced の `add_noise: enable` など）の `noise_seed` / `seed` を
+差し替えたワークフローを返します。元の辞書は変更されません。
+`workflow_noise_seed(workflow)` はワークフローに書かれているシードを返します。
+`SeedSequence(mode, base)` はジョブごとのシードを `"random"` / `"fixed"` / `"increment"` で決めます。
+
+```python
+from mini_muse.comfy_video_generator import SeedSequence, with_noise_seed
+
+seeds = SeedSequence("increment", base=1000)
+for _ in range(3):  # 同じ画像・プロンプトでシードだけ変える（エンコード結果は ComfyUI がキャッシュ）
+    submit_workflow(with_noise_seed(wf, seeds.next()))
+```
+
+### with_render_params(workflow, params) -> Dict[str, Any]
+
+解像度・フレーム数（WanImageToVideo の `width` / `height` / `length`）とサンプラーのステップ数を
+`RenderParams` の値に差し替えたワークフローを返します（None の項目は変更しません）。
+2段のサンプラー（WAN 2.2 の高ノイズ・低ノイズ）の `start_at_step` / `end_at_step` は
+ステップ数に合わせて同じ比率で縮めます。元の辞書は変更されません。
+`workflow_render_params(workflow)` はワークフローに書かれている値を、
+`draft_render_params(full, scale=, length=, steps=)` は下書き用に縮めた値を返します。
+
+```python
+from mini_muse.comfy_video_generator import (
+    draft_render_params, with_render_params, workflow_render_params,
+)
+
+full = workflow_render_params(wf)  # RenderParams(width=640, height=640, length=81, steps=4)
+draft = draft_render_params(full, scale=0.5, length=33, steps=2)  # 320x320, 33フレーム, 2ステップ
+submit_workflow(with_render_params(with_noise_seed(wf, seed), draft))
+# 気に入った下書きは、同じシード・プロンプトで full のまま投入し直す
+```
+
+### submit_workflow(workflow, *, host, client_id, session) -> str
 
 ワークフローをComfyUIに投入します。
 
 **引数:**
 - `workflow` (Dict[str, Any]): ワークフロー辞書
 - `host` (str): ComfyUIサーバーURL
+- `client_id` (str): websocket クライアントID（デフォルト: `CLIENT_ID`）
+- `session` (requests.Session): 接続を再利用するセッション（常駐処理などで指定）
 
 **戻り値:**
 - `str`: プロンプトID
 
-### wait_for_history(prompt_id, *, host, timeout_s, poll_s) -> Dict[str, Any]
+### wait_for_history(prompt_id, *, host, timeout_s, poll_s, max_poll_s, client_id, use_websocket, session) -> Dict[str, Any]
 
-実行完了を待機します（履歴ポーリング）。
+実行完了を待機します。websocket（`/ws`）の完了イベントを待ち、完了時に
+`/history/{prompt_id}` を1回だけ取得します。websocket が使えない場合は
+`/history/{prompt_id}` のみを、間隔を延ばしながらポーリングします。
 
 **引数:**
 - `prompt_id` (str): プロンプトID
 - `host` (str): ComfyUIサーバーURL
 - `timeout_s` (int): タイムアウト時間（秒）（デフォルト: 600）
-- `poll_s` (float): ポーリング間隔（秒）（デフォルト: 1.5）
+- `poll_s` (float): ポーリング間隔の初期値（秒）（デフォルト: 1.5）
+- `max_poll_s` (float): ポーリング間隔の上限（秒）（デフォルト: 15）
+- `client_id` (str): `submit_workflow()` に渡したクライアントID（デフォルト: `CLIENT_ID`）
+- `use_websocket` (bool): False の場合はポーリングのみ
 
 **戻り値:**
 - `Dict[str, Any]`: 履歴エントリ
 
-### download_outputs(prompt_id, save_dir, *, host) -> List[Path]
+### history_execution_seconds(entry) -> Optional[float]
 
-生成された出力ファイルをダウンロードします。
+履歴エントリの `execution_start` から `execution_success` までの時間（秒）を返します。
+キューで待った時間を含まない、サーバーでの実行時間です（記録がない場合はNone）。
+
+### fetch_queue(*, host, timeout, session) -> Dict[str, List[str]]
+
+`/queue` から実行中・待機中のプロンプトIDを取得します。再起動後に投入済みのジョブが
+サーバーに残っているか（再接続できるか）を確認する場合などに使います。
+
+**戻り値:**
+- `Dict[str, List[str]]`: `{"running": [...], "pending": [...]}`
+
+### download_outputs(prompt_id, save_dir, *, host, history, max_workers, chunk_size) -> List[OutputArtifact]
+
+生成された出力ファイル（videos / gifs / images）を並列にストリーミングでダウンロードします。
+サーバー上のサブフォルダ（例: `video/`）は保存先でも維持されます。
 
 **引数:**
 - `prompt_id` (str): プロンプトID
 - `save_dir` (str | Path): 保存先ディレクトリ
 - `host` (str): ComfyUIサーバーURL
+- `history` (Dict[str, Any]): `wait_for_history()` の戻り値（指定時は履歴を再取得しない）
+- `max_workers` (int): 同時ダウンロード数（デフォルト: 4）
+- `chunk_size` (int): ストリーミングの読み込み単位（デフォルト: 1MiB）
 
 **戻り値:**
-- `List[Path]`: 保存されたファイルパスのリスト
+- `List[OutputArtifact]`: 保存したファイルの情報
+  （`path` / `filename` / `subfolder` / `type` / `node_id` / `kind` / `size`）。
+  `os.PathLike` を実装しているため、パスとしてもそのまま使えます
+
+### deliver_output(item, dest, *, strategy, host, comfy_output_dir, session, chunk_size) -> OutputArtifact
+
+出力ファイル1つを最終的な保存先（ファイル名まで指定）に直接届けます。
+一時ディレクトリを経由しないため、動画1本あたりの転送は1回だけです。
 
-### run_comfy_pipeline(image_path, prompt_text, workflow_path, *, host, out_dir, timeout_s) -> List[Path]
+**受け渡し方法 (`strategy`):**
+- `"http"`: `/view` からストリーミングで保存先に書き込み
+- `"link"`: マウントした ComfyUI の出力ディレクトリからハードリンク
+  （同じファイルシステムでハードリンクが使えない場合は reflink、別ファイルシステムの場合はコピー）
+  保存先に同名のファイルがある場合は、隣の一時ファイルに作ってから置き換えます
+- `"rename"`: 出力ディレクトリから移動（サーバー側には残りません）
+- `"auto"`: 出力ディレクトリにファイルがあれば `"link"`、なければ `"http"`
+
+```python
+history = wait_for_history(pid)
+for item in history_output_files(history, suffixes=VIDEO_SUFFIXES):
+    deliver_output(item, "video_output/sample.mp4", comfy_output_dir="/mnt/d/ComfyUI/output")
+```
+
+### run_comfy_pipeline(image_path, prompt_text, workflow_path, *, host, out_dir, timeout_s, placeholder_values, preresize, output_tag) -> List[OutputArtifact]
 
 画像→動画生成の完全自動化パイプライン。
 
@@ -226,9 +342,13 @@ print(f"保存完了: {outputs}")
 - `host` (str): ComfyUIサーバーURL（デフォルト: http://127.0.0.1:15434）
 - `out_dir` (str | Path): 出力ディレクトリ（デフォルト: output）
 - `timeout_s` (int): タイムアウト時間（秒）（デフォルト: 600）
+- `placeholder_values` (Dict[str, Any]): 追加のプレースホルダの値（例: `{"SEED": 1234}`）
+- `preresize` (bool): True の場合、WanImageToVideo の解像度に縮小してからアップロード
+  （mini_muse.video_preprocess を参照）
+- `output_tag` (str): 保存ノードの `filename_prefix` に付けるタグ（`with_filename_prefix` を参照）
 
 **戻り値:**
-- `List[Path]`: 生成されたファイルパスのリスト
+- `List[OutputArtifact]`: 生成されたファイルの情報（パスとしても使用可）
 
 ## プレースホルダの配置方法
 
@@ -252,6 +372,17 @@ ComfyUIでワークフローをエクスポートした後、以下の箇所を
 }
 ```
 
+シードや解像度もジョブごとに変える場合は、同様に `"noise_seed": "###SEED###"` や
+`"width": "###WIDTH###"` と記述し、`values={"SEED": 1234, "WIDTH": 640}` で指定します。
+
+```python
+from mini_muse.comfy_video_generator import load_workflow_template, replace_placeholders
+
+template = load_workflow_template("workflows/wan22_i2v_workflow.json")
+print(template.pointers())  # {"IMAGE_FILENAME": ["/97/inputs/image"], "PROMPT": ["/93/inputs/text"]}
+wf = replace_placeholders(template, "sample.jpg", "A dragon flying", values={"SEED": 42})
+```
+
 ## エラーハンドリング
 
 ```python
@@ -282,6 +413,10 @@ A: 以下を確認してください：
    2. サーバーアドレスが正しいか
    3. ファイルパスが正しいか
 
+### Q: 画像が見つからないエラー（LoadImage）
+A: サーバーの input フォルダを掃除した場合は、マニフェストの記録が古くなっています。
+   `UploadManifest().forget(host)` で記録を削除すると、次回は再アップロードされます。
+
 ### Q: ワークフロー投入エラー（400）
 A: 以下を確認してください：
    1. プレースホルダが正しく置換されているか
@@ -297,35 +432,165 @@ A: 以下を確認してください：
 ### Q: 出力ファイルが見つからない（404）
 A: 以下を確認してください：
    1. ワークフローにSaveノードがあるか
-   2. /history にエントリがあるか
+   2. /history/{prompt_id} にエントリがあるか
    3. 出力フォーマットが正しいか
 
+### Q: websocket に接続できない環境で使いたい
+A: `wait_for_history(..., use_websocket=False)` でポーリングのみになります。
+   websocket-client が未インストールの場合や接続に失敗した場合も自動でポーリングに切り替わります。
+
 ================================================================================
 """
 
 from __future__ import annotations
 
+import errno
+import hashlib
 import json
+import os
+import random
+import re
+import shutil
+import socket
+import tempfile
+import threading
 import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Any
 
 import requests
 
+from mini_muse.file_lock import file_lock
+
+try:
+    import websocket  # websocket-client（未インストールの場合はポーリングで待機）
+except ImportError:  # pragma: no cover
+    websocket = None
+
 COMFY_HOST = "http://127.0.0.1:15434"
+# このプロセスの websocket クライアントID（投入時に渡すと実行イベントがこの接続に届く）
+CLIENT_ID = uuid.uuid4().hex
+
+
+# -------- 1) 画像アップロード（内容ハッシュ名で重複排除）--------
+# アップロード先のサブフォルダ（ComfyUI/input/{UPLOAD_SUBFOLDER}/）
+UPLOAD_SUBFOLDER = "mini_muse"
+
+
+def default_upload_manifest_path() -> Path:
+    """アップロード済み画像のマニフェストの既定パスを返します。"""
+    return Path.home() / ".cache" / "mini_muse" / "comfy_uploads.json"
+
+
+def _file_digest(path: Path) -> str:
+    """ファイル内容の SHA-256（16進）を返します。"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
 
+class UploadManifest:
+    """
+    サーバーごとのアップロード済み画像の記録
+
+    {host: {"subfolder/ハッシュ.ext": サイズ}} を JSON で保存します。
+    ファイルは最初の確認で1回だけ読み込み、以降の確認はメモリ上の記録で行います。
+    書き込み時はファイルロック（file_lock）を取ってからファイルを読み直してマージし、
+    一時ファイル経由で置換するため、複数のプロセスが同時に更新しても記録は失われません
+    （fcntl がない環境ではプロセス内のスレッド間のみ）。
+    他のプロセスが記録した画像は、このインスタンスが次に書き込むまで見えないことがあります
+    （その場合は同じ名前で再アップロードするだけです）。
+    """
+
+    def __init__(self, path: str | Path | None = None):
+        self.path = Path(path) if path else default_upload_manifest_path()
+        self._lock = threading.Lock()
+        self._data: dict[str, dict[str, int]] | None = None
 
-# -------- 1) 画像アップロード --------
-def upload_image_to_comfyui(image_path: str | Path, *, host: str = COMFY_HOST) -> str:
+    def _read(self) -> dict[str, dict[str, int]]:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _write(self, data: dict[str, dict[str, int]]):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(prefix=".uploads-", dir=self.path.parent)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_name, self.path)
+
+    def contains(self, host: str, name: str) -> bool:
+        """host に name がアップロード済みとして記録されているか確認します。"""
+        with self._lock:
+            if self._data is None:
+                self._data = self._read()
+            return name in self._data.get(host.rstrip("/"), {})
+
+    def add(self, host: str, name: str, size: int):
+        """host に name をアップロードしたことを記録します。"""
+        with self._lock, file_lock(self.path):
+            data = self._read()
+            data.setdefault(host.rstrip("/"), {})[name] = size
+            self._write(data)
+            self._data = data
+
+    def forget(self, host: str):
+        """host の記録を削除します（サーバーの input フォルダを掃除した場合など）。"""
+        with self._lock, file_lock(self.path):
+            data = self._read()
+            if data.pop(host.rstrip("/"), None) is not None:
+                self._write(data)
+            self._data = data
+
+
+_manifests: dict[Path, UploadManifest] = {}
+_manifests_lock = threading.Lock()
+
+
+def get_upload_manifest(path: str | Path | None = None) -> UploadManifest:
+    """パスごとにプロセス共通の UploadManifest を返します（記録の読み込みは1回だけ）。"""
+    path = Path(path) if path else default_upload_manifest_path()
+    with _manifests_lock:
+        manifest = _manifests.get(path)
+        if manifest is None:
+            manifest = _manifests[path] = UploadManifest(path)
+        return manifest
+
+
+def upload_image_to_comfyui(
+    image_path: str | Path,
+    *,
+    host: str = COMFY_HOST,
+    subfolder: str = UPLOAD_SUBFOLDER,
+    manifest: UploadManifest | str | Path | None = None,
+    content_addressed: bool = True,
+    session: requests.Session | None = None,
+) -> str:
     """
     画像をComfyUIサーバーにアップロードします。
 
+    画像は内容の SHA-256 をファイル名にして input/{subfolder}/ に置くため、
+    同名の別画像を同時に処理しても互いに上書きしません。
+    マニフェストにアップロード済みと記録されている画像はアップロードを省略します。
+
     Args:
         image_path: 画像ファイルパス
         host: ComfyUIサーバーURL（デフォルト: http://127.0.0.1:15434）
+        subfolder: アップロード先のサブフォルダ（デフォルト: mini_muse）
+        manifest: UploadManifest またはマニフェストのパス
+                  （Noneの場合は ~/.cache/mini_muse/comfy_uploads.json）
+        content_addressed: False の場合は従来どおり元のファイル名で上書きアップロード
+        session: 接続を再利用する requests.Session（Noneの場合は毎回接続）
 
     Returns:
-        str: アップロードされたファイル名
+        str: LoadImage の image 入力に指定する名前（例: "mini_muse/3fa2...c9.png"）
 
     Raises:
         FileNotFoundError: 画像ファイルが見つからない
@@ -334,21 +599,112 @@ def upload_image_to_comfyui(image_path: str | Path, *, host: str = COMFY_HOST) -
     Examples:
         >>> filename = upload_image_to_comfyui("input/sample.jpg")
         >>> print(filename)
-        "sample.jpg"
+        "mini_muse/9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08.jpg"
     """
     p = Path(image_path)
     if not p.exists():
         raise FileNotFoundError(p)
+    http = session or requests
+
+    if not content_addressed:
+        with open(p, "rb") as f:
+            r = http.post(
+                f"{host}/upload/image",
+                files={"image": (p.name, f, "application/octet-stream")},
+                data={"overwrite": "true"},
+                timeout=120,
+            )
+        r.raise_for_status()
+        # ComfyUI/input/{p.name} に配置される。ワークフローの LoadImage.inputs.image にはこのファイル名を指定する。
+        return p.name  # ファイル名のみ返す
+
+    if not isinstance(manifest, UploadManifest):
+        manifest = get_upload_manifest(manifest)
+    name = f"{_file_digest(p)}{p.suffix.lower()}"
+    ref = f"{subfolder}/{name}" if subfolder else name
+    if manifest.contains(host, ref):
+        return ref
+
+    # 同じ名前は同じ内容なので、上書きしても他のジョブに影響しない
     with open(p, "rb") as f:
-        r = requests.post(
+        r = http.post(
             f"{host}/upload/image",
-            files={"image": (p.name, f, "application/octet-stream")},
-            data={"overwrite": "true"},
+            files={"image": (name, f, "application/octet-stream")},
+            data={"overwrite": "true", "subfolder": subfolder, "type": "input"},
             timeout=120,
         )
     r.raise_for_status()
-    # ComfyUI/input/{p.name} に配置される。ワークフローの LoadImage.inputs.image にはこのファイル名を指定する。
-    return p.name  # ファイル名のみ返す
+    ref = _uploaded_ref(r, name, subfolder)
+    manifest.add(host, ref, p.stat().st_size)
+    # ComfyUI/input/{subfolder}/{name} に配置される。LoadImage.inputs.image には "subfolder/name" を指定する。
+    return ref
+
+
+def _uploaded_ref(response: requests.Response, name: str, subfolder: str) -> str:
+    """/upload/image の応答から LoadImage に指定する名前を返します。"""
+    try:
+        info = response.json()
+    except ValueError:
+        info = {}
+    uploaded_name = info.get("name") or name
+    uploaded_subfolder = info.get("subfolder", subfolder)
+    return f"{uploaded_subfolder}/{uploaded_name}" if uploaded_subfolder else uploaded_name
+
+
+def upload_image_bytes(
+    data: bytes,
+    suffix: str = ".png",
+    *,
+    host: str = COMFY_HOST,
+    subfolder: str = UPLOAD_SUBFOLDER,
+    session: requests.Session | None = None,
+) -> str:
+    """
+    メモリ上の画像データをComfyUIサーバーにアップロードします（ローカルに保存しない）。
+
+    別のサーバーの出力をそのまま渡す場合などに使います。
+    ファイル名は upload_image_to_comfyui と同じく内容の SHA-256 です。
+
+    Args:
+        data: 画像データ
+        suffix: 拡張子（例: ".png"）
+        host: ComfyUIサーバーURL
+        subfolder: アップロード先のサブフォルダ
+        session: 接続を再利用する requests.Session（Noneの場合は毎回接続）
+
+    Returns:
+        str: LoadImage の image 入力に指定する名前
+
+    Raises:
+        requests.HTTPError: アップロードエラー
+    """
+    name = f"{hashlib.sha256(data).hexdigest()}{suffix.lower()}"
+    r = (session or requests).post(
+        f"{host}/upload/image",
+        files={"image": (name, data, "application/octet-stream")},
+        data={"overwrite": "true", "subfolder": subfolder, "type": "input"},
+        timeout=120,
+    )
+    r.raise_for_status()
+    return _uploaded_ref(r, name, subfolder)
+
+
+def output_image_ref(item: dict[str, str]) -> str:
+    """
+    サーバーの出力フォルダにある画像を、LoadImage で直接読み込むための名前を返します。
+
+    ComfyUI の LoadImage は "名前 [output]" の形式で output/ 以下のファイルを読み込めるため、
+    同じサーバーで生成した画像はダウンロード・アップロードせずに動画の入力にできます。
+
+    Args:
+        item: 履歴エントリの出力ファイル（history_output_files の要素）
+
+    Returns:
+        str: LoadImage の image 入力に指定する名前（例: "sd35/ComfyUI_00001_.png [output]"）
+    """
+    subfolder = item.get("subfolder") or ""
+    name = f"{subfolder}/{item['filename']}" if subfolder else item["filename"]
+    return f"{name} [{item.get('type') or 'output'}]"
 
 
 # -------- 2) ワークフロー JSON 差し替え（プレースホルダ方式）--------
@@ -372,8 +728,172 @@ def load_workflow(path: str | Path) -> dict[str, Any]:
     return json.loads(Path(path).read_text(encoding="utf-8"))
 
 
+# ###NAME### 形式のプレースホルダ（NAME は英大文字・数字・アンダースコア）
+PLACEHOLDER_PATTERN = re.compile(r"###([A-Z0-9_]+)###")
+
+
+def _json_pointer(path: tuple[Any, ...]) -> str:
+    """キーのタプルを JSON Pointer（RFC 6901）文字列に変換します。"""
+    return "".join("/" + str(k).replace("~", "~0").replace("/", "~1") for k in path)
+
+
+class WorkflowTemplate:
+    """
+    プレースホルダの位置を索引化したワークフロー
+
+    読み込み時に1回だけ全体を走査し、`###NAME###` を含む文字列の位置を記録します。
+    render() は記録した位置だけを差し替え、経路上の dict / list のみをコピーするため、
+    ジョブごとのコストはワークフローの大きさではなくプレースホルダの数に比例します。
+    元のワークフローは変更されません（render() の結果と共有される部分があるため、
+    結果を書き換える場合は元のワークフローも変更しないよう注意してください）。
+    """
+
+    def __init__(self, workflow: dict[str, Any]):
+        """
+        ワークフローを走査してプレースホルダの位置を索引化します。
+
+        Args:
+            workflow: ワークフロー辞書
+        """
+        self.workflow = workflow
+        # {キーのタプル: (元の文字列, [プレースホルダ名, ...])}
+        self._leaves: dict[tuple[Any, ...], tuple[str, list[str]]] = {}
+        # {プレースホルダ名: [キーのタプル, ...]}
+        self.paths: dict[str, list[tuple[Any, ...]]] = {}
+
+        # ComfyUI ワークフローは { "id": {...} } 形式だったり配列だったり差があるため包括的に走査
+        stack: list[tuple[tuple[Any, ...], Any]] = [((), workflow)]
+        while stack:
+            path, obj = stack.pop()
+            if isinstance(obj, dict):
+                stack.extend((path + (k,), v) for k, v in obj.items())
+            elif isinstance(obj, list):
+                stack.extend((path + (i,), v) for i, v in enumerate(obj))
+            elif isinstance(obj, str) and "###" in obj:
+                names = list(dict.fromkeys(PLACEHOLDER_PATTERN.findall(obj)))
+                if names:
+                    self._leaves[path] = (obj, names)
+                    for name in names:
+                        self.paths.setdefault(name, []).append(path)
+
+    @property
+    def placeholders(self) -> list[str]:
+        """ワークフローに含まれるプレースホルダ名のリスト（例: ["IMAGE_FILENAME", "PROMPT"]）"""
+        return sorted(self.paths)
+
+    def pointers(self) -> dict[str, list[str]]:
+        """
+        プレースホルダごとの位置を JSON Pointer で返します。
+
+        Returns:
+            Dict[str, List[str]]: {プレースホルダ名: ["/97/inputs/image", ...]}
+        """
+        return {name: sorted(_json_pointer(p) for p in paths) for name, paths in self.paths.items()}
+
+    def render(self, values: dict[str, Any]) -> dict[str, Any]:
+        """
+        プレースホルダを値に置き換えたワークフローを返します。
+
+        文字列全体が `###NAME###` の場合は値をそのまま（int などの型を保って）設定し、
+        文字列の一部の場合は str(値) で置換します。values にないプレースホルダはそのまま残ります。
+
+        Args:
+            values: {プレースホルダ名: 値}（名前は "SEED" / "###SEED###" のどちらでも可）
+
+        Returns:
+            Dict[str, Any]: 置換後のワークフロー辞書（変更のない部分は元と共有）
+        """
+        values = {
+            (m.group(1) if (m := PLACEHOLDER_PATTERN.fullmatch(k)) else k): v
+            for k, v in values.items()
+        }
+        root = self.workflow
+        copies: dict[tuple[Any, ...], Any] = {}
+
+        for path, (text, names) in self._leaves.items():
+            present = [name for name in names if name in values]
+            if not present:
+                continue
+            if text == f"###{present[0]}###":
+                new_value = values[present[0]]
+            else:
+                new_value = text
+                for name in present:
+                    new_value = new_value.replace(f"###{name}###", str(values[name]))
+
+            # 経路上のコンテナだけをコピー（パスコピー）
+            if () not in copies:
+                copies[()] = type(root)(root)
+            node = copies[()]
+            for depth in range(1, len(path)):
+                prefix = path[:depth]
+                if prefix not in copies:
+                    key = path[depth - 1]
+                    copies[prefix] = type(node[key])(node[key])
+                    node[key] = copies[prefix]
+                node = copies[prefix]
+            node[path[-1]] = new_value
+
+        return copies.get((), root)
+
+
+# 読み込み済みワークフローごとの索引（同じオブジェクトに対しては再走査しない）
+_TEMPLATE_CACHE: dict[int, WorkflowTemplate] = {}
+_TEMPLATE_CACHE_SIZE = 16
+
+
+def get_workflow_template(workflow: dict[str, Any]) -> WorkflowTemplate:
+    """
+    ワークフロー辞書に対応する WorkflowTemplate を返します（索引はオブジェクトごとに1回だけ作成）。
+
+    Args:
+        workflow: load_workflow() で読み込んだワークフロー辞書
+
+    Returns:
+        WorkflowTemplate: 索引化済みワークフロー
+    """
+    template = _TEMPLATE_CACHE.get(id(workflow))
+    if template is None or template.workflow is not workflow:
+        if len(_TEMPLATE_CACHE) >= _TEMPLATE_CACHE_SIZE:
+            _TEMPLATE_CACHE.pop(next(iter(_TEMPLATE_CACHE)))
+        template = WorkflowTemplate(workflow)
+        _TEMPLATE_CACHE[id(workflow)] = template
+    return template
+
+
+_FILE_TEMPLATE_CACHE: dict[Path, tuple[int, WorkflowTemplate]] = {}
+
+
+def load_workflow_template(path: str | Path) -> WorkflowTemplate:
+    """
+    ワークフローJSONを読み込んで索引化します（ファイルが変更されない限り再利用）。
+
+    Args:
+        path: ワークフローJSONファイルパス
+
+    Returns:
+        WorkflowTemplate: 索引化済みワークフロー
+
+    Raises:
+        FileNotFoundError: ファイルが見つからない
+        json.JSONDecodeError: JSON解析エラー
+    """
+    path = Path(path).resolve()
+    mtime_ns = path.stat().st_mtime_ns
+    cached = _FILE_TEMPLATE_CACHE.get(path)
+    if cached is not None and cached[0] == mtime_ns:
+        return cached[1]
+    template = WorkflowTemplate(load_workflow(path))
+    _FILE_TEMPLATE_CACHE[path] = (mtime_ns, template)
+    return template
+
+
 def replace_placeholders(
-    workflow: dict[str, Any], image_filename: str, prompt_text: str
+    workflow: dict[str, Any] | WorkflowTemplate,
+    image_filename: str,
+    prompt_text: str,
+    *,
+    values: dict[str, Any] | None = None,
 ) -> dict[str, Any]:
     """
     ワークフロー内のプレースホルダを実際の値に置換します。
@@ -381,11 +901,16 @@ def replace_placeholders(
     プレースホルダ:
     - ###IMAGE_FILENAME###: 画像ファイル名
     - ###PROMPT###: プロンプトテキスト
+    - その他の ###NAME###（###SEED### / ###WIDTH### / ###LENGTH### など）: values で指定
+
+    プレースホルダの位置は同じワークフロー辞書に対して1回だけ索引化され、
+    以降は該当箇所だけを差し替えます（元の辞書は変更されません）。
 
     Args:
-        workflow: ワークフロー辞書
+        workflow: ワークフロー辞書、または load_workflow_template() の結果
         image_filename: 画像ファイル名
         prompt_text: プロンプトテキスト
+        values: 追加のプレースホルダの値（例: {"SEED": 1234, "LENGTH": 81}）
 
     Returns:
         Dict[str, Any]: 置換後のワークフロー辞書
@@ -393,35 +918,354 @@ def replace_placeholders(
     Examples:
         >>> wf = load_workflow("workflow.json")
         >>> wf = replace_placeholders(wf, "sample.jpg", "A dragon flying")
+        >>> wf = replace_placeholders(wf, "sample.jpg", "A dragon", values={"SEED": 42})
     """
+    if isinstance(workflow, WorkflowTemplate):
+        template = workflow
+    else:
+        template = get_workflow_template(workflow)
+    return template.render(
+        {"IMAGE_FILENAME": image_filename, "PROMPT": prompt_text, **(values or {})}
+    )
 
-    # ComfyUI ワークフローは { "nodes": { "id": {...} } } 形式だったり配列だったり差があるため包括的に処理
-    def _patch(obj: Any) -> Any:
-        if isinstance(obj, dict):
-            return {k: _patch(v) for k, v in obj.items()}
-        elif isinstance(obj, list):
-            return [_patch(v) for v in obj]
-        elif isinstance(obj, str):
-            s = obj
-            if "###IMAGE_FILENAME###" in s:
-                s = s.replace("###IMAGE_FILENAME###", image_filename)
-            if "###PROMPT###" in s:
-                s = s.replace("###PROMPT###", prompt_text)
-            return s
-        else:
-            return obj
 
-    return _patch(workflow)
+# 出力ファイル名（filename_prefix）を持つ保存ノードの種類
+SAVE_NODE_TYPES = ("SaveVideo", "SaveAnimatedWEBP", "SaveAnimatedPNG", "SaveImage")
+
+_UNSAFE_FILENAME_CHARS = re.compile(r"[^\w\-]+")
+
+
+def with_filename_prefix(
+    workflow: dict[str, Any],
+    tag: str,
+    *,
+    class_types: tuple[str, ...] = SAVE_NODE_TYPES,
+) -> dict[str, Any]:
+    """
+    保存ノードの filename_prefix にジョブ固有のタグを付けたワークフローを返します。
+
+    "video/ComfyUI" のようにサブフォルダを含む場合はサブフォルダを維持し、
+    ファイル名部分の末尾にタグを付けます。元の辞書は変更されません
+    （差し替えるノードと inputs だけをコピーします）。
+
+    Args:
+        workflow: ワークフロー辞書（replace_placeholders の結果など）
+        tag: 付加するタグ（ファイル名に使えない文字は "_" に置換）
+        class_types: 対象ノードの種類
+
+    Returns:
+        Dict[str, Any]: 差し替え後のワークフロー辞書
+
+    Raises:
+        ValueError: 対象の保存ノードが見つからない場合
+
+    Examples:
+        >>> wf = with_filename_prefix(wf, "sample_3fa2c9d1")
+        >>> wf["108"]["inputs"]["filename_prefix"]
+        'video/ComfyUI_sample_3fa2c9d1'
+    """
+    tag = _UNSAFE_FILENAME_CHARS.sub("_", tag).strip("_")
+    result = dict(workflow)
+    patched = 0
+    for node_id, node in workflow.items():
+        if not isinstance(node, dict) or node.get("class_type") not in class_types:
+            continue
+        inputs = node.get("inputs") or {}
+        prefix = inputs.get("filename_prefix")
+        if not isinstance(prefix, str):
+            continue
+        result[node_id] = {**node, "inputs": {**inputs, "filename_prefix": f"{prefix}_{tag}"}}
+        patched += 1
+    if not patched:
+        raise ValueError(f"filename_prefix を持つ保存ノードが見つかりません: {class_types}")
+    return result
+
+
+# ノイズのシードを持つサンプラーノードの種類と、シードの入力名
+SAMPLER_NODE_TYPES = ("KSampler", "KSamplerAdvanced", "SamplerCustom", "RandomNoise")
+_SEED_INPUTS = ("noise_seed", "seed")
+
+# シードの決め方（SeedSequence を参照）
+SEED_MODES = ("random", "fixed", "increment")
+# ランダムなシードの上限（JSON を扱うクライアントでも精度が落ちない範囲）
+SEED_MAX = 2**53 - 1
+
+
+def _noise_seed_inputs(
+    workflow: dict[str, Any], class_types: tuple[str, ...]
+) -> list[tuple[str, str, int]]:
+    """ノイズを加えるサンプラーの (ノードID, 入力名, シード) を返します（リンクされた入力は除く）。"""
+    found = []
+    for node_id, node in workflow.items():
+        if not isinstance(node, dict) or node.get("class_type") not in class_types:
+            continue
+        inputs = node.get("inputs") or {}
+        # KSamplerAdvanced の add_noise="disable"（2段目のサンプラー）はシードを使わない
+        if inputs.get("add_noise") in ("disable", False):
+            continue
+        for name in _SEED_INPUTS:
+            value = inputs.get(name)
+            if isinstance(value, int) and not isinstance(value, bool):
+                found.append((node_id, name, value))
+                break
+    return found
+
+
+def workflow_noise_seed(
+    workflow: dict[str, Any], *, class_types: tuple[str, ...] = SAMPLER_NODE_TYPES
+) -> int | None:
+    """
+    ワークフローに書かれているノイズのシードを返します。
+
+    Returns:
+        Optional[int]: 最初に見つかったサンプラーのシード（見つからない場合はNone）
+    """
+    found = _noise_seed_inputs(workflow, class_types)
+    return found[0][2] if found else None
+
+
+def with_noise_seed(
+    workflow: dict[str, Any],
+    seed: int,
+    *,
+    class_types: tuple[str, ...] = SAMPLER_NODE_TYPES,
+) -> dict[str, Any]:
+    """
+    ノイズを加えるサンプラーのシードを差し替えたワークフローを返します。
+
+    KSamplerAdvanced の add_noise が "disable" のノード（WAN 2.2 の2段目など）は変更しません。
+    シード以外の入力は変わらないため、同じ画像・プロンプトで続けて投入すると
+    ComfyUI は画像のエンコードやテキストのエンコードの結果をキャッシュから再利用します。
+    元の辞書は変更されません（差し替えるノードと inputs だけをコピーします）。
+
+    Args:
+        workflow: ワークフロー辞書（replace_placeholders の結果など）
+        seed: シード値
+        class_types: 対象ノードの種類
+
+    Returns:
+        Dict[str, Any]: 差し替え後のワークフロー辞書
+
+    Raises:
+        ValueError: シードを持つサンプラーノードが見つからない場合
+
+    Examples:
+        >>> wf = with_noise_seed(wf, 42)
+        >>> wf["86"]["inputs"]["noise_seed"]
+        42
+    """
+    found = _noise_seed_inputs(workflow, class_types)
+    if not found:
+        raise ValueError(f"シードを持つサンプラーノードが見つかりません: {class_types}")
+    result = dict(workflow)
+    for node_id, name, _ in found:
+        node = result[node_id]
+        result[node_id] = {**node, "inputs": {**node["inputs"], name: seed}}
+    return result
+
+
+class SeedSequence:
+    """
+    ジョブごとのシードを決めるクラス
+
+    - "random": 毎回ランダムなシード（0〜SEED_MAX）
+    - "fixed": 毎回 base（同じ画像・プロンプトなら同じ動画）
+    - "increment": base, base+1, base+2, ...（base を省略した場合はランダムな値から開始）
+    """
+
+    def __init__(self, mode: str = "random", base: int | None = None, *, rng: Any = None):
+        """
+        Args:
+            mode: シードの決め方（"random" / "fixed" / "increment"）
+            base: fixed / increment の基準値
+            rng: 乱数生成器（random.Random、Noneの場合はOSの乱数）
+
+        Raises:
+            ValueError: 不明な mode、または fixed で base が未指定
+        """
+        if mode not in SEED_MODES:
+            raise ValueError(f"不明なシードの決め方です: {mode}（{', '.join(SEED_MODES)}）")
+        if mode == "fixed" and base is None:
+            raise ValueError("fixed にはシードの指定が必要です")
+        self.mode = mode
+        self._rng = rng or random.SystemRandom()
+        self.base = base if base is not None else self._rng.randint(0, SEED_MAX)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def next(self) -> int:
+        """次のシードを返します。"""
+        with self._lock:
+            if self.mode == "random":
+                return self._rng.randint(0, SEED_MAX)
+            if self.mode == "fixed":
+                return self.base
+            seed = (self.base + self._count) % (SEED_MAX + 1)
+            self._count += 1
+            return seed
+
+
+# 解像度・フレーム数を持つノード（画像→動画の潜在変数を作るノード）の種類
+LATENT_NODE_TYPES = ("WanImageToVideo",)
+# 解像度の刻み（WAN の潜在変数は 1/8、パッチは 2×2）とフレーム数の刻み（4n+1）
+SIZE_MULTIPLE = 16
+LENGTH_MULTIPLE = 4
+
+
+@dataclass(frozen=True)
+class RenderParams:
+    """
+    動画の生成パラメータ（None の項目はワークフローの値のまま）
+    """
+
+    width: int | None = None
+    height: int | None = None
+    length: int | None = None  # フレーム数
+    steps: int | None = None  # サンプラーのステップ数（2段の場合は合計）
+
+    def describe(self) -> str:
+        """表示用の文字列（例: "640x640, 81フレーム, 4ステップ"）を返します。"""
+        parts = []
+        if self.width and self.height:
+            parts.append(f"{self.width}x{self.height}")
+        if self.length:
+            parts.append(f"{self.length}フレーム")
+        if self.steps:
+            parts.append(f"{self.steps}ステップ")
+        return ", ".join(parts) or "ワークフローの値"
+
+
+def _int_input(inputs: dict[str, Any], name: str) -> int | None:
+    value = inputs.get(name)
+    return value if isinstance(value, int) and not isinstance(value, bool) else None
+
+
+def workflow_render_params(workflow: dict[str, Any]) -> RenderParams:
+    """
+    ワークフローに書かれている解像度・フレーム数・ステップ数を返します。
+
+    値がプレースホルダや他ノードへの接続の項目は None になります。
+    """
+    width = height = length = steps = None
+    for node in workflow.values():
+        if not isinstance(node, dict):
+            continue
+        inputs = node.get("inputs") or {}
+        if node.get("class_type") in LATENT_NODE_TYPES and width is None:
+            width, height = _int_input(inputs, "width"), _int_input(inputs, "height")
+            length = _int_input(inputs, "length")
+        elif node.get("class_type") in SAMPLER_NODE_TYPES and steps is None:
+            steps = _int_input(inputs, "steps")
+    return RenderParams(width, height, length, steps)
+
+
+def draft_render_params(
+    full: RenderParams, *, scale: float = 0.5, length: int | None = None, steps: int | None = None
+) -> RenderParams:
+    """
+    下書き用に縮めた生成パラメータを返します。
+
+    解像度は縦横比を保って SIZE_MULTIPLE の倍数に、フレーム数は 4n+1 に丸めます。
+    いずれも full の値を超えることはありません。
+
+    Args:
+        full: 本番の生成パラメータ（workflow_render_params の結果など）
+        scale: 解像度の倍率（0 < scale <= 1）
+        length: フレーム数（Noneの場合は full のまま）
+        steps: ステップ数（Noneの場合は full のまま）
+
+    Returns:
+        RenderParams: 下書きの生成パラメータ
+
+    Raises:
+        ValueError: scale / length / steps が範囲外の場合
+    """
+    if not 0 < scale <= 1:
+        raise ValueError(f"解像度の倍率は 0 より大きく 1 以下で指定してください: {scale}")
+    if (length is not None and length < 1) or (steps is not None and steps < 1):
+        raise ValueError(f"フレーム数・ステップ数は1以上で指定してください: {length}, {steps}")
+
+    def size(value: int | None) -> int | None:
+        if value is None:
+            return None
+        return min(value, max(SIZE_MULTIPLE, round(value * scale / SIZE_MULTIPLE) * SIZE_MULTIPLE))
+
+    if length is not None:
+        length = (length - 1) // LENGTH_MULTIPLE * LENGTH_MULTIPLE + 1
+        if full.length is not None:
+            length = min(length, full.length)
+    if steps is not None and full.steps is not None:
+        steps = min(steps, full.steps)
+    return RenderParams(size(full.width), size(full.height), length, steps)
+
+
+def _scale_step(value: int, old_steps: int, new_steps: int) -> int:
+    """start_at_step / end_at_step をステップ数に合わせて縮めます（終端以降の値はそのまま）。"""
+    if value > old_steps:  # end_at_step=10000 など（最後まで）
+        return value
+    return int(value * new_steps / old_steps + 0.5)
+
+
+def with_render_params(workflow: dict[str, Any], params: RenderParams) -> dict[str, Any]:
+    """
+    解像度・フレーム数・ステップ数を差し替えたワークフローを返します。
+
+    2段のサンプラー（KSamplerAdvanced の start_at_step / end_at_step）は、
+    ステップ数に合わせて区切りの位置も同じ比率で縮めます（4ステップの 0-2 / 2-4 は
+    2ステップでは 0-1 / 1-2）。元の辞書は変更されません。
+
+    Args:
+        workflow: ワークフロー辞書
+        params: 生成パラメータ（None の項目は変更しない）
+
+    Returns:
+        Dict[str, Any]: 差し替え後のワークフロー辞書
+    """
+    latent = {
+        name: value
+        for name, value in (
+            ("width", params.width),
+            ("height", params.height),
+            ("length", params.length),
+        )
+        if value is not None
+    }
+    result = dict(workflow)
+    for node_id, node in workflow.items():
+        if not isinstance(node, dict):
+            continue
+        inputs = node.get("inputs") or {}
+        if node.get("class_type") in LATENT_NODE_TYPES and latent:
+            result[node_id] = {**node, "inputs": {**inputs, **latent}}
+        elif node.get("class_type") in SAMPLER_NODE_TYPES and params.steps is not None:
+            old = _int_input(inputs, "steps")
+            if old is None or old == params.steps:
+                continue
+            patched = {"steps": params.steps}
+            for name in ("start_at_step", "end_at_step"):
+                value = _int_input(inputs, name)
+                if value is not None:
+                    patched[name] = _scale_step(value, old, params.steps)
+            result[node_id] = {**node, "inputs": {**inputs, **patched}}
+    return result
 
 
 # -------- 3) ワークフロー投入 --------
-def submit_workflow(workflow: dict[str, Any], *, host: str = COMFY_HOST) -> str:
+def submit_workflow(
+    workflow: dict[str, Any],
+    *,
+    host: str = COMFY_HOST,
+    client_id: str = CLIENT_ID,
+    session: requests.Session | None = None,
+) -> str:
     """
     ワークフローをComfyUIに投入します。
 
     Args:
         workflow: ワークフロー辞書
         host: ComfyUIサーバーURL
+        client_id: websocket クライアントID（wait_for_history() と同じ値を指定）
+        session: 接続を再利用する requests.Session（Noneの場合は毎回接続）
 
     Returns:
         str: プロンプトID
@@ -435,7 +1279,9 @@ def submit_workflow(workflow: dict[str, Any], *, host: str = COMFY_HOST) -> str:
         >>> print(prompt_id)
         "abc123-def456-..."
     """
-    r = requests.post(f"{host}/prompt", json={"prompt": workflow}, timeout=120)
+    r = (session or requests).post(
+        f"{host}/prompt", json={"prompt": workflow, "client_id": client_id}, timeout=120
+    )
     r.raise_for_status()
     data = r.json()
     pid = data.get("prompt_id")
@@ -444,58 +1290,280 @@ def submit_workflow(workflow: dict[str, Any], *, host: str = COMFY_HOST) -> str:
     return pid
 
 
-# -------- 4) 完了待機（/history/{pid} を優先、無ければ /history で全件から抽出）--------
+# -------- 4) 完了待機（websocket の完了イベント、使えない場合は /history/{pid} をバックオフ付きでポーリング）--------
+def _history_entry(data: Any, prompt_id: str) -> dict[str, Any] | None:
+    """/history/{pid} のレスポンス（{pid: entry} 形式）から履歴エントリを取り出します。"""
+    if not isinstance(data, dict):
+        return None
+    if prompt_id in data:
+        return data[prompt_id]
+    # 古いサーバーではエントリそのものが返る場合がある
+    return data if "outputs" in data else None
+
+
+def _is_finished(entry: dict[str, Any] | None) -> bool:
+    """履歴エントリが実行完了を表しているか判定します（失敗時は RuntimeError）。"""
+    if not entry:
+        return False
+    status = entry.get("status") or {}
+    if status.get("status_str") == "error":
+        messages = [m for m in status.get("messages", []) if m and m[0] == "execution_error"]
+        detail = messages[-1][1] if messages else status
+        raise RuntimeError(f"ComfyUI execution failed: {detail}")
+    return bool(entry.get("outputs")) or bool(status.get("completed"))
+
+
+def history_execution_seconds(entry: dict[str, Any]) -> float | None:
+    """
+    履歴エントリからサーバーでの実行時間（キューで待った時間を含まない）を返します。
+
+    Args:
+        entry: 履歴エントリ（wait_for_history() の戻り値）
+
+    Returns:
+        Optional[float]: execution_start から execution_success までの秒数（記録がない場合はNone）
+    """
+    timestamps = {}
+    for message in (entry.get("status") or {}).get("messages") or []:
+        if len(message) == 2 and isinstance(message[1], dict):
+            timestamps[message[0]] = message[1].get("timestamp")
+    start, end = timestamps.get("execution_start"), timestamps.get("execution_success")
+    if not isinstance(start, (int, float)) or not isinstance(end, (int, float)):
+        return None
+    return max(0.0, (end - start) / 1000)  # ミリ秒
+
+
+def fetch_history_entry(
+    prompt_id: str,
+    *,
+    host: str = COMFY_HOST,
+    timeout: float = 30,
+    session: requests.Session | None = None,
+) -> dict[str, Any] | None:
+    """
+    /history/{prompt_id} から完了済みの履歴エントリを1回だけ取得します。
+
+    Args:
+        prompt_id: プロンプトID
+        host: ComfyUIサーバーURL
+        timeout: リクエストのタイムアウト（秒）
+        session: 接続を再利用する requests.Session（Noneの場合は毎回接続）
+
+    Returns:
+        Optional[Dict[str, Any]]: 完了済みの履歴エントリ（未完了・取得失敗の場合はNone）
+
+    Raises:
+        RuntimeError: 実行がエラーで終了している
+    """
+    try:
+        r = (session or requests).get(f"{host}/history/{prompt_id}", timeout=timeout)
+        if r.status_code != 200:
+            return None
+        entry = _history_entry(r.json(), prompt_id)
+    except (requests.RequestException, ValueError):
+        return None
+    return entry if _is_finished(entry) else None
+
+
+def fetch_queue(
+    *,
+    host: str = COMFY_HOST,
+    timeout: float = 30,
+    session: requests.Session | None = None,
+) -> dict[str, list[str]]:
+    """
+    /queue から実行中・待機中のプロンプトIDを取得します。
+
+    Args:
+        host: ComfyUIサーバーURL
+        timeout: リクエストのタイムアウト（秒）
+        session: 接続を再利用する requests.Session（Noneの場合は毎回接続）
+
+    Returns:
+        Dict[str, List[str]]: {"running": [prompt_id, ...], "pending": [prompt_id, ...]}
+
+    Raises:
+        requests.RequestException: 取得エラー
+    """
+    r = (session or requests).get(f"{host}/queue", timeout=timeout)
+    r.raise_for_status()
+    data = r.json()
+    # 各要素は [番号, prompt_id, prompt, extra_data, outputs_to_execute]
+    return {
+        name: [item[1] for item in data.get(f"queue_{name}", []) if len(item) > 1]
+        for name in ("running", "pending")
+    }
+
+
+def _ws_url(host: str, client_id: str) -> str:
+    """http(s)://host を ws(s)://host/ws?clientId=... に変換します。"""
+    if host.startswith("https://"):
+        base = "wss://" + host[len("https://") :]
+    elif host.startswith("http://"):
+        base = "ws://" + host[len("http://") :]
+    else:
+        base = f"ws://{host}"
+    return f"{base.rstrip('/')}/ws?clientId={client_id}"
+
+
+def _wait_via_websocket(
+    prompt_id: str,
+    *,
+    host: str,
+    client_id: str,
+    deadline: float,
+    check_s: float,
+    session: requests.Session | None = None,
+) -> dict[str, Any] | None:
+    """
+    websocket の実行イベントで完了を待ち、履歴エントリを1回だけ取得します。
+
+    接続できない・途中で切断された・期限を過ぎた場合は None を返し、
+    呼び出し側のポーリング（期限切れなら TimeoutError）に任せます。
+    イベントの取りこぼしに備えて、check_s 秒ごとに /history/{pid} を確認します。
+    """
+    if websocket is None:
+        return None
+    try:
+        ws = websocket.create_connection(
+            _ws_url(host, client_id), timeout=max(0.1, min(check_s, deadline - time.time()))
+        )
+    except (websocket.WebSocketException, OSError):
+        return None
+
+    try:
+        # 接続前に完了していた場合に備えて1回確認
+        entry = fetch_history_entry(prompt_id, host=host, session=session)
+        if entry is not None:
+            return entry
+        while time.time() < deadline:
+            ws.settimeout(max(0.1, min(check_s, deadline - time.time())))
+            try:
+                message = ws.recv()
+            except (websocket.WebSocketTimeoutException, socket.timeout):
+                entry = fetch_history_entry(prompt_id, host=host, session=session)
+                if entry is not None:
+                    return entry
+                continue
+            if not isinstance(message, str):
+                continue  # プレビュー画像などのバイナリフレーム
+            try:
+                event = json.loads(message)
+            except ValueError:
+                continue
+            data = event.get("data") or {}
+            if data.get("prompt_id") != prompt_id:
+                continue
+            kind = event.get("type")
+            if kind in ("execution_error", "execution_interrupted"):
+                detail = data.get("exception_message") or kind
+                raise RuntimeError(f"ComfyUI execution failed: {detail} (prompt_id={prompt_id})")
+            # 履歴への保存後に "executing"(node=None) が送られる
+            if kind == "executing" and data.get("node") is None:
+                entry = fetch_history_entry(prompt_id, host=host, session=session)
+                if entry is not None:
+                    return entry
+    except (websocket.WebSocketException, OSError):
+        return None
+    finally:
+        ws.close()
+    return None
+
+
 def wait_for_history(
-    prompt_id: str, *, host: str = COMFY_HOST, timeout_s: int = 600, poll_s: float = 1.5
+    prompt_id: str,
+    *,
+    host: str = COMFY_HOST,
+    timeout_s: int = 600,
+    poll_s: float = 1.5,
+    max_poll_s: float = 15.0,
+    client_id: str = CLIENT_ID,
+    use_websocket: bool = True,
+    session: requests.Session | None = None,
 ) -> dict[str, Any]:
     """
-    実行完了を待機します（履歴ポーリング）。
+    実行完了を待機し、履歴エントリを返します。
+
+    websocket（/ws）の完了イベントで待機し、完了時に /history/{pid} を1回だけ取得します。
+    websocket が使えない場合は /history/{pid} のみをポーリングし、
+    間隔を poll_s から max_poll_s まで徐々に延ばします（/history 全件は取得しません）。
+    返した履歴エントリは download_outputs() にそのまま渡して再取得を避けられます。
 
     Args:
         prompt_id: プロンプトID
         host: ComfyUIサーバーURL
         timeout_s: タイムアウト時間（秒）（デフォルト: 600）
-        poll_s: ポーリング間隔（秒）（デフォルト: 1.5）
+        poll_s: ポーリング間隔の初期値（秒）（デフォルト: 1.5）
+        max_poll_s: ポーリング間隔の上限（秒）（デフォルト: 15）
+        client_id: submit_workflow() に渡したクライアントID（イベントの受信先）
+        use_websocket: False の場合は最初からポーリングで待機
+        session: /history の取得で接続を再利用する requests.Session
 
     Returns:
-        Dict[str, Any]: 履歴エントリ
+        Dict[str, Any]: 履歴エントリ（{"outputs": ..., "status": ..., ...}）
 
     Raises:
         TimeoutError: タイムアウト
+        RuntimeError: 実行がエラーで終了した
 
     Examples:
         >>> history = wait_for_history(prompt_id, timeout_s=600)
+        >>> outputs = download_outputs(prompt_id, "output", history=history)
     """
-    t0 = time.time()
-    # まずは /history/{pid} を試す
-    while True:
-        try:
-            r = requests.get(f"{host}/history/{prompt_id}", timeout=30)
-            if r.status_code == 200:
-                data = r.json()
-                if data and "outputs" in data and data["outputs"]:
-                    return data
-        except requests.RequestException:
-            pass
-        # /history 全件から拾うフォールバック
-        try:
-            r = requests.get(f"{host}/history", timeout=30)
-            if r.status_code == 200:
-                h = r.json() or {}
-                if prompt_id in h:
-                    data = h[prompt_id]
-                    if data and "outputs" in data and data["outputs"]:
-                        return data
-        except requests.RequestException:
-            pass
+    deadline = time.time() + timeout_s
+    if use_websocket:
+        entry = _wait_via_websocket(
+            prompt_id,
+            host=host,
+            client_id=client_id,
+            deadline=deadline,
+            check_s=30.0,
+            session=session,
+        )
+        if entry is not None:
+            return entry
 
-        if time.time() - t0 > timeout_s:
+    # ポーリング（/history/{pid} のみ、指数バックオフ）
+    interval = poll_s
+    while True:
+        entry = fetch_history_entry(prompt_id, host=host, session=session)
+        if entry is not None:
+            return entry
+        remaining = deadline - time.time()
+        if remaining <= 0:
             raise TimeoutError(f"history not ready within {timeout_s}s (prompt_id={prompt_id})")
-        time.sleep(poll_s)
+        time.sleep(min(interval, remaining))
+        interval = min(interval * 1.5, max_poll_s)
 
 
 # -------- 5) 出力ファイルのダウンロード --------
-def _collect_output_files_from_history(history_entry: dict[str, Any]) -> list[tuple[str, str]]:
+# 履歴の outputs でファイル一覧を持つキー
+OUTPUT_KINDS = ("videos", "gifs", "images")
+# 動画として扱う出力ファイルの拡張子
+VIDEO_SUFFIXES = (".mp4", ".webm", ".mov", ".mkv", ".gif")
+
+
+@dataclass(frozen=True)
+class OutputArtifact:
+    """
+    ダウンロードした出力ファイルの情報
+
+    os.PathLike を実装しているため、従来どおりパスとしても扱えます。
+    """
+
+    path: Path  # 保存先のローカルパス
+    filename: str  # サーバー上のファイル名
+    subfolder: str  # サーバー上のサブフォルダ（例: "video"）
+    type: str  # "output" / "temp"
+    node_id: str  # 出力したノードID
+    kind: str  # "videos" / "gifs" / "images"
+    size: int  # バイト数
+
+    def __fspath__(self) -> str:
+        return str(self.path)
+
+
+def _collect_output_files_from_history(history_entry: dict[str, Any]) -> list[dict[str, str]]:
     """
     履歴エントリから出力ファイル情報を収集します。
 
@@ -503,67 +1571,318 @@ def _collect_output_files_from_history(history_entry: dict[str, Any]) -> list[tu
         history_entry: 履歴エントリ辞書
 
     Returns:
-        List[Tuple[str, str]]: (filename, type) のタプルリスト
+        List[Dict[str, str]]: {"filename", "subfolder", "type", "node_id", "kind"} のリスト
     """
-    files: list[tuple[str, str]] = []
+    files: list[dict[str, str]] = []
     outputs = history_entry.get("outputs") or {}
     # outputs は { node_id: { "images": [{filename, type, subfolder, ...}], "gifs": ..., "videos": ... } }
-    for _nid, node_out in outputs.items():
-        for key in ("images", "gifs", "videos"):
-            if key in node_out:
-                for item in node_out[key]:
-                    fn = item.get("filename")
-                    tp = item.get("type", "output")
-                    if fn:
-                        files.append((fn, tp))
+    for nid, node_out in outputs.items():
+        for key in OUTPUT_KINDS:
+            for item in node_out.get(key) or []:
+                if not isinstance(item, dict) or not item.get("filename"):
+                    continue
+                files.append(
+                    {
+                        "filename": item["filename"],
+                        "subfolder": item.get("subfolder") or "",
+                        "type": item.get("type", "output"),
+                        "node_id": str(nid),
+                        "kind": key,
+                    }
+                )
     return files
 
 
-def download_outputs(prompt_id: str, save_dir: str | Path, *, host: str = COMFY_HOST) -> list[Path]:
+def history_output_files(
+    history_entry: dict[str, Any],
+    *,
+    kinds: tuple[str, ...] = OUTPUT_KINDS,
+    suffixes: tuple[str, ...] | None = None,
+) -> list[dict[str, str]]:
     """
-    生成された出力ファイルをダウンロードします。
+    履歴エントリに記録された、このジョブの出力ファイルを返します。
+
+    出力ディレクトリを走査せずに、ジョブ自身の履歴だけから出力を特定します。
+    SaveVideo の出力は "images"（animated=True）として記録されるため、
+    動画を選ぶ場合は suffixes=VIDEO_SUFFIXES で拡張子により絞り込みます。
+
+    Args:
+        history_entry: wait_for_history() が返した履歴エントリ
+        kinds: 対象の種類（例: ("videos", "gifs")）
+        suffixes: 対象の拡張子（Noneの場合はすべて、例: VIDEO_SUFFIXES）
+
+    Returns:
+        List[Dict[str, str]]: {"filename", "subfolder", "type", "node_id", "kind"} のリスト
+    """
+    return [
+        f
+        for f in _collect_output_files_from_history(history_entry)
+        if f["kind"] in kinds
+        and (suffixes is None or Path(f["filename"]).suffix.lower() in suffixes)
+    ]
+
+
+def _local_path(save_dir: Path, subfolder: str, filename: str) -> Path:
+    """サーバー上のサブフォルダ構成を保ったローカルの保存先を返します（.. などは除去）。"""
+    parts = [p for p in Path(subfolder.replace("\\", "/")).parts if p not in ("", ".", "..", "/")]
+    return save_dir.joinpath(*parts, Path(filename).name)
+
+
+def _stream_view(
+    session: requests.Session, host: str, item: dict[str, str], out_path: Path, chunk_size: int
+) -> int:
+    """/view から1ファイルをストリーミングで out_path に保存し、バイト数を返します。"""
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = out_path.with_name(out_path.name + ".part")
+    # /view?filename=XXX&subfolder=YYY&type=output で取得可能
+    params = {"filename": item["filename"], "subfolder": item["subfolder"], "type": item["type"]}
+    size = 0
+    with session.get(f"{host}/view", params=params, stream=True, timeout=120) as rv:
+        rv.raise_for_status()
+        with open(tmp_path, "wb") as f:
+            for chunk in rv.iter_content(chunk_size=chunk_size):
+                f.write(chunk)
+                size += len(chunk)
+    tmp_path.replace(out_path)
+    return size
+
+
+def fetch_output_bytes(
+    item: dict[str, str],
+    *,
+    host: str = COMFY_HOST,
+    preview: str | None = None,
+    session: requests.Session | None = None,
+    timeout: float = 120,
+) -> bytes:
+    """
+    /view から出力ファイルをメモリに読み込みます（ローカルに保存しない）。
+
+    Args:
+        item: 履歴エントリの出力ファイル（history_output_files の要素）
+        host: ComfyUIサーバーURL
+        preview: サーバー側で再エンコードする形式（例: "jpeg;90"、Noneの場合は元のファイル）。
+                 2048×2048 の PNG も JPEG にしてから転送するため、分析用の画像を小さく取得できます
+        session: 接続を再利用する requests.Session（Noneの場合は毎回接続）
+        timeout: タイムアウト（秒）
+
+    Returns:
+        bytes: ファイルの内容
+
+    Raises:
+        requests.HTTPError: 取得エラー
+    """
+    params = {"filename": item["filename"], "subfolder": item["subfolder"], "type": item["type"]}
+    if preview:
+        params["preview"] = preview
+    r = (session or requests).get(f"{host}/view", params=params, timeout=timeout)
+    r.raise_for_status()
+    return r.content
+
+
+def _artifact(item: dict[str, str], path: Path, size: int) -> OutputArtifact:
+    return OutputArtifact(
+        path=path,
+        filename=item["filename"],
+        subfolder=item["subfolder"],
+        type=item["type"],
+        node_id=item["node_id"],
+        kind=item["kind"],
+        size=size,
+    )
+
+
+def _download_one(
+    session: requests.Session, host: str, item: dict[str, str], save_dir: Path, chunk_size: int
+) -> OutputArtifact:
+    """/view から1ファイルをストリーミングで保存します（一時ファイルに書いてから置換）。"""
+    out_path = _local_path(save_dir, item["subfolder"], item["filename"])
+    size = _stream_view(session, host, item, out_path, chunk_size)
+    return _artifact(item, out_path, size)
+
+
+def download_outputs(
+    prompt_id: str,
+    save_dir: str | Path,
+    *,
+    host: str = COMFY_HOST,
+    history: dict[str, Any] | None = None,
+    max_workers: int = 4,
+    chunk_size: int = 1 << 20,
+) -> list[OutputArtifact]:
+    """
+    生成された出力ファイル（videos / gifs / images）を並列にダウンロードします。
+
+    各ファイルは /view からストリーミングで直接ディスクに書き込み、
+    サーバー上のサブフォルダ（例: video/）を保存先でも維持します。
 
     Args:
         prompt_id: プロンプトID
         save_dir: 保存先ディレクトリ
         host: ComfyUIサーバーURL
+        history: wait_for_history() が返した履歴エントリ（指定時は /history を再取得しない）
+        max_workers: 同時ダウンロード数（デフォルト: 4）
+        chunk_size: ストリーミングの読み込み単位（バイト）
 
     Returns:
-        List[Path]: 保存されたファイルパスのリスト
+        List[OutputArtifact]: 保存したファイルの情報（パス・サイズ・ノードID・種別）
+            各要素は os.PathLike としてパスの代わりにも使えます
 
     Raises:
         RuntimeError: 履歴取得エラー
         requests.HTTPError: ダウンロードエラー
 
     Examples:
-        >>> outputs = download_outputs(prompt_id, "output")
-        >>> print(outputs)
-        [PosixPath('output/video_001.mp4')]
+        >>> history = wait_for_history(prompt_id)
+        >>> outputs = download_outputs(prompt_id, "output", history=history)
+        >>> print(outputs[0].path, outputs[0].size)
+        output/video/ComfyUI_00001_.mp4 1834212
     """
     save_dir = Path(save_dir)
     save_dir.mkdir(parents=True, exist_ok=True)
 
-    # history を取得
+    # history を取得（wait_for_history の結果があれば再利用）
+    hist = history
+    if hist is None:
+        try:
+            r = requests.get(f"{host}/history/{prompt_id}", timeout=30)
+            if r.status_code == 200:
+                hist = _history_entry(r.json(), prompt_id) or {}
+            else:
+                raise RuntimeError(f"history/{prompt_id} status={r.status_code}")
+        except requests.RequestException as e:
+            raise RuntimeError(f"failed to fetch history: {e}")
+
+    files = _collect_output_files_from_history(hist)
+    if not files:
+        return []
+    with requests.Session() as session:
+        if len(files) == 1 or max_workers <= 1:
+            return [_download_one(session, host, item, save_dir, chunk_size) for item in files]
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(files))) as pool:
+            futures = [
+                pool.submit(_download_one, session, host, item, save_dir, chunk_size)
+                for item in files
+            ]
+            return [future.result() for future in futures]
+
+
+# -------- 5') 出力ファイルの受け渡し（最終的な保存先へ1回だけ転送）--------
+# 受け渡し方法: http（/view からストリーミング）/ link（ハードリンク→reflink→コピー、
+# 別ファイルシステムはコピー）/
+# rename（マウントした出力ディレクトリから移動）/ auto（マウントがあれば link、なければ http）
+DELIVERY_STRATEGIES = ("auto", "http", "link", "rename")
+
+# Linux の FICLONE ioctl（reflink）
+_FICLONE = 0x40049409
+
+
+def _reflink(src: Path, dest: Path):
+    """reflink（コピーオンライトのクローン）を作成します。未対応の場合は OSError。"""
+    import fcntl
+
+    with open(src, "rb") as fsrc, open(dest, "wb") as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+        except OSError:
+            fdst.close()
+            dest.unlink(missing_ok=True)
+            raise
+
+
+def _link_or_copy(src: Path, dest: Path) -> str:
+    """
+    ハードリンク、reflink、コピーの順に試し、使った方法を返します。
+
+    reflink は同じファイルシステム内でしか作れないため、別ファイルシステム（EXDEV）の場合は
+    試さずにコピーします。dest が既にある場合は、隣の一時ファイルに作ってから置き換えます
+    （os.link は既存のファイルに失敗し、reflink は既存のファイルを切り詰めてしまうため）。
+    """
+    if dest.exists():
+        tmp = dest.with_name(f".{dest.name}.{uuid.uuid4().hex[:8]}.tmp")
+        try:
+            method = _link_or_copy(src, tmp)
+            os.replace(tmp, dest)
+        finally:
+            tmp.unlink(missing_ok=True)
+        return method
     try:
-        r = requests.get(f"{host}/history/{prompt_id}", timeout=30)
-        if r.status_code == 200:
-            hist = r.json()
+        os.link(src, dest)
+        return "hardlink"
+    except OSError as e:
+        same_filesystem = e.errno != errno.EXDEV
+    if same_filesystem:
+        try:
+            _reflink(src, dest)
+            return "reflink"
+        except (OSError, ImportError):
+            pass
+    shutil.copy2(src, dest)
+    return "copy"
+
+
+def deliver_output(
+    item: dict[str, str],
+    dest: str | Path,
+    *,
+    strategy: str = "auto",
+    host: str = COMFY_HOST,
+    comfy_output_dir: str | Path | None = None,
+    session: requests.Session | None = None,
+    chunk_size: int = 1 << 20,
+) -> OutputArtifact:
+    """
+    出力ファイル1つを最終的な保存先に直接届けます（一時コピーを作りません）。
+
+    Args:
+        item: history_output_files() の要素
+        dest: 保存先のファイルパス（最終的なファイル名）
+        strategy: 受け渡し方法
+            - "http": /view からストリーミングで dest に書き込み
+            - "link": comfy_output_dir 上のファイルからハードリンク（ハードリンクが使えない場合は
+              reflink、別ファイルシステムの場合はコピー。dest があれば置き換える）
+            - "rename": comfy_output_dir 上のファイルを dest に移動（サーバー側には残りません）
+            - "auto": comfy_output_dir にファイルがあれば "link"、なければ "http"
+        host: ComfyUIサーバーURL（"http" の場合）
+        comfy_output_dir: ComfyUIの output/ ディレクトリ（マウント先）のパス
+        session: 接続を再利用する requests.Session
+        chunk_size: ストリーミングの読み込み単位（バイト）
+
+    Returns:
+        OutputArtifact: 保存したファイルの情報（path は dest）
+
+    Raises:
+        ValueError: 不明な受け渡し方法、または link / rename で comfy_output_dir が未指定
+        FileNotFoundError: comfy_output_dir 上にファイルが見つからない
+        requests.HTTPError: ダウンロードエラー
+    """
+    if strategy not in DELIVERY_STRATEGIES:
+        raise ValueError(f"不明な受け渡し方法です: {strategy}（{', '.join(DELIVERY_STRATEGIES)}）")
+    dest = Path(dest)
+    source = None
+    if comfy_output_dir is not None and item.get("type", "output") == "output":
+        source = _local_path(Path(comfy_output_dir), item["subfolder"], item["filename"])
+    if strategy == "auto":
+        strategy = "link" if source is not None and source.exists() else "http"
+
+    if strategy == "http":
+        if session is None:
+            with requests.Session() as own_session:
+                size = _stream_view(own_session, host, item, dest, chunk_size)
         else:
-            raise RuntimeError(f"history/{prompt_id} status={r.status_code}")
-    except requests.RequestException as e:
-        raise RuntimeError(f"failed to fetch history: {e}")
+            size = _stream_view(session, host, item, dest, chunk_size)
+        return _artifact(item, dest, size)
 
-    files = _collect_output_files_from_history(hist)
-    saved: list[Path] = []
-    for fn, tp in files:
-        # /view?filename=XXX&type=output で取得可能
-        params = {"filename": fn, "type": tp}
-        rv = requests.get(f"{host}/view", params=params, timeout=120)
-        rv.raise_for_status()
-        out_path = save_dir / Path(fn).name
-        out_path.write_bytes(rv.content)
-        saved.append(out_path)
-    return saved
+    if source is None:
+        raise ValueError(f"'{strategy}' には ComfyUI の出力ディレクトリの指定が必要です")
+    if not source.exists():
+        raise FileNotFoundError(f"ComfyUI出力ファイルが見つかりません: {source}")
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    if strategy == "rename":
+        shutil.move(str(source), str(dest))
+    else:
+        _link_or_copy(source, dest)
+    return _artifact(item, dest, dest.stat().st_size)
 
 
 # -------- まとめ：ワンショット実行 --------
@@ -575,15 +1894,18 @@ def run_comfy_pipeline(
     host: str = COMFY_HOST,
     out_dir: str | Path = "output",
     timeout_s: int = 600,
-) -> list[Path]:
+    placeholder_values: dict[str, Any] | None = None,
+    preresize: bool = False,
+    output_tag: str | None = None,
+) -> list[OutputArtifact]:
     """
     画像→動画生成の完全自動化パイプライン。
 
     処理フロー:
-    1. 画像アップロード
+    1. 画像アップロード（preresize=True の場合はワークフローの解像度に縮小してから）
     2. ワークフロー読み込み＆プレースホルダ置換
     3. ワークフロー投入
-    4. 完了待機（履歴ポーリング）
+    4. 完了待機（websocket の完了イベント）
     5. 出力ファイルダウンロード
 
     Args:
@@ -593,9 +1915,13 @@ def run_comfy_pipeline(
         host: ComfyUIサーバーURL（デフォルト: http://127.0.0.1:15434）
         out_dir: 出力ディレクトリ（デフォルト: output）
         timeout_s: タイムアウト時間（秒）（デフォルト: 600）
+        placeholder_values: 追加のプレースホルダの値（例: {"SEED": 1234}）
+        preresize: True の場合、WanImageToVideo の width / height に合わせて
+                   ローカルで縮小・中央切り抜きしてからアップロード
+        output_tag: 保存ノードの filename_prefix に付けるタグ（Noneの場合はワークフローのまま）
 
     Returns:
-        List[Path]: 生成されたファイルパスのリスト
+        List[OutputArtifact]: 生成されたファイルの情報（os.PathLike としても使用可）
 
     Raises:
         FileNotFoundError: ファイルが見つからない
@@ -610,21 +1936,35 @@ def run_comfy_pipeline(
         ...     workflow_path="workflows/wan22_i2v_workflow.json",
         ...     out_dir="output"
         ... )
-        >>> print(outputs)
-        [PosixPath('output/video_001.mp4')]
+        >>> print([str(a.path) for a in outputs])
+        ['output/video/ComfyUI_00001_.mp4']
     """
-    # 1) 画像アップロード
+    template = load_workflow_template(workflow_path)
+
+    # 1) 画像アップロード（必要に応じて出力解像度へ縮小）
+    if preresize:
+        from mini_muse.video_preprocess import resize_for_video, workflow_target_size
+
+        size = workflow_target_size(template.workflow)
+        if size is not None:
+            image_path = resize_for_video(image_path, size)
     image_filename = upload_image_to_comfyui(image_path, host=host)
 
-    # 2) ワークフロー読み込み＆差し替え
-    wf = load_workflow(workflow_path)
-    wf = replace_placeholders(wf, image_filename=image_filename, prompt_text=prompt_text)
+    # 2) ワークフロー差し替え（索引はワークフローファイルごとに1回だけ作成）
+    wf = replace_placeholders(
+        template,
+        image_filename=image_filename,
+        prompt_text=prompt_text,
+        values=placeholder_values,
+    )
+    if output_tag:
+        wf = with_filename_prefix(wf, output_tag)
 
     # 3) 実行
     pid = submit_workflow(wf, host=host)
 
     # 4) 完了待機
-    wait_for_history(pid, host=host, timeout_s=timeout_s)
+    history = wait_for_history(pid, host=host, timeout_s=timeout_s)
 
-    # 5) 出力取得
-    return download_outputs(pid, save_dir=out_dir, host=host)
+    # 5) 出力取得（待機で得た履歴エントリを再利用）
+    return download_outputs(pid, save_dir=out_dir, host=host, history=history)
@@ -0,0 +1,68 @@
+"""
+ファイルのプロセス間ロック
+
+このモジュールは、JSON ファイルを読み直してマージし、置換する処理（読み込み→変更→書き込み）を
+複数のプロセス・スレッドの間で直列化するための file_lock を提供します。
+
+================================================================================
+使い方 - file_lock
+================================================================================
+
+## 概要
+
+- 対象ファイルの隣に置いたロックファイル（`{名前}.lock`）を `fcntl.flock` で排他ロックします。
+- flock はオープンしたファイルごとのロックのため、同じプロセスの別スレッドどうしも排他になります。
+- ロックはファイルを閉じると（プロセスが異常終了した場合も）解放されます。
+- fcntl がない環境（Windows）では、プロセス内のスレッド間のみ排他になります。
+
+## 基本的な使い方
+
+```python
+from mini_muse.file_lock import file_lock
+
+with file_lock(path):
+    data = json.loads(path.read_text())  # ロック中に読み直す
+    data[key] = value
+    write_atomically(path, data)  # 一時ファイル経由で置換
+```
+
+================================================================================
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# fcntl がない環境でのプロセス内ロック
+_fallback_lock = threading.Lock()
+
+
+@contextmanager
+def file_lock(path: str | Path) -> Iterator[None]:
+    """
+    path の排他ロックを取ります（path + ".lock" をロックファイルにする）。
+
+    Args:
+        path: ロックする対象のファイルパス（ファイル自体は開かない）
+    """
+    if fcntl is None:
+        with _fallback_lock:
+            yield
+        return
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(f"{path}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)  # 閉じるとロックも解放される
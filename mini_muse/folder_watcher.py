@@ -0,0 +1,223 @@
+"""
+入力フォルダの監視モジュール
+
+このモジュールは、フォルダに追加された画像ファイルを inotify（Linux）で検知し、
+書き込みが完了したファイルから順に返す機能を提供します。
+inotify が使えない環境（WSL の /mnt/d などのマウントや Linux 以外）ではポーリングで監視します。
+
+================================================================================
+使い方 - folder_watcher
+================================================================================
+
+## 概要
+
+- 起動時にフォルダ内の既存ファイルを返し、その後は追加されたファイルを待ちます。
+- inotify の IN_CLOSE_WRITE / IN_MOVED_TO で追加を検知し、ポーリング時は poll_s 秒ごとに走査します。
+- ファイルのサイズと更新時刻が settle_s 秒変化しなくなった時点で「書き込み完了」とみなします
+  （ネットワーク越しのコピーなど、inotify のイベントが届かない書き込みにも対応）。
+- 同じファイル（名前・サイズ・更新時刻が同じ）は2回返しません。
+  処理済みフォルダへ移動した後に同じ名前で置き直した場合は、新しいファイルとして返します。
+
+## 基本的な使い方
+
+```python
+import threading
+
+from mini_muse.folder_watcher import FolderWatcher
+
+stop = threading.Event()
+watcher = FolderWatcher("video_input", {".png", ".jpg"}, settle_s=0.5)
+print(watcher.mode)  # "inotify" または "polling"
+for path in watcher.watch(stop):
+    print("新しい画像:", path)
+```
+
+================================================================================
+"""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+# inotify のイベントマスク（<sys/inotify.h>）
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+class _Inotify:
+    """libc の inotify を ctypes で呼び出す最小限のラッパー"""
+
+    def __init__(self, directory: Path):
+        libc_name = ctypes.util.find_library("c")
+        if not sys.platform.startswith("linux") or not libc_name:
+            raise OSError("inotify is not available on this platform")
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        wd = libc.inotify_add_watch(self.fd, os.fsencode(directory), mask)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed: {directory}")
+
+    def read(self, timeout: float) -> tuple[list[str], bool]:
+        """
+        イベントを待ち、追加・書き込み完了したファイル名を返します。
+
+        Returns:
+            Tuple[List[str], bool]: (ファイル名のリスト, キューが溢れた場合True)
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return [], False
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return [], False
+        names: list[str] = []
+        overflow = False
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            raw = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                overflow = True
+            elif raw:
+                names.append(os.fsdecode(raw))
+        return names, overflow
+
+    def close(self):
+        os.close(self.fd)
+
+
+class FolderWatcher:
+    """
+    フォルダに追加された画像を、書き込み完了後に返す監視クラス
+
+    inotify を使える場合はイベントで、使えない場合はポーリングで監視します。
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        extensions: Iterable[str],
+        *,
+        settle_s: float = 0.5,
+        poll_s: float = 0.5,
+        use_inotify: bool = True,
+    ):
+        """
+        監視を準備します。
+
+        Args:
+            directory: 監視するフォルダ
+            extensions: 対象の拡張子（例: {".png", ".jpg"}、大文字小文字は区別しない）
+            settle_s: サイズと更新時刻がこの秒数変化しなければ書き込み完了とみなす
+            poll_s: ポーリング間隔（inotify 使用時は書き込み中ファイルの再確認間隔）
+            use_inotify: False の場合は常にポーリングで監視
+        """
+        self.directory = Path(directory)
+        self.extensions = {ext.lower() for ext in extensions}
+        self.settle_s = settle_s
+        self.poll_s = poll_s
+        self._inotify: _Inotify | None = None
+        if use_inotify:
+            try:
+                self._inotify = _Inotify(self.directory)
+            except OSError:
+                self._inotify = None
+        # 返したファイルの (名前, サイズ, 更新時刻)
+        self._yielded: set[tuple[str, int, int]] = set()
+        # 書き込み完了待ちのファイル: {名前: ((サイズ, 更新時刻), 最後に変化を確認した時刻)}
+        self._pending: dict[str, tuple[tuple[int, int], float]] = {}
+
+    @property
+    def mode(self) -> str:
+        """監視方法（"inotify" / "polling"）"""
+        return "inotify" if self._inotify is not None else "polling"
+
+    def close(self):
+        """inotify の監視を終了します。"""
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def _matches(self, name: str) -> bool:
+        return not name.startswith(".") and os.path.splitext(name)[1].lower() in self.extensions
+
+    def scan(self) -> list[str]:
+        """フォルダを1回走査し、対象の拡張子のファイル名を返します（名前順）。"""
+        try:
+            with os.scandir(self.directory) as entries:
+                return sorted(e.name for e in entries if e.is_file() and self._matches(e.name))
+        except FileNotFoundError:
+            return []
+
+    def _add(self, names: Iterable[str]):
+        now = time.monotonic()
+        for name in names:
+            if self._matches(name) and name not in self._pending:
+                self._pending[name] = ((-1, -1), now)
+
+    def _settled(self) -> list[Path]:
+        """書き込みが完了したファイルを返します（未完了のファイルは次回に持ち越し）。"""
+        now = time.monotonic()
+        ready = []
+        for name, (last, changed_at) in sorted(self._pending.items()):
+            try:
+                st = os.stat(self.directory / name)
+            except FileNotFoundError:
+                del self._pending[name]
+                continue
+            current = (st.st_size, st.st_mtime_ns)
+            if current != last:
+                self._pending[name] = (current, now)
+            elif now - changed_at >= self.settle_s and st.st_size > 0:
+                del self._pending[name]
+                key = (name, *current)
+                if key not in self._yielded:
+                    self._yielded.add(key)
+                    ready.append(self.directory / name)
+        return ready
+
+    def watch(self, stop: threading.Event | None = None) -> Iterator[Path]:
+        """
+        既存のファイルと、追加されたファイルを書き込み完了後に順に返します。
+
+        Args:
+            stop: セットされると監視を終了するイベント（Noneの場合は無期限）
+
+        Yields:
+            Path: 書き込みが完了した画像ファイルのパス
+        """
+        stop = stop or threading.Event()
+        self._add(self.scan())
+        while not stop.is_set():
+            yield from self._settled()
+            # 完了待ちのファイルがある間は短い間隔で再確認する
+            wait = min(self.poll_s, self.settle_s / 2) if self._pending else self.poll_s
+            if self._inotify is not None:
+                names, overflow = self._inotify.read(wait)
+                self._add(self.scan() if overflow else names)
+            else:
+                stop.wait(wait)
+                self._add(self.scan())
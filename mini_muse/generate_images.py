@@ -18,6 +18,9 @@ ComfyUI 画像バッチ生成スクリプト
     # シード固定で再現性を確保
     python generate_images.py --seed 42 --count 1
 
+    # 複数テンプレートファイルを重み付きで混ぜて生成
+    python generate_images.py --count 10 --mix "prompt_templates_polaroid_retro_v3_20251022.json=1,prompt_templates_深海の怪物_20251118.json=2"
+
 機能:
     - プロンプト自動生成（PromptGenerator使用）
     - ComfyUI APIを使用した画像生成
@@ -38,7 +41,8 @@ from pathlib import Path
 from typing import Optional
 
 from mini_muse.comfyui_client import ComfyUIClient
-from mini_muse.prompt_generator import PromptGenerator, list_available_template_files
+from mini_muse.prompt_catalog import TemplateCatalog, parse_mix_spec
+from mini_muse.prompt_generator import PromptGenerator
 
 
 def parse_server_address(server: str) -> tuple[str, Optional[int]]:
@@ -171,11 +175,22 @@ def parse_arguments():
         help="使用するプロンプトテンプレート名（指定しない場合は毎回ランダムに選択）",
     )
 
+    # 複数テンプレートファイルの重み付きミックス
+    parser.add_argument(
+        "--mix",
+        type=str,
+        default=None,
+        help=(
+            "複数テンプレートファイルから重み付きで選択（例: a.json=2,b.json:template=1）。"
+            "指定時は --template-file / --template より優先"
+        ),
+    )
+
     # テンプレートファイル一覧表示
     parser.add_argument(
         "--list-templates",
         action="store_true",
-        help="利用可能なテンプレートファイル一覧を表示して終了",
+        help="利用可能なテンプレートファイルとテンプレート名の一覧を表示して終了",
     )
 
     # ComfyUIサーバー
@@ -249,6 +264,14 @@ def parse_arguments():
         help="出力ディレクトリ（デフォルト: stablediffusion/outputs）",
     )
 
+    # トークン上限
+    parser.add_argument(
+        "--max-tokens",
+        type=int,
+        default=None,
+        help="プロンプト本文のトークン上限（CLIPは75）。指定時は上限に収まる値を選択",
+    )
+
     # ネガティブプロンプト
     parser.add_argument(
         "--negative-prompt",
@@ -335,10 +358,12 @@ def main():
         print("=" * 70)
         print("利用可能なテンプレートファイル")
         print("=" * 70)
-        template_files = list_available_template_files()
+        catalog = TemplateCatalog()
+        template_files = catalog.files()
         if template_files:
             for i, filename in enumerate(template_files, 1):
                 print(f"{i:2d}. {filename}")
+                print(f"      {', '.join(catalog.template_names(filename))}")
         else:
             print("テンプレートファイルが見つかりません。")
         print("=" * 70)
@@ -364,7 +389,14 @@ def main():
 
     # プロンプト生成器初期化
     print("\n[3] プロンプト生成器を初期化中...")
-    if args.template_file:
+    template_catalog = None
+    template_selector = None
+    if args.mix:
+        print(f"  テンプレートミックス: {args.mix}")
+        template_catalog = TemplateCatalog()
+        template_selector = template_catalog.build_selector(parse_mix_spec(args.mix))
+        prompt_gen = None
+    elif args.template_file:
         print(f"  テンプレートファイル: {args.template_file}")
         prompt_gen = PromptGenerator(elements_file=args.template_file)
     else:
@@ -373,11 +405,16 @@ def main():
     # 生成設定表示
     print("\n[4] 生成設定:")
     print(f"  生成枚数: {args.count}枚")
-    print(f"  テンプレート: {args.template if args.template else '毎回ランダム選択'}")
+    if template_selector is not None:
+        print(f"  テンプレート: ミックス（{len(template_selector)}テンプレートから重み付き選択）")
+    else:
+        print(f"  テンプレート: {args.template if args.template else '毎回ランダム選択'}")
     print(f"  ステップ数: {args.steps}")
     print(f"  CFGスケール: {args.cfg}")
     print(f"  解像度: {args.width}x{args.height}")
     print(f"  シード: {args.seed if args.seed else 'ランダム'}")
+    if args.max_tokens:
+        print(f"  トークン上限: {args.max_tokens}")
     print(f"  出力先: {base_output_dir}")
 
     # バッチ生成開始
@@ -408,7 +445,16 @@ def main():
 
             # プロンプト生成
             print("  プロンプト生成中...")
-            prompt = prompt_gen.generate_prompt(args.template)
+            if template_selector is not None:
+                template_ref = template_selector.sample()
+                print(f"  テンプレート: {template_ref}")
+                file_name, name = template_catalog.resolve(template_ref)
+                prompt = template_catalog.get_generator(file_name).generate_prompt(
+                    name, max_tokens=args.max_tokens
+                )
+            else:
+                template_ref = args.template
+                prompt = prompt_gen.generate_prompt(args.template, max_tokens=args.max_tokens)
             print(f"  プロンプト: {prompt[:80]}...")
 
             # シード値の設定
@@ -419,7 +465,10 @@ def main():
 
             # 出力パス生成
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            template_name = args.template if args.template else "random"
+            if template_selector is not None:
+                template_name = template_ref.split(":", 1)[1]
+            else:
+                template_name = args.template if args.template else "random"
             filename = f"{template_name}_{timestamp}_{i+1:04d}.png"
             output_path = current_date_dir / filename
 
@@ -446,7 +495,7 @@ def main():
             # CSVログに記録
             csv_data = {
                 "filename": filename,
-                "template": template_name,
+                "template": template_ref if template_selector is not None else template_name,
                 "positive_prompt": prompt,
                 "negative_prompt": args.negative_prompt,
                 "seed": seed if seed is not None else "random",
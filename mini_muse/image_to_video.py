@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+"""
+画像生成 → 動画生成 連結スクリプト
+
+SD3.5 の画像ワークフローで生成した画像を、そのまま WAN の画像→動画ワークフローに渡します。
+
+これまでの流れ（generate_images.py で PNG をダウンロード → INPUT_DIR に置く →
+batch_video_generation.py が読み直して Ollama 用に再エンコードし、ComfyUI に再アップロード）と違い、
+生成した画像はローカルのディスクを経由しません。
+
+- 動画を同じ ComfyUI サーバーで生成する場合は、LoadImage に "名前 [output]" を指定して
+  サーバーの output/ にある画像を直接読み込みます（ダウンロード・アップロードなし）。
+- 別のサーバーの場合は、画像をメモリに読み込んでそのままアップロードします。
+- Ollama には、サーバー側で JPEG に再エンコードした画像（/view の preview）を
+  メモリ上で縮小して送ります（2048×2048 の PNG を転送・保存しない）。
+- 画像と動画を同じサーバーで生成する場合は、AffinityScheduler で画像のジョブと動画のジョブを
+  それぞれまとめて投入します（交互に投入してモデルの読み込み直しが毎回起きるのを避ける）。
+  --affinity-batch 件続けたら、または相手側が --affinity-max-wait 秒待ったら切り替えます。
+
+処理フロー（ステージごとに並行実行）:
+    画像生成 → プロンプト（Ollama） → 投入 → 待機 → 回収（動画を出力フォルダに届ける）
+
+使い方:
+    # 4枚の画像を生成し、それぞれ動画にする
+    python -m mini_muse.image_to_video --count 4
+
+    # テンプレートと画像サーバー・動画サーバーを指定
+    python -m mini_muse.image_to_video --count 4 --template detailed_diorama \\
+        --server 127.0.0.1:15434 --video-server 127.0.0.1:8000
+
+    # 動画サーバーの output/ がマウントされている場合はハードリンクで受け取る
+    python -m mini_muse.image_to_video --comfy-output-dir /mnt/d/ComfyUI/output
+
+    # 画像を最大8枚まとめて生成してから動画に切り替える（動画の待ちは最大15分）
+    python -m mini_muse.image_to_video --count 16 --affinity-batch 8 --affinity-max-wait 900
+"""
+
+import argparse
+import copy
+import sys
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+from typing import Any, Optional
+
+import requests
+
+from mini_muse.affinity_scheduler import AffinityScheduler, Ticket, workflow_models
+from mini_muse.comfy_video_generator import (
+    VIDEO_SUFFIXES,
+    SeedSequence,
+    WorkflowTemplate,
+    deliver_output,
+    fetch_output_bytes,
+    history_execution_seconds,
+    history_output_files,
+    load_workflow,
+    load_workflow_template,
+    output_image_ref,
+    replace_placeholders,
+    submit_workflow,
+    upload_image_bytes,
+    wait_for_history,
+    with_filename_prefix,
+    with_noise_seed,
+    workflow_noise_seed,
+)
+from mini_muse.comfyui_client import ComfyUIClient
+from mini_muse.ollama_video_prompt import OllamaClient
+from mini_muse.prompt_generator import PromptGenerator
+from mini_muse.video_pipeline import PipelineJob, Stage, StagedPipeline
+
+# Ollama に送る画像の形式（ComfyUI の /view がサーバー側で再エンコードする）
+CAPTION_PREVIEW = "jpeg;90"
+# 生成した画像として扱う出力ファイルの拡張子
+IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg", ".webp")
+
+
+def server_url(server: str) -> str:
+    """host:port 形式のサーバーアドレスを URL にします（URL の場合はそのまま）。"""
+    server = server.rstrip("/")
+    return server if "://" in server else f"http://{server}"
+
+
+@dataclass
+class ChainJob(PipelineJob):
+    """画像1枚分の画像生成 → 動画生成の状態"""
+
+    index: int = 0  # 処理番号（1始まり）
+    total: int = 0  # 総処理数
+    image_prompt: Optional[str] = None  # 画像生成のプロンプト
+    image_seed: Optional[int] = None  # 画像生成のシード（Noneの場合はランダム）
+    image: Optional[dict[str, str]] = None  # サーバーの出力フォルダにある画像（履歴の出力）
+    image_ref: Optional[str] = None  # 動画ワークフローの LoadImage に渡す値
+    prompt: Optional[str] = None  # 動画のプロンプト（Ollama）
+    seed: Optional[int] = None  # 動画のノイズのシード
+    client_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    prompt_id: Optional[str] = None  # 動画ジョブの prompt_id
+    outputs: list[dict[str, str]] = field(default_factory=list)
+    video_path: Optional[Path] = None
+    ticket: Optional[Ticket] = None  # 動画ジョブの投入の順番（AffinityScheduler）
+
+    @property
+    def tag(self) -> str:
+        """出力ファイル名に付けるジョブ固有のタグ"""
+        return f"chain_{self.client_id[:8]}"
+
+    @property
+    def label(self) -> str:
+        return f"[{self.index}/{self.total}]"
+
+
+@dataclass
+class ChainConfig:
+    """連結パイプラインの設定"""
+
+    image_host: str  # 画像を生成する ComfyUI サーバーURL
+    video_host: str  # 動画を生成する ComfyUI サーバーURL
+    output_dir: Path  # 動画の出力フォルダ
+    comfy_output_dir: Optional[Path] = None  # 動画サーバーの output/ のマウント先
+    timeout: int = 600  # 生成の完了を待つ時間（秒）
+    session: requests.Session = field(default_factory=requests.Session)
+    # 画像と動画を同じサーバーで生成する場合に、モデルの組み合わせごとにまとめて投入する
+    scheduler: Optional[AffinityScheduler] = None
+
+    def acquire(self, workflow: dict[str, Any], label: str) -> Optional[Ticket]:
+        """ワークフローのモデルの組み合わせが投入できる順番になるまで待機します。"""
+        if self.scheduler is None:
+            return None
+        return self.scheduler.acquire(workflow_models(workflow), label=label)
+
+    def submitted(self, ticket: Optional[Ticket]):
+        """投入が終わったことを記録します（他のグループに切り替えられるようにする）。"""
+        if self.scheduler is not None and ticket is not None:
+            self.scheduler.submitted(ticket)
+
+    def release(self, ticket: Optional[Ticket], history: Optional[dict[str, Any]] = None):
+        """投入の順番を返し、サーバーでの実行時間を記録します。"""
+        if self.scheduler is not None and ticket is not None:
+            seconds = history_execution_seconds(history) if history else None
+            self.scheduler.release(ticket, seconds)
+
+
+def _generate_image(
+    job: ChainJob,
+    workflow: dict[str, Any],
+    client: ComfyUIClient,
+    config: ChainConfig,
+    params: dict[str, Any],
+) -> ChainJob:
+    """[画像生成] 画像ワークフローを投入し、サーバーの出力フォルダに保存された画像を特定します。"""
+    updated = client.update_prompt(
+        copy.deepcopy(workflow), job.image_prompt, seed=job.image_seed, **params
+    )
+    updated = with_filename_prefix(updated, job.tag)
+    ticket = config.acquire(updated, "画像")
+    history = None
+    try:
+        prompt_id = submit_workflow(
+            updated, host=config.image_host, client_id=job.client_id, session=config.session
+        )
+        config.submitted(ticket)
+        history = wait_for_history(
+            prompt_id,
+            host=config.image_host,
+            timeout_s=config.timeout,
+            client_id=job.client_id,
+            session=config.session,
+        )
+    finally:
+        config.release(ticket, history)
+    images = [
+        item
+        for item in history_output_files(history, kinds=("images",), suffixes=IMAGE_SUFFIXES)
+        if item["type"] == "output"
+    ]
+    if not images:
+        raise FileNotFoundError(f"履歴に画像が記録されていません (prompt_id: {prompt_id})")
+    job.image = images[-1]
+    print(f"{job.label} ✓ 画像: {job.image['filename']}")
+    return job
+
+
+def _make_prompt(job: ChainJob, ollama: OllamaClient, config: ChainConfig) -> ChainJob:
+    """[プロンプト] 画像を JPEG で取得してメモリ上で縮小し、Ollama で動画プロンプトを生成します。"""
+    data = fetch_output_bytes(
+        job.image, host=config.image_host, preview=CAPTION_PREVIEW, session=config.session
+    )
+    job.prompt = ollama.analyze(data)
+    print(f"{job.label} ✓ プロンプト: {job.prompt}")
+    return job
+
+
+def _submit(
+    job: ChainJob, template: WorkflowTemplate, seeds: SeedSequence, config: ChainConfig
+) -> ChainJob:
+    """[投入] 生成した画像を入力にして、動画ワークフローを投入します。"""
+    if config.video_host == config.image_host:
+        # 同じサーバーの output/ から直接読み込む（ダウンロード・アップロードしない）
+        job.image_ref = output_image_ref(job.image)
+    else:
+        data = fetch_output_bytes(job.image, host=config.image_host, session=config.session)
+        suffix = Path(job.image["filename"]).suffix or ".png"
+        job.image_ref = upload_image_bytes(
+            data, suffix, host=config.video_host, session=config.session
+        )
+    job.seed = seeds.next()
+    workflow = replace_placeholders(
+        template, image_filename=job.image_ref, prompt_text=job.prompt, values={"SEED": job.seed}
+    )
+    if workflow_noise_seed(workflow) is not None:
+        workflow = with_noise_seed(workflow, job.seed)
+    workflow = with_filename_prefix(workflow, job.tag)
+    job.ticket = config.acquire(workflow, "動画")
+    try:
+        job.prompt_id = submit_workflow(
+            workflow, host=config.video_host, client_id=job.client_id, session=config.session
+        )
+        config.submitted(job.ticket)
+    except BaseException:
+        config.release(job.ticket)
+        raise
+    print(f"{job.label} ✓ 動画を投入 (image: {job.image_ref}, seed: {job.seed})")
+    return job
+
+
+def _await(job: ChainJob, config: ChainConfig) -> ChainJob:
+    """[待機] 動画生成の完了を待機し、履歴エントリから動画ファイルを特定します。"""
+    history = None
+    try:
+        history = wait_for_history(
+            job.prompt_id,
+            host=config.video_host,
+            timeout_s=config.timeout,
+            client_id=job.client_id,
+            session=config.session,
+        )
+    finally:
+        config.release(job.ticket, history)
+    job.outputs = history_output_files(history, suffixes=VIDEO_SUFFIXES)
+    if not job.outputs:
+        raise FileNotFoundError(
+            f"履歴に動画ファイルが記録されていません (prompt_id: {job.prompt_id})"
+        )
+    return job
+
+
+def _collect(job: ChainJob, config: ChainConfig) -> ChainJob:
+    """[回収] 動画を出力フォルダに届けます（マウントがあればハードリンク、なければHTTP）。"""
+    video = job.outputs[0]
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    stem = Path(job.image["filename"]).stem.rstrip("_")
+    suffix = Path(video["filename"]).suffix or ".mp4"
+    artifact = deliver_output(
+        video,
+        config.output_dir / f"{stem}_{timestamp}_seed{job.seed}{suffix}",
+        host=config.video_host,
+        comfy_output_dir=config.comfy_output_dir,
+        session=config.session,
+    )
+    job.video_path = artifact.path
+    return job
+
+
+def build_stages(
+    workflow: dict[str, Any],
+    template: WorkflowTemplate,
+    client: ComfyUIClient,
+    ollama: OllamaClient,
+    config: ChainConfig,
+    image_params: dict[str, Any],
+    seeds: Optional[SeedSequence] = None,
+) -> list[Stage]:
+    """
+    連結パイプラインのステージを構築します。
+
+    Args:
+        workflow: 画像ワークフロー（API形式）
+        template: 動画ワークフローのテンプレート
+        client: 画像ワークフローのパラメータ更新に使う ComfyUIClient
+        ollama: 動画プロンプトの生成に使う OllamaClient
+        config: サーバー・出力先の設定
+        image_params: 画像生成のパラメータ（negative_prompt / steps / cfg / width / height）
+        seeds: 動画のシードの決め方（Noneの場合は毎回ランダム）
+
+    Returns:
+        List[Stage]: 画像生成 → プロンプト → 投入 → 待機 → 回収
+    """
+    seeds = seeds or SeedSequence()
+    # まとめて投入する間、相手側のジョブを溜めておけるようにキューを広げる
+    queue_size = max(2, config.scheduler.max_batch) if config.scheduler else 2
+    return [
+        Stage(
+            "image",
+            partial(
+                _generate_image,
+                workflow=workflow,
+                client=client,
+                config=config,
+                params=image_params,
+            ),
+        ),
+        Stage("prompt", partial(_make_prompt, ollama=ollama, config=config), queue_size=queue_size),
+        Stage(
+            "submit",
+            partial(_submit, template=template, seeds=seeds, config=config),
+            queue_size=queue_size,
+        ),
+        Stage("await", partial(_await, config=config), workers=2),
+        Stage("collect", partial(_collect, config=config)),
+    ]
+
+
+def parse_arguments(argv: Optional[list[str]] = None):
+    """コマンドライン引数をパース"""
+    parser = argparse.ArgumentParser(
+        description="画像を生成し、そのまま画像→動画ワークフローで動画にします",
+    )
+    parser.add_argument("--count", "-c", type=int, default=1, help="生成する動画の本数")
+    parser.add_argument("--template-file", type=str, default=None, help="テンプレートファイル名")
+    parser.add_argument("--template", "-t", type=str, default=None, help="プロンプトテンプレート名")
+    parser.add_argument(
+        "--server",
+        type=str,
+        default="127.0.0.1:15434",
+        help="画像を生成するComfyUIサーバー（デフォルト: 127.0.0.1:15434）",
+    )
+    parser.add_argument(
+        "--video-server",
+        type=str,
+        default=None,
+        help="動画を生成するComfyUIサーバー（デフォルト: --server と同じ）",
+    )
+    parser.add_argument("--workflow", type=str, default="workflows/sd3.5_large_turbo_upscale.json")
+    parser.add_argument("--video-workflow", type=str, default="workflows/wan22_i2v_workflow.json")
+    parser.add_argument("--steps", type=int, default=30, help="画像のサンプリングステップ数")
+    parser.add_argument("--cfg", type=float, default=5.45, help="画像のCFGスケール")
+    parser.add_argument("--width", type=int, default=1024, help="画像の幅")
+    parser.add_argument("--height", type=int, default=1024, help="画像の高さ")
+    parser.add_argument("--seed", type=int, default=None, help="画像のシード（複数枚は+1ずつ）")
+    parser.add_argument(
+        "--negative-prompt",
+        type=str,
+        default="blurry, low quality, distorted, ugly, deformed",
+    )
+    parser.add_argument("--ollama-host", type=str, default="http://localhost:11434")
+    parser.add_argument("--ollama-model", type=str, default="llava:7b")
+    parser.add_argument(
+        "--output-dir", type=str, default="stablediffusion/video_output", help="動画の出力先"
+    )
+    parser.add_argument(
+        "--comfy-output-dir",
+        type=str,
+        default=None,
+        help="動画サーバーの output/ のマウント先（指定した場合はハードリンクで受け取る）",
+    )
+    parser.add_argument("--timeout", type=int, default=600, help="生成の待機時間（秒）")
+    parser.add_argument(
+        "--affinity-batch",
+        type=int,
+        default=4,
+        help="同じサーバーで画像・動画のどちらかを続けて投入する上限（デフォルト: 4）",
+    )
+    parser.add_argument(
+        "--affinity-max-wait",
+        type=float,
+        default=600,
+        help="相手側のジョブがこの秒数待ったら切り替える（デフォルト: 600）",
+    )
+    parser.add_argument(
+        "--no-affinity",
+        action="store_true",
+        help="画像・動画をまとめずに、できた順に投入する",
+    )
+    return parser.parse_args(argv)
+
+
+def print_affinity_stats(scheduler: AffinityScheduler):
+    """モデルの組み合わせごとの切り替え回数と読み込み時間の推定値を表示します。"""
+    print("[モデル切り替え]")
+    for stats in scheduler.stats().values():
+        load = stats.load_seconds
+        load_text = f"{load:.1f}秒/回" if load is not None else "計測なし"
+        print(
+            f"  {stats.label}: {stats.submitted}件 / 切り替え {stats.switches}回"
+            f"（読み込み {load_text}、投入待ち 合計 {stats.wait_seconds:.1f}秒）"
+        )
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """メイン処理"""
+    args = parse_arguments(argv)
+
+    print("=" * 70)
+    print("画像生成 → 動画生成")
+    print("=" * 70)
+
+    config = ChainConfig(
+        image_host=server_url(args.server),
+        video_host=server_url(args.video_server or args.server),
+        output_dir=Path(args.output_dir),
+        comfy_output_dir=Path(args.comfy_output_dir) if args.comfy_output_dir else None,
+        timeout=args.timeout,
+    )
+    config.output_dir.mkdir(parents=True, exist_ok=True)
+    same = config.video_host == config.image_host
+    if same and not args.no_affinity:
+        config.scheduler = AffinityScheduler(
+            max_batch=args.affinity_batch, max_wait_s=args.affinity_max_wait
+        )
+    print(f"  画像サーバー: {config.image_host}")
+    print(f"  動画サーバー: {config.video_host}")
+    print(
+        "  画像の受け渡し: "
+        + ("サーバーの output/ から直接読み込み" if same else "メモリ経由でアップロード")
+    )
+    if config.scheduler:
+        print(
+            f"  まとめて投入: 最大{config.scheduler.max_batch}件"
+            f"（相手側の待ち 最大{config.scheduler.max_wait_s:.0f}秒）"
+        )
+
+    workflow = load_workflow(args.workflow)
+    template = load_workflow_template(args.video_workflow)
+    client = ComfyUIClient(config.image_host.split("://", 1)[1])
+    prompt_gen = PromptGenerator(elements_file=args.template_file)
+    image_params = {
+        "negative_prompt": args.negative_prompt,
+        "steps": args.steps,
+        "cfg": args.cfg,
+        "width": args.width,
+        "height": args.height,
+    }
+
+    jobs = []
+    for i in range(args.count):
+        seed = args.seed + i if args.seed is not None else None
+        prompt = prompt_gen.generate_prompt(args.template)
+        jobs.append(ChainJob(index=i + 1, total=args.count, image_prompt=prompt, image_seed=seed))
+
+    def report(job: ChainJob):
+        if job.success:
+            print(f"{job.label} ✓ 完了 → {job.video_path.name}（{job.duration:.1f}秒）")
+        else:
+            print(f"{job.label} ✗ {job.failed_stage} で失敗: {job.error}")
+
+    start_time = time.time()
+    with OllamaClient(args.ollama_host, args.ollama_model, keep_alive="30m", timeout=60) as ollama:
+        stages = build_stages(workflow, template, client, ollama, config, image_params)
+        pipeline = StagedPipeline(stages, on_result=report)
+        print(f"\n[パイプライン] {' → '.join(stage.name for stage in pipeline.stages)}")
+        finished = pipeline.run(jobs)
+
+    success_count = sum(1 for job in finished if job.success)
+    elapsed = time.time() - start_time
+    print("\n" + "=" * 70)
+    print(f"成功: {success_count}本 / 失敗: {len(finished) - success_count}本")
+    print(f"合計時間: {elapsed:.1f}秒")
+    print(f"出力先: {config.output_dir}")
+    if config.scheduler:
+        print_affinity_stats(config.scheduler)
+    print("=" * 70)
+    return 0 if success_count == len(finished) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+"""
+ジョブジャーナル（追記専用の処理記録）
+
+このモジュールは、バッチ動画生成の各ステージの結果を画像ごとに JSONL ファイルへ追記し、
+プロセスが途中で終了しても、再起動時に完了済みのステージを飛ばして再開できるようにします。
+
+================================================================================
+使い方 - job_journal
+================================================================================
+
+## 概要
+
+- 1行が1件の記録です: {"key": 画像のキー, "stage": ステージ名, "at": 時刻, ...データ}
+- 記録ごとに fsync するため、記録した時点の内容はクラッシュしても失われません
+  （書き込み途中で終了した最終行は読み込み時に無視されます）。
+- state(key) は同じキーの記録を先頭から順にマージした最新の状態を返します。
+- "failed" の記録はサーバー側の状態（prompt_id など）を破棄し、生成済みのプロンプトだけを残します。
+- "done" になったジョブは compact() で削除されます。
+
+| ステージ | 主なデータ                                    |
+|----------|-----------------------------------------------|
+| prompt   | prompt（生成したプロンプト）                  |
+| submit   | prompt_id, client_id, output_tag, host        |
+| render   | outputs（履歴エントリの出力ファイル）         |
+| done     | video（出力動画のパス）                       |
+| failed   | failed_stage, error                           |
+
+## 基本的な使い方
+
+```python
+from mini_muse.job_journal import JobJournal, image_key
+
+journal = JobJournal()  # ~/.cache/mini_muse/video_jobs.jsonl
+key = image_key("video_input/sample.png")
+journal.record(key, "prompt", prompt="A cat walks, ...")
+journal.record(key, "submit", prompt_id="abc123", client_id="...")
+
+# 再起動後
+state = journal.state(key)  # {"stage": "submit", "prompt": ..., "prompt_id": "abc123", ...}
+```
+
+================================================================================
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+# 失敗時に破棄するサーバー側の状態（再実行時は投入からやり直す）
+_SERVER_FIELDS = ("prompt_id", "client_id", "output_tag", "host", "outputs")
+
+
+def default_journal_path() -> Path:
+    """ジョブジャーナルの既定パスを返します。"""
+    return Path.home() / ".cache" / "mini_muse" / "video_jobs.jsonl"
+
+
+def image_key(image_path: str | Path) -> str:
+    """
+    画像を識別するキーを返します（絶対パス・サイズ・更新時刻）。
+
+    同じ名前で置き直された画像は別のキーになります。
+    """
+    p = Path(image_path).resolve()
+    st = p.stat()
+    return f"{p}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def _merge(state: dict[str, Any], record: dict[str, Any]):
+    """記録1件を状態にマージします。"""
+    stage = record.get("stage")
+    if stage == "failed":
+        for name in _SERVER_FIELDS:
+            state.pop(name, None)
+    elif stage != "done":
+        state.pop("error", None)
+        state.pop("failed_stage", None)
+    state.update({k: v for k, v in record.items() if k != "key"})
+
+
+class JobJournal:
+    """
+    画像ごとのステージの記録（JSONL、追記専用）
+
+    読み込みは初期化時の1回だけで、以降は record() のたびにメモリ上の状態も更新します。
+    ファイルは記録のたびに開いて閉じるため、close() は不要です。
+    同じファイルを複数のプロセスから同時に使うことは想定していません。
+    """
+
+    def __init__(self, path: str | Path | None = None, *, fsync: bool = True):
+        """
+        ジャーナルを開き、既存の記録を読み込みます。
+
+        Args:
+            path: JSONL ファイルのパス（Noneの場合は default_journal_path()）
+            fsync: 記録ごとにディスクへ書き出す（False の場合はフラッシュのみ）
+        """
+        self.path = Path(path) if path else default_journal_path()
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._states: dict[str, dict[str, Any]] = self._load()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def _load(self) -> dict[str, dict[str, Any]]:
+        states: dict[str, dict[str, Any]] = {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return states
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # 書き込み途中で終了した行
+            if isinstance(record, dict) and record.get("key"):
+                _merge(states.setdefault(record["key"], {}), record)
+        return states
+
+    def _append(self, record: dict[str, Any]):
+        # 記録はジョブのステージごとに数件なので、毎回開いて追記する
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+
+    def record(self, key: str, stage: str, **data: Any):
+        """
+        ステージの結果を追記します。
+
+        Args:
+            key: 画像のキー（image_key() の値）
+            stage: ステージ名（"prompt" / "submit" / "render" / "done" / "failed"）
+            **data: 記録するデータ（JSON に変換できる値）
+        """
+        record = {"key": key, "stage": stage, "at": time.time(), **data}
+        with self._lock:
+            self._append(record)
+            _merge(self._states.setdefault(key, {}), record)
+
+    def state(self, key: str) -> dict[str, Any] | None:
+        """
+        キーの最新の状態を返します。
+
+        Returns:
+            Optional[Dict[str, Any]]: {"stage": 最後のステージ, ...マージしたデータ}（記録がない場合はNone）
+        """
+        with self._lock:
+            state = self._states.get(key)
+            return dict(state) if state is not None else None
+
+    def pending(self) -> dict[str, dict[str, Any]]:
+        """完了していない（"done" でない）ジョブの状態を返します。"""
+        with self._lock:
+            return {
+                key: dict(state)
+                for key, state in self._states.items()
+                if state.get("stage") != "done"
+            }
+
+    def compact(self) -> int:
+        """
+        完了したジョブの記録を削除し、未完了のジョブを1行ずつに書き直します。
+
+        Returns:
+            int: 削除したジョブの数
+        """
+        with self._lock:
+            done = [key for key, state in self._states.items() if state.get("stage") == "done"]
+            for key in done:
+                del self._states[key]
+            tmp = self.path.with_name(f".{self.path.name}.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                for key, state in self._states.items():
+                    f.write(json.dumps({"key": key, **state}, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        return len(done)
@@ -62,16 +62,19 @@ prompt = analyze_image_with_ollama(
 
 ## パラメータ詳細
 
-### analyze_image_with_ollama(image_path, *, model, host, prompt, timeout)
+### analyze_image_with_ollama(image_path, *, model, host, prompt, timeout, cache, use_cache)
 
 画像をOllama LMMで分析し、1行の動画化プロンプトを返します。
 
 **引数:**
-- `image_path` (str | Path): 画像ファイルパス（jpg/png/webp）
+- `image_path` (str | Path | bytes): 画像ファイルパス（jpg/png/webp）、または画像データ
+  （bytes の場合はファイルに書き出さず、メモリ上で縮小して送信）
 - `model` (str): 使用するモデル名（デフォルト: "llava"）
 - `host` (str): OllamaサーバーURL（デフォルト: "http://localhost:11434"）
 - `prompt` (Optional[str]): カスタム分析プロンプト（デフォルト: None）
 - `timeout` (int): タイムアウト時間（秒）（デフォルト: 120）
+- `cache` (Optional[AnalysisCache]): 分析結果のキャッシュ（デフォルト: None = 既定のキャッシュ）
+- `use_cache` (bool): False の場合はキャッシュを使わない（デフォルト: True）
 
 **戻り値:**
 - `str`: 1行の動画化プロンプト
@@ -136,10 +139,65 @@ except Exception as e:
 
 入力画像は自動的に以下の処理が行われます：
 
-1. **RGB変換**: すべての画像をRGBモードに変換
-2. **リサイズ**: 短辺を768pxに縮小（メモリ節約）
-3. **JPEG圧縮**: 品質90%でJPEG圧縮
-4. **Base64エンコード**: API送信用にエンコード
+1. **縮小デコード**: JPEG は DCT の縮小デコード（draft）で必要な解像度だけ読み込み
+2. **リサイズ**: Image.reduce で整数縮小した後、LANCZOS で短辺を768pxに縮小（メモリ節約）
+3. **RGB変換**: すべての画像をRGBモードに変換
+4. **JPEG圧縮**: 品質90%でJPEG圧縮（optimize なし）
+5. **Base64エンコード**: API送信用にエンコード（スレッドごとにバッファを再利用）
+
+大量の画像を処理する場合は、`encode_images_for_analysis` または
+`OllamaClient(encoder=ProcessPoolExecutor())` でデコードをプロセスプールに分散できます。
+ベンチマーク: `uv run python tests/bench_preprocess.py`（12MP 画像での ms/画像 を表示）
+
+## 分析結果のキャッシュ
+
+分析結果は (画像内容のハッシュ, モデル, 分析プロンプト, 前処理パラメータ) をキーに
+`~/.cache/mini_muse/ollama_analysis.json` に保存され、同じ画像を再分析する場合は
+画像のデコードや API 呼び出しを行わずにキャッシュから返します。
+ComfyUI の失敗後にバッチを再実行した場合などに、キャプション生成をやり直さずに済みます。
+
+- エントリ数が上限（デフォルト: 5000）を超えると、最後に使われた時刻が古いものから削除します。
+- キャッシュのヒットではファイルを書き換えません（最後に使われた時刻は次の保存でまとめて書き込み）。
+- 保存時はファイルロックを取ってマージするため、複数のプロセスで同じファイルを共有できます。
+- `use_cache=False` でキャッシュを使わずに毎回分析します。
+
+```python
+from mini_muse.ollama_video_prompt import AnalysisCache, analyze_image_with_ollama
+
+cache = AnalysisCache(max_entries=1000)
+prompt = analyze_image_with_ollama("input/sample.jpg", cache=cache)
+print(cache.stats())  # {"hits": 0, "misses": 1, "stores": 1, "evictions": 0}
+
+# キャッシュを使わない
+prompt = analyze_image_with_ollama("input/sample.jpg", use_cache=False)
+```
+
+## バッチ処理向けクライアント
+
+OllamaClient は接続を再利用し、keep_alive でバッチの間モデルを常駐させ、
+最初の画像の前にモデルを読み込みます（ウォームアップ）。
+max_concurrency 件までのリクエストを同時に送るため、サーバー側で
+`OLLAMA_NUM_PARALLEL` を設定すると、その並列度に合わせて処理量が伸びます。
+
+```python
+from mini_muse.ollama_video_prompt import OllamaClient
+
+with OllamaClient(model="llava:7b", keep_alive="30m", max_concurrency=2) as client:
+    print(f"モデル読み込み: {client.warm_up():.1f}秒")
+    results = client.analyze_many(["input/a.jpg", "input/b.jpg", "input/c.jpg"])
+```
+
+## ストリーミングと早期終了
+
+`stream=True` を指定すると応答を逐次受信し、カンマ区切りで4要素の1行プロンプトが
+完成した時点で接続を閉じて生成を打ち切ります（Ollama は接続が切れると生成を中止します）。
+冗長なモデルが説明文を続けて生成する場合でも、不要なトークンの生成を待たずに済みます。
+1行が完成しない場合に備えて、生成トークン数の上限 `num_predict`
+（デフォルト: STREAM_NUM_PREDICT = 96）を指定します。
+
+```python
+prompt = analyze_image_with_ollama("input/sample.jpg", stream=True, num_predict=64)
+```
 
 ## デフォルト分析プロンプト
 
@@ -183,11 +241,21 @@ A: 以下を試してください：
 from __future__ import annotations
 
 import base64
+import hashlib
 import io
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 
 import requests
 from PIL import Image
+from requests.adapters import HTTPAdapter
+
+from mini_muse.file_lock import file_lock
 
 DEFAULT_ANALYSIS_PROMPT = (
     "Analyze this image and output a single concise prompt for a 5-second video animation. "
@@ -195,14 +263,235 @@ DEFAULT_ANALYSIS_PROMPT = (
     "No extra words."
 )
 
+# ストリーミング時の生成トークン数の上限（1行プロンプトが届かない場合の打ち切り）
+STREAM_NUM_PREDICT = 96
+# 1行プロンプトの要素数（[subject], [motion], [camera movement], [atmosphere]）
+PROMPT_PARTS = 4
+
+# 送信前の前処理パラメータ（変更した場合はキャッシュのキーも変わる）
+ANALYSIS_SHORT_SIDE = 768
+ANALYSIS_JPEG_QUALITY = 90
+
+
+def default_analysis_cache_path() -> Path:
+    """分析結果キャッシュの既定パスを返します。"""
+    return Path.home() / ".cache" / "mini_muse" / "ollama_analysis.json"
+
+
+def _file_digest(path: Path) -> str:
+    """ファイル内容の SHA-256（16進）を返します。"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _image_digest(image: str | Path | bytes) -> str:
+    """画像ファイル（または画像データ）の内容の SHA-256（16進）を返します。"""
+    if isinstance(image, bytes):
+        return hashlib.sha256(image).hexdigest()
+    return _file_digest(Path(image))
+
+
+def analysis_cache_key(
+    image_path: str | Path | bytes,
+    *,
+    model: str,
+    prompt: str,
+    preprocess: dict[str, object] | None = None,
+) -> str:
+    """
+    分析結果キャッシュのキーを返します。
+
+    画像はファイル名ではなく内容のハッシュで識別するため、
+    同じ画像を別名でコピーしてもキャッシュが使われます。
+
+    Args:
+        image_path: 画像ファイルパス（または画像データ）
+        model: モデル名
+        prompt: 分析プロンプト
+        preprocess: 前処理パラメータ（Noneの場合は現在の既定値）
+
+    Returns:
+        str: キー（SHA-256 の16進）
+    """
+    if preprocess is None:
+        preprocess = {"short_side": ANALYSIS_SHORT_SIDE, "quality": ANALYSIS_JPEG_QUALITY}
+    material = {
+        "image": _image_digest(image_path),
+        "model": model,
+        "prompt": prompt,
+        "preprocess": preprocess,
+    }
+    return hashlib.sha256(json.dumps(material, sort_keys=True).encode("utf-8")).hexdigest()
+
 
-def _load_and_resize_to_base64(image_path: str | Path, short_side: int = 768) -> str:
+class AnalysisCache:
+    """
+    Ollama 分析結果のディスクキャッシュ
+
+    {キー: {"text": 分析結果, "model": モデル名, "used": 最終使用時刻}} を JSON で保存します。
+    ファイルは最初の参照で読み込み、以降はメモリ上で参照します（見つからない場合のみ、
+    他のプロセスが更新していれば読み直す）。参照ではファイルを書き換えず、最終使用時刻の
+    更新は次の put() でまとめて書き込みます。
+    書き込み時はファイルロック（file_lock）を取ってからファイルを読み直してマージし、
+    一時ファイル経由で置換するため、複数のプロセスが同時に更新しても記録は失われません
+    （fcntl がない環境ではプロセス内のスレッド間のみ）。
+    エントリ数が max_entries を超えると、最終使用時刻が古いものから削除します。
+    """
+
+    def __init__(self, path: str | Path | None = None, max_entries: int = 5000):
+        self.path = Path(path) if path else default_analysis_cache_path()
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._data: dict[str, dict[str, object]] | None = None
+        self._mtime: int | None = None  # 読み込んだときのファイルの更新時刻
+        self._used: dict[str, float] = {}  # まだ書き込んでいない最終使用時刻
+
+    def _read(self) -> dict[str, dict[str, object]]:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _write(self, data: dict[str, dict[str, object]]):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(prefix=".analysis-", dir=self.path.parent)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_name, self.path)
+
+    def _file_mtime(self) -> int | None:
+        try:
+            return self.path.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def _load(self, *, refresh: bool = False) -> dict[str, dict[str, object]]:
+        """メモリ上の記録を返します（refresh の場合はファイルが更新されていれば読み直す）。"""
+        if self._data is None or (refresh and self._file_mtime() != self._mtime):
+            self._mtime = self._file_mtime()
+            self._data = self._read()
+        return self._data
+
+    def get(self, key: str) -> str | None:
+        """
+        キャッシュされた分析結果を返します（最終使用時刻は次の put() で書き込む）。
+
+        Args:
+            key: analysis_cache_key の結果
+
+        Returns:
+            Optional[str]: 分析結果（キャッシュにない場合はNone）
+        """
+        with self._lock:
+            entry = self._load().get(key)
+            if not isinstance(entry, dict) or not entry.get("text"):
+                entry = self._load(refresh=True).get(key)
+            if not isinstance(entry, dict) or not entry.get("text"):
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._used[key] = time.time()
+            return str(entry["text"])
+
+    def put(self, key: str, text: str, *, model: str = ""):
+        """
+        分析結果を保存し、上限を超えた古いエントリを削除します。
+
+        Args:
+            key: analysis_cache_key の結果
+            text: 分析結果
+            model: モデル名（記録用）
+        """
+        with self._lock, file_lock(self.path):
+            data = self._read()
+            for used_key, used in self._used.items():
+                entry = data.get(used_key)
+                if isinstance(entry, dict):
+                    entry["used"] = max(used, entry.get("used", 0))
+            data[key] = {"text": text, "model": model, "used": time.time()}
+            excess = len(data) - max(1, self.max_entries)
+            if excess > 0:
+                oldest = sorted(data, key=lambda k: data[k].get("used", 0))[:excess]
+                for old in oldest:
+                    del data[old]
+                self.evictions += len(oldest)
+            self._write(data)
+            self._data = data
+            self._mtime = self._file_mtime()
+            self._used.clear()
+            self.stores += 1
+
+    def clear(self):
+        """キャッシュをすべて削除します。"""
+        with self._lock, file_lock(self.path):
+            self.path.unlink(missing_ok=True)
+            self._data = {}
+            self._mtime = None
+            self._used.clear()
+
+    def stats(self) -> dict[str, int]:
+        """
+        このインスタンスでのキャッシュ利用統計を返します。
+
+        Returns:
+            Dict[str, int]: {"hits", "misses", "stores", "evictions", "entries"}
+        """
+        with self._lock:
+            entries = len(self._load())
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "entries": entries,
+        }
+
+
+_default_cache: AnalysisCache | None = None
+
+
+def get_default_analysis_cache() -> AnalysisCache:
+    """プロセス共通の AnalysisCache を返します。"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = AnalysisCache()
+    return _default_cache
+
+
+# スレッドごとに再利用する JPEG エンコード用バッファ
+_buffers = threading.local()
+
+
+def _encode_buffer() -> io.BytesIO:
+    buf = getattr(_buffers, "buf", None)
+    if buf is None:
+        buf = _buffers.buf = io.BytesIO()
+    buf.seek(0)
+    buf.truncate()
+    return buf
+
+
+def _load_and_resize_to_base64(
+    image_path: str | Path | bytes, short_side: int = ANALYSIS_SHORT_SIDE
+) -> str:
     """
     画像を読み込み、リサイズし、base64エンコードします。
 
+    JPEG は DCT の縮小デコード（draft）で読み込み、さらに Image.reduce で
+    目標サイズの2倍未満まで整数縮小してから LANCZOS で仕上げるため、
+    大きな画像でもフル解像度のデコードとリサンプルを避けられます。
+
     Args:
-        image_path: 画像ファイルパス
-        short_side: 短辺のピクセル数（デフォルト: 768）
+        image_path: 画像ファイルパス（bytes の場合はメモリ上の画像データ）
+        short_side: 短辺のピクセル数（デフォルト: ANALYSIS_SHORT_SIDE = 768）
 
     Returns:
         str: base64エンコードされた画像データ
@@ -210,13 +499,26 @@ def _load_and_resize_to_base64(image_path: str | Path, short_side: int = 768) ->
     Raises:
         FileNotFoundError: 画像ファイルが見つからない
     """
-    p = Path(image_path)
-    if not p.exists():
-        raise FileNotFoundError(f"image not found: {p}")
-    with Image.open(p) as im:
-        im = im.convert("RGB")
+    if isinstance(image_path, bytes):
+        source = io.BytesIO(image_path)
+    else:
+        source = Path(image_path)
+        if not source.exists():
+            raise FileNotFoundError(f"image not found: {source}")
+    with Image.open(source) as im:
+        w, h = im.size
+        scale = short_side / min(w, h)
+        if scale < 1:
+            # 短辺が short_side 以上になる範囲で 1/2, 1/4, 1/8 デコード（JPEG のみ有効）
+            im.draft("RGB", (round(w * scale), round(h * scale)))
+        if im.mode not in ("RGB", "L"):
+            im = im.convert("RGB")
         w, h = im.size
         if min(w, h) > short_side:
+            factor = min(w, h) // short_side
+            if factor >= 2:
+                im = im.reduce(factor)
+                w, h = im.size
             if w <= h:
                 new_w = short_side
                 new_h = int(h * (short_side / w))
@@ -224,29 +526,134 @@ def _load_and_resize_to_base64(image_path: str | Path, short_side: int = 768) ->
                 new_h = short_side
                 new_w = int(w * (short_side / h))
             im = im.resize((new_w, new_h), Image.LANCZOS)
-        buf = io.BytesIO()
-        im.save(buf, format="JPEG", quality=90, optimize=True)
-    return base64.b64encode(buf.getvalue()).decode("utf-8")
+        if im.mode != "RGB":
+            im = im.convert("RGB")
+        buf = _encode_buffer()
+        im.save(buf, format="JPEG", quality=ANALYSIS_JPEG_QUALITY)
+    with buf.getbuffer() as view:
+        return base64.b64encode(view).decode("ascii")
+
+
+def encode_images_for_analysis(
+    image_paths: list[str | Path],
+    *,
+    short_side: int = ANALYSIS_SHORT_SIDE,
+    max_workers: int | None = None,
+) -> dict[Path, str]:
+    """
+    複数の画像をプロセスプールで並列に縮小・base64エンコードします。
+
+    Args:
+        image_paths: 画像ファイルパスのリスト
+        short_side: 短辺のピクセル数
+        max_workers: プロセス数（Noneの場合はCPU数）
+
+    Returns:
+        Dict[Path, str]: {画像パス: base64エンコードされた画像データ}
+
+    Raises:
+        FileNotFoundError: 画像ファイルが見つからない
+    """
+    paths = [Path(p) for p in image_paths]
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        encoded = pool.map(_load_and_resize_to_base64, paths, [short_side] * len(paths))
+        return dict(zip(paths, encoded))
+
+
+def _complete_prompt_line(text: str, final: bool = False) -> str | None:
+    """
+    生成途中のテキストから、完成した1行プロンプトを探します。
+
+    カンマ区切りで PROMPT_PARTS 個以上の要素を持つ行を完成とみなします。
+    生成途中の最終行は、ピリオドで終わっている場合のみ対象にします。
+
+    Args:
+        text: これまでに受信したテキスト
+        final: 生成が終了している場合True（最終行も対象にする）
+
+    Returns:
+        Optional[str]: 完成した1行（見つからない場合はNone）
+    """
+    lines = text.split("\n")
+    if not final and not lines[-1].rstrip().endswith("."):
+        lines = lines[:-1]
+    for line in lines:
+        line = line.strip().strip('"').strip()
+        parts = line.rstrip(".").split(",")
+        if len(parts) >= PROMPT_PARTS and all(part.strip() for part in parts):
+            return line
+    return None
+
+
+def _read_stream(response: requests.Response) -> str:
+    """
+    ストリーミング応答を読み、1行プロンプトが完成した時点で読み込みを終了します。
+
+    呼び出し側が応答を閉じると接続が切れ、Ollama はその時点で生成を中止します。
+
+    Returns:
+        str: 完成した1行（完成しないまま生成が終了した場合は受信したテキスト全体）
+
+    Raises:
+        KeyError: レスポンス形式が不正
+        RuntimeError: サーバーがエラーを返した
+    """
+    chunks = []
+    for raw in response.iter_lines():
+        if not raw:
+            continue
+        data = json.loads(raw)
+        if "error" in data:
+            raise RuntimeError(f"ollama error: {data['error']}")
+        if "response" not in data:
+            raise KeyError(f"unexpected response fields: {list(data.keys())}")
+        chunks.append(data["response"] or "")
+        line = _complete_prompt_line("".join(chunks))
+        if line is not None:
+            return line
+        if data.get("done"):
+            break
+    text = "".join(chunks)
+    return _complete_prompt_line(text, final=True) or text
 
 
 def analyze_image_with_ollama(
-    image_path: str | Path,
+    image_path: str | Path | bytes,
     *,
     model: str = "llava",
     host: str = "http://localhost:11434",
     prompt: str | None = None,
     timeout: int = 120,
+    cache: AnalysisCache | None = None,
+    use_cache: bool = True,
+    keep_alive: str | int | None = None,
+    session: requests.Session | None = None,
+    stream: bool = False,
+    num_predict: int | None = None,
+    encoder: Executor | None = None,
 ) -> str:
     """
     画像 → LMM 分析 → 1行の動画化プロンプト文字列を返す。
     失敗時は requests.HTTPError / KeyError / Timeout など例外を送出。
 
+    同じ画像・モデル・分析プロンプトの結果がキャッシュにある場合は、
+    画像のデコードや API 呼び出しを行わずにキャッシュから返します。
+
     Args:
-        image_path: 画像ファイルパス（jpg/png/webp）
+        image_path: 画像ファイルパス（jpg/png/webp）、または画像データ
+                    （bytes の場合はファイルに書き出さず、メモリ上で縮小して送信）
         model: 使用するモデル名（デフォルト: "llava"）
         host: OllamaサーバーURL（デフォルト: "http://localhost:11434"）
         prompt: カスタム分析プロンプト（Noneの場合はデフォルトプロンプトを使用）
         timeout: タイムアウト時間（秒）（デフォルト: 120）
+        cache: 分析結果のキャッシュ（Noneの場合は ~/.cache/mini_muse/ollama_analysis.json）
+        use_cache: False の場合はキャッシュを参照・保存しない
+        keep_alive: 応答後にモデルをメモリに残す時間（例: "30m"、Noneの場合はサーバー設定）
+        session: 接続を再利用する requests.Session（Noneの場合は毎回接続）
+        stream: True の場合は応答を逐次受信し、1行プロンプトが完成した時点で生成を打ち切る
+        num_predict: 生成トークン数の上限（Noneの場合、stream=True では STREAM_NUM_PREDICT）
+        encoder: 画像の縮小・エンコードを実行する Executor（ProcessPoolExecutor など、
+                 Noneの場合は呼び出し元のスレッドで実行）
 
     Returns:
         str: 1行の動画化プロンプト文字列
@@ -257,6 +664,7 @@ def analyze_image_with_ollama(
         requests.Timeout: タイムアウト
         KeyError: レスポンス形式が不正
         ValueError: 空のレスポンス
+        RuntimeError: ストリーミング中にサーバーがエラーを返した
 
     Examples:
         >>> prompt = analyze_image_with_ollama("input/sample.jpg")
@@ -265,23 +673,204 @@ def analyze_image_with_ollama(
 
         >>> prompt = analyze_image_with_ollama("image.jpg", model="bakllava", timeout=300)
     """
-    img64 = _load_and_resize_to_base64(image_path)
+    analysis_prompt = prompt or DEFAULT_ANALYSIS_PROMPT
+    key = None
+    if use_cache:
+        if not isinstance(image_path, bytes) and not Path(image_path).exists():
+            raise FileNotFoundError(f"image not found: {image_path}")
+        cache = cache or get_default_analysis_cache()
+        key = analysis_cache_key(image_path, model=model, prompt=analysis_prompt)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    if encoder is not None:
+        img64 = encoder.submit(_load_and_resize_to_base64, image_path).result()
+    else:
+        img64 = _load_and_resize_to_base64(image_path)
     body = {
         "model": model,
-        "prompt": prompt or DEFAULT_ANALYSIS_PROMPT,
+        "prompt": analysis_prompt,
         "images": [img64],
         "stream": False,
     }
+    if keep_alive is not None:
+        body["keep_alive"] = keep_alive
+    if stream and num_predict is None:
+        num_predict = STREAM_NUM_PREDICT
+    if num_predict is not None:
+        body["options"] = {"num_predict": num_predict}
     url = f"{host.rstrip('/')}/api/generate"
-    r = requests.post(url, json=body, timeout=timeout)
-    r.raise_for_status()
-    data = r.json()
-    if "response" not in data:
-        raise KeyError(f"unexpected response fields: {list(data.keys())}")
-    text = (data["response"] or "").strip().replace("\n", " ")
+    poster = session or requests
+    if stream:
+        body["stream"] = True
+        # with を抜けると接続が閉じられ、サーバー側の生成も止まる
+        with poster.post(url, json=body, timeout=timeout, stream=True) as r:
+            r.raise_for_status()
+            response_text = _read_stream(r)
+    else:
+        r = poster.post(url, json=body, timeout=timeout)
+        r.raise_for_status()
+        data = r.json()
+        if "response" not in data:
+            raise KeyError(f"unexpected response fields: {list(data.keys())}")
+        response_text = data["response"]
+    text = (response_text or "").strip().replace("\n", " ")
     if not text:
         raise ValueError("empty response from model")
     # 1行フォーマットの軽い正規化（末尾ピリオド削除）
     if text.endswith("."):
         text = text[:-1]
+    if key is not None:
+        cache.put(key, text, model=model)
     return text
+
+
+class OllamaClient:
+    """
+    バッチ処理向けの Ollama クライアント
+
+    - requests.Session で接続を再利用します。
+    - すべてのリクエストに keep_alive を付け、バッチの間モデルをメモリに常駐させます。
+    - warm_up() で最初の画像の前にモデルを読み込みます。
+    - max_concurrency 件までのリクエストを同時に送ります
+      （サーバー側の OLLAMA_NUM_PARALLEL と合わせて設定してください）。
+    """
+
+    def __init__(
+        self,
+        host: str = "http://localhost:11434",
+        model: str = "llava",
+        *,
+        keep_alive: str | int = "30m",
+        max_concurrency: int = 1,
+        timeout: int = 120,
+        cache: AnalysisCache | None = None,
+        use_cache: bool = True,
+        stream: bool = False,
+        num_predict: int | None = None,
+        encoder: Executor | None = None,
+    ):
+        """
+        クライアントを初期化します。
+
+        Args:
+            host: OllamaサーバーURL
+            model: 使用するモデル名
+            keep_alive: 応答後にモデルをメモリに残す時間（例: "30m"、-1 で無期限）
+            max_concurrency: 同時に送るリクエスト数の上限
+            timeout: 1リクエストのタイムアウト時間（秒）
+            cache: 分析結果のキャッシュ（Noneの場合は既定のキャッシュ）
+            use_cache: False の場合はキャッシュを使わない
+            stream: True の場合は1行プロンプトが完成した時点で生成を打ち切る
+            num_predict: 生成トークン数の上限
+            encoder: 画像の縮小・エンコードを実行する Executor（大量の画像を処理する場合は
+                     ProcessPoolExecutor を指定すると、デコードが複数コアで並列に行われます）
+        """
+        self.host = host.rstrip("/")
+        self.model = model
+        self.keep_alive = keep_alive
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+        self.cache = cache
+        self.use_cache = use_cache
+        self.stream = stream
+        self.num_predict = num_predict
+        self.encoder = encoder
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+
+    def __enter__(self) -> OllamaClient:
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """セッションを閉じます（モデルは keep_alive の間メモリに残ります）。"""
+        self.session.close()
+
+    def warm_up(self) -> float:
+        """
+        モデルをメモリに読み込みます（空のプロンプトを送るとモデルの読み込みのみ行われます）。
+
+        Returns:
+            float: 読み込みにかかった時間（秒）（すでに読み込み済みの場合はほぼ0）
+
+        Raises:
+            requests.HTTPError: HTTP エラー
+        """
+        start = time.time()
+        r = self.session.post(
+            f"{self.host}/api/generate",
+            json={"model": self.model, "prompt": "", "keep_alive": self.keep_alive},
+            timeout=max(self.timeout, 300),
+        )
+        r.raise_for_status()
+        return time.time() - start
+
+    def unload(self):
+        """モデルをメモリから解放します（keep_alive=0）。"""
+        r = self.session.post(
+            f"{self.host}/api/generate",
+            json={"model": self.model, "prompt": "", "keep_alive": 0},
+            timeout=self.timeout,
+        )
+        r.raise_for_status()
+
+    def analyze(self, image_path: str | Path | bytes, prompt: str | None = None) -> str:
+        """
+        画像を分析して1行の動画化プロンプトを返します（同時実行数は max_concurrency まで）。
+
+        Args:
+            image_path: 画像ファイルパス（または画像データ）
+            prompt: カスタム分析プロンプト（Noneの場合はデフォルトプロンプト）
+
+        Returns:
+            str: 1行の動画化プロンプト文字列
+
+        Raises:
+            analyze_image_with_ollama と同じ
+        """
+        with self._slots:
+            return analyze_image_with_ollama(
+                image_path,
+                model=self.model,
+                host=self.host,
+                prompt=prompt,
+                timeout=self.timeout,
+                cache=self.cache,
+                use_cache=self.use_cache,
+                keep_alive=self.keep_alive,
+                session=self.session,
+                stream=self.stream,
+                num_predict=self.num_predict,
+                encoder=self.encoder,
+            )
+
+    def analyze_many(
+        self, image_paths: list[str | Path], prompt: str | None = None
+    ) -> dict[Path, str | Exception]:
+        """
+        複数の画像を max_concurrency 件ずつ並行に分析します。
+
+        Args:
+            image_paths: 画像ファイルパスのリスト
+            prompt: カスタム分析プロンプト
+
+        Returns:
+            Dict[Path, Union[str, Exception]]: {画像パス: 分析結果（失敗時は例外）}
+        """
+        paths = [Path(p) for p in image_paths]
+        results: dict[Path, str | Exception] = {}
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            futures = {path: pool.submit(self.analyze, path, prompt) for path in paths}
+            for path, future in futures.items():
+                try:
+                    results[path] = future.result()
+                except Exception as e:
+                    results[path] = e
+        return results
@@ -0,0 +1,997 @@
+"""
+コンパイル済みプロンプトカタログ
+
+このモジュールは、prompts/ フォルダ内のテンプレートJSONファイル群を
+1つのコンパクトなバイナリカタログにコンパイルし、mmap で読み込む機能を提供します。
+
+================================================================================
+使い方 - prompt_catalog
+================================================================================
+
+## 概要
+
+ワーカープロセスごとに JSON を解析して全文字列を個別に保持する代わりに、
+以下をまとめた1ファイルを作成します：
+
+- 文字列テーブル（重複を除いたUTF-8文字列とオフセット配列）
+- 要素カテゴリ・値・重みの配列
+- 構築済みのエイリアステーブル（AliasSampler 用）
+- テンプレート本文をリテラルとプレースホルダーに分割したスロット列
+
+カタログは読み取り専用の mmap で開くため、同じマシン上の N プロセスが
+ページキャッシュ上の1つのコピーを共有し、JSON 解析なしで即座に起動できます。
+
+## 基本的な使い方
+
+### 1. カタログのコンパイル
+
+```bash
+uv run python -m mini_muse.prompt_catalog
+# または出力先を指定
+uv run python -m mini_muse.prompt_catalog --prompts-dir prompts --output prompts/prompt_catalog.mmcat
+```
+
+### 2. PromptGenerator から利用
+
+```python
+from mini_muse.prompt_generator import PromptGenerator
+
+# カタログが古い場合は自動で再コンパイルされます
+generator = PromptGenerator(
+    elements_file="prompt_templates_抽象画_20250117.json",
+    catalog="prompts/prompt_catalog.mmcat",
+)
+prompt = generator.generate_prompt("abstract_composition")
+```
+
+### 3. カタログを直接開く
+
+```python
+from mini_muse.prompt_catalog import open_catalog
+
+catalog = open_catalog("prompts/prompt_catalog.mmcat")
+print(catalog.file_names())
+entry = catalog.get_file("prompt_elements.json")
+print(entry.template_names())
+```
+
+### 4. 全テンプレートファイルを横断して使う（TemplateCatalog）
+
+```python
+from mini_muse.prompt_catalog import TemplateCatalog
+
+catalog = TemplateCatalog()  # テンプレート名の索引のみ作成（JSONは読み込まない）
+print(catalog.template_refs())  # ["ファイル名:テンプレート名", ...]
+
+# ファイル単位・テンプレート単位の重みで混ぜて生成（使うファイルだけ読み込まれる）
+results = catalog.generate_mixed(
+    count=10,
+    weights={
+        "prompt_templates_コズミックホラー王道_20260220.json": 2.0,
+        "prompt_templates_polaroid_retro_v3_20251022.json": 1.0,
+    },
+)
+for ref, prompt in results:
+    print(ref, prompt[:80])
+```
+
+索引は `prompts/.template_manifest.cache` にキャッシュされ、
+サイズと mtime が変わったファイルだけ再索引します。
+
+## 無効化
+
+カタログには各ソースファイルのサイズ・更新時刻（mtime）・SHA-256 が記録されます。
+サイズと mtime が一致すればハッシュ計算なしで有効と判定し、
+mtime だけが異なる場合はハッシュを比較します。
+ソースファイルの追加・削除・変更があった場合、`ensure_catalog` が再コンパイルします。
+書き込みは一時ファイル経由の置換で行うため、旧カタログを mmap 中のプロセスには影響しません。
+
+## 注意事項
+
+- `"values"` を持たない要素（自由形式の補助データ）は説明文のみ保持します
+- テンプレートの `text` / `description` / `japanese_description` 以外のキーは保持しません
+
+================================================================================
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from collections.abc import Iterator, Sequence
+from pathlib import Path
+from typing import Any
+
+from mini_muse.prompt_generator import (
+    AliasSampler,
+    _parse_weighted_values,
+    compile_template_segments,
+)
+
+CATALOG_MAGIC = b"MMCATLG\x00"
+CATALOG_VERSION = 2
+DEFAULT_CATALOG_NAME = "prompt_catalog.mmcat"
+
+# 文字列が存在しないことを表す ID
+NO_STRING = 0xFFFFFFFF
+
+# ヘッダ: magic, version, section_count
+_HEADER = struct.Struct("<8sII")
+# セクションディレクトリ: offset, length
+_SECTION = struct.Struct("<QQ")
+# ファイル: name, elem_start, elem_count, tmpl_start, tmpl_count, constraints, size, mtime_ns, sha256
+# constraints は制約ルール（JSON文字列）の文字列ID
+_FILE_RECORD = struct.Struct("<6IQq32s")
+# 要素: name, description, value_start, value_count
+_ELEMENT_RECORD = struct.Struct("<4I")
+# テンプレート: name, description, japanese_description, text, seg_start, seg_count
+_TEMPLATE_RECORD = struct.Struct("<6I")
+
+# セクション番号（ファイル内の並び順）
+(
+    _SEC_STR_OFFSETS,
+    _SEC_STR_DATA,
+    _SEC_FILES,
+    _SEC_ELEMENTS,
+    _SEC_VALUE_SIDS,
+    _SEC_VALUE_WEIGHTS,
+    _SEC_ALIAS_PROB,
+    _SEC_ALIAS_INDEX,
+    _SEC_TEMPLATES,
+    _SEC_SEGMENTS,
+) = range(10)
+_SECTION_COUNT = 10
+
+
+def default_prompts_dir() -> Path:
+    """promptsフォルダのデフォルトパスを返します。"""
+    return Path(__file__).parent.parent / "prompts"
+
+
+def default_catalog_path() -> Path:
+    """カタログファイルのデフォルトパスを返します。"""
+    return default_prompts_dir() / DEFAULT_CATALOG_NAME
+
+
+def _file_sha256(path: Path) -> bytes:
+    """ファイルのSHA-256ダイジェストを返します。"""
+    return hashlib.sha256(path.read_bytes()).digest()
+
+
+# -------- コンパイル --------
+class _StringTable:
+    """重複を除いた文字列テーブルのビルダー"""
+
+    def __init__(self):
+        self._ids: dict[str, int] = {}
+        self._encoded: list[bytes] = []
+
+    def add(self, text: str | None) -> int:
+        if text is None:
+            return NO_STRING
+        sid = self._ids.get(text)
+        if sid is None:
+            sid = len(self._encoded)
+            self._ids[text] = sid
+            self._encoded.append(text.encode("utf-8"))
+        return sid
+
+    def pack(self) -> tuple[bytes, bytes]:
+        offsets = [0]
+        for data in self._encoded:
+            offsets.append(offsets[-1] + len(data))
+        return struct.pack(f"<{len(offsets)}I", *offsets), b"".join(self._encoded)
+
+
+def compile_catalog(
+    prompts_dir: str | Path | None = None, output_path: str | Path | None = None
+) -> Path:
+    """
+    promptsフォルダ内のJSONファイルをバイナリカタログにコンパイルします。
+
+    Args:
+        prompts_dir: プロンプトJSONのフォルダ（Noneの場合は prompts/）
+        output_path: 出力先（Noneの場合は prompts/prompt_catalog.mmcat）
+
+    Returns:
+        Path: 書き出したカタログのパス
+
+    Raises:
+        json.JSONDecodeError: JSONの解析に失敗した場合
+        ValueError: 要素の値の形式が不正な場合
+    """
+    prompts_dir = Path(prompts_dir) if prompts_dir else default_prompts_dir()
+    output_path = Path(output_path) if output_path else prompts_dir / DEFAULT_CATALOG_NAME
+
+    strings = _StringTable()
+    files: list[bytes] = []
+    elements: list[bytes] = []
+    value_sids: list[int] = []
+    value_weights: list[float] = []
+    alias_prob: list[float] = []
+    alias_index: list[int] = []
+    templates: list[bytes] = []
+    segments: list[int] = []
+
+    for path in sorted(prompts_dir.glob("*.json")):
+        raw = path.read_bytes()
+        stat = path.stat()
+        data = json.loads(raw.decode("utf-8"))
+
+        elem_start = len(elements)
+        for name, element in (data.get("elements") or {}).items():
+            element = element if isinstance(element, dict) else {}
+            value_start = len(value_sids)
+            values = element.get("values")
+            if values:
+                texts, weights = _parse_weighted_values(values)
+                prob, alias = AliasSampler(texts, weights).tables
+                value_sids.extend(strings.add(t) for t in texts)
+                value_weights.extend(weights)
+                alias_prob.extend(prob)
+                alias_index.extend(alias)
+            elements.append(
+                _ELEMENT_RECORD.pack(
+                    strings.add(name),
+                    strings.add(element.get("description")),
+                    value_start,
+                    len(value_sids) - value_start,
+                )
+            )
+
+        tmpl_start = len(templates)
+        for name, template in (data.get("templates") or {}).items():
+            seg_start = len(segments) // 2
+            for kind, text in compile_template_segments(template.get("text", "")):
+                segments.extend((kind, strings.add(text)))
+            templates.append(
+                _TEMPLATE_RECORD.pack(
+                    strings.add(name),
+                    strings.add(template.get("description")),
+                    strings.add(template.get("japanese_description")),
+                    strings.add(template.get("text", "")),
+                    seg_start,
+                    len(segments) // 2 - seg_start,
+                )
+            )
+
+        # 制約ルールは読み込み時にビットセットへコンパイルするため、JSONのまま格納
+        rules = {
+            "constraints": data.get("constraints") or [],
+            "templates": {
+                name: template["constraints"]
+                for name, template in (data.get("templates") or {}).items()
+                if template.get("constraints")
+            },
+        }
+        has_rules = rules["constraints"] or rules["templates"]
+        files.append(
+            _FILE_RECORD.pack(
+                strings.add(path.name),
+                elem_start,
+                len(elements) - elem_start,
+                tmpl_start,
+                len(templates) - tmpl_start,
+                strings.add(json.dumps(rules, ensure_ascii=False) if has_rules else None),
+                stat.st_size,
+                stat.st_mtime_ns,
+                hashlib.sha256(raw).digest(),
+            )
+        )
+
+    str_offsets, str_data = strings.pack()
+    sections = [
+        str_offsets,
+        str_data,
+        b"".join(files),
+        b"".join(elements),
+        struct.pack(f"<{len(value_sids)}I", *value_sids),
+        struct.pack(f"<{len(value_weights)}d", *value_weights),
+        struct.pack(f"<{len(alias_prob)}d", *alias_prob),
+        struct.pack(f"<{len(alias_index)}I", *alias_index),
+        b"".join(templates),
+        struct.pack(f"<{len(segments)}I", *segments),
+    ]
+
+    # 各セクションを8バイト境界に揃えて配置
+    offset = _HEADER.size + _SECTION.size * len(sections)
+    directory = []
+    body = []
+    for section in sections:
+        padding = (-offset) % 8
+        body.append(b"\x00" * padding)
+        offset += padding
+        directory.append(_SECTION.pack(offset, len(section)))
+        body.append(section)
+        offset += len(section)
+
+    blob = b"".join(
+        [_HEADER.pack(CATALOG_MAGIC, CATALOG_VERSION, len(sections)), *directory, *body]
+    )
+
+    # 一時ファイルに書いてから置換（読み込み中のプロセスに影響しない）
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(prefix=".catalog-", dir=output_path.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(blob)
+        os.replace(tmp_name, output_path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+    return output_path
+
+
+# -------- 読み込み --------
+class _StringView(Sequence):
+    """文字列IDの配列を、アクセス時にデコードする読み取り専用シーケンス"""
+
+    def __init__(self, catalog: CompiledPromptCatalog, sids: Sequence[int]):
+        self._catalog = catalog
+        self._sids = sids
+
+    def __len__(self) -> int:
+        return len(self._sids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._catalog.string(sid) for sid in self._sids[index]]
+        return self._catalog.string(self._sids[index])
+
+    def __iter__(self) -> Iterator[str]:
+        for sid in self._sids:
+            yield self._catalog.string(sid)
+
+
+class CatalogFile:
+    """カタログ内の1ソースファイル分のビュー"""
+
+    def __init__(self, catalog: CompiledPromptCatalog, record: tuple):
+        self._catalog = catalog
+        (
+            self._name_sid,
+            self._elem_start,
+            self._elem_count,
+            self._tmpl_start,
+            self._tmpl_count,
+            self._constraints_sid,
+            self.size,
+            self.mtime_ns,
+            self.sha256,
+        ) = record
+        self.name = catalog.string(self._name_sid)
+
+    def is_current(self, source_path: str | Path) -> bool:
+        """
+        ソースファイルがコンパイル時から変更されていないか確認します。
+
+        Args:
+            source_path: ソースJSONファイルのパス
+
+        Returns:
+            bool: 変更されていない場合True
+        """
+        path = Path(source_path)
+        try:
+            stat = path.stat()
+        except OSError:
+            return False
+        if stat.st_size != self.size:
+            return False
+        if stat.st_mtime_ns == self.mtime_ns:
+            return True
+        # mtime のみ異なる場合（コピーやチェックアウト）は内容で判定
+        return _file_sha256(path) == self.sha256
+
+    def _rules(self) -> dict[str, Any]:
+        if self._constraints_sid == NO_STRING:
+            return {"constraints": [], "templates": {}}
+        return json.loads(self._catalog.string(self._constraints_sid))
+
+    def constraints(self) -> list[dict[str, Any]]:
+        """ファイル全体に適用される制約ルールを返します。"""
+        return self._rules()["constraints"]
+
+    def _element_records(self) -> Iterator[tuple]:
+        for i in range(self._elem_start, self._elem_start + self._elem_count):
+            yield self._catalog._element(i)
+
+    def _template_records(self) -> Iterator[tuple]:
+        for i in range(self._tmpl_start, self._tmpl_start + self._tmpl_count):
+            yield self._catalog._template(i)
+
+    def element_names(self) -> list[str]:
+        """要素カテゴリ名のリストを返します。"""
+        return [self._catalog.string(r[0]) for r in self._element_records()]
+
+    def template_names(self) -> list[str]:
+        """テンプレート名のリストを返します。"""
+        return [self._catalog.string(r[0]) for r in self._template_records()]
+
+    def elements(self) -> dict[str, dict[str, Any]]:
+        """
+        要素辞書を返します（値は mmap 上の遅延デコードシーケンス）。
+
+        Returns:
+            Dict[str, Dict]: {カテゴリ名: {"description": str, "values": Sequence[str]}}
+        """
+        result: dict[str, dict[str, Any]] = {}
+        for name_sid, desc_sid, start, count in self._element_records():
+            element: dict[str, Any] = {}
+            if desc_sid != NO_STRING:
+                element["description"] = self._catalog.string(desc_sid)
+            if count:
+                element["values"] = _StringView(
+                    self._catalog, self._catalog._value_sids[start : start + count]
+                )
+            result[self._catalog.string(name_sid)] = element
+        return result
+
+    def samplers(self) -> dict[str, AliasSampler]:
+        """
+        構築済みのエイリアステーブルを参照するサンプラーを返します（再計算なし）。
+
+        Returns:
+            Dict[str, AliasSampler]: {カテゴリ名: サンプラー}
+        """
+        c = self._catalog
+        result: dict[str, AliasSampler] = {}
+        for name_sid, _desc_sid, start, count in self._element_records():
+            if not count:
+                continue
+            end = start + count
+            result[c.string(name_sid)] = AliasSampler.from_tables(
+                _StringView(c, c._value_sids[start:end]),
+                c._value_weights[start:end],
+                c._alias_prob[start:end],
+                c._alias_index[start:end],
+            )
+        return result
+
+    def templates(self) -> dict[str, dict[str, Any]]:
+        """
+        テンプレート辞書を返します。
+
+        Returns:
+            Dict[str, Dict]: {テンプレート名: {"description", "japanese_description", "text"}}
+                制約ルールを持つテンプレートには "constraints" も含まれます
+        """
+        template_rules = self._rules()["templates"]
+        result: dict[str, dict[str, Any]] = {}
+        for name_sid, desc_sid, jdesc_sid, text_sid, _start, _count in self._template_records():
+            template: dict[str, Any] = {}
+            if desc_sid != NO_STRING:
+                template["description"] = self._catalog.string(desc_sid)
+            if jdesc_sid != NO_STRING:
+                template["japanese_description"] = self._catalog.string(jdesc_sid)
+            template["text"] = self._catalog.string(text_sid)
+            name = self._catalog.string(name_sid)
+            if name in template_rules:
+                template["constraints"] = template_rules[name]
+            result[name] = template
+        return result
+
+    def template_segments(self) -> dict[str, list[tuple[int, str]]]:
+        """
+        プリコンパイル済みのテンプレートセグメントを返します。
+
+        Returns:
+            Dict[str, List[Tuple[int, str]]]: {テンプレート名: [(種別, 文字列), ...]}
+        """
+        c = self._catalog
+        result: dict[str, list[tuple[int, str]]] = {}
+        for record in self._template_records():
+            name_sid, start, count = record[0], record[4], record[5]
+            segs = c._segments[start * 2 : (start + count) * 2]
+            result[c.string(name_sid)] = [
+                (segs[i], c.string(segs[i + 1])) for i in range(0, len(segs), 2)
+            ]
+        return result
+
+
+class CompiledPromptCatalog:
+    """
+    mmap で開いたコンパイル済みプロンプトカタログ
+
+    配列はすべて mmap 上の memoryview で参照し、文字列はアクセス時にデコードします。
+    """
+
+    def __init__(self, path: str | Path):
+        """
+        カタログファイルを開きます。
+
+        Args:
+            path: カタログファイルのパス
+
+        Raises:
+            FileNotFoundError: ファイルが見つからない場合
+            ValueError: カタログの形式やバージョンが不正な場合
+        """
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+
+        magic, version, count = _HEADER.unpack_from(self._mmap, 0)
+        if magic != CATALOG_MAGIC:
+            self.close()
+            raise ValueError(f"プロンプトカタログではありません: {self.path}")
+        if version != CATALOG_VERSION or count != _SECTION_COUNT:
+            self.close()
+            raise ValueError(f"カタログのバージョンが一致しません: {self.path} (version={version})")
+
+        sections = [
+            _SECTION.unpack_from(self._mmap, _HEADER.size + i * _SECTION.size) for i in range(count)
+        ]
+
+        def _array(index: int, fmt: str) -> memoryview:
+            offset, length = sections[index]
+            return self._view[offset : offset + length].cast(fmt)
+
+        def _raw(index: int) -> memoryview:
+            offset, length = sections[index]
+            return self._view[offset : offset + length]
+
+        self._str_offsets = _array(_SEC_STR_OFFSETS, "I")
+        self._str_data = _raw(_SEC_STR_DATA)
+        self._files = _raw(_SEC_FILES)
+        self._elements = _raw(_SEC_ELEMENTS)
+        self._value_sids = _array(_SEC_VALUE_SIDS, "I")
+        self._value_weights = _array(_SEC_VALUE_WEIGHTS, "d")
+        self._alias_prob = _array(_SEC_ALIAS_PROB, "d")
+        self._alias_index = _array(_SEC_ALIAS_INDEX, "I")
+        self._templates = _raw(_SEC_TEMPLATES)
+        self._segments = _array(_SEC_SEGMENTS, "I")
+
+        self._file_index: dict[str, int] = {}
+        for i in range(len(self._files) // _FILE_RECORD.size):
+            name_sid = _FILE_RECORD.unpack_from(self._files, i * _FILE_RECORD.size)[0]
+            self._file_index[self.string(name_sid)] = i
+
+    def close(self):
+        """mmap を閉じます（外部に渡したビューが残っている場合は GC まで保持されます）。"""
+        for name in (
+            "_str_offsets",
+            "_str_data",
+            "_files",
+            "_elements",
+            "_value_sids",
+            "_value_weights",
+            "_alias_prob",
+            "_alias_index",
+            "_templates",
+            "_segments",
+            "_view",
+        ):
+            view = self.__dict__.get(name)
+            if view is not None:
+                view.release()
+        with contextlib.suppress(BufferError):
+            self._mmap.close()
+
+    def __enter__(self) -> CompiledPromptCatalog:
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def string(self, sid: int) -> str:
+        """文字列IDから文字列をデコードします。"""
+        start = self._str_offsets[sid]
+        end = self._str_offsets[sid + 1]
+        return str(self._str_data[start:end], "utf-8")
+
+    def _element(self, index: int) -> tuple:
+        return _ELEMENT_RECORD.unpack_from(self._elements, index * _ELEMENT_RECORD.size)
+
+    def _template(self, index: int) -> tuple:
+        return _TEMPLATE_RECORD.unpack_from(self._templates, index * _TEMPLATE_RECORD.size)
+
+    def file_names(self) -> list[str]:
+        """カタログに含まれるソースファイル名のリストを返します。"""
+        return list(self._file_index)
+
+    def get_file(self, name: str) -> CatalogFile | None:
+        """
+        ソースファイル名からカタログエントリを取得します。
+
+        Args:
+            name: ソースファイル名（例: "prompt_elements.json"）
+
+        Returns:
+            Optional[CatalogFile]: エントリ、存在しない場合はNone
+        """
+        index = self._file_index.get(name)
+        if index is None:
+            return None
+        record = _FILE_RECORD.unpack_from(self._files, index * _FILE_RECORD.size)
+        return CatalogFile(self, record)
+
+    def is_current(self, prompts_dir: str | Path) -> bool:
+        """
+        カタログが prompts_dir の現在の内容と一致しているか確認します。
+
+        Args:
+            prompts_dir: プロンプトJSONのフォルダ
+
+        Returns:
+            bool: ファイル構成と全ファイルの内容が一致する場合True
+        """
+        prompts_dir = Path(prompts_dir)
+        names = sorted(p.name for p in prompts_dir.glob("*.json"))
+        if names != sorted(self._file_index):
+            return False
+        return all(self.get_file(name).is_current(prompts_dir / name) for name in names)
+
+
+def open_catalog(path: str | Path | None = None) -> CompiledPromptCatalog:
+    """
+    カタログを mmap で開きます。
+
+    Args:
+        path: カタログファイルのパス（Noneの場合はデフォルトパス）
+
+    Returns:
+        CompiledPromptCatalog: 開いたカタログ
+    """
+    return CompiledPromptCatalog(path or default_catalog_path())
+
+
+def ensure_catalog(
+    catalog_path: str | Path | None = None, prompts_dir: str | Path | None = None
+) -> CompiledPromptCatalog:
+    """
+    カタログが最新であることを確認し、古い場合は再コンパイルしてから開きます。
+
+    Args:
+        catalog_path: カタログファイルのパス（Noneの場合は prompts/prompt_catalog.mmcat）
+        prompts_dir: プロンプトJSONのフォルダ（Noneの場合はカタログと同じフォルダ）
+
+    Returns:
+        CompiledPromptCatalog: 最新のカタログ
+    """
+    catalog_path = Path(catalog_path) if catalog_path else default_catalog_path()
+    prompts_dir = Path(prompts_dir) if prompts_dir else catalog_path.parent
+
+    if catalog_path.exists():
+        try:
+            catalog = CompiledPromptCatalog(catalog_path)
+        except ValueError:
+            catalog = None
+        if catalog is not None:
+            if catalog.is_current(prompts_dir):
+                return catalog
+            catalog.close()
+
+    print(f"プロンプトカタログをコンパイルします: {catalog_path}")
+    compile_catalog(prompts_dir, catalog_path)
+    return CompiledPromptCatalog(catalog_path)
+
+
+# -------- 全テンプレートファイルの統合カタログ（遅延読み込み）--------
+DEFAULT_MANIFEST_NAME = ".template_manifest.cache"
+MANIFEST_VERSION = 1
+
+
+def split_template_ref(ref: str) -> tuple[str | None, str]:
+    """
+    テンプレート参照を (ファイル名, テンプレート名) に分解します。
+
+    Args:
+        ref: "ファイル名:テンプレート名" またはテンプレート名のみ
+
+    Returns:
+        Tuple[Optional[str], str]: ファイル名（省略時はNone）とテンプレート名
+    """
+    if ":" in ref:
+        file_name, name = ref.split(":", 1)
+        return file_name, name
+    return None, ref
+
+
+def parse_mix_spec(spec: str) -> dict[str, float]:
+    """
+    "a.json=2,b.json:template=1" 形式の重み指定を辞書に変換します。
+
+    重みを省略した項目は 1.0 として扱います。
+
+    Args:
+        spec: カンマ区切りの重み指定
+
+    Returns:
+        Dict[str, float]: {ファイル名 または ファイル名:テンプレート名: 重み}
+
+    Raises:
+        ValueError: 重みが数値でない場合
+    """
+    weights: dict[str, float] = {}
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        key, _, weight = item.partition("=")
+        try:
+            weights[key.strip()] = float(weight) if weight else 1.0
+        except ValueError:
+            raise ValueError(f"重みの指定が不正です: {item}")
+    return weights
+
+
+class TemplateCatalog:
+    """
+    promptsフォルダ内の全テンプレートファイルを横断するカタログ
+
+    テンプレート名と要素名の索引だけを軽量に作成し（マニフェストまたは
+    コンパイル済みカタログを利用）、各ファイルの PromptGenerator は
+    初めて使われたときに作成します。
+    """
+
+    def __init__(
+        self,
+        prompts_dir: str | Path | None = None,
+        *,
+        manifest_path: str | Path | None = None,
+        compiled_catalog: str | Path | CompiledPromptCatalog | None = None,
+    ):
+        """
+        カタログを初期化し、テンプレート索引を作成します。
+
+        Args:
+            prompts_dir: プロンプトJSONのフォルダ（Noneの場合は prompts/）
+            manifest_path: 索引キャッシュのパス（Noneの場合は prompts/.template_manifest.cache）
+            compiled_catalog: PromptGenerator に渡すコンパイル済みカタログ（任意）
+        """
+        self.prompts_dir = Path(prompts_dir) if prompts_dir else default_prompts_dir()
+        self.manifest_path = (
+            Path(manifest_path) if manifest_path else self.prompts_dir / DEFAULT_MANIFEST_NAME
+        )
+        if compiled_catalog is not None and not isinstance(compiled_catalog, CompiledPromptCatalog):
+            compiled_catalog = ensure_catalog(compiled_catalog, self.prompts_dir)
+        self.compiled_catalog = compiled_catalog
+        self._index: dict[str, dict[str, Any]] = {}
+        self._generators: dict[str, Any] = {}
+        self._scan()
+
+    def _read_manifest(self) -> dict[str, dict[str, Any]]:
+        try:
+            data = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        if data.get("version") != MANIFEST_VERSION:
+            return {}
+        return data.get("files", {})
+
+    def _write_manifest(self):
+        payload = json.dumps(
+            {"version": MANIFEST_VERSION, "files": self._index}, ensure_ascii=False
+        )
+        try:
+            fd, tmp_name = tempfile.mkstemp(prefix=".manifest-", dir=self.manifest_path.parent)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(payload)
+            os.replace(tmp_name, self.manifest_path)
+        except OSError as e:
+            # 読み取り専用環境ではキャッシュなしで続行
+            print(f"警告: テンプレート索引を保存できませんでした: {e}")
+
+    def _index_file(self, path: Path, stat: os.stat_result) -> dict[str, Any]:
+        """1ファイル分の索引を作成します（コンパイル済みカタログがあればJSON解析を省略）。"""
+        entry = None
+        if self.compiled_catalog is not None:
+            compiled = self.compiled_catalog.get_file(path.name)
+            if compiled is not None and compiled.is_current(path):
+                templates = compiled.template_names()
+                elements = compiled.element_names()
+                entry = {"templates": templates, "elements": elements}
+        if entry is None:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            entry = {
+                "templates": list((data.get("templates") or {}).keys()),
+                "elements": list((data.get("elements") or {}).keys()),
+            }
+        entry["size"] = stat.st_size
+        entry["mtime_ns"] = stat.st_mtime_ns
+        return entry
+
+    def _scan(self):
+        """テンプレート索引を作成します（変更のないファイルはマニフェストを再利用）。"""
+        cached = self._read_manifest()
+        index: dict[str, dict[str, Any]] = {}
+        changed = False
+        for path in sorted(self.prompts_dir.glob("*.json")):
+            stat = path.stat()
+            entry = cached.get(path.name)
+            if (
+                entry is None
+                or entry.get("size") != stat.st_size
+                or entry.get("mtime_ns") != stat.st_mtime_ns
+            ):
+                try:
+                    entry = self._index_file(path, stat)
+                except ValueError as e:
+                    print(f"警告: テンプレートファイルを索引できません: {path.name} ({e})")
+                    continue
+                changed = True
+            index[path.name] = entry
+        changed = changed or set(index) != set(cached)
+        self._index = index
+        if changed:
+            self._write_manifest()
+
+    def files(self) -> list[str]:
+        """テンプレートファイル名のリストを返します。"""
+        return list(self._index)
+
+    def template_names(self, file_name: str) -> list[str]:
+        """指定ファイルのテンプレート名のリストを返します（ファイルは読み込みません）。"""
+        return list(self._index[file_name]["templates"])
+
+    def element_names(self, file_name: str) -> list[str]:
+        """指定ファイルの要素カテゴリ名のリストを返します（ファイルは読み込みません）。"""
+        return list(self._index[file_name]["elements"])
+
+    def template_refs(self, file_name: str | None = None) -> list[str]:
+        """
+        "ファイル名:テンプレート名" 形式のテンプレート参照一覧を返します。
+
+        Args:
+            file_name: 対象ファイル（Noneの場合は全ファイル）
+
+        Returns:
+            List[str]: テンプレート参照のリスト
+        """
+        names = [file_name] if file_name else self._index
+        return [f"{f}:{t}" for f in names for t in self._index[f]["templates"]]
+
+    def files_for_template(self, template_name: str) -> list[str]:
+        """指定テンプレート名を含むファイル名のリストを返します。"""
+        return [f for f, entry in self._index.items() if template_name in entry["templates"]]
+
+    def resolve(self, ref: str) -> tuple[str, str]:
+        """
+        テンプレート参照を (ファイル名, テンプレート名) に解決します。
+
+        Args:
+            ref: "ファイル名:テンプレート名" またはテンプレート名のみ
+
+        Returns:
+            Tuple[str, str]: ファイル名とテンプレート名
+
+        Raises:
+            ValueError: テンプレートが見つからない、または複数ファイルに存在し特定できない場合
+        """
+        file_name, name = split_template_ref(ref)
+        if file_name is not None:
+            if file_name not in self._index or name not in self._index[file_name]["templates"]:
+                raise ValueError(f"テンプレート '{ref}' が見つかりません。")
+            return file_name, name
+        candidates = self.files_for_template(name)
+        if not candidates:
+            raise ValueError(f"テンプレート '{name}' が見つかりません。")
+        if len(candidates) > 1:
+            raise ValueError(
+                f"テンプレート '{name}' は複数のファイルに存在します。"
+                f"ファイル名を指定してください: {', '.join(candidates)}"
+            )
+        return candidates[0], name
+
+    def get_generator(self, file_name: str):
+        """
+        指定ファイルの PromptGenerator を返します（初回のみ読み込み）。
+
+        Args:
+            file_name: テンプレートファイル名
+
+        Returns:
+            PromptGenerator: 生成器
+        """
+        from mini_muse.prompt_generator import PromptGenerator
+
+        if file_name not in self._index:
+            raise ValueError(f"テンプレートファイル '{file_name}' が見つかりません。")
+        generator = self._generators.get(file_name)
+        if generator is None:
+            generator = PromptGenerator(
+                elements_file=str(self.prompts_dir / file_name), catalog=self.compiled_catalog
+            )
+            self._generators[file_name] = generator
+        return generator
+
+    def loaded_files(self) -> list[str]:
+        """読み込み済みのファイル名のリストを返します。"""
+        return list(self._generators)
+
+    def generate_prompt(self, ref: str) -> str:
+        """
+        テンプレート参照を指定してプロンプトを生成します。
+
+        Args:
+            ref: "ファイル名:テンプレート名" またはテンプレート名のみ
+
+        Returns:
+            str: 生成されたプロンプト
+        """
+        file_name, name = self.resolve(ref)
+        return self.get_generator(file_name).generate_prompt(name)
+
+    def build_selector(self, weights: dict[str, float] | None = None) -> AliasSampler:
+        """
+        ファイル横断の重み付きテンプレート選択器を作成します。
+
+        Args:
+            weights: {ファイル名: 重み} または {ファイル名:テンプレート名: 重み}
+                     ファイル名の重みはそのファイルのテンプレートに均等に分配されます
+                     Noneの場合は全テンプレートを一様に選択
+
+        Returns:
+            AliasSampler: 値がテンプレート参照のサンプラー
+
+        Raises:
+            ValueError: 指定したファイル・テンプレートが見つからない場合
+        """
+        if weights is None:
+            return AliasSampler(self.template_refs())
+
+        combined: dict[str, float] = {}
+        for key, weight in weights.items():
+            file_name, name = split_template_ref(key)
+            if file_name is None and key in self._index:
+                refs = self.template_refs(key)
+                for ref in refs:
+                    combined[ref] = combined.get(ref, 0.0) + weight / len(refs)
+            else:
+                file_name, name = self.resolve(key)
+                ref = f"{file_name}:{name}"
+                combined[ref] = combined.get(ref, 0.0) + weight
+        if not combined:
+            raise ValueError("選択可能なテンプレートがありません。")
+        return AliasSampler(list(combined), list(combined.values()))
+
+    def generate_mixed(
+        self, count: int, weights: dict[str, float] | None = None, rng: Any = None
+    ) -> list[tuple[str, str]]:
+        """
+        複数ファイルのテンプレートを重み付きで選びながらプロンプトを生成します。
+
+        Args:
+            count: 生成するプロンプトの数
+            weights: build_selector と同じ形式の重み指定
+            rng: 乱数生成器（Noneの場合はrandomモジュール）
+
+        Returns:
+            List[Tuple[str, str]]: (テンプレート参照, プロンプト) のリスト
+        """
+        selector = self.build_selector(weights)
+        results = []
+        for _ in range(count):
+            ref = selector.sample(rng) if rng is not None else selector.sample()
+            results.append((ref, self.generate_prompt(ref)))
+        return results
+
+
+def main(argv: list[str] | None = None) -> int:
+    """コマンドラインからカタログをコンパイルします。"""
+    parser = argparse.ArgumentParser(
+        description="プロンプトJSONをバイナリカタログにコンパイルします"
+    )
+    parser.add_argument("--prompts-dir", type=str, default=None, help="プロンプトJSONのフォルダ")
+    parser.add_argument("--output", type=str, default=None, help="カタログの出力先")
+    args = parser.parse_args(argv)
+
+    output = compile_catalog(args.prompts_dir, args.output)
+    with CompiledPromptCatalog(output) as catalog:
+        print(f"✓ カタログを書き出しました: {output}")
+        print(f"  ファイル数: {len(catalog.file_names())}")
+        print(f"  サイズ: {output.stat().st_size:,} bytes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,444 @@
+"""
+要素値の組み合わせ制約
+
+このモジュールは、テンプレートJSONに宣言した要素値どうしの組み合わせルールを
+読み込み時にビットセットへコンパイルし、ルールを満たす組み合わせだけを
+棄却なしでサンプリングする機能を提供します。
+
+================================================================================
+使い方 - prompt_constraints
+================================================================================
+
+## ルールの書き方
+
+JSONのトップレベル（ファイル内の全テンプレートに適用）または
+各テンプレートの `"constraints"` に記述します。
+
+```json
+"constraints": [
+  {"when": {"lighting": ["neon glow"]}, "exclude": {"color": ["pastel pink", "beige"]}},
+  {"when": {"style": "ukiyo-e"}, "include": {"medium": ["woodblock print", "sumi ink"]}}
+]
+```
+
+- `when`: 条件となる要素と値（要素は1つ、値は文字列またはリスト）
+- `exclude`: 条件を満たすとき、指定した要素のスロットに使えない値
+- `include`: 条件を満たすとき、指定した要素のスロットが取るべき値（それ以外は不可）
+
+ルールは要素のすべてのスロットに適用されます（`{color_1}` と `{color_2}` の両方など）。
+`when` と同じ要素を `exclude` に指定した場合は、同じ要素の別のスロットに適用されます。
+ルールは対称に扱われ、スロットの選択順序には依存しません。
+
+## 仕組み
+
+- 読み込み時に、要素の組ごとに「値 i を選んだとき相手の要素で使える値」を
+  整数ビットセットとして計算します（`compile_rules`）。
+- テンプレートごとに、ルールでつながるスロットを連結成分に分け、
+  成分ごとに「残りのスロットの候補集合」をキーにしたメモ化DPで
+  ルールを満たす組み合わせの数と重みの総和を数えます（`ConstraintModel`）。
+- 番号付きスロット（`{color_1}` `{color_2}`）が別の値を取る条件はDPに含めず、
+  スロットの集合分割ごとの包除原理で数えます。DPの状態はルールのある値の数だけで決まり、
+  値の数が数千でも数え上げの時間はほとんど増えません。
+- サンプリングは各スロットで「その値を選んだ後に完成できる重み」に比例して選ぶため、
+  棄却が発生せず、ルールがどれだけ厳しくても1回で有効な組み合わせが得られます。
+
+## 基本的な使い方
+
+```python
+from mini_muse.prompt_generator import PromptGenerator
+
+generator = PromptGenerator(elements_file="prompt_templates_抽象悪夢_20250122.json")
+print(generator.count_combinations("color_harmony_study"))  # ルールを満たす組み合わせ数
+prompt = generator.generate_prompt("color_harmony_study")
+```
+
+================================================================================
+"""
+
+from __future__ import annotations
+
+import itertools
+import math
+import random
+from collections.abc import Callable, Sequence
+from typing import Any
+
+# 要素の組ごとの互換ビットセット: {(要素a, 要素b): [a の値 i に対する b の許可ビットセット]}
+CompatTable = dict[tuple[str, str], list[int]]
+
+
+def _as_list(values: Any) -> list[str]:
+    """ルール内の値指定（文字列またはリスト）をリストにします。"""
+    if isinstance(values, str):
+        return [values]
+    return list(values)
+
+
+def _value_bits(element: str, values: Any, index: dict[str, list[int]]) -> int:
+    """値のリストをビットセットに変換します。"""
+    bits = 0
+    for value in _as_list(values):
+        if value not in index:
+            raise ValueError(f"制約ルールの値 '{value}' が要素 '{element}' に見つかりません。")
+        for i in index[value]:
+            bits |= 1 << i
+    return bits
+
+
+def compile_rules(rules: list[dict[str, Any]], samplers: dict[str, Any]) -> CompatTable:
+    """
+    制約ルールを要素の組ごとの互換ビットセットにコンパイルします。
+
+    Args:
+        rules: ルールのリスト（{"when": ..., "exclude": ...} / {"when": ..., "include": ...}）
+        samplers: {要素名: AliasSampler}
+
+    Returns:
+        Dict[Tuple[str, str], List[int]]: {(要素a, 要素b): a の値ごとの b の許可ビットセット}
+            両方向が登録され、(a, b) と (b, a) は互いに転置の関係になります
+
+    Raises:
+        ValueError: ルールの形式が不正、または要素・値が見つからない場合
+    """
+    indexes: dict[str, dict[str, list[int]]] = {}
+
+    def value_index(element: str) -> dict[str, list[int]]:
+        if element not in samplers:
+            raise ValueError(f"制約ルールの要素 '{element}' が見つかりません。")
+        if element not in indexes:
+            index: dict[str, list[int]] = {}
+            for i, value in enumerate(samplers[element].values):
+                index.setdefault(value, []).append(i)
+            indexes[element] = index
+        return indexes[element]
+
+    # (a, b) -> a の値ごとの b の許可ビットセット（この段階では片方向）
+    table: CompatTable = {}
+    for rule in rules:
+        when = rule.get("when")
+        if not isinstance(when, dict) or len(when) != 1:
+            raise ValueError(f"制約ルールの 'when' には要素を1つだけ指定してください: {rule}")
+        if not ("exclude" in rule or "include" in rule):
+            raise ValueError(f"制約ルールに 'exclude' または 'include' がありません: {rule}")
+
+        ((source, source_values),) = when.items()
+        source_bits = _value_bits(source, source_values, value_index(source))
+        for mode in ("exclude", "include"):
+            for target, target_values in (rule.get(mode) or {}).items():
+                target_bits = _value_bits(target, target_values, value_index(target))
+                full = (1 << len(samplers[target])) - 1
+                allowed = full & ~target_bits if mode == "exclude" else target_bits
+                row = table.setdefault((source, target), [full] * len(samplers[source]))
+                bits = source_bits
+                while bits:
+                    low = bits & -bits
+                    row[low.bit_length() - 1] &= allowed
+                    bits ^= low
+
+    # 対称化: (a=i, b=j) は両方向のルールで許可されている場合のみ有効
+    compat: CompatTable = {}
+    for a, b in {tuple(sorted(pair)) for pair in table}:
+        n_a, n_b = len(samplers[a]), len(samplers[b])
+        forward = table.get((a, b), [(1 << n_b) - 1] * n_a)
+        backward = table.get((b, a), [(1 << n_a) - 1] * n_b)
+        full_a, full_b = (1 << n_a) - 1, (1 << n_b) - 1
+        # ルールが関わる行だけを処理する（値の数が数千でも全組を走査しない）
+        rows = list(forward)
+        for j, bits in enumerate(backward):
+            for i in _iter_bits(full_a & ~bits):
+                rows[i] &= ~(1 << j)
+        compat[(a, b)] = rows
+        if a != b:
+            transposed = [full_a] * n_b
+            for i, bits in enumerate(rows):
+                for j in _iter_bits(full_b & ~bits):
+                    transposed[j] &= ~(1 << i)
+            compat[(b, a)] = transposed
+    return compat
+
+
+def _iter_bits(bits: int):
+    """ビットセットの立っているインデックスを昇順に返します。"""
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+def _set_partitions(items: list[int]):
+    """items の集合分割をすべて返します（各ブロックは先頭の要素から順）。"""
+    if not items:
+        yield []
+        return
+    first, rest = items[0], items[1:]
+    for partition in _set_partitions(rest):
+        yield [[first], *partition]
+        for k, block in enumerate(partition):
+            yield [*partition[:k], [first, *block], *partition[k + 1 :]]
+
+
+class _RuleDP:
+    """ルールの辺だけでつながったスロット列を、候補集合をキーにしたメモ化DPで数えます。"""
+
+    def __init__(
+        self,
+        weights: list[Sequence[float]],
+        relations: list[list[tuple[int, list[int]]]],
+    ):
+        # relations[k]: スロット k の後ろにある隣接スロット (j, k の値ごとの j の許可ビットセット)
+        self.size = len(weights)
+        self.weights = weights
+        self.relations = relations
+        self._memo: dict[tuple[int, ...], tuple[int, float]] = {}
+
+    def _children(self, doms: tuple[int, ...], i: int) -> tuple[int, ...] | None:
+        """先頭スロットに値 i を選んだ後の残りスロットの候補集合（空になる場合はNone）"""
+        k = self.size - len(doms)
+        rest = list(doms[1:])
+        for j, rows in self.relations[k]:
+            pos = j - k - 1
+            rest[pos] &= rows[i]
+            if not rest[pos]:
+                return None
+        return tuple(rest)
+
+    def mass(self, doms: tuple[int, ...]) -> tuple[int, float]:
+        """残りスロットの組み合わせ数と重みの総和を返します。"""
+        if not doms:
+            return 1, 1.0
+        weights = self.weights[self.size - len(doms)]
+        head = doms[0]
+        if not head & (head - 1):
+            # 先頭が1つの値に決まっている（抽選で固定した）状態はメモに残さない
+            # （抽選のたびに新しいキーが増え続けるため、固定した値から先の残りの状態だけを残す）
+            i = head.bit_length() - 1
+            rest = self._children(doms, i)
+            if rest is None:
+                return 0, 0.0
+            c, m = self.mass(rest)
+            return c, weights[i] * m
+        cached = self._memo.get(doms)
+        if cached is not None:
+            return cached
+        count, mass = 0, 0.0
+        for i in _iter_bits(doms[0]):
+            rest = self._children(doms, i)
+            if rest is None:
+                continue
+            c, m = self.mass(rest)
+            count += c
+            mass += weights[i] * m
+        self._memo[doms] = (count, mass)
+        return count, mass
+
+
+class _Component:
+    """
+    ルールまたは「別の値を取る」関係でつながったスロットの集合
+
+    別の値を取る条件はDPに含めず、同じ要素のスロットの集合分割ごとに
+    「ブロック内は同じ値」としたルールだけのDPを数え、メビウス関数
+    （ブロックごとに (-1)^(|B|-1) (|B|-1)!）で重み付けして足し合わせます（包除原理）。
+    ルールのない値どうしは候補集合が変わらないため、値の数が数千でも状態は増えません。
+    """
+
+    def __init__(
+        self,
+        slots: list[str],
+        domains: list[int],
+        weights: list[Sequence[float]],
+        relation: Callable[[int, int], list[int] | None],
+        groups: list[list[int]],
+    ):
+        """
+        Args:
+            slots: プレースホルダー
+            domains: スロットごとの候補のビットセット
+            weights: スロットごとの値の重み
+            relation: relation(a, b) はスロット a の値ごとの b の許可ビットセット（ルールがなければNone）
+            groups: 互いに別の値を取るスロット（同じ要素）の位置のリスト
+        """
+        self.slots = slots
+        self.domains = domains
+        grouped = {p for group in groups for p in group}
+        # [(係数, スロット位置 -> ブロック番号, ブロックの候補集合, DP)]
+        self._terms: list[tuple[int, list[int], tuple[int, ...], _RuleDP]] = []
+        for partition in itertools.product(*(_set_partitions(g) for g in groups)):
+            blocks = [[p] for p in range(len(slots)) if p not in grouped]
+            blocks += [block for part in partition for block in part]
+            blocks.sort(key=min)
+            coefficient = 1
+            block_of = [0] * len(slots)
+            base = []
+            block_weights = []
+            for n, block in enumerate(blocks):
+                coefficient *= (-1) ** (len(block) - 1) * math.factorial(len(block) - 1)
+                dom = domains[block[0]]
+                for p in block:
+                    block_of[p] = n
+                    dom &= domains[p]
+                # ブロック内のスロットは同じ値なので、その値がルールで自分自身と両立する必要がある
+                for a, b in itertools.combinations(block, 2):
+                    rows = relation(a, b)
+                    if rows is not None:
+                        dom &= sum(1 << i for i, row in enumerate(rows) if row >> i & 1)
+                base.append(dom)
+                w = weights[block[0]]
+                block_weights.append(w if len(block) == 1 else [x ** len(block) for x in w])
+            relations: list[list[tuple[int, list[int]]]] = [[] for _ in blocks]
+            for n, m in itertools.combinations(range(len(blocks)), 2):
+                combined = None
+                for a, b in itertools.product(blocks[n], blocks[m]):
+                    rows = relation(a, b)
+                    if rows is not None:
+                        combined = (
+                            rows if combined is None else list(map(int.__and__, combined, rows))
+                        )
+                if combined is not None:
+                    relations[n].append((m, combined))
+            self._terms.append(
+                (coefficient, block_of, tuple(base), _RuleDP(block_weights, relations))
+            )
+
+    def _total(self, fixed: dict[int, int]) -> tuple[int, float]:
+        """fixed（スロット位置 -> 値）を固定したときの組み合わせ数と重みの総和を返します。"""
+        count, mass = 0, 0.0
+        for coefficient, block_of, base, dp in self._terms:
+            doms = list(base)
+            for p, i in fixed.items():
+                doms[block_of[p]] &= 1 << i
+            if not all(doms):
+                continue
+            c, m = dp.mass(tuple(doms))
+            count += coefficient * c
+            mass += coefficient * m
+        return count, mass
+
+    def count(self) -> int:
+        return self._total({})[0]
+
+    def sample(self, rng: Any = random) -> list[int]:
+        fixed: dict[int, int] = {}
+        for k, slot in enumerate(self.slots):
+            options = []
+            total = 0.0
+            for i in _iter_bits(self.domains[k]):
+                # 完成できるかは整数の組み合わせ数で判定する（重みの包除は丸め誤差を含む）
+                count, mass = self._total({**fixed, k: i})
+                if count > 0 and mass > 0:
+                    options.append((i, mass))
+                    total += mass
+            if not options:
+                raise ValueError(f"スロット '{slot}' に制約を満たす値がありません。")
+            r = rng.random() * total
+            pick = options[-1][0]
+            for i, mass in options:
+                r -= mass
+                if r < 0:
+                    pick = i
+                    break
+            fixed[k] = pick
+        return [fixed[k] for k in range(len(self.slots))]
+
+
+class ConstraintModel:
+    """
+    テンプレート1つ分の制約付きスロットモデル
+
+    ルールに関わる要素のスロットだけを扱い、それ以外のスロットは通常の抽選に任せます。
+    """
+
+    def __init__(
+        self,
+        slots: list[tuple[str, str, bool]],
+        samplers: dict[str, Any],
+        compat: CompatTable,
+    ):
+        """
+        スロットと互換ビットセットからモデルを構築します。
+
+        Args:
+            slots: [(プレースホルダー, 要素名, ベース名で解決したか), ...]
+                   ベース名で解決した同じ要素のスロットどうしは別の値になります
+                   （値の数よりスロットが多い場合は重複を許可）
+            samplers: {要素名: AliasSampler}
+            compat: compile_rules の結果
+        """
+        ruled = {element for pair in compat for element in pair}
+        slots = [s for s in slots if s[1] in ruled]
+        distinct: dict[str, list[int]] = {}
+        for k, (_placeholder, element, is_distinct) in enumerate(slots):
+            if is_distinct:
+                distinct.setdefault(element, []).append(k)
+        distinct = {e: ks for e, ks in distinct.items() if len(ks) <= len(samplers[e])}
+
+        def relation(a: int, b: int) -> list[int] | None:
+            return compat.get((slots[a][1], slots[b][1]))
+
+        # 連結成分に分割（Union-Find）
+        parent = list(range(len(slots)))
+
+        def find(x: int) -> int:
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        for a, b in itertools.combinations(range(len(slots)), 2):
+            if relation(a, b) is not None:
+                parent[find(a)] = find(b)
+        for ks in distinct.values():
+            for k in ks[1:]:
+                parent[find(k)] = find(ks[0])
+
+        members: dict[int, list[int]] = {}
+        for i in range(len(slots)):
+            members.setdefault(find(i), []).append(i)
+
+        self.components: list[_Component] = []
+        for group in members.values():
+            position = {slot: k for k, slot in enumerate(group)}
+            self.components.append(
+                _Component(
+                    [slots[i][0] for i in group],
+                    [(1 << len(samplers[slots[i][1]])) - 1 for i in group],
+                    [samplers[slots[i][1]].weights for i in group],
+                    lambda a, b, group=group: relation(group[a], group[b]),
+                    [
+                        [position[k] for k in ks]
+                        for ks in distinct.values()
+                        if len(ks) > 1 and ks[0] in position
+                    ],
+                )
+            )
+        self.placeholders = [s[0] for s in slots]
+
+    def count(self) -> int:
+        """
+        ルールを満たす組み合わせ数を返します（このモデルが扱うスロットのみ）。
+
+        Returns:
+            int: 組み合わせ数（重みに関係なく数えた厳密な値）
+        """
+        total = 1
+        for component in self.components:
+            total *= component.count()
+        return total
+
+    def sample(self, rng: Any = random) -> dict[str, int]:
+        """
+        ルールを満たす組み合わせを1つ、値の重みの積に比例する確率で選びます。
+
+        Args:
+            rng: 乱数生成器（random モジュール互換）
+
+        Returns:
+            Dict[str, int]: {プレースホルダー: 値のインデックス}
+
+        Raises:
+            ValueError: ルールを満たす組み合わせが存在しない場合
+        """
+        result: dict[str, int] = {}
+        for component in self.components:
+            result.update(zip(component.slots, component.sample(rng)))
+        return result
@@ -74,6 +74,42 @@ print(f"説明: {info['description']}")
 print(f"日本語説明: {info['japanese_description']}")
 ```
 
+### 重み付きサンプリング
+
+要素の値は文字列のほか、`{"value": ..., "weight": ...}` 形式で重みを指定できます。
+重みを省略した値は 1.0 として扱われます。
+
+```json
+"values": [
+  "tilt-shift",
+  {"value": "macro lens", "weight": 3.0},
+  {"value": "fisheye lens", "weight": 0.5}
+]
+```
+
+読み込み時にカテゴリごとに Walker のエイリアステーブル（AliasSampler）を構築するため、
+値の数に関係なく1回の抽選は O(1) で完了します。
+
+### 組み合わせ制約
+
+要素値どうしの組み合わせルールを `"constraints"` に宣言できます
+（トップレベルはファイル内の全テンプレート、テンプレート内はそのテンプレートのみに適用）。
+
+```json
+"constraints": [
+  {"when": {"lighting": ["neon glow"]}, "exclude": {"color": ["pastel pink"]}},
+  {"when": {"style": "ukiyo-e"}, "include": {"medium": ["woodblock print"]}}
+]
+```
+
+ルールは読み込み時にビットセットへコンパイルされ、ルールを満たす組み合わせだけが
+棄却なしで選ばれます。`count_combinations()` で組み合わせ数を厳密に数えられます
+（詳細は mini_muse.prompt_constraints を参照）。
+
+```python
+print(generator.count_combinations("abstract_art"))
+```
+
 ### 要素情報の取得
 
 ```python
@@ -161,7 +197,7 @@ with open("workflows/updated_workflow.json", "w", encoding="utf-8") as f:
   "elements": {
     "カテゴリ名": {
       "description": "カテゴリの説明",
-      "values": ["値1", "値2", "値3", ...]
+      "values": ["値1", "値2", {"value": "値3", "weight": 2.0}, ...]
     }
   },
   "templates": {
@@ -200,10 +236,14 @@ except ValueError as e:
 2. **ランダム性**
    - 各プレースホルダーはランダムに選択されるため、同じテンプレートでも
      毎回異なるプロンプトが生成されます
+   - 重みを指定した値は重みに比例した確率で選択されます
 
 3. **文字数**
    - 生成されるプロンプトは通常900-1000文字程度
    - ComfyUIなどで使用する際は、モデルの最大トークン数に注意
+   - `generate_prompt(..., max_tokens=75)` でCLIPの上限に収まる値を選択できます
+   - `token_report()` でテンプレートごとの想定切り捨て量を確認できます
+     （詳細は mini_muse.token_counter を参照）
 
 ## トラブルシューティング
 
@@ -216,16 +256,21 @@ A: JSONファイルの要素カテゴリ名とテンプレート内のプレー
    一致しているか確認してください。
 
 ### Q: 生成されたプロンプトが長すぎる
-A: テンプレートを編集するか、生成後に必要な部分だけを抽出してください。
+A: `max_tokens` を指定して生成するか、`token_report()` で固定部のトークン数を確認し、
+   テンプレートを編集してください。
 
 ================================================================================
 """
 
 import json
+import math
 import random
 import re
+from collections.abc import Sequence
 from pathlib import Path
-from typing import Optional
+from typing import Any, Optional
+
+from mini_muse.prompt_constraints import ConstraintModel, compile_rules
 
 
 def list_available_template_files() -> list[str]:
@@ -246,6 +291,213 @@ def list_available_template_files() -> list[str]:
     return json_files
 
 
+# テンプレートのセグメント種別
+SEGMENT_LITERAL = 0
+SEGMENT_PLACEHOLDER = 1
+
+_PLACEHOLDER_PATTERN = re.compile(r"\{(\w+)\}")
+
+
+def compile_template_segments(text: str) -> list[tuple[int, str]]:
+    """
+    テンプレート本文をリテラルとプレースホルダーのセグメント列に分割します。
+
+    Args:
+        text: テンプレート本文
+
+    Returns:
+        List[Tuple[int, str]]: (種別, 文字列) のリスト
+            種別は SEGMENT_LITERAL または SEGMENT_PLACEHOLDER
+    """
+    segments: list[tuple[int, str]] = []
+    for i, part in enumerate(_PLACEHOLDER_PATTERN.split(text)):
+        if i % 2 == 1:
+            segments.append((SEGMENT_PLACEHOLDER, part))
+        elif part:
+            segments.append((SEGMENT_LITERAL, part))
+    return segments
+
+
+def _parse_weighted_values(values: list[Any]) -> tuple[list[str], list[float]]:
+    """
+    要素の値リストを (値, 重み) に分解します。
+
+    Args:
+        values: 文字列、または {"value": str, "weight": float} 形式の辞書のリスト
+
+    Returns:
+        Tuple[List[str], List[float]]: 値のリストと重みのリスト
+
+    Raises:
+        ValueError: 値の形式が不正、または重みが負の場合
+    """
+    texts: list[str] = []
+    weights: list[float] = []
+    for item in values:
+        if isinstance(item, str):
+            texts.append(item)
+            weights.append(1.0)
+        elif isinstance(item, dict) and isinstance(item.get("value"), str):
+            weight = float(item.get("weight", 1.0))
+            if weight < 0:
+                raise ValueError(f"重みは0以上で指定してください: {item}")
+            texts.append(item["value"])
+            weights.append(weight)
+        else:
+            raise ValueError(f"要素の値の形式が不正です: {item!r}")
+    return texts, weights
+
+
+class AliasSampler:
+    """
+    Walker のエイリアス法による重み付きサンプラー
+
+    構築時に O(n) でテーブルを作成し、以降の抽選は値の数に関係なく O(1) です。
+    使用済みの値を除外する非復元抽選にも対応しています。
+    """
+
+    # 除外された重みの割合がこれを超えたら、棄却ではなく残りの値でテーブルを作り直す
+    _REBUILD_THRESHOLD = 0.5
+
+    def __init__(self, values: list[str], weights: Optional[list[float]] = None):
+        """
+        サンプラーを初期化します。
+
+        Args:
+            values: 値のリスト
+            weights: 各値の重み（Noneの場合は一様）
+
+        Raises:
+            ValueError: 値が空、重みの数が一致しない、または重みの合計が0の場合
+        """
+        if not values:
+            raise ValueError("値のリストが空です。")
+        if weights is None:
+            weights = [1.0] * len(values)
+        if len(weights) != len(values):
+            raise ValueError("値と重みの数が一致しません。")
+
+        self.values = list(values)
+        self.weights = [float(w) for w in weights]
+        self.total_weight = sum(self.weights)
+        if self.total_weight <= 0:
+            raise ValueError("重みの合計が0です。")
+
+        n = len(self.values)
+        scaled = [w * n / self.total_weight for w in self.weights]
+        self._prob = [1.0] * n
+        self._alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s = small.pop()
+            g = large.pop()
+            self._prob[s] = scaled[s]
+            self._alias[s] = g
+            scaled[g] -= 1.0 - scaled[s]
+            (small if scaled[g] < 1.0 else large).append(g)
+        # 残りは浮動小数点誤差分のみなので確率1とする
+        for i in small + large:
+            self._prob[i] = 1.0
+
+    @classmethod
+    def from_tables(
+        cls,
+        values: Sequence[Any],
+        weights: Sequence[float],
+        prob: Sequence[float],
+        alias: Sequence[int],
+    ) -> "AliasSampler":
+        """
+        構築済みのエイリアステーブルからサンプラーを復元します（再計算なし）。
+
+        コンパイル済みカタログ（prompt_catalog）の mmap 上の配列をそのまま渡すことで、
+        プロセス間でテーブルを共有できます。
+
+        Args:
+            values: 値のシーケンス
+            weights: 各値の重み
+            prob: エイリアス法の確率テーブル
+            alias: エイリアス法の別名テーブル
+
+        Returns:
+            AliasSampler: 復元されたサンプラー
+        """
+        sampler = cls.__new__(cls)
+        sampler.values = values
+        sampler.weights = weights
+        sampler.total_weight = sum(weights)
+        sampler._prob = prob
+        sampler._alias = alias
+        return sampler
+
+    @property
+    def tables(self) -> tuple[Sequence[float], Sequence[int]]:
+        """エイリアス法の (確率テーブル, 別名テーブル) を返します。"""
+        return self._prob, self._alias
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def draw_index(self, rng: Any = random) -> int:
+        """
+        重みに従ってインデックスを1つ抽選します（O(1)）。
+
+        Args:
+            rng: random()メソッドを持つ乱数生成器（デフォルト: randomモジュール）
+
+        Returns:
+            int: 抽選されたインデックス
+        """
+        u = rng.random() * len(self._prob)
+        i = int(u)
+        if i >= len(self._prob):  # u が丸めで n に達した場合の保険
+            i = len(self._prob) - 1
+        return i if (u - i) < self._prob[i] else self._alias[i]
+
+    def draw_index_excluding(self, excluded: set[int], rng: Any = random) -> Optional[int]:
+        """
+        除外インデックスを避けて非復元抽選します。
+
+        除外された重みが小さい間は棄却法（期待 O(1)）で、大きくなった場合は
+        残りの値だけで一時テーブルを構築して抽選します。
+
+        Args:
+            excluded: 除外するインデックスの集合
+            rng: 乱数生成器
+
+        Returns:
+            Optional[int]: 抽選されたインデックス。選択可能な値がない場合はNone
+        """
+        if not excluded:
+            return self.draw_index(rng)
+        excluded_weight = sum(self.weights[i] for i in excluded)
+        remaining_weight = self.total_weight - excluded_weight
+        if remaining_weight <= 1e-12 * self.total_weight:
+            return None
+        if excluded_weight <= self._REBUILD_THRESHOLD * self.total_weight:
+            while True:
+                i = self.draw_index(rng)
+                if i not in excluded:
+                    return i
+        # 値の代わりに元のインデックスを持たせた一時テーブル
+        remaining = [i for i in range(len(self.values)) if i not in excluded]
+        sub = AliasSampler(remaining, [self.weights[i] for i in remaining])
+        return sub.values[sub.draw_index(rng)]
+
+    def sample(self, rng: Any = random) -> str:
+        """
+        重みに従って値を1つ抽選します。
+
+        Args:
+            rng: 乱数生成器
+
+        Returns:
+            str: 抽選された値
+        """
+        return self.values[self.draw_index(rng)]
+
+
 class PromptGenerator:
     """
     プロンプト生成エンジン
@@ -254,7 +506,12 @@ class PromptGenerator:
     ランダムな組み合わせでプロンプトを生成します。
     """
 
-    def __init__(self, elements_file: Optional[str] = None):
+    def __init__(
+        self,
+        elements_file: Optional[str] = None,
+        catalog: Any = None,
+        token_counter: Any = None,
+    ):
         """
         プロンプト生成エンジンを初期化します。
 
@@ -262,6 +519,12 @@ class PromptGenerator:
             elements_file: プロンプト要素のJSONファイルパス
                           Noneの場合はデフォルトパス（prompt_elements.json）を使用
                           ファイル名のみの場合はpromptsフォルダから検索
+            catalog: コンパイル済みカタログのパス、または CompiledPromptCatalog
+                     指定した場合はJSONを解析せず mmap 上のカタログから読み込みます
+                     （カタログにファイルがない、または古い場合はJSONから読み込み）
+            token_counter: トークン数カウンター（ClipTokenCounter など count(text) を持つもの）
+                           指定した場合は読み込み時に全要素値のトークン数を計算します
+                           Noneの場合は max_tokens 指定時に既定のCLIPカウンターを使用
         """
         if elements_file is None:
             # デフォルトパス: prompts/prompt_elements.json
@@ -277,12 +540,25 @@ class PromptGenerator:
         self.elements_file = Path(elements_file)
         self.elements: dict = {}
         self.templates: dict = {}
-
-        self._load_elements()
+        self.samplers: dict[str, AliasSampler] = {}
+        self.template_segments: dict[str, list[tuple[int, str]]] = {}
+        self.constraints: list[dict[str, Any]] = []
+        self.constraint_models: dict[str, ConstraintModel] = {}
+        self.catalog = None
+        self._token_counter = token_counter
+        self.value_token_counts: dict[str, list[int]] = {}
+        self.literal_token_counts: dict[str, int] = {}
+        self._token_order_cache: dict[str, list[int]] = {}
+
+        if not (catalog is not None and self._load_from_catalog(catalog)):
+            self._load_elements()
+        self._compile_constraints()
         print("PromptGeneratorの初期化が完了しました。")
         print(f"読み込んだファイル: {self.elements_file.name}")
         print(f"要素カテゴリ数: {len(self.elements)}")
         print(f"テンプレート数: {len(self.templates)}")
+        if token_counter is not None:
+            self._ensure_token_counts()
 
     def _load_elements(self):
         """JSONファイルから要素とテンプレートを読み込みます。"""
@@ -292,6 +568,12 @@ class PromptGenerator:
 
             self.elements = data.get("elements", {})
             self.templates = data.get("templates", {})
+            self.constraints = data.get("constraints", [])
+            self._build_samplers()
+            self.template_segments = {
+                name: compile_template_segments(t.get("text", ""))
+                for name, t in self.templates.items()
+            }
 
             print(f"要素を読み込みました: {self.elements_file}")
         except FileNotFoundError:
@@ -301,13 +583,383 @@ class PromptGenerator:
             print(f"エラー: JSONの解析に失敗しました: {e}")
             raise
 
-    def generate_prompt(self, template_name: Optional[str] = None) -> str:
+    def _load_from_catalog(self, catalog: Any) -> bool:
+        """
+        コンパイル済みカタログから要素とテンプレートを読み込みます。
+
+        Args:
+            catalog: カタログのパス、または CompiledPromptCatalog
+
+        Returns:
+            bool: 読み込めた場合True（ファイルが未登録・古い場合はFalse）
+        """
+        from mini_muse.prompt_catalog import CompiledPromptCatalog, ensure_catalog
+
+        if not isinstance(catalog, CompiledPromptCatalog):
+            catalog = ensure_catalog(catalog, self.elements_file.parent)
+        entry = catalog.get_file(self.elements_file.name)
+        if entry is None or not entry.is_current(self.elements_file):
+            print(f"カタログに最新の {self.elements_file.name} がないため、JSONから読み込みます。")
+            return False
+
+        self.catalog = catalog
+        self.elements = entry.elements()
+        self.templates = entry.templates()
+        self.constraints = entry.constraints()
+        self.samplers = entry.samplers()
+        self.template_segments = entry.template_segments()
+        print(f"カタログから要素を読み込みました: {catalog.path}")
+        return True
+
+    def _build_samplers(self):
+        """要素カテゴリごとにエイリアステーブルを構築します（読み込み時に1回だけ実行）。"""
+        self.samplers = {}
+        self._token_order_cache = {}
+        for name, element in self.elements.items():
+            # "values" を持たない要素（自由形式の補助データ）はサンプリング対象外
+            values = element.get("values") if isinstance(element, dict) else None
+            if not values:
+                continue
+            texts, weights = _parse_weighted_values(values)
+            self.samplers[name] = AliasSampler(texts, weights)
+
+    def _compile_constraints(self):
+        """制約ルールをテンプレートごとの ConstraintModel にコンパイルします（読み込み時に1回だけ実行）。"""
+        self.constraint_models = {}
+        try:
+            base = compile_rules(self.constraints, self.samplers) if self.constraints else {}
+            for name, segments in self.template_segments.items():
+                rules = self.templates[name].get("constraints") or []
+                compat = compile_rules(self.constraints + rules, self.samplers) if rules else base
+                if not compat:
+                    continue
+                slots = []
+                for placeholder in dict.fromkeys(
+                    text for kind, text in segments if kind == SEGMENT_PLACEHOLDER
+                ):
+                    element, distinct = self._resolve_placeholder(placeholder)
+                    if element is not None:
+                        slots.append((placeholder, element, distinct))
+                model = ConstraintModel(slots, self.samplers, compat)
+                if model.placeholders:
+                    self.constraint_models[name] = model
+        except ValueError as e:
+            print(f"エラー: 制約ルールの読み込みに失敗しました: {e}")
+            raise
+
+    def _sample_constrained(self, template_name: str) -> dict[str, str]:
+        """制約のあるスロットの値をまとめて選択します（制約がない場合は空の辞書）。"""
+        model = self.constraint_models.get(template_name)
+        if model is None:
+            return {}
+        values = {}
+        for placeholder, index in model.sample().items():
+            element = self._resolve_placeholder(placeholder)[0]
+            values[placeholder] = self.samplers[element].values[index]
+            print(f"  {placeholder} ({element}) -> {values[placeholder]} [制約]")
+        return values
+
+    def count_combinations(self, template_name: str) -> int:
+        """
+        テンプレートで選ばれうる値の組み合わせ数を厳密に数えます。
+
+        同じベース名のスロットが別の値になること、および制約ルールを考慮します。
+
+        Args:
+            template_name: テンプレート名
+
+        Returns:
+            int: プレースホルダーへの値の割り当て方の数
+
+        Raises:
+            ValueError: 指定されたテンプレートが存在しない場合
+        """
+        if template_name not in self.template_segments:
+            raise ValueError(f"テンプレート '{template_name}' が見つかりません。")
+        placeholders = list(
+            dict.fromkeys(
+                text
+                for kind, text in self.template_segments[template_name]
+                if kind == SEGMENT_PLACEHOLDER
+            )
+        )
+        model = self.constraint_models.get(template_name)
+        total = 1
+        if model is not None:
+            total = model.count()
+            placeholders = [p for p in placeholders if p not in model.placeholders]
+        for key, (element, slots) in self._budget_groups(placeholders).items():
+            n = len(self.samplers[element])
+            k = len(slots)
+            # 値の数よりスロットが多い場合は重複して選ばれる
+            total *= math.perm(n, k) if not key.startswith("=") and k <= n else n**k
+        return total
+
+    @property
+    def token_counter(self):
+        """トークン数カウンター（未指定の場合は既定のCLIPカウンター）"""
+        if self._token_counter is None:
+            from mini_muse.token_counter import get_default_counter
+
+            self._token_counter = get_default_counter()
+        return self._token_counter
+
+    def _ensure_token_counts(self):
+        """全要素値とテンプレート固定部のトークン数を計算してキャッシュします。"""
+        if self.value_token_counts or not self.samplers:
+            return
+        counter = self.token_counter
+        self._token_order_cache = {}
+        self.value_token_counts = {
+            name: [counter.count(v) for v in sampler.values]
+            for name, sampler in self.samplers.items()
+        }
+        self.literal_token_counts = {
+            name: sum(counter.count(text) for kind, text in segments if kind == SEGMENT_LITERAL)
+            for name, segments in self.template_segments.items()
+        }
+
+    def _resolve_placeholder(self, placeholder: str) -> tuple[Optional[str], bool]:
+        """
+        プレースホルダーに対応する要素名を返します。
+
+        Returns:
+            Tuple[Optional[str], bool]: (要素名, ベース名で解決したか)
+                ベース名で解決した場合、同じベース名のプレースホルダー同士は別の値になります
+        """
+        base_name = re.sub(r"_\d+$", "", placeholder)
+        if base_name in self.samplers:
+            return base_name, True
+        if placeholder in self.samplers:
+            return placeholder, False
+        return None, False
+
+    def _budget_groups(
+        self, placeholders: list[str]
+    ) -> dict[str, tuple[str, list[tuple[str, int]]]]:
+        """
+        トークン予算計算用に、値を共有するプレースホルダーをグループ化します。
+
+        ベース名で解決したプレースホルダーは要素ごとに1グループ（互いに別の値）、
+        名前そのままで解決したものはプレースホルダーごとに1グループになります。
+
+        Returns:
+            Dict[str, Tuple[str, List[Tuple[str, int]]]]:
+                {グループキー: (要素名, [(プレースホルダー, 出現回数), ...])}
+        """
+        occurrences: dict[str, int] = {}
+        for placeholder in placeholders:
+            occurrences[placeholder] = occurrences.get(placeholder, 0) + 1
+        groups: dict[str, tuple[str, list[tuple[str, int]]]] = {}
+        for placeholder, occ in occurrences.items():
+            element, distinct = self._resolve_placeholder(placeholder)
+            if element is None:
+                continue
+            key = element if distinct else f"={placeholder}"
+            groups.setdefault(key, (element, []))[1].append((placeholder, occ))
+        return groups
+
+    def _missing_placeholder_tokens(self, placeholders: list[str]) -> int:
+        """要素が見つからないプレースホルダー（[name] のまま残る）のトークン数を返します。"""
+        return sum(
+            self.token_counter.count(f"[{p}]")
+            for p in placeholders
+            if self._resolve_placeholder(p)[0] is None
+        )
+
+    def _group_min_tokens(self, element: str, used: set[int], occs: list[int]) -> int:
+        """未使用の値で残りスロットを埋めたときの最小トークン数を返します。"""
+        if not occs:
+            return 0
+        counts = self.value_token_counts[element]
+        smallest = [counts[i] for i in self._token_order(element) if i not in used][: len(occs)]
+        # 値が足りない場合は使用済みの値も再利用される
+        smallest += [min(counts)] * (len(occs) - len(smallest))
+        # 出現回数の多いスロットに短い値を割り当てるのが最小
+        return sum(c * o for c, o in zip(smallest, sorted(occs, reverse=True)))
+
+    def _token_order(self, element: str) -> list[int]:
+        """要素値のインデックスをトークン数の昇順で返します（キャッシュ付き）。"""
+        order = self._token_order_cache.get(element)
+        if order is None:
+            counts = self.value_token_counts[element]
+            order = sorted(range(len(counts)), key=counts.__getitem__)
+            self._token_order_cache[element] = order
+        return order
+
+    def _fits_budget(
+        self,
+        element: str,
+        used: set[int],
+        index: int,
+        occ: int,
+        rest_occs: list[int],
+        available: int,
+    ) -> bool:
+        """値 index を選んでも、同じグループの残りスロットを含めて予算内に収まるか判定します。"""
+        rest = self._group_min_tokens(element, used | {index}, rest_occs)
+        return self.value_token_counts[element][index] * occ + rest <= available
+
+    def _select_within_budget(
+        self,
+        template_name: str,
+        placeholders: list[str],
+        max_tokens: int,
+        fixed: Optional[dict[str, str]] = None,
+    ) -> dict[str, str]:
+        """
+        レンダリング後のプロンプトがトークン上限に収まるように各スロットの値を選択します。
+
+        各スロットでは「残りのスロットを最短の値で埋めても上限に収まる」値だけを候補とし、
+        候補の中から重みに従って抽選します。固定部だけで上限を超える場合は最短の値を選びます。
+        fixed に指定したスロット（制約で選択済みの値）はそのまま使い、予算から差し引きます。
+        """
+        self._ensure_token_counts()
+        fixed = fixed or {}
+        spent = self.literal_token_counts.get(template_name, 0)
+        spent += sum(self.token_counter.count(fixed[p]) for p in placeholders if p in fixed)
+        placeholders = [p for p in placeholders if p not in fixed]
+        groups = self._budget_groups(placeholders)
+        spent += self._missing_placeholder_tokens(placeholders)
+
+        values = {p: f"[{p}]" for p in placeholders if self._resolve_placeholder(p)[0] is None}
+        values.update(fixed)
+        used: dict[str, set[int]] = {key: set() for key in groups}
+        pending = {key: [occ for _, occ in slots] for key, (_, slots) in groups.items()}
+        order = [(key, slot) for key, (_, slots) in groups.items() for slot in slots]
+        random.shuffle(order)
+
+        for key, (placeholder, occ) in order:
+            element = groups[key][0]
+            sampler = self.samplers[element]
+            pending[key].remove(occ)
+            others_min = sum(
+                self._group_min_tokens(groups[k][0], used[k], pending[k])
+                for k in groups
+                if k != key
+            )
+            available = max_tokens - spent - others_min
+            if len(used[key]) >= len(sampler):
+                used[key].clear()  # すべて使用済みの場合はリセット
+            args = (element, used[key])
+            budget = (occ, pending[key], available)
+
+            index = None
+            # 多くの場合は棄却法で数回以内に候補が見つかる
+            for _ in range(16):
+                candidate = sampler.draw_index_excluding(used[key])
+                if candidate is None:
+                    break
+                if self._fits_budget(*args, candidate, *budget):
+                    index = candidate
+                    break
+            if index is None:
+                candidates = [
+                    i
+                    for i in range(len(sampler))
+                    if i not in used[key] and self._fits_budget(*args, i, *budget)
+                ]
+                weights = [sampler.weights[i] for i in candidates]
+                if candidates and sum(weights) > 0:
+                    index = random.choices(candidates, weights=weights)[0]
+                elif candidates:
+                    index = random.choice(candidates)
+                else:
+                    # 上限に収められない場合は最短の値を選ぶ
+                    index = next(i for i in self._token_order(element) if i not in used[key])
+
+            count = self.value_token_counts[element][index]
+            used[key].add(index)
+            spent += count * occ
+            values[placeholder] = sampler.values[index]
+            print(f"  {placeholder} ({element}) -> {values[placeholder]} [{count} tokens]")
+        return values
+
+    def token_report(
+        self, max_tokens: Optional[int] = None, samples: int = 200, seed: int = 0
+    ) -> list[dict[str, Any]]:
+        """
+        テンプレートごとの想定トークン数と切り捨て量を集計します。
+
+        Args:
+            max_tokens: 本文のトークン上限（Noneの場合はCLIPの75トークン）
+            samples: 超過率・想定切り捨て量を見積もるための抽選回数
+            seed: 抽選の乱数シード
+
+        Returns:
+            List[Dict[str, Any]]: テンプレートごとの集計
+                - template: テンプレート名
+                - literal_tokens: 固定部のトークン数
+                - min_tokens / mean_tokens / max_tokens: 想定トークン数
+                - overflow_rate: 上限を超える割合
+                - expected_truncated_tokens: 切り捨てられるトークン数の期待値
+        """
+        if max_tokens is None:
+            from mini_muse.token_counter import CLIP_CONTENT_TOKENS
+
+            max_tokens = CLIP_CONTENT_TOKENS
+        self._ensure_token_counts()
+        rng = random.Random(seed)
+        report = []
+        for name, segments in self.template_segments.items():
+            placeholders = [text for kind, text in segments if kind == SEGMENT_PLACEHOLDER]
+            groups = self._budget_groups(placeholders)
+            literal = self.literal_token_counts.get(name, 0)
+            literal += self._missing_placeholder_tokens(placeholders)
+
+            min_total = max_total = literal
+            mean_total = float(literal)
+            for element, slots in groups.values():
+                counts = self.value_token_counts[element]
+                weights = self.samplers[element].weights
+                occs = [occ for _, occ in slots]
+                min_total += self._group_min_tokens(element, set(), occs)
+                max_total += max(counts) * sum(occs)
+                mean = sum(c * w for c, w in zip(counts, weights)) / sum(weights)
+                mean_total += mean * sum(occs)
+
+            totals = []
+            for _ in range(samples):
+                total = literal
+                for key, (element, slots) in groups.items():
+                    sampler = self.samplers[element]
+                    counts = self.value_token_counts[element]
+                    used: set[int] = set()
+                    for _placeholder, occ in slots:
+                        index = sampler.draw_index_excluding(used, rng)
+                        if index is None:
+                            used.clear()
+                            index = sampler.draw_index(rng)
+                        if not key.startswith("="):
+                            used.add(index)
+                        total += counts[index] * occ
+                totals.append(total)
+
+            overflow = [max(0, t - max_tokens) for t in totals]
+            report.append(
+                {
+                    "template": name,
+                    "literal_tokens": literal,
+                    "min_tokens": min_total,
+                    "mean_tokens": mean_total,
+                    "max_tokens": max_total,
+                    "overflow_rate": sum(1 for o in overflow if o) / max(len(overflow), 1),
+                    "expected_truncated_tokens": sum(overflow) / max(len(overflow), 1),
+                }
+            )
+        return report
+
+    def generate_prompt(
+        self, template_name: Optional[str] = None, max_tokens: Optional[int] = None
+    ) -> str:
         """
         指定されたテンプレートに基づいてプロンプトを生成します。
 
         Args:
             template_name: 使用するテンプレート名
                           Noneの場合は利用可能なテンプレートからランダムに選択
+            max_tokens: 本文のトークン上限（CLIPの場合は75）
+                        指定した場合は上限に収まるように各スロットの値を選択します
 
         Returns:
             str: 生成されたプロンプト
@@ -331,49 +983,62 @@ class PromptGenerator:
                 f"利用可能なテンプレート: {available}"
             )
 
-        template = self.templates[template_name]["text"]
+        segments = self.template_segments[template_name]
         print(f"テンプレート '{template_name}' を使用してプロンプトを生成します。")
 
-        # テンプレート内のプレースホルダーを検出
-        placeholders = re.findall(r"\{(\w+)\}", template)
+        # テンプレート内のプレースホルダー（読み込み時にセグメント化済み）
+        placeholders = [text for kind, text in segments if kind == SEGMENT_PLACEHOLDER]
         print(f"検出されたプレースホルダー: {set(placeholders)}")
 
+        # 制約のあるスロットは棄却なしでまとめて選択
+        constrained = self._sample_constrained(template_name)
+
+        if max_tokens is not None:
+            placeholder_values = self._select_within_budget(
+                template_name, placeholders, max_tokens, fixed=constrained
+            )
+            filled_template = "".join(
+                placeholder_values[text] if kind == SEGMENT_PLACEHOLDER else text
+                for kind, text in segments
+            )
+            token_count = self.token_counter.count(filled_template)
+            print(f"生成されたプロンプト長: {len(filled_template)} 文字 / {token_count} トークン")
+            if token_count > max_tokens:
+                print(f"警告: トークン上限 {max_tokens} を超えています（{token_count} トークン）")
+            return filled_template
+
         # プレースホルダーごとに選択された値を保存する辞書
-        placeholder_values = {}
+        placeholder_values = dict(constrained)
 
-        # ベース名ごとに既に選択された値を追跡（重複を避けるため）
-        used_values_by_base = {}
+        # ベース名ごとに既に選択された値のインデックスを追跡（重複を避けるため）
+        used_indices_by_base: dict[str, set[int]] = {}
 
         # 各ユニークなプレースホルダーに対して値を選択
-        for placeholder in set(placeholders):
+        for placeholder in set(placeholders) - constrained.keys():
             # プレースホルダーのベース名を取得 (例: color_1 -> color, texture_2 -> texture)
             base_name = re.sub(r"_\d+$", "", placeholder)
 
             # ベース名が要素に存在するか確認
-            if base_name in self.elements:
-                values = self.elements[base_name]["values"]
+            if base_name in self.samplers:
+                sampler = self.samplers[base_name]
+                used_indices = used_indices_by_base.setdefault(base_name, set())
 
-                # このベース名で既に使用された値を取得
-                if base_name not in used_values_by_base:
-                    used_values_by_base[base_name] = []
+                # 未使用の値から重みに従って選択
+                index = sampler.draw_index_excluding(used_indices)
 
-                # 未使用の値からランダムに選択
-                available_values = [v for v in values if v not in used_values_by_base[base_name]]
+                # すべて使用済みの場合は、全体から選択
+                if index is None:
+                    used_indices.clear()  # リセット
+                    index = sampler.draw_index()
 
-                # すべて使用済みの場合は、全体からランダムに選択
-                if not available_values:
-                    available_values = values
-                    used_values_by_base[base_name] = []  # リセット
-
-                selected_value = random.choice(available_values)
-                used_values_by_base[base_name].append(selected_value)
+                used_indices.add(index)
+                selected_value = sampler.values[index]
                 placeholder_values[placeholder] = selected_value
                 print(f"  {placeholder} ({base_name}) -> {selected_value}")
 
             # プレースホルダー名そのままが要素に存在するか確認
-            elif placeholder in self.elements:
-                values = self.elements[placeholder]["values"]
-                selected_value = random.choice(values)
+            elif placeholder in self.samplers:
+                selected_value = self.samplers[placeholder].sample()
                 placeholder_values[placeholder] = selected_value
                 print(f"  {placeholder} -> {selected_value}")
             else:
@@ -381,9 +1046,10 @@ class PromptGenerator:
                 placeholder_values[placeholder] = f"[{placeholder}]"
 
         # すべてのプレースホルダーを置換
-        filled_template = template
-        for placeholder, value in placeholder_values.items():
-            filled_template = filled_template.replace(f"{{{placeholder}}}", value)
+        filled_template = "".join(
+            placeholder_values[text] if kind == SEGMENT_PLACEHOLDER else text
+            for kind, text in segments
+        )
 
         print(f"生成されたプロンプト長: {len(filled_template)} 文字")
         return filled_template
@@ -428,8 +1094,24 @@ class PromptGenerator:
         Returns:
             Optional[List[str]]: 値のリスト、存在しない場合はNone
         """
+        if element_name in self.samplers:
+            return list(self.samplers[element_name].values)
         if element_name in self.elements:
-            return self.elements[element_name]["values"]
+            return self.elements[element_name].get("values")
+        return None
+
+    def get_element_weights(self, element_name: str) -> Optional[list[float]]:
+        """
+        指定された要素カテゴリの重みリストを取得します。
+
+        Args:
+            element_name: 要素カテゴリ名
+
+        Returns:
+            Optional[List[float]]: 重みのリスト（値と同じ順序）、存在しない場合はNone
+        """
+        if element_name in self.samplers:
+            return list(self.samplers[element_name].weights)
         return None
 
     def generate_multiple_prompts(
@@ -0,0 +1,338 @@
+"""
+CLIP/T5 トークン数推定モジュール
+
+このモジュールは、生成したプロンプトがテキストエンコーダーの
+トークン上限（CLIPは77トークン）に収まるかを高速に判定する機能を提供します。
+
+================================================================================
+使い方 - token_counter
+================================================================================
+
+## 概要
+
+- **ClipTokenCounter**: CLIP-L / CLIP-G（OpenCLIP bigG）共通の BPE 語彙
+  （bpe_simple_vocab_16e6）と互換の純Python BPE でトークン数を数えます。
+  語彙ファイル（merges）が見つからない場合はヒューリスティック推定に切り替わります。
+- **estimate_t5_tokens**: T5（SentencePiece）トークン数の概算を返します。
+
+CLIP の 77 トークンには開始・終了トークンが含まれるため、
+本文に使えるのは 75 トークンです（`CLIP_CONTENT_TOKENS`）。
+
+## 語彙ファイルの場所
+
+以下の順に探索します：
+
+1. `ClipTokenCounter(merges_path=...)` で指定したパス
+2. 環境変数 `CLIP_BPE_PATH`
+3. 環境変数 `COMFYUI_DIR` 配下の `comfy/sd1_tokenizer/merges.txt`
+4. `~/.cache/mini_muse/bpe_simple_vocab_16e6.txt.gz`
+
+open_clip の `bpe_simple_vocab_16e6.txt.gz` と Hugging Face の `merges.txt` の
+どちらの形式にも対応しています。
+
+## 基本的な使い方
+
+```python
+from mini_muse.token_counter import ClipTokenCounter
+
+counter = ClipTokenCounter()
+print(counter.exact)  # 語彙ファイルを読み込めた場合True
+print(counter.count("a tiny diorama of a victorian library, tilt-shift"))
+```
+
+### PromptGenerator との連携
+
+```python
+from mini_muse.prompt_generator import PromptGenerator
+
+generator = PromptGenerator()
+# 本文75トークン以内に収まるように各スロットの値を選択
+prompt = generator.generate_prompt("abstract_art", max_tokens=75)
+
+# テンプレートごとの想定トークン数と切り捨て量のレポート
+for row in generator.token_report():
+    print(row["template"], row["mean_tokens"], row["expected_truncated_tokens"])
+```
+
+### コマンドライン
+
+```bash
+uv run python -m mini_muse.token_counter --template-file prompt_templates_抽象画_20250117.json
+```
+
+================================================================================
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import gzip
+import html
+import io
+import math
+import os
+import re
+import sys
+from pathlib import Path
+
+# CLIP のコンテキスト長（開始・終了トークンを含む）
+CLIP_MAX_TOKENS = 77
+# 本文に使えるトークン数
+CLIP_CONTENT_TOKENS = CLIP_MAX_TOKENS - 2
+
+# bpe_simple_vocab_16e6 のマージ数（49152 - 256 - 2）
+_CLIP_MERGE_COUNT = 48894
+
+# CLIP の前処理トークン分割（regex モジュールの \p{L} / \p{N} を標準 re で近似）
+_CLIP_PATTERN = re.compile(
+    r"<\|startoftext\|>|<\|endoftext\|>|'s|'t|'re|'ve|'m|'ll|'d|[^\W\d_]+|\d|(?:[^\s\w]|_)+",
+    re.IGNORECASE,
+)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _bytes_to_unicode() -> dict[int, str]:
+    """GPT-2 / CLIP 共通のバイト→Unicode文字対応表を返します。"""
+    bs = (
+        list(range(ord("!"), ord("~") + 1))
+        + list(range(ord("¡"), ord("¬") + 1))
+        + list(range(ord("®"), ord("ÿ") + 1))
+    )
+    cs = bs[:]
+    n = 0
+    for b in range(256):
+        if b not in bs:
+            bs.append(b)
+            cs.append(256 + n)
+            n += 1
+    return dict(zip(bs, [chr(c) for c in cs]))
+
+
+_BYTE_ENCODER = _bytes_to_unicode()
+
+
+def _clean_text(text: str) -> str:
+    """CLIP と同じく HTML エスケープ解除・空白正規化・小文字化を行います。"""
+    text = html.unescape(html.unescape(text))
+    return _WHITESPACE.sub(" ", text).strip().lower()
+
+
+def default_merges_paths() -> list[Path]:
+    """語彙ファイルの探索候補を返します。"""
+    candidates = []
+    if os.environ.get("CLIP_BPE_PATH"):
+        candidates.append(Path(os.environ["CLIP_BPE_PATH"]))
+    if os.environ.get("COMFYUI_DIR"):
+        candidates.append(
+            Path(os.environ["COMFYUI_DIR"]) / "comfy" / "sd1_tokenizer" / "merges.txt"
+        )
+    candidates.append(Path.home() / ".cache" / "mini_muse" / "bpe_simple_vocab_16e6.txt.gz")
+    return candidates
+
+
+def load_merges(path: str | Path) -> list[tuple[str, str]]:
+    """
+    BPE マージリストを読み込みます。
+
+    Args:
+        path: bpe_simple_vocab_16e6.txt.gz または merges.txt のパス
+
+    Returns:
+        List[Tuple[str, str]]: マージ順のペアのリスト
+    """
+    path = Path(path)
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        lines = f.read().split("\n")
+    # CLIP と同じく先頭行のヘッダー（"bpe_simple_vocab_16e6.txt#version: 0.2" や
+    # "#version: 0.2"）を飛ばし、続く _CLIP_MERGE_COUNT 行をマージ順に使う
+    merges = []
+    for line in lines[1 : _CLIP_MERGE_COUNT + 1]:
+        parts = line.split()
+        if len(parts) == 2:
+            merges.append((parts[0], parts[1]))
+    return merges
+
+
+def estimate_clip_tokens(text: str) -> int:
+    """
+    語彙ファイルなしで CLIP トークン数を概算します。
+
+    一般的な英単語は1トークン、長い単語は約5文字ごとに1トークン、
+    記号列は1トークン、非ASCII文字はバイト数に応じて数えます。
+
+    Args:
+        text: 対象テキスト
+
+    Returns:
+        int: 推定トークン数（開始・終了トークンを除く）
+    """
+    total = 0
+    for token in _CLIP_PATTERN.findall(_clean_text(text)):
+        if token.isascii():
+            total += 1 if len(token) <= 6 or not token.isalpha() else math.ceil(len(token) / 5)
+        else:
+            total += max(1, math.ceil(len(token.encode("utf-8")) / 3))
+    return total
+
+
+def estimate_t5_tokens(text: str) -> int:
+    """
+    T5（SentencePiece）トークン数を概算します。
+
+    英語の単語は平均約1.3トークン、記号は1トークンとして数えます。
+
+    Args:
+        text: 対象テキスト
+
+    Returns:
+        int: 推定トークン数（終了トークンを除く）
+    """
+    words = re.findall(r"\w+|[^\w\s]", text)
+    total = 0.0
+    for word in words:
+        if not word[0].isalnum() and word[0] != "_":
+            total += 1
+        elif word.isascii():
+            total += 1 if len(word) <= 4 else 1 + (len(word) - 4) / 6
+        else:
+            total += len(word)
+    return math.ceil(total)
+
+
+class ClipTokenCounter:
+    """
+    CLIP-L / CLIP-G 互換のトークン数カウンター
+
+    語彙ファイルを読み込めた場合は BPE で正確に数え（exact=True）、
+    見つからない場合はヒューリスティック推定を使います（exact=False）。
+    単語単位の BPE 結果はキャッシュされます。
+    """
+
+    def __init__(self, merges_path: str | Path | None = None):
+        """
+        カウンターを初期化します。
+
+        Args:
+            merges_path: 語彙ファイルのパス（Noneの場合は既定の場所を探索）
+        """
+        self.merges_path: Path | None = None
+        self._ranks: dict[tuple[str, str], int] = {}
+        self._cache: dict[str, int] = {}
+
+        candidates = [Path(merges_path)] if merges_path else default_merges_paths()
+        for candidate in candidates:
+            if candidate.exists():
+                merges = load_merges(candidate)
+                self._ranks = {pair: i for i, pair in enumerate(merges)}
+                self.merges_path = candidate
+                break
+
+    @property
+    def exact(self) -> bool:
+        """BPE 語彙で正確に数えられる場合True"""
+        return bool(self._ranks)
+
+    def _bpe_length(self, token: str) -> int:
+        """前処理済みトークン1つの BPE 分割数を返します。"""
+        cached = self._cache.get(token)
+        if cached is not None:
+            return cached
+
+        word = [_BYTE_ENCODER[b] for b in token.encode("utf-8")]
+        word[-1] = word[-1] + "</w>"
+        ranks = self._ranks
+        while len(word) > 1:
+            best = None
+            best_rank = None
+            for i in range(len(word) - 1):
+                rank = ranks.get((word[i], word[i + 1]))
+                if rank is not None and (best_rank is None or rank < best_rank):
+                    best, best_rank = i, rank
+            if best is None:
+                break
+            first, second = word[best], word[best + 1]
+            merged = []
+            i = 0
+            while i < len(word):
+                if i < len(word) - 1 and word[i] == first and word[i + 1] == second:
+                    merged.append(first + second)
+                    i += 2
+                else:
+                    merged.append(word[i])
+                    i += 1
+            word = merged
+
+        self._cache[token] = len(word)
+        return len(word)
+
+    def count(self, text: str) -> int:
+        """
+        テキストのトークン数を返します（開始・終了トークンを除く）。
+
+        Args:
+            text: 対象テキスト
+
+        Returns:
+            int: トークン数
+        """
+        if not self.exact:
+            return estimate_clip_tokens(text)
+        return sum(self._bpe_length(t) for t in _CLIP_PATTERN.findall(_clean_text(text)))
+
+    def truncated_tokens(self, text: str, max_tokens: int = CLIP_CONTENT_TOKENS) -> int:
+        """
+        上限を超えて切り捨てられるトークン数を返します。
+
+        Args:
+            text: 対象テキスト
+            max_tokens: 本文のトークン上限（デフォルト: 75）
+
+        Returns:
+            int: 切り捨てられるトークン数（収まる場合は0）
+        """
+        return max(0, self.count(text) - max_tokens)
+
+
+_default_counter: ClipTokenCounter | None = None
+
+
+def get_default_counter() -> ClipTokenCounter:
+    """プロセス共通の ClipTokenCounter を返します（語彙の読み込みは1回のみ）。"""
+    global _default_counter
+    if _default_counter is None:
+        _default_counter = ClipTokenCounter()
+    return _default_counter
+
+
+def main(argv: list[str] | None = None) -> int:
+    """テンプレートファイルのトークン数レポートを表示します。"""
+    from mini_muse.prompt_generator import PromptGenerator
+
+    parser = argparse.ArgumentParser(description="テンプレートごとの想定トークン数を表示します")
+    parser.add_argument("--template-file", type=str, default=None, help="テンプレートファイル名")
+    parser.add_argument(
+        "--max-tokens", type=int, default=CLIP_CONTENT_TOKENS, help="本文のトークン上限"
+    )
+    args = parser.parse_args(argv)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        generator = PromptGenerator(elements_file=args.template_file)
+    counter = generator.token_counter
+    mode = f"BPE ({counter.merges_path})" if counter.exact else "ヒューリスティック推定"
+    print(f"トークン数の計算方法: {mode}")
+    print(f"本文のトークン上限: {args.max_tokens}")
+    print("=" * 70)
+    for row in generator.token_report(max_tokens=args.max_tokens):
+        print(
+            f"{row['template']}: 固定部 {row['literal_tokens']} / "
+            f"最小 {row['min_tokens']} / 平均 {row['mean_tokens']:.1f} / 最大 {row['max_tokens']} "
+            f"→ 想定切り捨て {row['expected_truncated_tokens']:.1f} トークン "
+            f"（超過率 {row['overflow_rate']:.0%}）"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+"""
+ステージ型パイプライン
+
+このモジュールは、複数の処理段（ステージ）を有界キューでつなぎ、
+ステージごとに独立したワーカー数で並行実行する汎用パイプラインを提供します。
+
+================================================================================
+使い方 - video_pipeline
+================================================================================
+
+## 概要
+
+画像→動画のバッチ処理では、Ollama による解析（CPU/別GPU）と ComfyUI での動画生成（GPU）を
+1枚ずつ順番に実行すると、どちらか一方が常に待機状態になります。
+StagedPipeline は各ステージをワーカースレッドで実行し、ステージ間を有界キューでつなぐため、
+後段が詰まると前段が自然に待機し（バックプレッシャー）、先読みしすぎることがありません。
+
+- ステージの関数は1件のジョブを受け取り、次のステージに渡すジョブを返します。
+  リストを返した場合は各要素を次のステージに渡します（1枚の画像から複数のテイクを作る場合など）。
+  空のリストを返すと、そのジョブは以降のステージに進まず、結果にも含まれません。
+- 例外が発生したジョブは以降のステージを飛ばして結果として報告されます（ジョブの error に記録）。
+- 結果は完了順に on_result コールバックへ渡されます。コールバックは1件ずつ呼ばれ、
+  コールバックで発生した例外は警告を表示して無視します（パイプラインは止まりません）。
+
+## 基本的な使い方
+
+```python
+from mini_muse.video_pipeline import Stage, StagedPipeline
+
+pipeline = StagedPipeline(
+    [
+        Stage("prompt", make_prompt, workers=2),
+        Stage("render", render_video, workers=1, queue_size=2),
+        Stage("collect", collect_outputs),
+    ],
+    on_result=lambda job: print(job),
+)
+results = pipeline.run(jobs)
+```
+
+================================================================================
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+# キューの終端を表す番兵
+_DONE = object()
+
+
+@dataclass
+class Stage:
+    """パイプラインの1ステージ"""
+
+    name: str  # ステージ名（ログ・統計用）
+    func: Callable[[Any], Any]  # ジョブを受け取り、次のステージに渡すジョブ（リスト可）を返す
+    workers: int = 1  # 並行実行するワーカー数
+    queue_size: int = 2  # このステージの入力キューの上限
+
+
+@dataclass
+class StageStats:
+    """ステージごとの処理統計"""
+
+    processed: int = 0
+    failed: int = 0
+    busy_seconds: float = 0.0
+
+
+@dataclass
+class PipelineJob:
+    """
+    パイプラインを流れるジョブの基底クラス
+
+    ステージ関数は任意のオブジェクトを扱えますが、このクラス（またはサブクラス）を使うと
+    失敗したステージ名・エラー・ステージごとの所要時間が自動で記録されます。
+    """
+
+    error: str | None = None
+    failed_stage: str | None = None
+    stage_seconds: dict[str, float] = field(default_factory=dict)
+    started_at: float = field(default_factory=time.time)
+    finished_at: float | None = None
+
+    @property
+    def success(self) -> bool:
+        return self.error is None
+
+    @property
+    def duration(self) -> float:
+        end = self.finished_at if self.finished_at is not None else time.time()
+        return end - self.started_at
+
+
+class StagedPipeline:
+    """
+    有界キューでつないだステージを並行実行するパイプライン
+    """
+
+    def __init__(
+        self,
+        stages: list[Stage],
+        on_result: Callable[[Any], None] | None = None,
+        on_error: Callable[[Any, str, BaseException], None] | None = None,
+    ):
+        """
+        パイプラインを構築します。
+
+        Args:
+            stages: ステージのリスト（先頭から順に実行）
+            on_result: ジョブが最後のステージまで完了、または失敗したときに呼ばれる関数
+            on_error: ステージで例外が発生したときに呼ばれる関数 (ジョブ, ステージ名, 例外)
+        """
+        if not stages:
+            raise ValueError("ステージが指定されていません。")
+        self.stages = stages
+        self.on_result = on_result
+        self.on_error = on_error
+        self.stats: dict[str, StageStats] = {stage.name: StageStats() for stage in stages}
+        self._lock = threading.Lock()
+        # コールバックを1件ずつ呼ぶためのロック（統計・結果のロックとは分ける）
+        self._callback_lock = threading.Lock()
+        self._results: list[Any] = []
+
+    def _callback(self, name: str, func: Callable[..., None] | None, *args: Any):
+        """コールバックを呼びます（例外は警告を表示して無視し、ワーカーを止めない）。"""
+        if func is None:
+            return
+        with self._callback_lock:
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"警告: {name} コールバックで例外が発生しました: {type(e).__name__}: {e}")
+
+    def _finish(self, job: Any):
+        if isinstance(job, PipelineJob):
+            job.finished_at = time.time()
+        with self._lock:
+            self._results.append(job)
+        self._callback("on_result", self.on_result, job)
+
+    def _worker(
+        self,
+        index: int,
+        inbox: queue.Queue,
+        outbox: queue.Queue | None,
+        remaining: list[int],
+    ):
+        try:
+            self._process(index, inbox, outbox)
+        finally:
+            # 最後に終了したワーカーが次のステージへ終端を伝える
+            with self._lock:
+                remaining[index] -= 1
+                last = remaining[index] == 0
+            if last and outbox is not None:
+                for _ in range(max(1, self.stages[index + 1].workers)):
+                    outbox.put(_DONE)
+
+    def _process(self, index: int, inbox: queue.Queue, outbox: queue.Queue | None):
+        stage = self.stages[index]
+        stats = self.stats[stage.name]
+        while True:
+            job = inbox.get()
+            if job is _DONE:
+                break
+            t0 = time.time()
+            try:
+                result = stage.func(job)
+            except Exception as e:
+                elapsed = time.time() - t0
+                with self._lock:
+                    stats.failed += 1
+                    stats.busy_seconds += elapsed
+                if isinstance(job, PipelineJob):
+                    job.error = str(e)
+                    job.failed_stage = stage.name
+                    job.stage_seconds[stage.name] = elapsed
+                self._callback("on_error", self.on_error, job, stage.name, e)
+                self._finish(job)
+                continue
+            elapsed = time.time() - t0
+            with self._lock:
+                stats.processed += 1
+                stats.busy_seconds += elapsed
+            for item in result if isinstance(result, list) else [result]:
+                if isinstance(item, PipelineJob):
+                    item.stage_seconds[stage.name] = elapsed
+                if outbox is None:
+                    self._finish(item)
+                else:
+                    outbox.put(item)
+
+    def run(self, jobs: Iterable[Any]) -> list[Any]:
+        """
+        ジョブを流し、すべて完了するまで待機します。
+
+        Args:
+            jobs: 先頭ステージに渡すジョブ（イテレーターの場合は必要に応じて読み進めます）
+
+        Returns:
+            List[Any]: 完了（または失敗）したジョブのリスト（完了順）
+        """
+        self._results = []
+        queues = [queue.Queue(maxsize=max(1, stage.queue_size)) for stage in self.stages]
+        remaining = [max(1, stage.workers) for stage in self.stages]
+        threads = []
+        for index, stage in enumerate(self.stages):
+            outbox = queues[index + 1] if index + 1 < len(queues) else None
+            for n in range(remaining[index]):
+                thread = threading.Thread(
+                    target=self._worker,
+                    args=(index, queues[index], outbox, remaining),
+                    name=f"{stage.name}-{n}",
+                    daemon=True,
+                )
+                thread.start()
+                threads.append(thread)
+
+        # 先頭キューが満杯の間はここで待機（読み込みすぎない）
+        for job in jobs:
+            queues[0].put(job)
+        for _ in range(max(1, self.stages[0].workers)):
+            queues[0].put(_DONE)
+
+        for thread in threads:
+            thread.join()
+        return list(self._results)
@@ -0,0 +1,217 @@
+"""
+動画入力画像の前処理モジュール
+
+このモジュールは、画像→動画ワークフローに渡す画像を、ワークフローの出力解像度
+（WanImageToVideo の width / height）に合わせてローカルで縮小・中央切り抜きし、
+再エンコードする機能を提供します。
+
+================================================================================
+使い方 - video_preprocess
+================================================================================
+
+## 概要
+
+画像生成パイプラインの 2048×2048 PNG や大きな写真をそのままアップロードすると、
+ComfyUI サーバー側でデコードと縮小が行われます。事前に 640×640 などの
+出力解像度へ縮小しておくことで、アップロード量とサーバー側のデコード時間を減らせます。
+
+- 切り抜きは WanImageToVideo と同じ中央基準なので、構図は変わりません。
+- 縮小結果は元画像の内容ハッシュと解像度をキーにキャッシュされ、再実行時は再計算しません。
+- 複数画像はプロセスプールで並列に処理します。
+
+## 基本的な使い方
+
+```python
+from mini_muse.comfy_video_generator import load_workflow
+from mini_muse.video_preprocess import preprocess_images, workflow_target_size
+
+workflow = load_workflow("workflows/wan22_i2v_workflow.json")
+size = workflow_target_size(workflow)  # (640, 640)
+
+# {元画像: 縮小後の画像} の辞書
+resized = preprocess_images(["input/a.png", "input/b.jpg"], size, max_workers=4)
+```
+
+### run_comfy_pipeline との連携
+
+```python
+from mini_muse.comfy_video_generator import run_comfy_pipeline
+
+outputs = run_comfy_pipeline(
+    image_path="input/sample.png",
+    prompt_text="A dragon flying",
+    workflow_path="workflows/wan22_i2v_workflow.json",
+    preresize=True,  # ワークフローの解像度に縮小してからアップロード
+)
+```
+
+================================================================================
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any
+
+from PIL import Image, ImageOps
+
+# 出力解像度を持つノードの class_type
+TARGET_NODE_TYPE = "WanImageToVideo"
+
+# 再エンコード形式ごとの拡張子
+_FORMAT_SUFFIX = {"png": ".png", "jpeg": ".jpg", "webp": ".webp"}
+
+
+def default_cache_dir() -> Path:
+    """縮小済み画像のキャッシュフォルダの既定パスを返します。"""
+    return Path.home() / ".cache" / "mini_muse" / "resized"
+
+
+def find_nodes(workflow: dict[str, Any], class_type: str) -> list[tuple[str, dict[str, Any]]]:
+    """
+    API形式のワークフローから指定した class_type のノードを探します。
+
+    Args:
+        workflow: ワークフロー辞書（{ノードID: {"class_type": ..., "inputs": ...}}）
+        class_type: ノードの種類（例: "WanImageToVideo"）
+
+    Returns:
+        List[Tuple[str, Dict]]: [(ノードID, ノード), ...]（ノードID順）
+    """
+    nodes = [
+        (str(node_id), node)
+        for node_id, node in workflow.items()
+        if isinstance(node, dict) and node.get("class_type") == class_type
+    ]
+    return sorted(nodes, key=lambda item: (len(item[0]), item[0]))
+
+
+def workflow_target_size(
+    workflow: dict[str, Any], class_type: str = TARGET_NODE_TYPE
+) -> tuple[int, int] | None:
+    """
+    ワークフローの出力解像度（width, height）を取得します。
+
+    Args:
+        workflow: ワークフロー辞書
+        class_type: 解像度を持つノードの種類（デフォルト: WanImageToVideo）
+
+    Returns:
+        Optional[Tuple[int, int]]: (width, height)
+            ノードがない場合や、値がプレースホルダ・他ノードへの接続の場合はNone
+    """
+    for _node_id, node in find_nodes(workflow, class_type):
+        inputs = node.get("inputs") or {}
+        width, height = inputs.get("width"), inputs.get("height")
+        if isinstance(width, int) and isinstance(height, int) and width > 0 and height > 0:
+            return width, height
+    return None
+
+
+def _cache_name(image_path: Path, size: tuple[int, int], fmt: str) -> str:
+    h = hashlib.sha256()
+    with open(image_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return f"{h.hexdigest()[:32]}_{size[0]}x{size[1]}{_FORMAT_SUFFIX[fmt]}"
+
+
+def resize_for_video(
+    image_path: str | Path,
+    size: tuple[int, int],
+    *,
+    out_dir: str | Path | None = None,
+    fmt: str = "png",
+    quality: int = 95,
+) -> Path:
+    """
+    画像を出力解像度に合わせて縮小・中央切り抜きし、再エンコードして保存します。
+
+    Args:
+        image_path: 元画像のパス
+        size: 出力解像度 (width, height)
+        out_dir: 保存先フォルダ（Noneの場合は ~/.cache/mini_muse/resized）
+        fmt: 保存形式（"png" / "jpeg" / "webp"）
+        quality: jpeg / webp の品質
+
+    Returns:
+        Path: 縮小後の画像のパス（すでに同じ解像度の場合は元画像のパス）
+
+    Raises:
+        FileNotFoundError: 画像ファイルが見つからない
+        ValueError: 保存形式が不正
+    """
+    fmt = fmt.lower()
+    if fmt not in _FORMAT_SUFFIX:
+        raise ValueError(f"未対応の保存形式です: {fmt}")
+    image_path = Path(image_path)
+    out_dir = Path(out_dir) if out_dir else default_cache_dir()
+    out_path = out_dir / _cache_name(image_path, size, fmt)
+    if out_path.exists():
+        return out_path
+
+    with Image.open(image_path) as img:
+        if img.size == tuple(size) and not img.getexif().get(0x0112):
+            return image_path
+        # JPEG は縮小デコードで読み込み量を減らす（出力解像度以上は保たれる）
+        img.draft("RGB", size)
+        img = ImageOps.exif_transpose(img)
+        if fmt == "jpeg" or img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if fmt != "jpeg" and "A" in img.getbands() else "RGB")
+        # WanImageToVideo と同じく中央を基準に切り抜く
+        fitted = ImageOps.fit(img, size, Image.Resampling.LANCZOS, centering=(0.5, 0.5))
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = out_path.with_name(f".{out_path.name}.{os.getpid()}.tmp")
+    options: dict[str, Any] = {"quality": quality} if fmt in ("jpeg", "webp") else {}
+    fitted.save(tmp_path, format=fmt.upper(), **options)
+    tmp_path.replace(out_path)
+    return out_path
+
+
+def _resize_task(args: tuple[str, tuple[int, int], str | None, str]) -> str:
+    image_path, size, out_dir, fmt = args
+    return str(resize_for_video(image_path, size, out_dir=out_dir, fmt=fmt))
+
+
+def preprocess_images(
+    image_paths: Iterable[str | Path],
+    size: tuple[int, int],
+    *,
+    out_dir: str | Path | None = None,
+    fmt: str = "png",
+    max_workers: int | None = None,
+) -> dict[Path, Path]:
+    """
+    複数の画像をプロセスプールで並列に縮小します。
+
+    失敗した画像は警告を表示し、元画像のパスをそのまま返します。
+
+    Args:
+        image_paths: 元画像のパスのリスト
+        size: 出力解像度 (width, height)
+        out_dir: 保存先フォルダ（Noneの場合は ~/.cache/mini_muse/resized）
+        fmt: 保存形式（"png" / "jpeg" / "webp"）
+        max_workers: プロセス数（Noneの場合はCPU数）
+
+    Returns:
+        Dict[Path, Path]: {元画像のパス: アップロードに使う画像のパス}
+    """
+    paths = [Path(p) for p in image_paths]
+    result: dict[Path, Path] = {}
+    if not paths:
+        return result
+    tasks = [(str(p), tuple(size), str(out_dir) if out_dir else None, fmt) for p in paths]
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(_resize_task, task) for task in tasks]
+        for path, future in zip(paths, futures):
+            try:
+                result[path] = Path(future.result())
+            except Exception as e:
+                print(f"警告: 画像の縮小に失敗したため元画像を使用します: {path.name} ({e})")
+                result[path] = path
+    return result
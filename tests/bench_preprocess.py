@@ -0,0 +1,94 @@
+"""
+Ollama送信用の画像前処理のベンチマーク
+
+mini_muse.ollama_video_prompt._load_and_resize_to_base64 と、
+従来の実装（フルデコード → RGB変換 → LANCZOS → optimize=True の JPEG）を比較し、
+12MP（4000×3000）の JPEG / PNG での ms/画像 を表示します。
+
+使い方:
+    uv run python tests/bench_preprocess.py
+    uv run python tests/bench_preprocess.py --count 16 --workers 4
+"""
+
+import argparse
+import base64
+import io
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image
+
+from mini_muse.ollama_video_prompt import (
+    ANALYSIS_JPEG_QUALITY,
+    ANALYSIS_SHORT_SIDE,
+    _load_and_resize_to_base64,
+    encode_images_for_analysis,
+)
+
+
+def _legacy_load_and_resize_to_base64(image_path, short_side=ANALYSIS_SHORT_SIDE):
+    """変更前の実装（比較用）"""
+    with Image.open(image_path) as im:
+        im = im.convert("RGB")
+        w, h = im.size
+        if min(w, h) > short_side:
+            if w <= h:
+                new_w = short_side
+                new_h = int(h * (short_side / w))
+            else:
+                new_h = short_side
+                new_w = int(w * (short_side / h))
+            im = im.resize((new_w, new_h), Image.LANCZOS)
+        buf = io.BytesIO()
+        im.save(buf, format="JPEG", quality=ANALYSIS_JPEG_QUALITY, optimize=True)
+    return base64.b64encode(buf.getvalue()).decode("utf-8")
+
+
+def _make_images(directory: Path, count: int, fmt: str) -> list[Path]:
+    """12MP のテスト画像（写真に近い圧縮率になるようグラデーション＋ノイズ）を作成します。"""
+    size = (4000, 3000)
+    gradient = Image.linear_gradient("L").resize(size)
+    noise = Image.effect_noise(size, 40)
+    base = Image.merge("RGB", (gradient, noise, gradient.transpose(Image.FLIP_LEFT_RIGHT)))
+    paths = []
+    for i in range(count):
+        path = directory / f"bench_{i}.{fmt}"
+        base.save(path)
+        paths.append(path)
+    return paths
+
+
+def _bench(func, paths: list[Path]) -> float:
+    """1画像あたりの処理時間（ミリ秒）を返します。"""
+    func(paths[0])  # ウォームアップ
+    start = time.perf_counter()
+    for path in paths:
+        func(path)
+    return (time.perf_counter() - start) * 1000 / len(paths)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="画像前処理のベンチマーク")
+    parser.add_argument("--count", type=int, default=8, help="画像数（形式ごと）")
+    parser.add_argument("--workers", type=int, default=None, help="プロセスプールのプロセス数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in ("jpg", "png"):
+            paths = _make_images(Path(tmp), args.count, fmt)
+            legacy = _bench(_legacy_load_and_resize_to_base64, paths)
+            current = _bench(_load_and_resize_to_base64, paths)
+
+            start = time.perf_counter()
+            encode_images_for_analysis(paths, max_workers=args.workers)
+            pooled = (time.perf_counter() - start) * 1000 / len(paths)
+
+            print(f"[12MP {fmt.upper()} × {len(paths)}]")
+            print(f"  従来の実装:       {legacy:8.1f} ms/画像")
+            print(f"  現在の実装:       {current:8.1f} ms/画像（{legacy / current:.1f}倍）")
+            print(f"  プロセスプール:   {pooled:8.1f} ms/画像（起動時間を含む）")
+
+
+if __name__ == "__main__":
+    main()
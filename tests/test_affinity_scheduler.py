@@ -0,0 +1,130 @@
+"""
+ワークフローのまとめ投入スケジューラのテスト
+
+このモジュールは、mini_muse.affinity_scheduler の機能をテストします。
+"""
+
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from mini_muse.affinity_scheduler import AffinityScheduler, workflow_models
+from mini_muse.comfy_video_generator import history_execution_seconds, load_workflow
+
+WORKFLOWS = Path(__file__).parent.parent / "workflows"
+
+
+def _submit(scheduler, key):
+    """順番を待って投入したことにします。"""
+    ticket = scheduler.acquire(key)
+    scheduler.submitted(ticket)
+    return ticket
+
+
+def _acquire_later(scheduler, key):
+    """別スレッドで _submit() し、待機列に並ぶまで待ちます。"""
+    acquired = []
+    thread = threading.Thread(target=lambda: acquired.append(_submit(scheduler, key)), daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 5
+    while not scheduler._waiting.get(key) and not acquired and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return thread, acquired
+
+
+def test_workflow_models_groups_by_loaded_model_files():
+    """
+    正常系テスト：画像と動画のワークフローが別のモデルの組み合わせになることを確認
+    """
+    image = workflow_models(load_workflow(WORKFLOWS / "sd3.5_large_turbo_upscale.json"))
+    video = workflow_models(load_workflow(WORKFLOWS / "wan22_i2v_workflow.json"))
+
+    assert "RealESRGAN_x2plus.pth" in image
+    assert any("high_noise" in name for name in video)
+    assert any("low_noise" in name for name in video)
+    assert image != video and not set(image) & set(video)
+
+
+def test_batches_group_until_max_batch_then_yields():
+    """
+    正常系テスト：待っているグループがあっても max_batch 件までは同じグループを続け、
+    切り替えた後は元のグループを実行中のグループが終わるまで待たせることを確認
+    """
+    scheduler = AffinityScheduler(max_batch=2, max_wait_s=60, linger_s=0.05)
+    image1 = _submit(scheduler, "image")
+    video_thread, video = _acquire_later(scheduler, "video")
+    assert video == []
+
+    image2 = scheduler.acquire("image")  # 2件目までは画像を続ける
+    time.sleep(0.05)
+    assert video == []  # 画像の投入が終わるまでは切り替えない
+    scheduler.submitted(image2)
+    video_thread.join(timeout=5)  # 上限に達したので動画に切り替わる
+    assert len(video) == 1 and video[0].after_switch
+    assert not image2.after_switch
+
+    image_thread, image3 = _acquire_later(scheduler, "image")
+    scheduler.release(image1)
+    scheduler.release(image2)
+    time.sleep(0.05)
+    assert image3 == []  # 動画が実行中の間は待つ
+    scheduler.release(video[0])
+    image_thread.join(timeout=5)
+    assert len(image3) == 1 and image3[0].after_switch
+
+    stats = scheduler.stats()
+    assert (stats["image"].submitted, stats["image"].switches) == (3, 2)
+    assert (stats["video"].submitted, stats["video"].switches) == (1, 1)
+
+
+def test_max_wait_switches_before_max_batch():
+    """
+    正常系テスト：他のグループの先頭が max_wait_s 秒待ったら max_batch 前でも切り替えることを確認
+    """
+    scheduler = AffinityScheduler(max_batch=100, max_wait_s=0.05)
+    image = _submit(scheduler, "image")
+    video_thread, video = _acquire_later(scheduler, "video")
+
+    video_thread.join(timeout=5)  # 画像が実行中でも待ち時間の上限で切り替わる
+    assert len(video) == 1
+    image_thread, image2 = _acquire_later(scheduler, "image")
+    assert image2 == []
+    scheduler.release(image)
+    scheduler.release(video[0])
+    image_thread.join(timeout=5)
+    assert len(image2) == 1
+
+
+def test_load_seconds_from_first_and_steady_runs():
+    """
+    正常系テスト：切り替え直後と続けて実行したジョブの実行時間の差を読み込み時間とすることを確認
+    """
+    scheduler = AffinityScheduler()
+    for seconds in (12.0, 4.0, 5.0, 3.0):
+        scheduler.release(_submit(scheduler, "video"), seconds)
+    scheduler.release(scheduler.acquire("image"))
+
+    stats = scheduler.stats()
+    assert stats["video"].first_seconds == [12.0]
+    assert stats["video"].load_seconds == pytest.approx(8.0)
+    assert stats["image"].load_seconds is None
+
+
+def test_history_execution_seconds():
+    """
+    正常系テスト：履歴の execution_start / execution_success からサーバーでの実行時間を求めることを確認
+    """
+    entry = {
+        "status": {
+            "messages": [
+                ["execution_start", {"prompt_id": "p", "timestamp": 1_000_000}],
+                ["execution_cached", {"nodes": [], "timestamp": 1_000_010}],
+                ["execution_success", {"prompt_id": "p", "timestamp": 1_042_500}],
+            ]
+        }
+    }
+    assert history_execution_seconds(entry) == pytest.approx(42.5)
+    assert history_execution_seconds({"status": {"messages": []}}) is None
+    assert history_execution_seconds({}) is None
@@ -0,0 +1,104 @@
+"""
+バッチ動画生成スクリプトのテスト
+
+このモジュールは、mini_muse.batch_video_generation の機能をテストします。
+"""
+
+import threading
+import time
+from functools import partial
+from pathlib import Path
+
+import mini_muse.batch_video_generation as batch
+from mini_muse.comfy_hosts import ComfyHostPool
+from mini_muse.comfy_video_generator import load_workflow_template
+from mini_muse.video_pipeline import Stage, StagedPipeline
+
+WORKFLOW_PATH = Path(__file__).parent.parent / "workflows" / "wan22_i2v_workflow.json"
+
+
+def _fake_server(monkeypatch, queued):
+    """
+    アップロード・投入・完了待ちをフェイクに置き換えます。
+
+    queued のプロンプトIDは、前回の実行で投入してサーバーのキューに残っているものとします。
+    """
+    submitted = []
+
+    def fake_upload_image_to_comfyui(path, *, host, session=None):
+        time.sleep(0.05)  # 再接続するジョブがフィーダーで先に復元されるようにする
+        return f"mini_muse/{Path(path).name}"
+
+    def fake_submit_workflow(workflow, *, host, client_id, session=None):
+        submitted.append(client_id)
+        return f"new{len(submitted)}"
+
+    def fake_wait_for_history(prompt_id, *, host, timeout_s, client_id, session=None):
+        filename = f"{prompt_id}.mp4"
+        return {"outputs": {"9": {"images": [{"filename": filename, "type": "output"}]}}}
+
+    monkeypatch.setattr(batch, "upload_image_to_comfyui", fake_upload_image_to_comfyui)
+    monkeypatch.setattr(batch, "submit_workflow", fake_submit_workflow)
+    monkeypatch.setattr(batch, "wait_for_history", fake_wait_for_history)
+    monkeypatch.setattr(batch, "fetch_history_entry", lambda prompt_id, **kwargs: None)
+    monkeypatch.setattr(
+        batch, "fetch_queue", lambda **kwargs: {"running": queued[:1], "pending": queued[1:]}
+    )
+    return submitted
+
+
+def test_resumed_jobs_do_not_block_fresh_jobs_ahead_of_them(monkeypatch):
+    """
+    正常系テスト：投入済みのジョブに再接続しても、その前に並んだ新しいジョブの投入を
+    待たせ続けない（待機ステージに届くまで投入数の上限に数えない）ことを確認
+    """
+    submitted = _fake_server(monkeypatch, ["old1", "old2"])
+    host = "http://a"
+    monkeypatch.setattr(batch, "HOST_POOL", ComfyHostPool([host], depth=2))
+    template = load_workflow_template(WORKFLOW_PATH)
+
+    def jobs():
+        for i in range(1, 6):
+            job = batch.VideoJob(image_path=Path(f"image{i}.png"), index=i, total=5, prompt="p")
+            if i > 3:  # 前回の実行で投入済み
+                state = {"prompt_id": f"old{i - 3}", "client_id": f"client{i}", "host": host}
+                assert batch._restore_submission(job, state)
+            yield job
+
+    pipeline = StagedPipeline(
+        [
+            Stage("upload", batch._upload, workers=2, queue_size=10),
+            Stage("submit", partial(batch._submit, template=template), queue_size=10),
+            Stage("await", batch._await, workers=4, queue_size=10),
+        ]
+    )
+    finished = []
+    thread = threading.Thread(target=lambda: finished.extend(pipeline.run(jobs())), daemon=True)
+    thread.start()
+    thread.join(timeout=10)
+
+    assert not thread.is_alive()
+    assert len(submitted) == 3
+    assert sorted(job.prompt_id for job in finished) == ["new1", "new2", "new3", "old1", "old2"]
+    assert all(job.success for job in finished)
+    assert batch.HOST_POOL.in_flight(host) == 0
+
+
+def test_submit_reacquires_host_when_assignment_was_released(monkeypatch):
+    """
+    異常系テスト：投入を待つ間に割り当てが解除された場合は、サーバーを選び直してから投入し、
+    プールの投入数に数えることを確認
+    """
+    submitted = _fake_server(monkeypatch, [])
+    pool = ComfyHostPool(["http://a"], depth=1)
+    monkeypatch.setattr(batch, "HOST_POOL", pool)
+    template = load_workflow_template(WORKFLOW_PATH)
+    job = batch.VideoJob(image_path=Path("image1.png"), index=1, total=1, prompt="p")
+    batch._upload(job)
+    pool.release(job.client_id)
+
+    batch._submit(job, template)
+
+    assert submitted == [job.client_id]
+    assert pool.in_flight("http://a") == 1
+    assert pool.stats["http://a"].submitted == 1
@@ -0,0 +1,148 @@
+"""
+ComfyUIサーバーの振り分けのテスト
+
+このモジュールは、mini_muse.comfy_hosts の機能をテストします。
+"""
+
+import threading
+
+import pytest
+import requests
+
+import mini_muse.comfy_hosts as comfy_hosts
+from mini_muse.comfy_hosts import ComfyHostPool, is_host_failure
+
+
+def _fake_queues(monkeypatch, lengths):
+    """fetch_queue を {host: キューの長さ（None の場合は接続エラー）} で置き換えます。"""
+    calls = []
+
+    def fake_fetch_queue(*, host, timeout, session):
+        calls.append(host)
+        if lengths[host] is None:
+            raise requests.ConnectionError(f"cannot connect to {host}")
+        return {"running": ["r"] if lengths[host] else [], "pending": ["p"] * (lengths[host] - 1)}
+
+    monkeypatch.setattr(comfy_hosts, "fetch_queue", fake_fetch_queue)
+    return calls
+
+
+def test_acquire_picks_shortest_queue_and_counts_unsubmitted(monkeypatch):
+    """
+    正常系テスト：キューが最も短いサーバーを選び、未投入の割り当ても負荷として数えることを確認
+    """
+    _fake_queues(monkeypatch, {"http://a": 3, "http://b": 1, "http://c": 2})
+    pool = ComfyHostPool(["http://a", "http://b/", "http://c"])
+
+    assert pool.acquire("job1") == "http://b"
+    # job1 は未投入なので b の負荷は 1 + 1、同じ負荷の c より b の方が割り当て中のジョブが多い
+    assert pool.acquire("job2") == "http://c"
+    pool.submitted("job1")
+    assert pool.stats["http://b"].submitted == 1
+
+    pool.release("job2")
+    pool.release("job2")  # 何度呼んでも安全
+    assert pool.acquire("job3") == "http://b"
+
+
+def test_failed_hosts_are_skipped_until_retry(monkeypatch):
+    """
+    異常系テスト：/queue を取得できないサーバーや障害を記録したサーバーが選ばれないことを確認
+    """
+    calls = _fake_queues(monkeypatch, {"http://a": 0, "http://b": None, "http://c": 5})
+    pool = ComfyHostPool(["http://a", "http://b", "http://c"], retry_s=60)
+
+    assert pool.acquire("job1") == "http://a"
+    assert pool.stats["http://b"].failures == 1
+    pool.mark_failed("http://a", "connection refused")
+    assert pool.available() == ["http://c"]
+
+    calls.clear()
+    assert pool.acquire("job2") == "http://c"
+    assert calls == []  # 候補が1台の場合は /queue を問い合わせない
+
+    pool.mark_failed("http://c", "connection refused")
+    with pytest.raises(RuntimeError):
+        pool.acquire("job3")
+
+
+def test_is_host_failure():
+    """
+    正常系テスト：接続エラーと 5xx だけをサーバーの障害とみなすことを確認
+    """
+
+    def http_error(status):
+        response = requests.Response()
+        response.status_code = status
+        return requests.HTTPError(response=response)
+
+    assert is_host_failure(requests.ConnectionError())
+    assert is_host_failure(requests.Timeout())
+    assert is_host_failure(http_error(503))
+    assert not is_host_failure(http_error(400))
+    assert not is_host_failure(ValueError())
+
+
+def test_wait_for_slot_limits_jobs_in_flight(monkeypatch):
+    """
+    正常系テスト：投入済みで未完了のジョブが depth 件になると、どれかが完了するまで待機することを確認
+    """
+    _fake_queues(monkeypatch, {"http://a": 0})
+    pool = ComfyHostPool(["http://a"], depth=2)
+    for token in ("job1", "job2"):
+        pool.acquire(token)
+        assert pool.wait_for_slot(token, timeout=0) == "http://a"
+        pool.submitted(token)
+    assert pool.in_flight("http://a") == 2
+
+    pool.acquire("job3")
+    assert pool.wait_for_slot("job3", timeout=0.01) is None
+    # 投入順に関係なく、完了したジョブの分だけ投入できる
+    threading.Timer(0.05, pool.release, args=("job2",)).start()
+    assert pool.wait_for_slot("job3", timeout=5) == "http://a"
+    assert pool.in_flight("http://a") == 1
+
+
+def test_wait_for_slot_moves_job_to_first_free_host(monkeypatch):
+    """
+    正常系テスト：割り当てたサーバーが埋まっている間に別のサーバーが空くと、そちらに割り当て直すことを確認
+    """
+    _fake_queues(monkeypatch, {"http://a": 0, "http://b": 1})
+    pool = ComfyHostPool(["http://a", "http://b"], depth=1)
+    pool.attach("running_a", "http://a")
+    pool.attach("running_b", "http://b")
+
+    assert pool.acquire("job") == "http://a"
+    threading.Timer(0.05, pool.release, args=("running_b",)).start()
+    assert pool.wait_for_slot("job", timeout=5) == "http://b"
+    pool.submitted("job")
+    assert pool.in_flight("http://b") == 1
+    assert pool.in_flight("http://a") == 1
+
+
+def test_wait_for_slot_keeps_pinned_job_on_its_host(monkeypatch):
+    """
+    正常系テスト：move=False の場合は別のサーバーが空いていても割り当てたサーバーを待つことを確認
+    """
+    _fake_queues(monkeypatch, {"http://a": 0, "http://b": 0})
+    pool = ComfyHostPool(["http://a", "http://b"], depth=1)
+    pool.attach("running_a", "http://a")
+    pool.attach("take", "http://a", submitted=False)
+    assert pool.stats["http://a"].assigned == 1
+
+    assert pool.wait_for_slot("take", timeout=0.01, move=False) is None
+    assert pool.wait_for_slot("take", timeout=0) == "http://b"
+
+
+def test_wait_for_slot_returns_none_when_released_while_waiting(monkeypatch):
+    """
+    異常系テスト：待機中に割り当てが解除された場合は KeyError にならず None を返すことを確認
+    """
+    _fake_queues(monkeypatch, {"http://a": 0})
+    pool = ComfyHostPool(["http://a"], depth=1)
+    pool.attach("running", "http://a")
+    pool.acquire("job")
+
+    threading.Timer(0.05, pool.release, args=("job",)).start()
+    assert pool.wait_for_slot("job", timeout=5) is None
+    assert pool.in_flight("http://a") == 1
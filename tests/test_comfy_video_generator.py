@@ -0,0 +1,459 @@
+"""
+ComfyUI パイプライン実行モジュールのテスト
+
+このモジュールは、mini_muse.comfy_video_generator のサーバー不要な機能をテストします。
+"""
+
+import errno
+import json
+import multiprocessing
+import random
+from pathlib import Path
+
+import pytest
+
+import mini_muse.comfy_video_generator as cvg
+from mini_muse.comfy_video_generator import (
+    RenderParams,
+    SeedSequence,
+    WorkflowTemplate,
+    draft_render_params,
+    get_workflow_template,
+    history_output_files,
+    load_workflow,
+    replace_placeholders,
+    with_filename_prefix,
+    with_noise_seed,
+    with_render_params,
+    workflow_noise_seed,
+    workflow_render_params,
+)
+
+WORKFLOW_PATH = Path(__file__).parent.parent / "workflows" / "wan22_i2v_workflow.json"
+
+
+def test_index_wan22_workflow():
+    """
+    正常系テスト：同梱ワークフローのプレースホルダ位置が索引化されることを確認
+    """
+    template = WorkflowTemplate(load_workflow(WORKFLOW_PATH))
+    assert template.pointers() == {
+        "IMAGE_FILENAME": ["/97/inputs/image"],
+        "PROMPT": ["/93/inputs/text"],
+    }
+
+
+def test_render_copies_only_patched_paths():
+    """
+    正常系テスト：差し替え箇所の経路だけがコピーされ、元のワークフローは変更されないことを確認
+    """
+    workflow = load_workflow(WORKFLOW_PATH)
+    original = json.dumps(workflow, sort_keys=True)
+    patched = replace_placeholders(workflow, "sample.png", "a dragon")
+
+    assert patched["97"]["inputs"]["image"] == "sample.png"
+    assert patched["93"]["inputs"]["text"] == "a dragon"
+    assert patched["97"] is not workflow["97"]
+    # 差し替えのないノードは共有される
+    assert patched["86"] is workflow["86"]
+    assert json.dumps(workflow, sort_keys=True) == original
+    # 同じワークフローに対しては索引を再利用
+    assert get_workflow_template(workflow) is get_workflow_template(workflow)
+
+
+def test_unique_filename_prefix_and_history_outputs():
+    """
+    正常系テスト：SaveVideo の filename_prefix にタグが付き、出力が履歴から特定できることを確認
+    """
+    workflow = load_workflow(WORKFLOW_PATH)
+    patched = with_filename_prefix(workflow, "my image_3fa2c9d1")
+
+    assert patched["108"]["inputs"]["filename_prefix"] == "video/ComfyUI_my_image_3fa2c9d1"
+    assert workflow["108"]["inputs"]["filename_prefix"] == "video/ComfyUI"
+    assert patched["86"] is workflow["86"]
+    with pytest.raises(ValueError):
+        with_filename_prefix({"1": {"class_type": "KSampler", "inputs": {}}}, "tag")
+
+    entry = {
+        "outputs": {
+            "108": {
+                "images": [
+                    {
+                        "filename": "ComfyUI_my_image_3fa2c9d1_00001_.mp4",
+                        "subfolder": "video",
+                        "type": "output",
+                    }
+                ],
+                "animated": [True],
+            },
+            "9": {"images": [{"filename": "preview.png", "subfolder": "", "type": "temp"}]},
+        }
+    }
+    # SaveVideo の出力は "images" として記録されるため拡張子で選ぶ
+    videos = history_output_files(entry, suffixes=cvg.VIDEO_SUFFIXES)
+    assert [(v["node_id"], v["subfolder"], v["filename"]) for v in videos] == [
+        ("108", "video", "ComfyUI_my_image_3fa2c9d1_00001_.mp4")
+    ]
+    assert history_output_files(entry, kinds=("videos", "gifs")) == []
+    assert len(history_output_files(entry)) == 2
+
+
+def test_noise_seed_patches_only_noise_adding_sampler():
+    """
+    正常系テスト：ノイズを加えるサンプラー（ノード86）だけのシードを差し替えることを確認
+    """
+    workflow = load_workflow(WORKFLOW_PATH)
+    original = json.dumps(workflow, sort_keys=True)
+    assert workflow_noise_seed(workflow) == 138073435077572
+
+    patched = with_noise_seed(workflow, 42)
+    assert patched["86"]["inputs"]["noise_seed"] == 42
+    assert patched["85"] is workflow["85"]  # add_noise="disable" の2段目は変更しない
+    assert patched["98"] is workflow["98"]  # 画像のエンコードなどは共有（キャッシュが効く）
+    assert json.dumps(workflow, sort_keys=True) == original
+
+    with pytest.raises(ValueError):
+        with_noise_seed({"1": {"class_type": "LoadImage", "inputs": {}}}, 1)
+
+
+def test_draft_render_params_patch_size_length_and_step_split():
+    """
+    正常系テスト：下書きの解像度・フレーム数・ステップ数に差し替え、2段のサンプラーの区切りも縮めることを確認
+    """
+    workflow = load_workflow(WORKFLOW_PATH)
+    full = workflow_render_params(workflow)
+    assert full == RenderParams(width=640, height=640, length=81, steps=4)
+
+    draft = draft_render_params(full, scale=0.5, length=34, steps=2)
+    assert draft == RenderParams(width=320, height=320, length=33, steps=2)  # 4n+1 に丸める
+    assert draft_render_params(full, scale=1, length=200, steps=8) == full  # 本番を超えない
+
+    patched = with_render_params(workflow, draft)
+    assert patched["98"]["inputs"]["width"] == 320
+    assert patched["98"]["inputs"]["length"] == 33
+    high, low = patched["86"]["inputs"], patched["85"]["inputs"]
+    assert (high["steps"], high["start_at_step"], high["end_at_step"]) == (2, 0, 1)
+    assert (low["steps"], low["start_at_step"], low["end_at_step"]) == (2, 1, 2)
+    assert workflow["86"]["inputs"]["steps"] == 4  # 元の辞書は変更しない
+    assert patched["93"] is workflow["93"]
+
+    with pytest.raises(ValueError):
+        draft_render_params(full, scale=0)
+
+
+def test_seed_sequence_modes():
+    """
+    正常系テスト：random / fixed / increment のシードの決め方を確認
+    """
+    assert [SeedSequence("fixed", 7).next() for _ in range(2)] == [7, 7]
+    seeds = SeedSequence("increment", 10)
+    assert [seeds.next() for _ in range(3)] == [10, 11, 12]
+    rng = random.Random(0)
+    randoms = SeedSequence("random", rng=rng)
+    values = {randoms.next() for _ in range(5)}
+    assert len(values) == 5 and all(0 <= v <= cvg.SEED_MAX for v in values)
+
+    with pytest.raises(ValueError):
+        SeedSequence("fixed")
+    with pytest.raises(ValueError):
+        SeedSequence("sometimes")
+
+
+def test_extra_placeholders_keep_types():
+    """
+    正常系テスト：追加プレースホルダが型を保って、部分一致は文字列として置換されることを確認
+    """
+    workflow = {
+        "1": {"inputs": {"noise_seed": "###SEED###", "steps": 4}},
+        "2": {"inputs": {"width": "###WIDTH###", "prefix": "video/###SEED###_run"}},
+        "3": {"inputs": {"text": "###PROMPT###", "clip": ["1", 0]}},
+    }
+    patched = replace_placeholders(workflow, "a.png", "p", values={"SEED": 42, "###WIDTH###": 640})
+    assert patched["1"]["inputs"] == {"noise_seed": 42, "steps": 4}
+    assert patched["2"]["inputs"] == {"width": 640, "prefix": "video/42_run"}
+    assert patched["3"]["inputs"]["clip"] is workflow["3"]["inputs"]["clip"]
+    # 値を指定しないプレースホルダはそのまま残る
+    assert replace_placeholders(workflow, "a.png", "p")["1"]["inputs"]["noise_seed"] == "###SEED###"
+
+
+class _Response:
+    def __init__(self, payload, status_code=200):
+        self._payload = payload
+        self.status_code = status_code
+
+    def json(self):
+        return self._payload
+
+
+def _fake_history(monkeypatch, responses):
+    """requests.get を置き換え、呼び出されたURLを記録します。"""
+    calls = []
+
+    def fake_get(url, **kwargs):
+        calls.append(url)
+        return _Response(responses.pop(0) if len(responses) > 1 else responses[0])
+
+    monkeypatch.setattr(cvg.requests, "get", fake_get)
+    monkeypatch.setattr(cvg.time, "sleep", lambda s: None)
+    return calls
+
+
+def test_wait_polling_uses_per_id_endpoint(monkeypatch):
+    """
+    正常系テスト：ポーリングは /history/{pid} のみを使い、{pid: entry} 形式から取り出すことを確認
+    """
+    entry = {"outputs": {"108": {"images": []}}, "status": {"completed": True}}
+    calls = _fake_history(monkeypatch, [{}, {}, {"pid1": entry}])
+
+    assert cvg.wait_for_history("pid1", host="http://h", use_websocket=False) == entry
+    assert calls == ["http://h/history/pid1"] * 3
+
+
+def test_wait_raises_on_execution_error(monkeypatch):
+    """
+    異常系テスト：履歴エントリがエラーの場合は RuntimeError になることを確認
+    """
+    entry = {
+        "outputs": {},
+        "status": {
+            "status_str": "error",
+            "completed": False,
+            "messages": [["execution_error", {"exception_message": "OOM"}]],
+        },
+    }
+    _fake_history(monkeypatch, [{"pid1": entry}])
+    with pytest.raises(RuntimeError, match="OOM"):
+        cvg.wait_for_history("pid1", host="http://h", use_websocket=False)
+
+
+def test_wait_websocket_completion_event(monkeypatch):
+    """
+    正常系テスト：websocket の完了イベントを受けて履歴エントリを1回だけ取得することを確認
+    """
+    entry = {"outputs": {"108": {"images": []}}, "status": {"completed": True}}
+    calls = _fake_history(monkeypatch, [{}, {"pid1": entry}])
+    messages = [
+        json.dumps({"type": "status", "data": {"status": {}}}),
+        b"\x00\x00\x00\x01preview",
+        json.dumps({"type": "executing", "data": {"node": None, "prompt_id": "other"}}),
+        json.dumps({"type": "executing", "data": {"node": "86", "prompt_id": "pid1"}}),
+        json.dumps({"type": "executing", "data": {"node": None, "prompt_id": "pid1"}}),
+    ]
+
+    class FakeSocket:
+        def settimeout(self, timeout):
+            pass
+
+        def recv(self):
+            return messages.pop(0)
+
+        def close(self):
+            pass
+
+    urls = []
+
+    def create_connection(url, timeout=None):
+        urls.append(url)
+        return FakeSocket()
+
+    monkeypatch.setattr(cvg.websocket, "create_connection", create_connection)
+    result = cvg.wait_for_history("pid1", host="http://h:1", client_id="abc")
+
+    assert result == entry
+    assert urls == ["ws://h:1/ws?clientId=abc"]
+    # 接続直後の確認1回 + 完了イベント後の1回
+    assert calls == ["http://h:1/history/pid1"] * 2
+
+
+def test_download_outputs_from_entry(monkeypatch, tmp_path):
+    """
+    正常系テスト：履歴エントリから videos / images をサブフォルダ付きで保存することを確認
+    """
+    entry = {
+        "outputs": {
+            "108": {
+                "images": [
+                    {"filename": "ComfyUI_00001_.mp4", "subfolder": "video", "type": "output"}
+                ],
+                "animated": [True],
+            },
+            "50": {"gifs": [{"filename": "p.gif", "subfolder": "", "type": "temp"}]},
+        }
+    }
+    requested = []
+
+    class FakeStream:
+        def __init__(self, params):
+            self.params = params
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def raise_for_status(self):
+            pass
+
+        def iter_content(self, chunk_size):
+            yield self.params["filename"].encode()
+            yield b"-data"
+
+    class FakeSession:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def get(self, url, params=None, **kwargs):
+            requested.append((url, params))
+            return FakeStream(params)
+
+    def fail_get(*args, **kwargs):
+        raise AssertionError("履歴を再取得してはいけません")
+
+    monkeypatch.setattr(cvg.requests, "Session", FakeSession)
+    monkeypatch.setattr(cvg.requests, "get", fail_get)
+
+    artifacts = cvg.download_outputs("pid", tmp_path, host="http://h", history=entry)
+
+    video, gif = sorted(artifacts, key=lambda a: a.kind, reverse=True)
+    assert video.path == tmp_path / "video" / "ComfyUI_00001_.mp4"
+    assert (video.node_id, video.kind, video.type) == ("108", "images", "output")
+    assert video.size == len(b"ComfyUI_00001_.mp4-data")
+    assert Path(video).read_bytes() == b"ComfyUI_00001_.mp4-data"
+    assert (gif.path, gif.type) == (tmp_path / "p.gif", "temp")
+    assert sorted(p["subfolder"] for _, p in requested) == ["", "video"]
+
+
+def test_upload_content_addressed_and_dedup(monkeypatch, tmp_path):
+    """
+    正常系テスト：同名の別画像は別名になり、アップロード済みの画像は再送しないことを確認
+    """
+    posts = []
+
+    class UploadResponse(_Response):
+        def raise_for_status(self):
+            pass
+
+    def fake_post(url, files=None, data=None, **kwargs):
+        name = files["image"][0]
+        posts.append((url, name, data))
+        return UploadResponse({"name": name, "subfolder": data["subfolder"], "type": "input"})
+
+    monkeypatch.setattr(cvg.requests, "post", fake_post)
+    manifest = cvg.UploadManifest(tmp_path / "uploads.json")
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+    first = tmp_path / "a" / "same.PNG"
+    second = tmp_path / "b" / "same.PNG"
+    first.write_bytes(b"image-1")
+    second.write_bytes(b"image-2")
+
+    ref1 = cvg.upload_image_to_comfyui(first, host="http://h", manifest=manifest)
+    ref2 = cvg.upload_image_to_comfyui(second, host="http://h", manifest=manifest)
+    assert ref1 != ref2
+    assert ref1.startswith("mini_muse/") and ref1.endswith(".png")
+    assert len(posts) == 2
+
+    # 再実行ではアップロードしない（別サーバーにはアップロードする）
+    assert cvg.upload_image_to_comfyui(first, host="http://h", manifest=manifest) == ref1
+    assert len(posts) == 2
+    cvg.upload_image_to_comfyui(first, host="http://other", manifest=manifest)
+    assert len(posts) == 3
+
+
+def _add_uploads(path, worker, count):
+    manifest = cvg.UploadManifest(path)
+    for i in range(count):
+        manifest.add("http://h", f"mini_muse/{worker}-{i}.png", i)
+
+
+def test_upload_manifest_keeps_concurrent_process_updates(tmp_path):
+    """
+    正常系テスト：複数のプロセスが同時に記録しても、ファイルロックで記録が失われないことを確認
+    """
+    path = tmp_path / "uploads.json"
+    reader = cvg.UploadManifest(path)
+    assert not reader.contains("http://h", "mini_muse/0-0.png")
+
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=_add_uploads, args=(path, w, 20)) for w in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=60)
+        assert worker.exitcode == 0
+
+    assert len(json.loads(path.read_text(encoding="utf-8"))["http://h"]) == 80
+    # 確認は読み込み済みの記録で行い、自分が書き込むときに他のプロセスの記録を取り込む
+    assert not reader.contains("http://h", "mini_muse/0-0.png")
+    reader.add("http://h", "mini_muse/own.png", 1)
+    assert reader.contains("http://h", "mini_muse/0-0.png")
+
+
+def test_link_or_copy_replaces_existing_and_skips_reflink_across_filesystems(monkeypatch, tmp_path):
+    """
+    正常系テスト：既存の保存先は置き換え、別ファイルシステムでは reflink を試さずにコピーすることを確認
+    """
+    source = tmp_path / "source.mp4"
+    source.write_bytes(b"new-video")
+    dest = tmp_path / "dest.mp4"
+    dest.write_bytes(b"old-video")
+
+    assert cvg._link_or_copy(source, dest) == "hardlink"
+    assert dest.read_bytes() == b"new-video"
+    assert not list(tmp_path.glob(".*.tmp"))
+
+    def cross_device_link(src, dst):
+        raise OSError(errno.EXDEV, "Invalid cross-device link")
+
+    def fail_reflink(src, dst):
+        raise AssertionError("別ファイルシステムでは reflink を試さない")
+
+    monkeypatch.setattr(cvg.os, "link", cross_device_link)
+    monkeypatch.setattr(cvg, "_reflink", fail_reflink)
+    other = tmp_path / "other.mp4"
+    other.write_bytes(b"newer-video")
+    assert cvg._link_or_copy(other, dest) == "copy"
+    assert dest.read_bytes() == b"newer-video"
+
+
+def test_deliver_output_strategies(monkeypatch, tmp_path):
+    """
+    正常系テスト：link / rename / auto で最終的なファイル名に直接届けられることを確認
+    """
+    comfy_output = tmp_path / "comfy"
+    (comfy_output / "video").mkdir(parents=True)
+    item = {
+        "filename": "ComfyUI_tag_00001_.mp4",
+        "subfolder": "video",
+        "type": "output",
+        "node_id": "108",
+        "kind": "videos",
+    }
+    source = comfy_output / "video" / item["filename"]
+    source.write_bytes(b"video-data")
+
+    def fail_session():
+        raise AssertionError("マウントがある場合はHTTPを使ってはいけません")
+
+    monkeypatch.setattr(cvg.requests, "Session", fail_session)
+    out_dir = tmp_path / "out"
+
+    linked = cvg.deliver_output(item, out_dir / "a.mp4", comfy_output_dir=comfy_output)
+    assert linked.path.read_bytes() == b"video-data" and linked.size == 10
+    assert source.exists()
+    assert not list(out_dir.glob("*.part"))
+
+    moved = cvg.deliver_output(
+        item, out_dir / "b.mp4", strategy="rename", comfy_output_dir=comfy_output
+    )
+    assert moved.path.read_bytes() == b"video-data"
+    assert not source.exists()
+
+    with pytest.raises(FileNotFoundError):
+        cvg.deliver_output(item, out_dir / "c.mp4", strategy="link", comfy_output_dir=comfy_output)
+    with pytest.raises(ValueError):
+        cvg.deliver_output(item, out_dir / "c.mp4", strategy="ftp")
@@ -0,0 +1,67 @@
+"""
+入力フォルダ監視モジュールのテスト
+
+このモジュールは、mini_muse.folder_watcher の機能をテストします。
+"""
+
+import threading
+import time
+
+import pytest
+
+from mini_muse.folder_watcher import FolderWatcher
+
+
+def _collect(watcher, stop, found):
+    for path in watcher.watch(stop):
+        found.append((path.name, time.monotonic()))
+
+
+@pytest.mark.parametrize("use_inotify", [True, False])
+def test_watch_yields_existing_and_new_files_once_settled(tmp_path, use_inotify):
+    """
+    正常系テスト：既存ファイルと追加ファイルが書き込み完了後に1回だけ返されることを確認
+
+    テスト内容：
+    1. 起動前からあるファイルが返されることを確認
+    2. 追加中のファイルは書き込みが止まるまで返されないことを確認
+    3. 対象外の拡張子・隠しファイルは返されないことを確認
+    4. 追加から1秒以内に返されることを確認
+    """
+    (tmp_path / "old.PNG").write_bytes(b"old")
+    watcher = FolderWatcher(
+        tmp_path, {".png", ".jpg"}, settle_s=0.3, poll_s=0.1, use_inotify=use_inotify
+    )
+    if use_inotify and watcher.mode != "inotify":
+        pytest.skip("inotify is not available")
+    stop = threading.Event()
+    found = []
+    thread = threading.Thread(target=_collect, args=(watcher, stop, found), daemon=True)
+    thread.start()
+    try:
+        time.sleep(0.5)
+        assert [name for name, _ in found] == ["old.PNG"]
+
+        # 書き込み中（サイズが変化し続ける）ファイル
+        growing = tmp_path / "new.jpg"
+        with open(growing, "wb") as f:
+            for _ in range(4):
+                f.write(b"x" * 100)
+                f.flush()
+                time.sleep(0.15)
+                assert "new.jpg" not in [name for name, _ in found]
+        written_at = time.monotonic()
+        (tmp_path / "notes.txt").write_text("skip")
+        (tmp_path / ".hidden.png").write_bytes(b"skip")
+
+        deadline = time.monotonic() + 3
+        while "new.jpg" not in [name for name, _ in found] and time.monotonic() < deadline:
+            time.sleep(0.05)
+        time.sleep(0.5)
+    finally:
+        stop.set()
+        thread.join(timeout=3)
+        watcher.close()
+
+    assert [name for name, _ in found] == ["old.PNG", "new.jpg"]
+    assert found[1][1] - written_at < 1.0
@@ -0,0 +1,93 @@
+"""
+画像生成 → 動画生成 連結スクリプトのテスト
+
+このモジュールは、mini_muse.image_to_video の機能をテストします。
+"""
+
+from pathlib import Path
+
+import mini_muse.image_to_video as i2v
+from mini_muse.comfy_video_generator import SeedSequence, load_workflow_template
+
+WORKFLOW_PATH = Path(__file__).parent.parent / "workflows" / "wan22_i2v_workflow.json"
+IMAGE = {"filename": "chain_ab12cd34_00001_.png", "subfolder": "sd35", "type": "output"}
+
+
+def _fake_server(monkeypatch):
+    """/view・アップロード・投入を記録するフェイクに置き換えます。"""
+    calls = {"view": [], "upload": [], "submit": []}
+
+    def fake_fetch_output_bytes(item, *, host, preview=None, session=None):
+        calls["view"].append((host, preview))
+        return b"jpeg" if preview else b"png"
+
+    def fake_upload_image_bytes(data, suffix, *, host, session=None):
+        calls["upload"].append((host, data, suffix))
+        return "mini_muse/hash.png"
+
+    def fake_submit_workflow(workflow, *, host, client_id, session=None):
+        calls["submit"].append((host, workflow))
+        return "pid"
+
+    monkeypatch.setattr(i2v, "fetch_output_bytes", fake_fetch_output_bytes)
+    monkeypatch.setattr(i2v, "upload_image_bytes", fake_upload_image_bytes)
+    monkeypatch.setattr(i2v, "submit_workflow", fake_submit_workflow)
+    return calls
+
+
+def _config(image_host, video_host):
+    return i2v.ChainConfig(image_host=image_host, video_host=video_host, output_dir=Path("out"))
+
+
+def test_submit_references_server_output_on_same_host(monkeypatch):
+    """
+    正常系テスト：同じサーバーでは出力フォルダの画像を "名前 [output]" で参照し、転送しないことを確認
+    """
+    calls = _fake_server(monkeypatch)
+    template = load_workflow_template(WORKFLOW_PATH)
+    job = i2v.ChainJob(index=1, total=1, image=IMAGE, prompt="A cat walks")
+
+    i2v._submit(job, template, SeedSequence("fixed", 42), _config("http://a", "http://a"))
+
+    assert job.image_ref == "sd35/chain_ab12cd34_00001_.png [output]"
+    assert calls["view"] == [] and calls["upload"] == []
+    host, workflow = calls["submit"][0]
+    assert host == "http://a"
+    assert workflow["97"]["inputs"]["image"] == job.image_ref
+    assert workflow["86"]["inputs"]["noise_seed"] == 42
+
+
+def test_submit_uploads_from_memory_to_other_host(monkeypatch):
+    """
+    正常系テスト：別のサーバーには画像をメモリ経由でアップロードすることを確認
+    """
+    calls = _fake_server(monkeypatch)
+    template = load_workflow_template(WORKFLOW_PATH)
+    job = i2v.ChainJob(index=1, total=1, image=IMAGE, prompt="A cat walks")
+
+    i2v._submit(job, template, SeedSequence(), _config("http://a", "http://b"))
+
+    assert calls["view"] == [("http://a", None)]
+    assert calls["upload"] == [("http://b", b"png", ".png")]
+    assert job.image_ref == "mini_muse/hash.png"
+    assert calls["submit"][0][0] == "http://b"
+
+
+def test_make_prompt_analyzes_jpeg_preview_in_memory(monkeypatch):
+    """
+    正常系テスト：Ollama にはサーバー側で JPEG にした画像データを渡すことを確認
+    """
+    calls = _fake_server(monkeypatch)
+    analyzed = []
+
+    class FakeOllama:
+        def analyze(self, image):
+            analyzed.append(image)
+            return "A cat walks, slow pan"
+
+    job = i2v.ChainJob(index=1, total=1, image=IMAGE)
+    i2v._make_prompt(job, FakeOllama(), _config("http://a", "http://a"))
+
+    assert calls["view"] == [("http://a", i2v.CAPTION_PREVIEW)]
+    assert analyzed == [b"jpeg"]
+    assert job.prompt == "A cat walks, slow pan"
@@ -0,0 +1,66 @@
+"""
+ジョブジャーナルのテスト
+
+このモジュールは、mini_muse.job_journal の機能をテストします。
+"""
+
+from mini_muse.job_journal import JobJournal, image_key
+
+
+def test_journal_restores_stages_after_restart(tmp_path):
+    """
+    正常系テスト：記録したステージが再読み込み後にマージされた状態として復元されることを確認
+    """
+    path = tmp_path / "jobs.jsonl"
+    journal = JobJournal(path, fsync=False)
+    journal.record("a", "prompt", prompt="A cat walks, slow pan, soft light, calm")
+    journal.record("a", "submit", prompt_id="p1", client_id="c1", output_tag="a_c1")
+    journal.record("b", "prompt", prompt="A dog runs")
+    # 書き込み途中で終了した最終行は無視される
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"key": "b", "stage": "sub')
+
+    state = JobJournal(path).state("a")
+    assert state["stage"] == "submit"
+    assert state["prompt"].startswith("A cat walks")
+    assert (state["prompt_id"], state["client_id"], state["output_tag"]) == ("p1", "c1", "a_c1")
+    assert JobJournal(path).state("b")["stage"] == "prompt"
+    assert JobJournal(path).state("missing") is None
+
+
+def test_journal_failure_keeps_prompt_and_compact_drops_done(tmp_path):
+    """
+    正常系テスト：失敗時はプロンプトだけが残り、compact() で完了したジョブが削除されることを確認
+    """
+    path = tmp_path / "jobs.jsonl"
+    journal = JobJournal(path, fsync=False)
+    journal.record("a", "prompt", prompt="A cat walks")
+    journal.record("a", "submit", prompt_id="p1", client_id="c1")
+    journal.record("a", "failed", failed_stage="await", error="timeout")
+    journal.record("b", "render", outputs=[{"filename": "b.mp4"}])
+    journal.record("b", "done", video="/out/b.mp4")
+
+    state = journal.state("a")
+    assert state["prompt"] == "A cat walks"
+    assert "prompt_id" not in state and state["error"] == "timeout"
+    assert list(journal.pending()) == ["a"]
+
+    assert journal.compact() == 1
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 1
+    reloaded = JobJournal(path)
+    assert reloaded.state("a") == state
+    assert reloaded.state("b") is None
+
+
+def test_image_key_changes_when_file_is_replaced(tmp_path):
+    """
+    正常系テスト：同じ名前でも内容（サイズ・更新時刻）が変わると別のキーになることを確認
+    """
+    image = tmp_path / "sample.png"
+    image.write_bytes(b"first")
+    key = image_key(image)
+    assert key == image_key(image)
+
+    image.write_bytes(b"second image")
+    assert image_key(image) != key
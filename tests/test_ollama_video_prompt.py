@@ -4,7 +4,9 @@ Ollama動画プロンプト生成モジュールのテスト
 このモジュールは、mini_muse.ollama_video_prompt の機能をテストします。
 """
 
+import json
 import os
+import time
 
 import pytest
 
@@ -49,3 +51,237 @@ def test_error_when_missing_file():
     """
     with pytest.raises(FileNotFoundError):
         analyze_image_with_ollama("no_such_file.jpg", host=OLLAMA_HOST)
+
+
+class _Response:
+    def __init__(self, data):
+        self._data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._data
+
+
+def test_analysis_cache_skips_request(tmp_path, monkeypatch):
+    """
+    正常系テスト：同じ内容の画像はキャッシュから返され、APIを呼ばないことを確認
+
+    テスト内容：
+    1. 1回目の分析でAPIを呼び出し、結果がキャッシュに保存されることを確認
+    2. 別名でコピーした同じ画像はキャッシュから返されることを確認
+    3. モデルが異なる場合はキャッシュを使わないことを確認
+    4. use_cache=False の場合はキャッシュを使わないことを確認
+    """
+    from PIL import Image
+
+    import mini_muse.ollama_video_prompt as ovp
+
+    calls = []
+
+    def fake_post(url, json, timeout):
+        calls.append(json["model"])
+        return _Response({"response": f"subject, motion, camera, {json['model']}."})
+
+    monkeypatch.setattr(ovp.requests, "post", fake_post)
+    p = tmp_path / "a.png"
+    Image.new("RGB", (64, 64), (10, 20, 30)).save(p)
+    copy = tmp_path / "b.png"
+    copy.write_bytes(p.read_bytes())
+    cache = ovp.AnalysisCache(tmp_path / "cache.json")
+
+    assert analyze_image_with_ollama(p, model="m1", cache=cache) == "subject, motion, camera, m1"
+    assert analyze_image_with_ollama(copy, model="m1", cache=cache) == "subject, motion, camera, m1"
+    assert calls == ["m1"]
+    analyze_image_with_ollama(p, model="m2", cache=cache)
+    analyze_image_with_ollama(p, model="m1", cache=cache, use_cache=False)
+    assert calls == ["m1", "m2", "m1"]
+    assert cache.stats() == {"hits": 1, "misses": 2, "stores": 2, "evictions": 0, "entries": 2}
+    # 画像データ（bytes）は内容で識別され、同じ内容のファイルとキャッシュを共有する
+    assert analyze_image_with_ollama(p.read_bytes(), model="m1", cache=cache).endswith("m1")
+    assert calls == ["m1", "m2", "m1"]
+
+
+def test_analysis_cache_evicts_least_recently_used(tmp_path):
+    """
+    正常系テスト：上限を超えると最終使用時刻が古いエントリから削除されることを確認
+    """
+    from mini_muse.ollama_video_prompt import AnalysisCache
+
+    cache = AnalysisCache(tmp_path / "cache.json", max_entries=2)
+    cache.put("a", "text a")
+    cache.put("b", "text b")
+    assert cache.get("a") == "text a"  # a を最近使用にする
+    cache.put("c", "text c")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "text a"
+    assert cache.get("c") == "text c"
+    assert cache.evictions == 1
+
+
+def test_analysis_cache_hits_do_not_rewrite_file(tmp_path):
+    """
+    正常系テスト：ヒットではファイルを書き換えず、最終使用時刻は次の保存でまとめて書き込むことを確認
+    """
+    from mini_muse.ollama_video_prompt import AnalysisCache
+
+    path = tmp_path / "cache.json"
+    writer = AnalysisCache(path)
+    writer.put("a", "text a")
+    time.sleep(0.01)
+    reader = AnalysisCache(path)
+    assert reader.get("a") == "text a"
+
+    writer.put("b", "text b")  # 別のインスタンス（プロセス）の保存
+    before = path.read_bytes()
+    assert reader.get("b") == "text b"  # 見つからない場合はファイルを読み直す
+    assert reader.get("a") == "text a"
+    assert path.read_bytes() == before
+
+    used = json.loads(before)["a"]["used"]
+    reader.put("c", "text c")
+    data = json.loads(path.read_text())
+    assert set(data) == {"a", "b", "c"}
+    assert data["a"]["used"] > used
+
+
+def test_ollama_client_keep_alive_and_concurrency(tmp_path, monkeypatch):
+    """
+    正常系テスト：OllamaClient が keep_alive を付け、同時実行数の上限を守ることを確認
+
+    テスト内容：
+    1. warm_up が画像なしのリクエストでモデルを読み込むことを確認
+    2. すべての分析リクエストに keep_alive が付くことを確認
+    3. 同時に処理中のリクエスト数が max_concurrency を超えないことを確認
+    """
+    import threading
+    import time
+
+    from PIL import Image
+
+    from mini_muse.ollama_video_prompt import OllamaClient
+
+    bodies = []
+    active = [0, 0]  # [現在の同時実行数, 最大値]
+    lock = threading.Lock()
+
+    def fake_post(url, json, timeout):
+        with lock:
+            bodies.append(json)
+            active[0] += 1
+            active[1] = max(active[1], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return _Response({"response": "subject, motion, camera, mood"})
+
+    paths = []
+    for i in range(6):
+        p = tmp_path / f"{i}.png"
+        Image.new("RGB", (32, 32), (i, 0, 0)).save(p)
+        paths.append(p)
+
+    with OllamaClient(model="m", keep_alive="1h", max_concurrency=2, use_cache=False) as client:
+        monkeypatch.setattr(client.session, "post", fake_post)
+        client.warm_up()
+        results = client.analyze_many(paths)
+
+    assert bodies[0] == {"model": "m", "prompt": "", "keep_alive": "1h"}
+    assert all(b["keep_alive"] == "1h" and len(b["images"]) == 1 for b in bodies[1:])
+    assert set(results.values()) == {"subject, motion, camera, mood"}
+    assert active[1] == 2
+
+
+class _StreamResponse:
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self.read = 0
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.closed = True
+
+    def raise_for_status(self):
+        pass
+
+    def iter_lines(self):
+        import json
+
+        for i, chunk in enumerate(self._chunks):
+            self.read += 1
+            yield json.dumps({"response": chunk, "done": i == len(self._chunks) - 1})
+
+
+def test_streaming_stops_after_complete_line(tmp_path, monkeypatch):
+    """
+    正常系テスト：ストリーミングで1行プロンプトが完成した時点で受信を打ち切ることを確認
+
+    テスト内容：
+    1. 前置きの行は読み飛ばし、4要素の行が完成した時点で応答を閉じることを確認
+    2. num_predict の既定値がリクエストに含まれることを確認
+    3. 1行が完成しないまま終了した場合は受信したテキスト全体を返すことを確認
+    """
+    from PIL import Image
+
+    import mini_muse.ollama_video_prompt as ovp
+
+    p = tmp_path / "a.png"
+    Image.new("RGB", (32, 32)).save(p)
+    chunks = [
+        "Here is the prompt:\n",
+        "A fox, running",
+        ", dolly in",
+        ", misty dawn",
+        ".",
+        " Extra",
+    ]
+    responses = []
+
+    def fake_post(url, json, timeout, stream=False):
+        assert stream and json["stream"]
+        assert json["options"] == {"num_predict": ovp.STREAM_NUM_PREDICT}
+        responses.append(_StreamResponse(chunks))
+        return responses[-1]
+
+    monkeypatch.setattr(ovp.requests, "post", fake_post)
+    out = analyze_image_with_ollama(p, stream=True, use_cache=False)
+
+    assert out == "A fox, running, dolly in, misty dawn"
+    assert responses[0].read == 5 and responses[0].closed
+
+    chunks = ["just a caption", " without commas"]
+    assert analyze_image_with_ollama(p, stream=True, use_cache=False) == (
+        "just a caption without commas"
+    )
+
+
+def test_resize_to_base64_keeps_short_side(tmp_path):
+    """
+    正常系テスト：縮小デコード・整数縮小を経ても短辺が指定サイズのJPEGになることを確認
+    """
+    import base64
+    import io
+
+    from PIL import Image
+
+    from mini_muse.ollama_video_prompt import _load_and_resize_to_base64
+
+    for name, size, mode in [
+        ("large.jpg", (3000, 2000), "RGB"),
+        ("alpha.png", (900, 1700), "RGBA"),
+    ]:
+        p = tmp_path / name
+        Image.new(mode, size, (120, 80, 40, 255)[: len(mode)]).save(p)
+        with Image.open(io.BytesIO(base64.b64decode(_load_and_resize_to_base64(p)))) as out:
+            assert out.format == "JPEG" and out.mode == "RGB"
+            assert min(out.size) == 768
+            assert abs(out.size[0] / out.size[1] - size[0] / size[1]) < 0.01
+        # 2回目（バッファ再利用）も同じ結果になる
+        assert _load_and_resize_to_base64(p) == _load_and_resize_to_base64(p)
+        # 画像データ（bytes）もファイルと同じ結果になる
+        assert _load_and_resize_to_base64(p.read_bytes()) == _load_and_resize_to_base64(p)
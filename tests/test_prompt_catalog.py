@@ -0,0 +1,150 @@
+"""
+コンパイル済みプロンプトカタログのテスト
+
+このモジュールは、mini_muse.prompt_catalog の機能をテストします。
+"""
+
+import json
+import os
+
+from mini_muse.prompt_catalog import (
+    TemplateCatalog,
+    compile_catalog,
+    ensure_catalog,
+    open_catalog,
+    parse_mix_spec,
+)
+from mini_muse.prompt_generator import PromptGenerator
+
+SAMPLE = {
+    "elements": {
+        "color": {
+            "description": "色",
+            "values": ["赤", {"value": "blue", "weight": 3.0}, "green"],
+        },
+        "extra": {"description": "補助データ", "notes": ["values を持たない要素"]},
+    },
+    "templates": {
+        "pair": {
+            "description": "two colors",
+            "japanese_description": "2色",
+            "text": "{color_1} meets {color_2}.",
+        }
+    },
+}
+
+
+def _write_sample(prompts_dir):
+    path = prompts_dir / "sample.json"
+    path.write_text(json.dumps(SAMPLE, ensure_ascii=False), encoding="utf-8")
+    return path
+
+
+def test_catalog_roundtrip(tmp_path):
+    """
+    正常系テスト：コンパイルしたカタログからJSONと同じ内容が読めることを確認
+    """
+    _write_sample(tmp_path)
+    catalog_path = compile_catalog(tmp_path, tmp_path / "catalog.mmcat")
+
+    with open_catalog(catalog_path) as catalog:
+        entry = catalog.get_file("sample.json")
+        assert entry is not None
+        assert entry.element_names() == ["color", "extra"]
+        assert entry.templates() == SAMPLE["templates"]
+        sampler = entry.samplers()["color"]
+        assert list(sampler.values) == ["赤", "blue", "green"]
+        assert list(sampler.weights) == [1.0, 3.0, 1.0]
+        assert "values" not in entry.elements()["extra"]
+        assert catalog.get_file("missing.json") is None
+
+
+def test_generator_uses_catalog(tmp_path):
+    """
+    正常系テスト：PromptGenerator がカタログから読み込んで生成できることを確認
+    """
+    source = _write_sample(tmp_path)
+    generator = PromptGenerator(elements_file=str(source), catalog=tmp_path / "catalog.mmcat")
+
+    assert generator.catalog is not None
+    prompt = generator.generate_prompt("pair")
+    first, second = prompt.rstrip(".").split(" meets ")
+    assert first != second
+    assert {first, second} <= {"赤", "blue", "green"}
+
+
+def test_catalog_invalidated_by_change(tmp_path):
+    """
+    正常系テスト：ソースファイルの変更でカタログが再コンパイルされることを確認
+    """
+    source = _write_sample(tmp_path)
+    catalog_path = tmp_path / "catalog.mmcat"
+    catalog = ensure_catalog(catalog_path, tmp_path)
+    assert catalog.is_current(tmp_path)
+
+    # mtime のみの変更は内容ハッシュで有効と判定される
+    stat = source.stat()
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert catalog.is_current(tmp_path)
+
+    data = dict(SAMPLE, templates={"solo": {"description": "one", "text": "{color}"}})
+    source.write_text(json.dumps(data), encoding="utf-8")
+    assert not catalog.is_current(tmp_path)
+    catalog.close()
+
+    with ensure_catalog(catalog_path, tmp_path) as refreshed:
+        assert refreshed.get_file("sample.json").template_names() == ["solo"]
+
+
+def test_template_catalog_lazy_mix(tmp_path):
+    """
+    正常系テスト：TemplateCatalog が索引のみ作成し、使うファイルだけ読み込むことを確認
+    """
+    _write_sample(tmp_path)
+    other = {
+        "elements": {"shape": {"description": "形", "values": ["circle", "square"]}},
+        "templates": {"solo": {"description": "one shape", "text": "a {shape}"}},
+    }
+    (tmp_path / "other.json").write_text(json.dumps(other), encoding="utf-8")
+
+    catalog = TemplateCatalog(tmp_path)
+    assert catalog.files() == ["other.json", "sample.json"]
+    assert catalog.template_refs() == ["other.json:solo", "sample.json:pair"]
+    assert catalog.loaded_files() == []
+    assert (tmp_path / ".template_manifest.cache").exists()
+
+    # 重み0のファイルは選ばれず、読み込まれない
+    results = catalog.generate_mixed(5, weights=parse_mix_spec("other.json=1,sample.json=0"))
+    assert {ref for ref, _ in results} == {"other.json:solo"}
+    assert catalog.loaded_files() == ["other.json"]
+
+    assert catalog.resolve("pair") == ("sample.json", "pair")
+    # 2回目はマニフェストから索引を再利用
+    assert TemplateCatalog(tmp_path).template_names("sample.json") == ["pair"]
+
+
+def test_catalog_keeps_constraints(tmp_path):
+    """
+    正常系テスト：カタログ経由でも制約ルールが読み込まれることを確認
+    """
+    data = dict(
+        SAMPLE,
+        constraints=[{"when": {"color": "赤"}, "exclude": {"color": "green"}}],
+    )
+    data["templates"] = dict(
+        SAMPLE["templates"],
+        solo={
+            "description": "one",
+            "text": "{color}",
+            "constraints": [{"when": {"color": "blue"}, "include": {"color": "blue"}}],
+        },
+    )
+    source = tmp_path / "sample.json"
+    source.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+
+    from_json = PromptGenerator(elements_file=str(source))
+    from_catalog = PromptGenerator(elements_file=str(source), catalog=tmp_path / "catalog.mmcat")
+    assert from_catalog.catalog is not None
+    assert from_catalog.templates == from_json.templates
+    # 3色から2色を選ぶ 6 通りのうち、赤と green の組み合わせ 2 通りが除外される
+    assert from_catalog.count_combinations("pair") == from_json.count_combinations("pair") == 4
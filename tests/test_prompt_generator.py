@@ -82,6 +82,18 @@ uv run python -m unittest tests.test_prompt_generator
 1. **test_all_templates** - 全テンプレートのテスト
    - すべてのテンプレートでプロンプト生成が成功することを確認
 
+### 重み付きサンプラーのテスト (TestAliasSampler)
+
+1. **test_weighted_distribution** - 重みに比例した分布になることを確認
+2. **test_draw_excluding** - 除外インデックスを避けて抽選されることを確認
+3. **test_weighted_values_in_json** - JSONの重み付き値が読み込まれることを確認
+
+### 組み合わせ制約のテスト (TestConstraints)
+
+1. **test_count_combinations** - ルールを満たす組み合わせ数が総当たりと一致することを確認
+2. **test_constrained_generation** - 生成結果がルールを満たすことを確認
+3. **test_invalid_rule** - 存在しない値を指定したルールでValueErrorが発生することを確認
+
 ## テスト結果の見方
 
 ### 成功例
@@ -186,7 +198,12 @@ jobs:
 ================================================================================
 """
 
+import itertools
+import json
+import random
 import sys
+import tempfile
+import time
 import unittest
 from pathlib import Path
 
@@ -194,7 +211,7 @@ from pathlib import Path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-from mini_muse.prompt_generator import PromptGenerator  # noqa: E402
+from mini_muse.prompt_generator import AliasSampler, PromptGenerator  # noqa: E402
 
 
 class TestPromptGenerator(unittest.TestCase):
@@ -354,6 +371,177 @@ class TestPromptGeneratorEdgeCases(unittest.TestCase):
                 print(f"  ✓ {template_name}: OK")
 
 
+class TestAliasSampler(unittest.TestCase):
+    """重み付きサンプラーのテスト"""
+
+    def test_weighted_distribution(self):
+        """重みに比例した分布になることを確認"""
+        print("\n[サンプラーテスト] 重み付き分布のテスト")
+        sampler = AliasSampler(["a", "b", "c"], [1.0, 2.0, 7.0])
+        rng = random.Random(0)
+        counts = {"a": 0, "b": 0, "c": 0}
+        for _ in range(20000):
+            counts[sampler.sample(rng)] += 1
+        self.assertAlmostEqual(counts["a"] / 20000, 0.1, delta=0.02)
+        self.assertAlmostEqual(counts["b"] / 20000, 0.2, delta=0.02)
+        self.assertAlmostEqual(counts["c"] / 20000, 0.7, delta=0.02)
+        print(f"  ✓ 分布: {counts}")
+
+    def test_draw_excluding(self):
+        """除外インデックスを避けて抽選されることを確認"""
+        print("\n[サンプラーテスト] 非復元抽選のテスト")
+        sampler = AliasSampler([f"v{i}" for i in range(10)])
+        rng = random.Random(1)
+        # 棄却法の範囲と一時テーブル再構築の範囲の両方を確認
+        for excluded in ({0, 1}, set(range(8))):
+            for _ in range(200):
+                index = sampler.draw_index_excluding(excluded, rng)
+                self.assertNotIn(index, excluded)
+        self.assertIsNone(sampler.draw_index_excluding(set(range(10)), rng))
+        print("  ✓ 除外インデックスは選択されませんでした")
+
+    def test_weighted_values_in_json(self):
+        """JSONの重み付き値が読み込まれることを確認"""
+        print("\n[サンプラーテスト] 重み付きJSONの読み込みテスト")
+        data = {
+            "elements": {
+                "color": {
+                    "description": "色",
+                    "values": ["red", {"value": "blue", "weight": 0}, {"value": "green"}],
+                }
+            },
+            "templates": {"t": {"description": "test", "text": "{color_1} and {color_2}"}},
+        }
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "weighted.json"
+            path.write_text(json.dumps(data), encoding="utf-8")
+            generator = PromptGenerator(elements_file=str(path))
+        self.assertEqual(generator.get_element_values("color"), ["red", "blue", "green"])
+        self.assertEqual(generator.get_element_weights("color"), [1.0, 0.0, 1.0])
+        for _ in range(20):
+            prompt = generator.generate_prompt("t")
+            # 重み0の値は選ばれず、番号付きプレースホルダーは別の値になる
+            self.assertNotIn("blue", prompt)
+            self.assertIn(prompt, ("red and green", "green and red"))
+        print("  ✓ 重み付き値で生成成功")
+
+
+class TestConstraints(unittest.TestCase):
+    """組み合わせ制約のテスト"""
+
+    DATA = {
+        "elements": {
+            "color": {"values": ["red", "green", "blue", {"value": "black", "weight": 3.0}]},
+            "light": {"values": ["neon", "sun", "moon"]},
+        },
+        "constraints": [
+            {"when": {"light": "neon"}, "exclude": {"color": ["red", "green"]}},
+            {"when": {"color": "red"}, "exclude": {"color": "green"}},
+        ],
+        "templates": {
+            "pair": {"text": "{color_1} {color_2} under {light}"},
+            "solo": {
+                "text": "{color} under {light}",
+                "constraints": [{"when": {"light": "sun"}, "include": {"color": ["blue"]}}],
+            },
+        },
+    }
+
+    def _generator(self, data):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "constraints.json"
+            path.write_text(json.dumps(data), encoding="utf-8")
+            return PromptGenerator(elements_file=str(path))
+
+    def test_count_combinations(self):
+        """ルールを満たす組み合わせ数が総当たりと一致することを確認"""
+        print("\n[制約テスト] 組み合わせ数のテスト")
+        generator = self._generator(self.DATA)
+        expected = 0
+        for c1, c2, light in itertools.product(range(4), range(4), range(3)):
+            if c1 == c2 or {c1, c2} == {0, 1}:
+                continue
+            if light == 0 and {c1, c2} & {0, 1}:
+                continue
+            expected += 1
+        self.assertEqual(generator.count_combinations("pair"), expected)
+        # neon: blue/black, sun: blue のみ, moon: 4色
+        self.assertEqual(generator.count_combinations("solo"), 2 + 1 + 4)
+        print(f"  ✓ 組み合わせ数: {expected}")
+
+    def test_constrained_generation(self):
+        """生成結果がルールを満たすことを確認"""
+        print("\n[制約テスト] 制約付き生成のテスト")
+        generator = self._generator(self.DATA)
+        for _ in range(200):
+            first, rest = generator.generate_prompt("pair").split(" ", 1)
+            second, light = rest.split(" under ")
+            self.assertNotEqual(first, second)
+            self.assertNotEqual({first, second}, {"red", "green"})
+            if light == "neon":
+                self.assertFalse({first, second} & {"red", "green"})
+            color, light = generator.generate_prompt("solo").split(" under ")
+            if light == "sun":
+                self.assertEqual(color, "blue")
+        print("  ✓ すべての生成結果が制約を満たしました")
+
+    def test_count_large_element_with_numbered_slots(self):
+        """値が1000個の要素に番号付きスロットが3つあっても、組み合わせ数をすぐ数えられることを確認"""
+        print("\n[制約テスト] 大きな要素の組み合わせ数のテスト")
+        n = 1000
+        data = {
+            "elements": {"color": {"values": [f"color{i}" for i in range(n)]}},
+            "constraints": [{"when": {"color": "color0"}, "exclude": {"color": "color1"}}],
+            "templates": {"triple": {"text": "{color_1}, {color_2} and {color_3}"}},
+        }
+        generator = self._generator(data)
+
+        start = time.perf_counter()
+        count = generator.count_combinations("triple")
+        elapsed = time.perf_counter() - start
+        # 3つとも別の値で、color0 と color1 が同時に現れない並び
+        self.assertEqual(count, n * (n - 1) * (n - 2) - 3 * 2 * (n - 2))
+        self.assertLess(elapsed, 1.0)
+        colors = generator.generate_prompt("triple").replace(" and ", ", ").split(", ")
+        self.assertEqual(len(set(colors)), 3)
+        self.assertFalse({"color0", "color1"} <= set(colors))
+        print(f"  ✓ 組み合わせ数: {count}（{elapsed:.3f}秒）")
+
+    def test_sampling_keeps_memo_bounded(self):
+        """抽選を繰り返しても、数え上げのメモが増え続けないことを確認"""
+        print("\n[制約テスト] 抽選のメモのテスト")
+        n = 1000
+        data = {
+            "elements": {"color": {"values": [f"color{i}" for i in range(n)]}},
+            "constraints": [{"when": {"color": "color0"}, "exclude": {"color": "color1"}}],
+            "templates": {"triple": {"text": "{color_1}, {color_2} and {color_3}"}},
+        }
+        generator = self._generator(data)
+        model = generator.constraint_models["triple"]
+
+        def memo_size():
+            return sum(len(dp._memo) for c in model.components for *_, dp in c._terms)
+
+        rng = random.Random(0)
+        model.sample(rng)
+        size = memo_size()
+        for _ in range(20):
+            model.sample(rng)
+        self.assertEqual(memo_size(), size)
+        self.assertLess(size, n)
+        print(f"  ✓ メモの件数: {size}")
+
+    def test_invalid_rule(self):
+        """存在しない値を指定したルールでValueErrorが発生することを確認"""
+        print("\n[制約テスト] 不正なルールのテスト")
+        data = dict(
+            self.DATA, constraints=[{"when": {"light": "dusk"}, "exclude": {"color": "red"}}]
+        )
+        with self.assertRaises(ValueError):
+            self._generator(data)
+        print("  ✓ ValueErrorが正しく発生しました")
+
+
 def run_tests():
     """テストを実行する関数"""
     # テストスイートの作成
@@ -363,6 +551,8 @@ def run_tests():
     # テストケースを追加
     suite.addTests(loader.loadTestsFromTestCase(TestPromptGenerator))
     suite.addTests(loader.loadTestsFromTestCase(TestPromptGeneratorEdgeCases))
+    suite.addTests(loader.loadTestsFromTestCase(TestAliasSampler))
+    suite.addTests(loader.loadTestsFromTestCase(TestConstraints))
 
     # テストの実行
     runner = unittest.TextTestRunner(verbosity=2)
@@ -0,0 +1,95 @@
+"""
+トークン数推定モジュールのテスト
+
+このモジュールは、mini_muse.token_counter と PromptGenerator の
+トークン予算付き生成をテストします。
+"""
+
+import gzip
+import json
+
+import mini_muse.token_counter as token_counter
+from mini_muse.prompt_generator import PromptGenerator
+from mini_muse.token_counter import ClipTokenCounter, estimate_clip_tokens, load_merges
+
+
+class WordCounter:
+    """テスト用：空白区切りの単語数をトークン数とみなすカウンター"""
+
+    exact = True
+
+    def count(self, text):
+        return len(text.split())
+
+
+def test_bpe_count_with_merges(tmp_path):
+    """
+    正常系テスト：マージリストに従って BPE 分割数が数えられることを確認
+    """
+    merges = tmp_path / "merges.txt"
+    merges.write_text("#version: 0.2\nl o\nlo w</w>\ne r</w>\n", encoding="utf-8")
+    counter = ClipTokenCounter(merges_path=merges)
+
+    assert counter.exact
+    # "low" -> l o w</w> -> lo w</w> -> low</w>
+    assert counter.count("low") == 1
+    # "lower" -> lo w e r</w> -> lo w er</w>
+    assert counter.count("LOWER") == 3
+    # 記号は単語と別トークン
+    assert counter.count("low, low") == 3
+    assert counter.truncated_tokens("low low low", max_tokens=2) == 1
+
+
+def test_load_merges_skips_open_clip_header(tmp_path, monkeypatch):
+    """
+    正常系テスト：open_clip の語彙ファイルのヘッダー行をマージに含めず、
+    マージ数の上限まで読み込むことを確認
+    """
+    merges = tmp_path / "bpe_simple_vocab_16e6.txt.gz"
+    with gzip.open(merges, "wt", encoding="utf-8") as f:
+        f.write("bpe_simple_vocab_16e6.txt#version: 0.2\nl o\nlo w</w>\ne r</w>\n")
+
+    assert load_merges(merges)[0] == ("l", "o")
+    assert ClipTokenCounter(merges_path=merges).count("low") == 1
+    monkeypatch.setattr(token_counter, "_CLIP_MERGE_COUNT", 2)
+    assert load_merges(merges) == [("l", "o"), ("lo", "w</w>")]
+
+
+def test_heuristic_fallback(tmp_path):
+    """
+    正常系テスト：語彙ファイルがない場合はヒューリスティック推定になることを確認
+    """
+    counter = ClipTokenCounter(merges_path=tmp_path / "missing.txt")
+    assert not counter.exact
+    assert counter.count("a red fox") == estimate_clip_tokens("a red fox") == 3
+
+
+def test_generate_within_budget(tmp_path):
+    """
+    正常系テスト：max_tokens を指定するとトークン上限に収まる値が選ばれることを確認
+    """
+    data = {
+        "elements": {
+            "subject": {
+                "description": "主題",
+                "values": ["fox", "old grey wolf", "very large ancient stone dragon"],
+            }
+        },
+        "templates": {"t": {"description": "test", "text": "a {subject_1} and {subject_2}"}},
+    }
+    path = tmp_path / "budget.json"
+    path.write_text(json.dumps(data), encoding="utf-8")
+    generator = PromptGenerator(elements_file=str(path), token_counter=WordCounter())
+    assert generator.value_token_counts["subject"] == [1, 3, 5]
+
+    for _ in range(30):
+        prompt = generator.generate_prompt("t", max_tokens=6)
+        # 固定部2語 + 2スロットで6語以内 → fox と old grey wolf の組み合わせのみ
+        assert len(prompt.split()) <= 6
+        assert "dragon" not in prompt
+
+    (row,) = generator.token_report(max_tokens=6)
+    assert row["literal_tokens"] == 2
+    assert row["min_tokens"] == 6
+    assert row["max_tokens"] == 12
+    assert row["overflow_rate"] > 0
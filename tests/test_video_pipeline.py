@@ -0,0 +1,151 @@
+"""
+ステージ型パイプラインのテスト
+
+このモジュールは、mini_muse.video_pipeline の機能をテストします。
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+
+from mini_muse.video_pipeline import PipelineJob, Stage, StagedPipeline
+
+
+@dataclass
+class _Job(PipelineJob):
+    value: int = 0
+
+
+def test_pipeline_runs_all_jobs_through_stages():
+    """
+    正常系テスト：すべてのジョブが全ステージを通り、ステージごとの統計が記録されることを確認
+    """
+
+    def double(job):
+        job.value *= 2
+        return job
+
+    def add_one(job):
+        job.value += 1
+        return job
+
+    pipeline = StagedPipeline([Stage("double", double, workers=3), Stage("add", add_one)])
+    results = pipeline.run(_Job(value=i) for i in range(10))
+
+    assert sorted(job.value for job in results) == [i * 2 + 1 for i in range(10)]
+    assert all(job.success and set(job.stage_seconds) == {"double", "add"} for job in results)
+    assert pipeline.stats["double"].processed == 10
+    assert pipeline.stats["add"].processed == 10
+
+
+def test_pipeline_skips_remaining_stages_on_error():
+    """
+    異常系テスト：失敗したジョブは以降のステージを飛ばし、失敗ステージが記録されることを確認
+    """
+    seen = []
+
+    def check(job):
+        if job.value == 2:
+            raise ValueError("bad value")
+        return job
+
+    def record(job):
+        seen.append(job.value)
+        return job
+
+    errors = []
+    pipeline = StagedPipeline(
+        [Stage("check", check), Stage("record", record)],
+        on_error=lambda job, stage, e: errors.append((job.value, stage)),
+    )
+    results = pipeline.run(_Job(value=i) for i in range(4))
+
+    assert sorted(seen) == [0, 1, 3]
+    failed = [job for job in results if not job.success]
+    assert [(job.value, job.failed_stage, job.error) for job in failed] == [
+        (2, "check", "bad value")
+    ]
+    assert errors == [(2, "check")]
+    assert pipeline.stats["check"].failed == 1
+
+
+def test_pipeline_overlaps_stages_with_backpressure():
+    """
+    正常系テスト：ステージが並行に動き、後段が詰まると前段の先行がキューの上限で止まることを確認
+    """
+    released = threading.Event()
+    started = []
+
+    def fast(job):
+        started.append(job.value)
+        return job
+
+    def slow(job):
+        released.wait(timeout=5)
+        return job
+
+    pipeline = StagedPipeline(
+        [Stage("fast", fast, queue_size=1), Stage("slow", slow, queue_size=1)]
+    )
+    runner = threading.Thread(target=pipeline.run, args=([_Job(value=i) for i in range(10)],))
+    runner.start()
+    time.sleep(0.2)
+
+    # slow が1件処理中、slow のキューに1件、fast の処理中に1件まで（残りは投入待ち）
+    assert 2 <= len(started) <= 3
+    released.set()
+    runner.join(timeout=5)
+    assert not runner.is_alive()
+    assert len(started) == 10
+
+
+def test_pipeline_fans_out_list_results():
+    """
+    正常系テスト：ステージがリストを返すと各要素が次のステージに渡されることを確認
+    """
+
+    def split(job):
+        return [_Job(value=job.value * 10 + take) for take in range(job.value)]
+
+    def add_one(job):
+        job.value += 1
+        return job
+
+    pipeline = StagedPipeline([Stage("split", split), Stage("add", add_one, workers=2)])
+    results = pipeline.run(_Job(value=i) for i in range(4))
+
+    assert sorted(job.value for job in results) == [11, 21, 22, 31, 32, 33]
+    assert pipeline.stats["split"].processed == 4
+    assert pipeline.stats["add"].processed == 6
+
+
+def test_pipeline_survives_raising_callbacks(capsys):
+    """
+    異常系テスト：on_result / on_error が例外を出してもワーカーが止まらず、run() が終わることを確認
+    """
+
+    def check(job):
+        if job.value == 1:
+            raise ValueError("bad value")
+        return job
+
+    def raise_error(job, stage, e):
+        raise RuntimeError("error callback")
+
+    pipeline = StagedPipeline(
+        [Stage("check", check), Stage("pass", lambda job: job)],
+        on_result=lambda job: 1 / 0,
+        on_error=raise_error,
+    )
+    finished = []
+    thread = threading.Thread(
+        target=lambda: finished.extend(pipeline.run(_Job(value=i) for i in range(3)))
+    )
+    thread.start()
+    thread.join(timeout=5)
+
+    assert not thread.is_alive()
+    assert sorted(job.value for job in finished) == [0, 1, 2]
+    output = capsys.readouterr().out
+    assert "on_result" in output and "ZeroDivisionError" in output
+    assert "on_error" in output
@@ -0,0 +1,72 @@
+"""
+動画入力画像の前処理モジュールのテスト
+
+このモジュールは、mini_muse.video_preprocess の機能をテストします。
+"""
+
+from pathlib import Path
+
+from PIL import Image
+
+from mini_muse.comfy_video_generator import load_workflow
+from mini_muse.video_preprocess import (
+    find_nodes,
+    preprocess_images,
+    resize_for_video,
+    workflow_target_size,
+)
+
+WORKFLOW_PATH = Path(__file__).parent.parent / "workflows" / "wan22_i2v_workflow.json"
+
+
+def test_workflow_target_size():
+    """
+    正常系テスト：同梱ワークフローから WanImageToVideo の解像度を取得できることを確認
+    """
+    workflow = load_workflow(WORKFLOW_PATH)
+    assert [node_id for node_id, _ in find_nodes(workflow, "WanImageToVideo")] == ["98"]
+    assert workflow_target_size(workflow) == (640, 640)
+    # プレースホルダや接続の場合は取得しない
+    assert (
+        workflow_target_size(
+            {"1": {"class_type": "WanImageToVideo", "inputs": {"width": "###W###", "height": 640}}}
+        )
+        is None
+    )
+
+
+def test_resize_center_crop(tmp_path):
+    """
+    正常系テスト：中央基準で切り抜かれ、キャッシュが再利用されることを確認
+    """
+    # 左右が赤、中央が青の横長画像
+    source = tmp_path / "wide.png"
+    image = Image.new("RGB", (1200, 400), (255, 0, 0))
+    image.paste((0, 0, 255), (400, 0, 800, 400))
+    image.save(source)
+
+    out = resize_for_video(source, (64, 64), out_dir=tmp_path / "cache")
+    with Image.open(out) as resized:
+        assert resized.size == (64, 64)
+        # 端まで中央の青い領域になる（リサンプリングによる境界のにじみは許容）
+        for x in (2, 32, 61):
+            r, _g, b = resized.getpixel((x, 32))
+            assert b > 220 and r < 30
+    mtime = out.stat().st_mtime_ns
+    assert resize_for_video(source, (64, 64), out_dir=tmp_path / "cache") == out
+    assert out.stat().st_mtime_ns == mtime
+
+
+def test_preprocess_images_pool(tmp_path):
+    """
+    正常系テスト：複数画像をプロセスプールで処理し、失敗した画像は元画像を返すことを確認
+    """
+    good = tmp_path / "good.jpg"
+    Image.new("RGB", (300, 200), (10, 20, 30)).save(good)
+    broken = tmp_path / "broken.png"
+    broken.write_bytes(b"not an image")
+
+    result = preprocess_images([good, broken], (32, 32), out_dir=tmp_path / "cache", max_workers=2)
+    assert result[broken] == broken
+    with Image.open(result[good]) as resized:
+        assert resized.size == (32, 32)